@@ -183,19 +183,15 @@ df.insert(0, '№', range(1, len(df) + 1))
   - Ищем точку (\.)
   - Ищем пробел (\s*)
   - Удаляем всё это
-"""
 
-import re
+Вместе с префиксом применяется словарь CORRECTIONS (fix_complaints_grammar.py).
+Обработка идет по уникальным жалобам (их десятки), а не по строкам:
+результат раздается обратно через категориальные коды.
+"""
 
-def clean_complaint_prefix(text):
-    if pd.isna(text):
-        return text
-    text = str(text)
-    # Regex: ^ (начало) \s* (пробелы) [1-4] (цифра) \. (точка) \s* (пробелы)
-    text = re.sub(r'^\s*[1-4]\.\s*', '', text)
-    return text
+from fix_complaints_grammar import canonicalize_complaints
 
-df['Жалоба'] = df['Жалоба'].apply(clean_complaint_prefix)
+df['Жалоба'], _ = canonicalize_complaints(df['Жалоба'], strip_prefix=True)
 
 
 # ============================================================================
@@ -451,8 +447,8 @@ df = df.sort_values(by='Қўнғироқ қабул қилинган вақт',
 # 5. Добавление нумерации
 df.insert(0, '№', range(1, len(df) + 1))  # 5,574 × 17
 
-# 6. Очистка жалоб
-df['Жалоба'] = df['Жалоба'].apply(clean_complaint_prefix)
+# 6. Очистка жалоб (по уникальным значениям)
+df['Жалоба'], _ = canonicalize_complaints(df['Жалоба'], strip_prefix=True)
 
 # 7-10. Создание листов
 # Лист 1: Детальные (весь DF)
@@ -18,6 +18,15 @@
  * JSON Lines (по одной записи на строку):
  * {"operator":"ФИО","date":"01.12.2024","card":"1234","status":"положительный"}
  * 
+ * ➕ ДОПИСЫВАНИЕ:
+ * "Собрать все данные" не очищает документ, а дописывает в конец только
+ * новые строки листов. Для каждого листа в свойствах скрипта хранится,
+ * сколько строк уже прочитано (ROWS_PREFIX + id таблицы + лист).
+ * Заголовок пишется один раз в пустой документ, итоги - только в лог.
+ * Python (docs_stream.py) читает документ с отметки прошлого импорта.
+ * Исправления в уже собранных строках попадают в документ только при
+ * "Пересобрать документ с нуля".
+ * 
  * 🚀 ИСПОЛЬЗОВАНИЕ:
  * 1. Создайте новый Google Docs документ
  * 2. Скопируйте ID документа
@@ -36,9 +45,13 @@ var DOCS_ID = "ВСТАВЬТЕ_ID_ДОКУМЕНТА_СЮДА";
 // ID таблицы со списком операторов (текущая таблица)
 var SETTINGS_SHEET_NAME = "Настройки";
 
-// Максимальное количество записей за один запуск (чтобы не превысить лимиты)
+// Максимальное количество записей за один запуск (чтобы не превысить лимиты).
+// Остаток дописывается следующим запуском
 var MAX_RECORDS_PER_RUN = 10000;
 
+// Префикс свойств скрипта: сколько строк листа уже записано в документ
+var ROWS_PREFIX = "docs_rows:";
+
 // =============================================================================
 // МЕНЮ
 // =============================================================================
@@ -48,6 +61,7 @@ function onOpen() {
   
   ui.createMenu("📄 Docs Collector")
     .addItem("🔄 Собрать все данные в Docs", "collectAllDataToDocs")
+    .addItem("♻️ Пересобрать документ с нуля", "rebuildDocsDocument")
     .addItem("🗑️ Очистить документ Docs", "clearDocsDocument")
     .addSeparator()
     .addItem("📊 Собрать архивные данные", "collectArchiveDataToDocs")
@@ -62,7 +76,7 @@ function onOpen() {
 // =============================================================================
 
 /**
- * Собирает все данные из всех таблиц операторов в Google Docs
+ * Дописывает в Google Docs новые строки всех таблиц операторов
  */
 function collectAllDataToDocs() {
   var startTime = new Date().getTime();
@@ -96,22 +110,23 @@ function collectAllDataToDocs() {
     var doc = DocumentApp.openById(DOCS_ID);
     var body = doc.getBody();
     
-    // Очищаем документ
-    body.clear();
-    
-    // Добавляем заголовок и метаданные
-    var header = body.appendParagraph("АРХИВ ДАННЫХ ОПЕРАТОРОВ");
-    header.setHeading(DocumentApp.ParagraphHeading.HEADING1);
-    
-    body.appendParagraph("Дата сбора: " + new Date().toLocaleString());
-    body.appendParagraph("Количество операторов: " + operators.length);
-    body.appendParagraph("Формат: JSON Lines (по одной записи на строку)");
-    body.appendParagraph("=" .repeat(80));
-    body.appendParagraph("");
+    // Заголовок - только в пустой документ: строки выше уже
+    // импортированных записей не должны меняться
+    if (!body.getText().trim()) {
+      var header = body.appendParagraph("АРХИВ ДАННЫХ ОПЕРАТОРОВ");
+      header.setHeading(DocumentApp.ParagraphHeading.HEADING1);
+      
+      body.appendParagraph("Создан: " + new Date().toLocaleString());
+      body.appendParagraph("Формат: JSON Lines (по одной записи на строку, новые - в конце)");
+      body.appendParagraph("=" .repeat(80));
+      body.appendParagraph("");
+    }
     
     // Собираем данные
     var totalRecords = 0;
     var processedOperators = 0;
+    var properties = PropertiesService.getScriptProperties();
+    var collectedRows = properties.getProperties();
     
     for (var i = 0; i < operators.length; i++) {
       var op = operators[i];
@@ -124,7 +139,7 @@ function collectAllDataToDocs() {
       Logger.log("\n▶ Обработка: " + op.name + " (" + (i+1) + "/" + operators.length + ")");
       
       try {
-        var records = collectOperatorData(op);
+        var records = collectOperatorData(op, body, collectedRows, MAX_RECORDS_PER_RUN - totalRecords);
         
         if (records > 0) {
           totalRecords += records;
@@ -146,14 +161,14 @@ function collectAllDataToDocs() {
       }
     }
     
-    // Добавляем футер
-    body.appendParagraph("");
-    body.appendParagraph("=" .repeat(80));
-    body.appendParagraph("ИТОГО:");
-    body.appendParagraph("Обработано операторов: " + processedOperators);
-    body.appendParagraph("Всего записей: " + totalRecords);
-    body.appendParagraph("Время сбора: " + Math.round((new Date().getTime() - startTime) / 1000) + " сек");
+    // Сначала документ, потом отметки: при сбое между ними строки будут
+    // дописаны повторно (импорт в БД идет через ON CONFLICT), но не потеряны
+    var docName = doc.getName();
+    doc.saveAndClose();
+    properties.setProperties(collectedRows);
     
+    // Итоги - только в лог и уведомление: футер в документе
+    // оказался бы между старыми и новыми записями
     var duration = Math.round((new Date().getTime() - startTime) / 1000);
     
     Logger.log("\n========================================");
@@ -166,9 +181,9 @@ function collectAllDataToDocs() {
     SpreadsheetApp.getActiveSpreadsheet().toast(
       "✅ Данные собраны!\n\n" +
       "Операторов: " + processedOperators + "\n" +
-      "Записей: " + totalRecords + "\n" +
+      "Новых записей: " + totalRecords + "\n" +
       "Время: " + duration + " сек\n\n" +
-      "Документ: " + doc.getName(),
+      "Документ: " + docName,
       "Готово",
       10
     );
@@ -186,12 +201,11 @@ function collectAllDataToDocs() {
 }
 
 /**
- * Собирает данные одного оператора из всех архивных листов
+ * Дописывает новые строки одного оператора из всех архивных листов.
+ * collectedRows - свойства скрипта (строк прочитано по листам),
+ * обновляются на месте. limit - сколько записей еще можно добавить.
  */
-function collectOperatorData(operator) {
-  var doc = DocumentApp.openById(DOCS_ID);
-  var body = doc.getBody();
-  
+function collectOperatorData(operator, body, collectedRows, limit) {
   // Открываем таблицу оператора
   var spreadsheet = SpreadsheetApp.openById(operator.spreadsheetId);
   var sheets = spreadsheet.getSheets();
@@ -211,14 +225,22 @@ function collectOperatorData(operator) {
       continue;
     }
     
-    // Читаем данные с листа
+    // Читаем только строки после уже записанных
+    var rowsKey = ROWS_PREFIX + operator.spreadsheetId + ":" + sheetName;
+    var doneRows = parseInt(collectedRows[rowsKey], 10) || 0;
     var lastRow = sheet.getLastRow();
-    if (lastRow < 2) continue;
+    if (lastRow - 1 < doneRows) {
+      Logger.log("    ⚠️ Лист " + sheetName + " стал короче (" + (lastRow - 1) + " < " + doneRows +
+                 " строк) - удаленные строки останутся в документе, нужна пересборка");
+      collectedRows[rowsKey] = String(Math.max(lastRow - 1, 0));
+      continue;
+    }
+    if (lastRow - 1 === doneRows) continue;
     
-    Logger.log("    Лист: " + sheetName + " (" + (lastRow - 1) + " строк)");
+    Logger.log("    Лист: " + sheetName + " (новых строк: " + (lastRow - 1 - doneRows) + ")");
     
     // Читаем колонки B-I (номер карты, данные, статус, дата)
-    var data = sheet.getRange(2, 2, lastRow - 1, 8).getValues();
+    var data = sheet.getRange(2 + doneRows, 2, lastRow - 1 - doneRows, 8).getValues();
     
     var recordsFromSheet = 0;
     
@@ -227,6 +249,8 @@ function collectOperatorData(operator) {
       var status = String(data[j][3] || "").trim();     // E - статус
       var dateValue = data[j][7];                       // I - дата
       
+      // Незаполненные строки не отмечаются прочитанными, если после
+      // них нет заполненных - оператор может дописать их позже
       if (!cardNum) continue;
       
       // Парсим дату
@@ -244,19 +268,20 @@ function collectOperatorData(operator) {
       
       // Записываем в документ
       body.appendParagraph(JSON.stringify(record));
+      collectedRows[rowsKey] = String(doneRows + j + 1);
       
       recordsFromSheet++;
       totalRecords++;
       
       // Проверка лимита
-      if (totalRecords >= MAX_RECORDS_PER_RUN) {
+      if (totalRecords >= limit) {
         break;
       }
     }
     
     Logger.log("      Записей: " + recordsFromSheet);
     
-    if (totalRecords >= MAX_RECORDS_PER_RUN) {
+    if (totalRecords >= limit) {
       break;
     }
   }
@@ -264,6 +289,22 @@ function collectOperatorData(operator) {
   return totalRecords;
 }
 
+/**
+ * Очищает документ и отметки строк, затем собирает все данные заново.
+ * Нужна, если в уже собранных строках листов что-то исправили или удалили
+ */
+function rebuildDocsDocument() {
+  if (DOCS_ID === "ВСТАВЬТЕ_ID_ДОКУМЕНТА_СЮДА") {
+    SpreadsheetApp.getUi().alert("⚠️ Необходимо настроить DOCS_ID");
+    return;
+  }
+  
+  DocumentApp.openById(DOCS_ID).getBody().clear();
+  resetCollectedRows();
+  Logger.log("✓ Документ очищен, сбор с начала");
+  collectAllDataToDocs();
+}
+
 /**
  * Собирает только архивные данные (все листы кроме Статистика и Предыдущий месяц)
  */
@@ -292,7 +333,10 @@ function collectCurrentStatsToDocs() {
     var doc = DocumentApp.openById(DOCS_ID);
     var body = doc.getBody();
     
+    // Статистика заменяет содержимое документа - архивные строки
+    // придется собирать заново
     body.clear();
+    resetCollectedRows();
     
     var header = body.appendParagraph("ТЕКУЩАЯ СТАТИСТИКА ОПЕРАТОРОВ");
     header.setHeading(DocumentApp.ParagraphHeading.HEADING1);
@@ -430,6 +474,7 @@ function clearDocsDocument() {
     try {
       var doc = DocumentApp.openById(DOCS_ID);
       doc.getBody().clear();
+      resetCollectedRows();
       
       Logger.log("✓ Документ очищен");
       SpreadsheetApp.getActiveSpreadsheet().toast("✅ Документ очищен", "Готово", 3);
@@ -445,6 +490,19 @@ function clearDocsDocument() {
 // ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
 // =============================================================================
 
+/**
+ * Сбрасывает отметки прочитанных строк (после очистки документа)
+ */
+function resetCollectedRows() {
+  var properties = PropertiesService.getScriptProperties();
+  var keys = properties.getKeys();
+  for (var i = 0; i < keys.length; i++) {
+    if (keys[i].indexOf(ROWS_PREFIX) === 0) {
+      properties.deleteProperty(keys[i]);
+    }
+  }
+}
+
 /**
  * Получает список операторов из листа Настройки
  */
@@ -551,7 +609,8 @@ function showInstructions() {
     '<ol>' +
     '<li>Обновите страницу таблицы</li>' +
     '<li>Откройте меню "📄 Docs Collector"</li>' +
-    '<li>Выберите "🔄 Собрать все данные в Docs"</li>' +
+    '<li>Выберите "🔄 Собрать все данные в Docs" - новые строки дописываются в конец</li>' +
+    '<li>После исправлений в уже собранных строках - "♻️ Пересобрать документ с нуля"</li>' +
     '<li>Дождитесь завершения</li>' +
     '</ol>' +
     '<h3>Шаг 4: Работа с Python</h3>' +
@@ -565,7 +624,7 @@ function showInstructions() {
     '<pre>{"operator":"Иванов","sheet":"11.2024","card":"1234","status":"положительный","date":"01.11.2024 10:30:00"}</pre>' +
     '<p><strong>Лимиты:</strong></p>' +
     '<ul>' +
-    '<li>Максимум 10,000 записей за запуск</li>' +
+    '<li>Максимум 10,000 записей за запуск (остаток - следующим запуском)</li>' +
     '<li>Время выполнения до 6 минут</li>' +
     '<li>Размер документа до 1 МБ</li>' +
     '</ul>'
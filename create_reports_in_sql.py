@@ -3,9 +3,13 @@
 """
 Создание таблиц отчетов напрямую в PostgreSQL с использованием SQL
 Намного быстрее, чем pandas + psycopg2
+
+Отчеты - материализованные представления (scripts/database/report_views.py),
+обновляются через REFRESH MATERIALIZED VIEW CONCURRENTLY
 """
 
 import os
+import sys
 import psycopg2
 from pathlib import Path
 from dotenv import load_dotenv
@@ -25,6 +29,9 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'qayta_password_2026')
 }
 
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from database.report_views import refresh_report_views, print_refresh_stats
+
 
 def get_db_connection():
     """Создать подключение к БД"""
@@ -58,109 +65,22 @@ def main():
     conn = get_db_connection()
     start = datetime.now()
     
-    cursor = conn.cursor()
-    
-    # 1. Создать основную таблицу reportов
-    print("\n1️⃣  Создание таблицы detailed_reports...")
-    query_detailed = """
-    DROP TABLE IF EXISTS detailed_reports;
-    CREATE TABLE detailed_reports AS
-    SELECT 
-        f.fixation_id,
-        f.card_number,
-        f.call_date AS "call_datetime",
-        r.region_name AS "region",
-        s.service_name AS "service",
-        f.phone AS "phone",
-        f.incident_number AS "incident",
-        f.complaint AS "complaint",
-        f.status AS "status_text",
-        f.reason,
-        f.description AS "comment",
-        o.operator_name,
-        f.source_file,
-        f.collection_date AS "closed_date"
-    FROM fixations f
-    LEFT JOIN operators o ON f.operator_id = o.operator_id
-    LEFT JOIN regions r ON f.region_id = r.region_id
-    LEFT JOIN services s ON f.service_id = s.service_id
-    ORDER BY f.call_date;
-    """
-    
-    cursor.execute(query_detailed)
-    conn.commit()
-    count = cursor.rowcount
-    print(f"✓ Создана таблица detailed_reports с {count:,} записями")
-    
-    # 2. Создать таблицу жалоб
-    print("\n2️⃣  Создание таблицы negative_complaints...")
-    query_negative = """
-    DROP TABLE IF EXISTS negative_complaints;
-    CREATE TABLE negative_complaints AS
-    SELECT *
-    FROM detailed_reports
-    WHERE LOWER(status_text) LIKE '%жалоб%'
-        OR LOWER(status_text) LIKE '%отриц%'
-        OR LOWER(status_text) LIKE '%негатив%';
-    """
-    
-    cursor.execute(query_negative)
-    conn.commit()
-    count = cursor.rowcount
-    print(f"✓ Создана таблица negative_complaints с {count:,} записями")
-    
-    # 3. Статистика по регионам
-    print("\n3️⃣  Создание таблицы complaints_by_region...")
-    query_regions = """
-    DROP TABLE IF EXISTS complaints_by_region;
-    CREATE TABLE complaints_by_region AS
-    SELECT 
-        COALESCE(region, '(не указан)') as region,
-        COUNT(*) as total_calls,
-        COUNT(*) FILTER (WHERE LOWER(status_text) LIKE '%жалоб%') as complaints_count,
-        COUNT(*) FILTER (WHERE LOWER(status_text) LIKE '%отриц%') as negative_count,
-        COUNT(*) FILTER (WHERE LOWER(status_text) LIKE '%Положительно%') as positive_count
-    FROM detailed_reports
-    GROUP BY region
-    ORDER BY total_calls DESC;
-    """
-    
-    cursor.execute(query_regions)
-    conn.commit()
-    count = cursor.rowcount
-    print(f"✓ Создана таблица complaints_by_region с {count:,} записями")
-    
-    # 4. Итоговые статистики
-    print("\n4️⃣  Создание таблицы summary_statistics...")
-    query_summary = """
-    DROP TABLE IF EXISTS summary_statistics;
-    CREATE TABLE summary_statistics AS
-    SELECT 
-        COUNT(*) as total_calls,
-        COUNT(*) FILTER (WHERE LOWER(status_text) LIKE '%жалоб%') as total_complaints,
-        COUNT(*) FILTER (WHERE LOWER(status_text) LIKE '%отриц%') as negative_feedback,
-        COUNT(*) FILTER (WHERE LOWER(status_text) LIKE '%Положительно%') as positive_feedback,
-        COUNT(DISTINCT COALESCE(region, '')) as regions_count,
-        COUNT(DISTINCT operator_name) as operators_count,
-        MIN(call_datetime) as first_call,
-        MAX(call_datetime) as last_call
-    FROM detailed_reports;
-    """
-    
-    cursor.execute(query_summary)
-    conn.commit()
-    print(f"✓ Создана таблица summary_statistics")
-    
-    cursor.close()
-    conn.close()
+    # Материализованные представления обновляются без удаления:
+    # пока идет обновление, читатели видят предыдущие данные
+    print("\n🔄 Обновление материализованных представлений...")
+    try:
+        stats = refresh_report_views(conn)
+    finally:
+        conn.close()
+    print_refresh_stats(stats)
     
     # Показать результаты
     elapsed = datetime.now() - start
     print("\n" + "="*70)
-    print("✅ ВСЕ ТАБЛИЦЫ СОЗДАНЫ УСПЕШНО")
+    print("✅ ВСЕ ПРЕДСТАВЛЕНИЯ ОБНОВЛЕНЫ")
     print("="*70)
     print(f"Время выполнения: {elapsed}")
-    print("\nСозданные таблицы:")
+    print("\nМатериализованные представления:")
     print("  • detailed_reports - основной отчет")
     print("  • negative_complaints - жалобы и отрицательные отзывы")
     print("  • complaints_by_region - статистика по регионам")
@@ -91,6 +91,7 @@ if exclude_patterns:
             f.write(f'{pattern}\n')
     
     print('\n💾 Сохранено в СТРОКИ_ДЛЯ_УДАЛЕНИЯ.txt')
+    print('   Пересчитать флаги исключения операторов: python scripts/database/exclusions.py')
 else:
     print('\n✅ Не найдено паттернов для исключения')
 
@@ -54,6 +54,8 @@ from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.styles import (Border, Side, Font, PatternFill, Alignment)
 from openpyxl.worksheet.table import Table, TableStyleInfo
 
+from fix_complaints_grammar import canonical_complaint, canonicalize_complaints
+
 
 # ============================================================================
 # КОНФИГУРАЦИЯ
@@ -116,13 +118,7 @@ def classify_status(val):
 
 def clean_complaint_prefix(text):
     """Удаляет префиксы 1./2./3./4. из начала текста жалобы"""
-    if pd.isna(text):
-        return text
-    
-    text = str(text)
-    # Удаляем начальные пробелы и цифру с точкой
-    text = re.sub(r'^\s*[1-4]\.\s*', '', text)
-    return text
+    return canonical_complaint(text, strip_prefix=True)
 
 
 # ============================================================================
@@ -220,7 +216,7 @@ def process_detailed_sheet(wb, df):
     
     # Очищаем жалобы
     if COMPLAINT_COLUMN in df.columns:
-        df[COMPLAINT_COLUMN] = df[COMPLAINT_COLUMN].apply(clean_complaint_prefix)
+        df[COMPLAINT_COLUMN], _ = canonicalize_complaints(df[COMPLAINT_COLUMN], strip_prefix=True)
     
     # Удаляем старый лист и создаем новый
     if 'Детальные' in wb.sheetnames:
@@ -250,7 +246,7 @@ def process_negative_sheet(wb, df):
     
     # Очищаем жалобы
     if COMPLAINT_COLUMN in df_neg.columns:
-        df_neg[COMPLAINT_COLUMN] = df_neg[COMPLAINT_COLUMN].apply(clean_complaint_prefix)
+        df_neg[COMPLAINT_COLUMN], _ = canonicalize_complaints(df_neg[COMPLAINT_COLUMN], strip_prefix=True)
     
     # Переиндексируем с 1
     df_neg.insert(0, '№', range(1, len(df_neg) + 1))
@@ -2,8 +2,19 @@
 # -*- coding: utf-8 -*-
 """
 Исправляет грамматические ошибки в жалобах в CSV файле Sheets
+
+canonicalize_complaints() - единый этап нормализации текста жалоб:
+словарь CORRECTIONS + (по желанию) удаление префикса "1."-"4.".
+Работает по уникальным значениям колонки и раздает результат обратно
+через категориальные коды, поэтому время зависит от числа разных
+жалоб, а не от числа строк. Импортеры сохраняют
+КОНСОЛИДИРОВАННЫЕ_ДАННЫЕ_*.csv через save_consolidated_csv() (жалобы
+нормализуются до записи); отчеты вызывают canonicalize_complaints().
 """
 
+import os
+import re
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
@@ -48,8 +59,90 @@ CORRECTIONS = {
     '4.  Ҳеч ким боғланмаган, келмаган, лекин газ берилган.': '4. Ҳеч ким боғланмаган, келмаган, лекин газ берилган.',
 }
 
+# Префикс службы в начале жалобы: "1. ", " 2.  " и т.п.
+COMPLAINT_PREFIX = re.compile(r'^\s*[1-4]\.\s*')
+
+# Колонка жалобы в КОНСОЛИДИРОВАННЫЕ_ДАННЫЕ_*.csv
+CSV_COMPLAINT_COLUMN = 'Колонка_7'
+
+
+def canonical_complaint(text, strip_prefix=False):
+    """Каноническая форма одной жалобы"""
+    if pd.isna(text):
+        return text
+    
+    text = str(text)
+    text = CORRECTIONS.get(text, CORRECTIONS.get(text.strip(), text))
+    if strip_prefix:
+        text = COMPLAINT_PREFIX.sub('', text)
+    return text
+
+
+def canonicalize_complaints(values, strip_prefix=False):
+    """
+    Нормализовать колонку жалоб за один проход по уникальным значениям.
+    
+    Возвращает категориальную Series с тем же индексом и число
+    измененных строк.
+    """
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    present = codes != -1
+    
+    canonical = pd.Series([canonical_complaint(text, strip_prefix) for text in uniques], dtype=object)
+    changed = (canonical != pd.Series(uniques, dtype=object)).to_numpy()
+    
+    # Разные исходные строки могут дать одну каноническую - перекодируем
+    remap, categories = pd.factorize(canonical)
+    new_codes = np.full(len(codes), -1, dtype=np.int64)
+    new_codes[present] = remap[codes[present]]
+    
+    result = pd.Series(
+        pd.Categorical.from_codes(new_codes, categories=categories),
+        index=values.index,
+        name=values.name
+    )
+    changed_rows = int(changed[codes[present]].sum())
+    return result, changed_rows
+
+
+def canonicalize_csv_frame(df):
+    """Нормализовать жалобы в DataFrame консолидированных данных (на месте)"""
+    if CSV_COMPLAINT_COLUMN not in df.columns:
+        return 0
+    df[CSV_COMPLAINT_COLUMN], changed_rows = canonicalize_complaints(df[CSV_COMPLAINT_COLUMN])
+    return changed_rows
+
+
+def write_csv_atomic(df, path):
+    """Записать CSV через временный файл - при сбое прежний файл остается целым"""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    try:
+        df.to_csv(tmp_path, index=False, encoding='utf-8-sig')
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def save_consolidated_csv(df, path):
+    """
+    Сохранить консолидированные данные: жалобы нормализуются в df (на
+    месте), файл записывается атомарно. Возвращает число исправленных строк.
+    """
+    corrections = canonicalize_csv_frame(df)
+    write_csv_atomic(df, path)
+    return corrections
+
+
 def fix_complaints_in_csv():
-    """Исправляет жалобы в последнем CSV файле"""
+    """
+    Исправляет жалобы в последнем CSV файле.
+    
+    Новые файлы импортеры уже сохраняют нормализованными; для старых
+    файл заменяется (без копии _ИСПРАВЛЕНО_, через временный файл),
+    и только если есть что исправлять.
+    """
     
     # Находим последний файл
     data_dir = Path('data')
@@ -63,29 +156,25 @@ def fix_complaints_in_csv():
     
     # Читаем файл
     df = pd.read_csv(latest_file, low_memory=False)
-    original_count = len(df)
+    
+    if CSV_COMPLAINT_COLUMN not in df.columns:
+        print(f"❌ Колонка '{CSV_COMPLAINT_COLUMN}' не найдена")
+        return
     
     # Применяем исправления
-    if 'Колонка_7' in df.columns:
-        corrections_made = 0
-        for old_text, new_text in CORRECTIONS.items():
-            mask = df['Колонка_7'] == old_text
-            count = mask.sum()
-            if count > 0:
-                df.loc[mask, 'Колонка_7'] = new_text
-                corrections_made += count
-                print(f"  ✓ Исправлено '{old_text[:50]}...' -> '{new_text[:50]}...' ({count} раз)")
-        
-        print(f"\n✅ Всего исправлений: {corrections_made}")
-    else:
-        print("❌ Колонка 'Колонка_7' не найдена")
+    unique_count = df[CSV_COMPLAINT_COLUMN].nunique()
+    corrections_made = canonicalize_csv_frame(df)
+    print(f"  Уникальных жалоб: {unique_count:,}")
+    print(f"\n✅ Всего исправлений: {corrections_made}")
+    
+    if not corrections_made:
+        print("   Файл уже нормализован")
         return
     
     # Сохраняем
-    output_file = data_dir / f'КОНСОЛИДИРОВАННЫЕ_ДАННЫЕ_ИСПРАВЛЕНО_{pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")}.csv'
-    df.to_csv(output_file, index=False, encoding='utf-8-sig')
+    write_csv_atomic(df, latest_file)
     
-    print(f"\n💾 Сохранено: {output_file.name}")
+    print(f"\n💾 Обновлено: {latest_file.name}")
     print(f"   Записей: {len(df):,}")
 
 if __name__ == '__main__':
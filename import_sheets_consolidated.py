@@ -17,8 +17,11 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 import socket
+import sys
 import pandas as pd
 
+from fix_complaints_grammar import save_consolidated_csv
+
 # Прокси (закомментировано для работы в Codespaces)
 # os.environ['HTTP_PROXY'] = 'http://10.145.62.76:3128'
 # os.environ['HTTPS_PROXY'] = 'http://10.145.62.76:3128'
@@ -29,7 +32,12 @@ DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
 TOKEN_FILE = BASE_DIR / 'config' / 'token.json'
 CREDENTIALS_FILE = BASE_DIR / 'config' / 'credentials.json'
 
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from data_collection.sheets_metadata import (
+    SheetsMetadataCache, build_drive_service, token_has_drive_access, DRIVE_METADATA_SCOPE
+)
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly', DRIVE_METADATA_SCOPE]
 
 # Список ID документов для импорта
 SPREADSHEET_IDS = [
@@ -126,7 +134,7 @@ def authenticate():
     """Аутентификация в Google API"""
     creds = None
     
-    if TOKEN_FILE.exists():
+    if TOKEN_FILE.exists() and token_has_drive_access(TOKEN_FILE):
         creds = Credentials.from_authorized_user_file(str(TOKEN_FILE), SCOPES)
     
     if not creds or not creds.valid:
@@ -170,26 +178,23 @@ def get_sheet_data(service, spreadsheet_id, sheet_name, max_rows=10000):
         # Тихо пропускаем ошибки (лист может не существовать)
         return []
 
-def get_all_sheet_names(service, spreadsheet_id):
-    """Получить список всех листов в документе с размером"""
+def get_all_sheet_names(metadata, spreadsheet_id):
+    """Получить список всех листов в документе с размером (из кэша метаданных)"""
     try:
-        spreadsheet = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-        sheets = spreadsheet.get('sheets', [])
         return [
             {
-                'title': sheet['properties']['title'],
-                'rowCount': sheet['properties'].get('gridProperties', {}).get('rowCount', 10000)
+                'title': sheet['title'],
+                'rowCount': sheet['rowCount'] or 10000
             }
-            for sheet in sheets
+            for sheet in metadata.sheets(spreadsheet_id)
         ]
     except:
         return []
 
-def get_spreadsheet_title(service, spreadsheet_id):
-    """Получить название документа"""
+def get_spreadsheet_title(metadata, spreadsheet_id):
+    """Получить название документа (тот же запрос метаданных, что и для листов)"""
     try:
-        spreadsheet = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-        return spreadsheet.get('properties', {}).get('title', 'Без названия')
+        return metadata.title(spreadsheet_id) or 'Без названия'
     except:
         return f"ID: {spreadsheet_id[:8]}..."
 
@@ -239,6 +244,7 @@ def main():
         print('\n[1/3] Подключение к Google Sheets...')
         creds = authenticate()
         service = build('sheets', 'v4', credentials=creds)
+        metadata = SheetsMetadataCache(service, build_drive_service(creds))
         print('✅ Подключено')
         
         # Сбор данных
@@ -255,11 +261,11 @@ def main():
         for idx, spreadsheet_id in enumerate(SPREADSHEET_IDS, start=1):
             try:
                 # Получаем название документа
-                doc_title = get_spreadsheet_title(service, spreadsheet_id)
+                doc_title = get_spreadsheet_title(metadata, spreadsheet_id)
                 print(f'\n  [{idx}/{len(SPREADSHEET_IDS)}] {doc_title}')
                 
                 # Получаем ВСЕ листы в документе
-                all_sheets = get_all_sheet_names(service, spreadsheet_id)
+                all_sheets = get_all_sheet_names(metadata, spreadsheet_id)
                 
                 doc_records = 0
                 
@@ -295,6 +301,9 @@ def main():
                 print(f'    ❌ Ошибка: {str(e)}')
                 stats['errors'] += 1
         
+        metadata.save()
+        print(f'\n   {metadata.report()}')
+        
         # Сохранение
         print(f'\n[3/3] Сохранение данных...')
         
@@ -312,7 +321,8 @@ def main():
             # Сохраняем в CSV
             timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
             csv_file = BASE_DIR / 'data' / f'КОНСОЛИДИРОВАННЫЕ_ДАННЫЕ_{timestamp}.csv'
-            df.to_csv(csv_file, index=False, encoding='utf-8-sig')
+            corrections = save_consolidated_csv(df, csv_file)
+            print(f'   Исправлено жалоб: {corrections:,}')
             
             print(f'\n✅ Сохранено в CSV: {csv_file.name}')
             print(f'   Всего строк: {len(df)}')
@@ -13,6 +13,8 @@ from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from datetime import datetime
 
+from fix_complaints_grammar import save_consolidated_csv
+
 BASE_DIR = Path(__file__).parent
 SERVICE_ACCOUNT_FILE = BASE_DIR / 'config' / 'service_account.json'
 
@@ -219,7 +221,8 @@ def main():
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     csv_path = output_dir / f'КОНСОЛИДИРОВАННЫЕ_ДАННЫЕ_{timestamp}.csv'
     
-    df_final.to_csv(csv_path, index=False, encoding='utf-8-sig')
+    corrections = save_consolidated_csv(df_final, csv_path)
+    print(f"Исправлено жалоб: {corrections:,}")
     
     print(f"\n{'='*80}")
     print(f"✅ ГОТОВО! Импортировано {len(df_final):,} записей")
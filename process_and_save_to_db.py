@@ -3,15 +3,16 @@
 """
 Обработка данных и сохранение результатов в PostgreSQL
 Вместо создания Excel файлов, создает таблицы в БД:
-- detailed_reports - детальные отчеты
-- negative_complaints - отрицательные и жалобы
-- complaints_by_region - жалобы по регионам
-- regions_complaints_pivot - pivot регионы-жалобы
 - not_found_applications - не найденные заявки
+
+detailed_reports, negative_complaints, complaints_by_region и
+summary_statistics - материализованные представления
+(scripts/database/report_views.py), здесь они только обновляются
 """
 
 import os
 import re
+import sys
 import pandas as pd
 import psycopg2
 from psycopg2.extras import execute_values
@@ -33,6 +34,9 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'qayta_password_2026')
 }
 
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from database.report_views import refresh_report_views, print_refresh_stats
+
 # Колонки для удаления
 DROP_COLUMNS = [
     'Дата_112',
@@ -196,27 +200,6 @@ def process_detailed_data(df):
     return df_detailed
 
 
-def create_negative_complaints(df_detailed):
-    """Создать таблицу отрицательных отзывов и жалоб"""
-    print("\n❌ Создание таблицы отрицательных отзывов...")
-    
-    if 'Статус_связи' not in df_detailed.columns:
-        return pd.DataFrame()
-    
-    # Поиск отрицательных статусов в колонке Статус_связи
-    negative_keywords = ['отриц', 'негатив', 'неудов', 'плох', 'жалоб']
-    
-    # Проверить каждую строку
-    mask = df_detailed['Статус_связи'].fillna('').str.lower().apply(
-        lambda x: any(kw in x for kw in negative_keywords) if x else False
-    )
-    
-    df_negative = df_detailed[mask].copy()
-    
-    print(f"✓ Найдено {len(df_negative):,} отрицательных записей")
-    return df_negative
-
-
 def create_complaints_by_region(df_detailed):
     """Создать сводку жалоб по регионам"""
     print("\n🗺️ Создание сводки по регионам...")
@@ -360,7 +343,6 @@ def main():
         
         # 3. Создать производные таблицы
         print("\nСоздание производных таблиц...")
-        df_negative = create_negative_complaints(df_detailed)
         
         # Пропустить медленные операции, которые зависают
         # df_regions = create_complaints_by_region(df_detailed)
@@ -373,14 +355,18 @@ def main():
         print("="*70)
         
         conn = get_db_connection()
-        
-        save_to_database('detailed_reports', df_detailed, conn)
-        save_to_database('negative_complaints', df_negative, conn)
-        # skip: save_to_database('complaints_by_region', df_regions, conn)
-        # skip: save_to_database('regions_complaints_pivot', df_pivot, conn)
-        save_to_database('not_found_applications', df_not_found, conn)
-        
-        conn.close()
+        try:
+            # detailed_reports и negative_complaints - материализованные
+            # представления: DROP TABLE на них падает, поэтому они
+            # обновляются, а не пересоздаются из DataFrame
+            print("\n🔄 Обновление материализованных представлений...")
+            stats = refresh_report_views(conn)
+            print_refresh_stats(stats)
+            
+            # skip: save_to_database('regions_complaints_pivot', df_pivot, conn)
+            save_to_database('not_found_applications', df_not_found, conn)
+        finally:
+            conn.close()
         
         # 5. Итоги
         elapsed = datetime.now() - start_time
@@ -388,9 +374,10 @@ def main():
         print("✅ ОБРАБОТКА ЗАВЕРШЕНА")
         print("="*70)
         print(f"Время выполнения: {elapsed}")
+        print(f"\nОбновленные представления:")
+        for name in stats:
+            print(f"  • {name}")
         print(f"\nСозданные таблицы:")
-        print(f"  • detailed_reports: {len(df_detailed):,} записей")
-        print(f"  • negative_complaints: {len(df_negative):,} записей")
         print(f"  • not_found_applications: {len(df_not_found):,} записей")
         print("="*70)
         
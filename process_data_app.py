@@ -11,12 +11,34 @@ from pathlib import Path
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import threading
+import queue
 import socket
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 
+sys.path.insert(0, str(Path(__file__).parent / 'scripts'))
+from data_collection.sheets_metadata import (
+    SheetsMetadataCache, build_drive_service, token_has_drive_access, DRIVE_METADATA_SCOPE
+)
+
+# Параллельные запросы к Google Sheets (по одному документу на поток)
+MAX_FETCH_WORKERS = 6
+
+# Сколько строк читать, если rowCount листа неизвестен
+DEFAULT_ROW_COUNT = 10000
+
+# Как часто главный поток Tk забирает сообщения из очереди (мс)
+EVENT_POLL_MS = 100
+
+SERVICE_SHEETS = ['Настройки', 'Статистика', 'Сводка', 'Тренды', 'Итого']
+
+
+class OperationCancelled(Exception):
+    """Операция остановлена кнопкой «Отмена»"""
+
 
 class DataProcessorApp:
     def __init__(self, root):
@@ -35,8 +57,17 @@ class DataProcessorApp:
         self.base_dir = Path(__file__).parent
         self.token_file = self.base_dir / 'config' / 'token.json'
         self.credentials_file = self.base_dir / 'config' / 'credentials.json'
-        self.scopes = ['https://www.googleapis.com/auth/spreadsheets.readonly']
+        self.scopes = ['https://www.googleapis.com/auth/spreadsheets.readonly', DRIVE_METADATA_SCOPE]
         self.master_spreadsheet_id = "1s0nbLCo6q_KoM0jCP2v2vMxLbIHuScjigNTMSvUn0GA"
+        self.creds = None
+        self.metadata = None
+        self._thread_local = threading.local()
+        
+        # Фоновые операции: сообщения для интерфейса идут через очередь,
+        # виджеты Tk меняются только в главном потоке
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.busy = False
         
         # Прокси
         os.environ['HTTP_PROXY'] = 'http://10.145.62.76:3128'
@@ -44,6 +75,7 @@ class DataProcessorApp:
         socket.setdefaulttimeout(120)
         
         self.setup_ui()
+        self.root.after(EVENT_POLL_MS, self.poll_events)
     
     def setup_ui(self):
         """Создание интерфейса"""
@@ -60,8 +92,9 @@ class DataProcessorApp:
         btn_frame = ttk.Frame(sheets_frame)
         btn_frame.pack(fill="x", pady=5)
         
-        ttk.Button(btn_frame, text="Загрузить список из Google Sheets",
-                  command=self.load_sheets_list).pack(side="left", padx=5)
+        self.load_btn = ttk.Button(btn_frame, text="Загрузить список из Google Sheets",
+                                   command=self.load_sheets_list)
+        self.load_btn.pack(side="left", padx=5)
         ttk.Button(btn_frame, text="Выбрать операторов",
                   command=self.select_agents).pack(side="left", padx=5)
         ttk.Button(btn_frame, text="Выбрать все",
@@ -108,7 +141,7 @@ class DataProcessorApp:
         self.progress_label = tk.Label(self.progress_frame, text="")
         self.progress_label.pack()
         
-        self.progress = ttk.Progressbar(self.progress_frame, mode='indeterminate')
+        self.progress = ttk.Progressbar(self.progress_frame, mode='determinate')
         
         # Кнопки действий
         button_frame = ttk.Frame(self.root)
@@ -118,95 +151,213 @@ class DataProcessorApp:
                                      command=self.start_processing, state="disabled")
         self.process_btn.pack(side="left", padx=5)
         
+        self.cancel_btn = ttk.Button(button_frame, text="Отмена",
+                                    command=self.cancel_operation, state="disabled")
+        self.cancel_btn.pack(side="left", padx=5)
+        
         ttk.Button(button_frame, text="Выход", command=self.root.quit).pack(side="left", padx=5)
     
+    # =========================================================================
+    # ФОНОВЫЕ ОПЕРАЦИИ
+    # =========================================================================
+    
+    def post(self, func, *args, **kwargs):
+        """Выполнить func в главном потоке Tk (можно вызывать из любого потока)"""
+        self.events.put((func, args, kwargs))
+    
+    def poll_events(self):
+        """Забрать сообщения фоновых потоков и применить их к интерфейсу"""
+        try:
+            while True:
+                try:
+                    func, args, kwargs = self.events.get_nowait()
+                except queue.Empty:
+                    break
+                func(*args, **kwargs)
+        finally:
+            self.root.after(EVENT_POLL_MS, self.poll_events)
+    
+    def run_in_background(self, target, *args):
+        """Запустить операцию в фоновом потоке; одновременно - только одна"""
+        if self.busy:
+            return
+        self.busy = True
+        self.cancel_event.clear()
+        self.load_btn.config(state="disabled")
+        self.process_btn.config(state="disabled")
+        self.cancel_btn.config(state="normal")
+        self.progress.config(mode='indeterminate', value=0)
+        self.progress.pack(fill="x", pady=5)
+        self.progress.start(10)
+        
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.start()
+    
+    def operation_finished(self):
+        """Вернуть интерфейс в исходное состояние (главный поток)"""
+        self.busy = False
+        self.progress.stop()
+        self.progress.pack_forget()
+        self.cancel_btn.config(state="disabled")
+        self.load_btn.config(state="normal")
+        self.check_ready()
+    
+    def cancel_operation(self):
+        """Кнопка «Отмена»: уже начатые запросы дочитываются, новые не отправляются"""
+        self.cancel_event.set()
+        self.cancel_btn.config(state="disabled")
+        self.progress_label.config(text="Отмена...")
+    
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise OperationCancelled()
+    
+    def set_progress(self, done, total):
+        """Прогресс в штуках (документах) вместо бегущей полосы"""
+        if str(self.progress.cget('mode')) != 'determinate':
+            self.progress.stop()
+            self.progress.config(mode='determinate')
+        self.progress.config(maximum=max(total, 1), value=done)
+    
+    def thread_service(self):
+        """Sheets API для текущего потока (объект API нельзя делить между потоками)"""
+        if not hasattr(self._thread_local, 'service'):
+            self._thread_local.service = build('sheets', 'v4', credentials=self.creds,
+                                               cache_discovery=False)
+        return self._thread_local.service
+    
+    def run_parallel(self, func, items, describe):
+        """
+        Выполнить func(item) в пуле потоков. После каждого завершенного
+        item - сообщение о прогрессе. При отмене оставшиеся задачи
+        снимаются с очереди и поднимается OperationCancelled.
+        Возвращает список (item, результат или исключение).
+        """
+        results = []
+        executor = ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS)
+        try:
+            futures = {executor.submit(func, item): item for item in items}
+            for done, future in enumerate(as_completed(futures), 1):
+                item = futures[future]
+                try:
+                    results.append((item, future.result()))
+                except OperationCancelled:
+                    pass
+                except Exception as e:
+                    results.append((item, e))
+                self.post(self.set_progress, done, len(futures))
+                self.update_progress(f"{describe(item)} ({done}/{len(futures)})")
+                self.check_cancelled()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
+    
     def load_sheets_list(self):
-        """Загрузить список документов и листов из Google Sheets"""
+        """Загрузить список документов и листов из Google Sheets (в фоне)"""
+        self.sheets_label.config(text="Подключение к Google Sheets...", fg="blue")
+        self.run_in_background(self.load_sheets_worker)
+    
+    def load_sheets_worker(self):
+        """Фоновый поток: лист 'Настройки' и листы всех документов параллельно"""
         try:
-            self.sheets_label.config(text="Подключение к Google Sheets...", fg="blue")
-            self.root.update()
-            
-            # Аутентификация
             service = self.authenticate_google()
-            
+        except Exception as e:
+            self.post(self.sheets_load_failed, "Ошибка подключения",
+                      f"Не удалось подключиться к Google Sheets:\n\n{str(e)}")
+            return
+        
+        try:
             # Получаем список ID документов из листа "Настройки"
             self.update_progress("Загрузка списка документов из листа 'Настройки'...")
             
-            try:
-                settings_range = "Настройки!A2:B100"  # Колонка A - название, B - ID документа
-                result = service.spreadsheets().values().get(
-                    spreadsheetId=self.master_spreadsheet_id,
-                    range=settings_range
-                ).execute()
-                
-                values = result.get('values', [])
-                
-                if not values:
-                    messagebox.showerror("Ошибка", "Лист 'Настройки' пуст или не найден")
-                    self.sheets_label.config(text="Ошибка загрузки", fg="red")
-                    return
-                
-                # Собираем ID документов
-                spreadsheet_ids = []
-                for row in values:
-                    if len(row) >= 2 and row[1]:  # Есть ID во второй колонке
-                        doc_id = str(row[1]).strip()
-                        doc_name = str(row[0]).strip() if row[0] else f"Документ {len(spreadsheet_ids)+1}"
-                        if doc_id:
-                            spreadsheet_ids.append({'id': doc_id, 'name': doc_name})
-                
-                if not spreadsheet_ids:
-                    messagebox.showerror("Ошибка", "Не найдено ID документов в листе 'Настройки'")
-                    self.sheets_label.config(text="ID не найдены", fg="red")
-                    return
-                
-                self.update_progress(f"Найдено документов: {len(spreadsheet_ids)}. Загрузка списка операторов...")
-                
-                # Теперь получаем листы из каждого документа
-                self.available_sheets = []
-                
-                for idx, doc_info in enumerate(spreadsheet_ids, 1):
-                    try:
-                        self.update_progress(f"Загрузка листов {idx}/{len(spreadsheet_ids)}: {doc_info['name']}...")
-                        
-                        spreadsheet = service.spreadsheets().get(spreadsheetId=doc_info['id']).execute()
-                        sheets = spreadsheet.get('sheets', [])
-                        
-                        for sheet in sheets:
-                            title = sheet['properties']['title']
-                            # Пропускаем служебные листы
-                            if title not in ['Настройки', 'Статистика', 'Сводка', 'Тренды', 'Итого']:
-                                # Добавляем информацию о листе и документе
-                                self.available_sheets.append({
-                                    'sheet_name': title,
-                                    'doc_id': doc_info['id'],
-                                    'doc_name': doc_info['name'],
-                                    'display_name': f"{doc_info['name']} → {title}"
-                                })
-                    except Exception as e:
-                        print(f"Ошибка при чтении документа {doc_info['name']}: {e}")
-                        continue
-                
-                if not self.available_sheets:
-                    messagebox.showwarning("Внимание", "Не найдено листов операторов в документах")
-                    self.sheets_label.config(text="Листы не найдены", fg="red")
-                    return
-                
-                self.sheets_label.config(
-                    text=f"Загружено листов: {len(self.available_sheets)} из {len(spreadsheet_ids)} документов",
-                    fg="green"
-                )
-                messagebox.showinfo("Успех", 
-                    f"Загружено:\n• Документов: {len(spreadsheet_ids)}\n• Листов операторов: {len(self.available_sheets)}\n\nТеперь выберите операторов для импорта.")
-                
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось прочитать лист 'Настройки':\n\n{str(e)}")
-                self.sheets_label.config(text="Ошибка чтения настроек", fg="red")
+            settings_range = "Настройки!A2:B100"  # Колонка A - название, B - ID документа
+            values = self.metadata.values(self.master_spreadsheet_id, settings_range)
+            
+            if not values:
+                self.post(self.sheets_load_failed, "Ошибка загрузки", "Лист 'Настройки' пуст или не найден")
+                return
+            
+            # Собираем ID документов
+            spreadsheet_ids = []
+            for row in values:
+                if len(row) >= 2 and row[1]:  # Есть ID во второй колонке
+                    doc_id = str(row[1]).strip()
+                    doc_name = str(row[0]).strip() if row[0] else f"Документ {len(spreadsheet_ids)+1}"
+                    if doc_id:
+                        spreadsheet_ids.append({'id': doc_id, 'name': doc_name})
+            
+            if not spreadsheet_ids:
+                self.post(self.sheets_load_failed, "ID не найдены", "Не найдено ID документов в листе 'Настройки'")
                 return
             
+            self.update_progress(f"Найдено документов: {len(spreadsheet_ids)}. Загрузка списка операторов...")
+            
+            # Листы документов - параллельно; из кэша, если документ не менялся
+            results = self.run_parallel(
+                lambda doc_info: self.metadata.sheets(doc_info['id']),
+                spreadsheet_ids,
+                lambda doc_info: f"Загрузка листов: {doc_info['name']}"
+            )
+            self.metadata.save()
+            
+        except OperationCancelled:
+            self.post(self.sheets_load_failed, "Загрузка отменена", None)
+            return
         except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось подключиться к Google Sheets:\n\n{str(e)}")
-            self.sheets_label.config(text="Ошибка подключения", fg="red")
+            self.post(self.sheets_load_failed, "Ошибка чтения настроек",
+                      f"Не удалось прочитать лист 'Настройки':\n\n{str(e)}")
+            return
+        
+        # Порядок документов - как в листе 'Настройки'
+        sheets_by_doc = dict((doc_info['id'], sheets) for doc_info, sheets in results)
+        available_sheets = []
+        for doc_info in spreadsheet_ids:
+            sheets = sheets_by_doc.get(doc_info['id'], [])
+            if isinstance(sheets, Exception):
+                print(f"Ошибка при чтении документа {doc_info['name']}: {sheets}")
+                continue
+            
+            for sheet in sheets:
+                # Пропускаем служебные листы
+                if sheet['title'] not in SERVICE_SHEETS:
+                    # Добавляем информацию о листе и документе
+                    available_sheets.append({
+                        'sheet_name': sheet['title'],
+                        'doc_id': doc_info['id'],
+                        'doc_name': doc_info['name'],
+                        'display_name': f"{doc_info['name']} → {sheet['title']}",
+                        'row_count': sheet['rowCount']
+                    })
+        
+        self.post(self.sheets_loaded, available_sheets, len(spreadsheet_ids))
+    
+    def sheets_loaded(self, available_sheets, docs_count):
+        """Главный поток: список листов получен"""
+        self.operation_finished()
+        self.update_progress(self.metadata.report())
+        self.available_sheets = available_sheets
+        
+        if not self.available_sheets:
+            messagebox.showwarning("Внимание", "Не найдено листов операторов в документах")
+            self.sheets_label.config(text="Листы не найдены", fg="red")
+            return
+        
+        self.sheets_label.config(
+            text=f"Загружено листов: {len(self.available_sheets)} из {docs_count} документов",
+            fg="green"
+        )
+        self.update_info()
+        messagebox.showinfo("Успех", 
+            f"Загружено:\n• Документов: {docs_count}\n• Листов операторов: {len(self.available_sheets)}\n\nТеперь выберите операторов для импорта.")
+    
+    def sheets_load_failed(self, status, message):
+        """Главный поток: загрузка списка не удалась или отменена"""
+        self.operation_finished()
+        self.progress_label.config(text="")
+        self.sheets_label.config(text=status, fg="gray" if message is None else "red")
+        if message:
+            messagebox.showerror("Ошибка", message)
     
     def select_agents(self):
         """Диалог выбора агентов"""
@@ -377,25 +528,17 @@ class DataProcessorApp:
     
     def start_processing(self):
         """Запуск обработки в отдельном потоке"""
-        self.process_btn.config(state="disabled")
-        self.progress.pack(fill="x", pady=5)
-        self.progress.start(10)
-        
-        # Запускаем обработку в отдельном потоке
-        thread = threading.Thread(target=self.process_data)
-        thread.daemon = True
-        thread.start()
+        self.run_in_background(self.process_data)
     
     def update_progress(self, message):
-        """Обновление статуса обработки"""
-        self.progress_label.config(text=message)
-        self.root.update()
+        """Обновление статуса обработки (из любого потока)"""
+        self.post(self.progress_label.config, text=message)
     
     def authenticate_google(self):
-        """Аутентификация в Google Sheets API"""
+        """Аутентификация в Google Sheets API (кэш метаданных - на весь сеанс)"""
         creds = None
         
-        if self.token_file.exists():
+        if self.token_file.exists() and token_has_drive_access(self.token_file):
             creds = Credentials.from_authorized_user_file(str(self.token_file), self.scopes)
         
         if not creds or not creds.valid:
@@ -408,53 +551,92 @@ class DataProcessorApp:
             with open(self.token_file, 'w') as token:
                 token.write(creds.to_json())
         
-        return build('sheets', 'v4', credentials=creds)
+        self.creds = creds
+        self._thread_local = threading.local()
+        service = self.thread_service()
+        if self.metadata is None:
+            self.metadata = SheetsMetadataCache(service, build_drive_service(creds),
+                                                service_factory=self.thread_service)
+        else:
+            self.metadata.service = service
+        return service
     
-    def collect_sheets_data(self, service, selected_sheets):
-        """Сбор данных из Google Sheets от выбранных листов"""
-        all_data = []
-        
+    def fetch_document(self, document):
+        """
+        Листы одного документа одним batchGet. Диапазон каждого листа -
+        по его rowCount, а не фиксированные 10000 строк.
+        """
+        doc_id, sheet_infos = document
+        self.check_cancelled()
+        
+        ranges = []
+        for sheet_info in sheet_infos:
+            row_count = sheet_info.get('row_count') or DEFAULT_ROW_COUNT
+            sheet_name = sheet_info['sheet_name'].replace("'", "''")
+            ranges.append(f"'{sheet_name}'!A1:Z{row_count}")
+        
+        result = self.thread_service().spreadsheets().values().batchGet(
+            spreadsheetId=doc_id,
+            ranges=ranges
+        ).execute()
+        
+        # valueRanges приходят в порядке ranges
+        frames = []
+        for sheet_info, value_range in zip(sheet_infos, result.get('valueRanges', [])):
+            df_sheet = self.values_to_frame(value_range.get('values', []), sheet_info)
+            if df_sheet is not None:
+                frames.append(df_sheet)
+        return frames
+    
+    def values_to_frame(self, values, sheet_info):
+        """Значения листа -> DataFrame (None, если данных нет)"""
+        if not values or len(values) < 2:
+            return None
+        
+        # Первая строка - заголовки
+        headers = values[0]
+        num_headers = len(headers)
+        data_rows = values[1:]
+        
+        # Нормализация данных - приводим все строки к одинаковому количеству колонок
+        normalized_rows = []
+        for row in data_rows:
+            if len(row) < num_headers:
+                # Дополняем строку пустыми значениями
+                row = row + [''] * (num_headers - len(row))
+            elif len(row) > num_headers:
+                # Обрезаем лишние колонки
+                row = row[:num_headers]
+            normalized_rows.append(row)
+        
+        # Создаём DataFrame
+        df_sheet = pd.DataFrame(normalized_rows, columns=headers)
+        df_sheet['Документ'] = sheet_info['doc_name']  # Добавляем источник
+        df_sheet['Лист'] = sheet_info['sheet_name']  # Добавляем название листа
+        return df_sheet
+    
+    def collect_sheets_data(self, selected_sheets):
+        """Сбор данных из Google Sheets от выбранных листов (документы - параллельно)"""
+        # Один запрос на документ со всеми выбранными листами
+        documents = {}
         for sheet_info in selected_sheets:
-            try:
-                self.update_progress(f"Загрузка: {sheet_info['display_name']}...")
-                
-                # Читаем данные с листа
-                range_name = f"'{sheet_info['sheet_name']}'!A1:Z10000"
-                result = service.spreadsheets().values().get(
-                    spreadsheetId=sheet_info['doc_id'],
-                    range=range_name
-                ).execute()
-                
-                values = result.get('values', [])
-                if not values or len(values) < 2:
-                    continue
-                
-                # Первая строка - заголовки
-                headers = values[0]
-                num_headers = len(headers)
-                data_rows = values[1:]
-                
-                # Нормализация данных - приводим все строки к одинаковому количеству колонок
-                normalized_rows = []
-                for row in data_rows:
-                    if len(row) < num_headers:
-                        # Дополняем строку пустыми значениями
-                        row = row + [''] * (num_headers - len(row))
-                    elif len(row) > num_headers:
-                        # Обрезаем лишние колонки
-                        row = row[:num_headers]
-                    normalized_rows.append(row)
-                
-                # Создаём DataFrame
-                df_sheet = pd.DataFrame(normalized_rows, columns=headers)
-                df_sheet['Документ'] = sheet_info['doc_name']  # Добавляем источник
-                df_sheet['Лист'] = sheet_info['sheet_name']  # Добавляем название листа
-                
-                all_data.append(df_sheet)
-                
-            except Exception as e:
-                print(f"Ошибка при чтении {sheet_info['display_name']}: {e}")
+            documents.setdefault(sheet_info['doc_id'], []).append(sheet_info)
+        
+        results = self.run_parallel(
+            self.fetch_document,
+            list(documents.items()),
+            lambda document: f"Загрузка: {document[1][0]['doc_name']}"
+        )
+        
+        frames_by_doc = {}
+        for (doc_id, sheet_infos), frames in results:
+            if isinstance(frames, Exception):
+                print(f"Ошибка при чтении {sheet_infos[0]['doc_name']}: {frames}")
                 continue
+            frames_by_doc[doc_id] = frames
+        
+        # Порядок - как в списке выбранных операторов
+        all_data = [df for doc_id in documents for df in frames_by_doc.get(doc_id, [])]
         
         if not all_data:
             raise Exception("Не удалось загрузить данные ни от одного оператора")
@@ -476,10 +658,12 @@ class DataProcessorApp:
             self.update_progress("Подключение к Google Sheets...")
             
             # 1. Аутентификация и загрузка данных Google Sheets
-            service = self.authenticate_google()
+            self.authenticate_google()
             
             self.update_progress(f"Загрузка данных от {len(self.selected_agents)} агентов...")
-            df_sheets = self.collect_sheets_data(service, self.selected_agents)
+            df_sheets = self.collect_sheets_data(self.selected_agents)
+            self.post(self.progress.config, mode='indeterminate')
+            self.post(self.progress.start, 10)
             
             self.update_progress(f"Загружено записей из Sheets: {len(df_sheets):,}")
             
@@ -507,6 +691,7 @@ class DataProcessorApp:
             total_rows_loaded = 0
             
             for idx, file_path in enumerate(self.incident_files, 1):
+                self.check_cancelled()
                 try:
                     self.update_progress(f"Загрузка файла {idx}/{len(self.incident_files)}: {Path(file_path).name}...")
                     df_temp = pd.read_excel(file_path)
@@ -608,6 +793,8 @@ class DataProcessorApp:
             if 'Статус_112' in df_112.columns:
                 df_112['Статус_112'] = df_112['Статус_112'].replace(status_map)
             
+            self.check_cancelled()
+            
             # 3. Сопоставление данных
             self.update_progress("Сопоставление данных по инцидентам...")
             
@@ -657,6 +844,7 @@ class DataProcessorApp:
             summary_data = []
             
             for service_code in sorted(df_matched['Служба'].unique()):
+                self.check_cancelled()
                 df_service = df_matched[df_matched['Служба'] == service_code].copy()
                 
                 # Получаем уникальные инциденты для подсчёта
@@ -745,8 +933,6 @@ class DataProcessorApp:
                 f.write(summary_df.to_string(index=False))
             
             # Завершение
-            self.progress.stop()
-            self.progress.pack_forget()
             self.update_progress("✅ Обработка завершена!")
             
             # Показываем результат
@@ -771,17 +957,26 @@ class DataProcessorApp:
 Открыть папку с результатами?
 """
             
-            if messagebox.askyesno("Готово", result_message):
-                os.startfile(self.output_folder)
+            self.post(self.processing_done, result_message)
             
-            self.process_btn.config(state="normal")
+        except OperationCancelled:
+            self.update_progress("⛔ Обработка отменена")
+            self.post(self.operation_finished)
             
         except Exception as e:
-            self.progress.stop()
-            self.progress.pack_forget()
             self.update_progress("❌ Ошибка при обработке")
-            messagebox.showerror("Ошибка", f"Произошла ошибка:\n\n{str(e)}")
-            self.process_btn.config(state="normal")
+            self.post(self.processing_failed, str(e))
+    
+    def processing_done(self, result_message):
+        """Главный поток: показать результат обработки"""
+        self.operation_finished()
+        if messagebox.askyesno("Готово", result_message):
+            os.startfile(self.output_folder)
+    
+    def processing_failed(self, error):
+        """Главный поток: показать ошибку обработки"""
+        self.operation_finished()
+        messagebox.showerror("Ошибка", f"Произошла ошибка:\n\n{error}")
 
 
 def main():
@@ -9,12 +9,33 @@
 """
 
 import os
+import sys
+import sqlite3
 import pandas as pd
-import glob
 from datetime import datetime
 from pathlib import Path
 import re
 
+sys.path.insert(0, str(Path(__file__).parent / 'scripts'))
+from formatting.parallel_xlsx import write_workbooks
+from data_processing.frame_schema import (
+    SHEETS_SCHEMA, read_dtypes, apply_schema, to_id, align_keys,
+    map_unique, set_where, ensure_categories, explode_unique, concat_frames,
+    memory_report, peak_rss_mb
+)
+from data_processing.incident_index import IncidentIndex
+from data_processing.snapshots_112 import load_snapshots
+from database.file_catalog import scan, catalog_files, mark, absolute_path, STATUS_INVALID, STATUS_DUPLICATE, STATUS_PROCESSED
+
+DB_PATH = Path(__file__).parent / 'data' / 'fiksa_database.db'
+
+# Второй проход сопоставления: телефон + ближайший звонок 112 в пределах окна
+PHONE_MATCH_WINDOW = pd.Timedelta(hours=int(os.getenv('PHONE_MATCH_WINDOW_HOURS', '48')))
+PHONE_MIN_DIGITS = 7
+
+# Третий проход: номер инцидента с одной опечаткой (перестановка/замена/пропуск цифры)
+SIMILAR_INCIDENT_CONFIDENCE = 0.9
+
 def normalize_phone(phone):
     """Нормализация телефонного номера"""
     if pd.isna(phone):
@@ -51,19 +72,29 @@ def scan_123_folder():
     print("СКАНИРОВАНИЕ ПАПКИ 123")
     print("="*80)
     
-    files = glob.glob('123/*.xlsx')
+    # Каталог файлов: неизмененные файлы не открываются, новые разбираются один раз
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        counts = scan(conn, '112')
+        catalog = catalog_files(conn, '112')
+    finally:
+        conn.close()
     
-    if not files:
+    if catalog.empty:
         print("\n❌ Файлы не найдены в папке 123!")
         print("\nПожалуйста, загрузите файлы Excel в папку 123/")
         return []
     
-    print(f"\n✓ Найдено файлов: {len(files)}\n")
+    print(f"\n✓ Найдено файлов: {len(catalog)} (новых/измененных: {counts['new'] + counts['changed']})\n")
     
     periods = {}
-    for file in files:
+    for entry in catalog.itertuples():
+        file = str(absolute_path(entry.path))
         filename = Path(file).name
-        print(f"  • {filename}")
+        if entry.status in (STATUS_INVALID, STATUS_DUPLICATE):
+            print(f"  • {filename} - пропущен ({entry.status}: {entry.error})")
+            continue
+        print(f"  • {filename} [{entry.status}]")
         
         # Пытаемся извлечь период из имени файла
         # Формат: ЧақирувТарихи_112_2026_01_04_00_00_00_2026_01_11_23_59_59.xlsx
@@ -72,7 +103,11 @@ def scan_123_folder():
             start_year, start_month, start_day = match.group(1), match.group(2), match.group(3)
             end_year, end_month, end_day = match.group(4), match.group(5), match.group(6)
             period_key = f"{start_year}-{start_month}"
-            
+        else:
+            # Имя без дат - период, определенный по датам звонков при разборе
+            period_key = entry.period
+        
+        if period_key:
             if period_key not in periods:
                 periods[period_key] = []
             periods[period_key].append(file)
@@ -143,7 +178,9 @@ def load_sheets_data():
     latest_file = max(local_files, key=lambda p: p.stat().st_ctime)
     print(f"\n✓ Файл: {latest_file.name}")
     
-    df_sheets = pd.read_csv(latest_file)
+    # Типы задаются при чтении: category / Int64 / datetime (frame_schema.py)
+    df_sheets = pd.read_csv(latest_file, dtype=read_dtypes(SHEETS_SCHEMA), low_memory=False)
+    df_sheets = apply_schema(df_sheets, SHEETS_SCHEMA)
     print(f"✓ Загружено записей: {len(df_sheets)}")
     
     # Переименовываем колонки (структура из Google Sheets)
@@ -169,15 +206,22 @@ def load_sheets_data():
     }
     df_sheets = df_sheets.rename(columns=col_mapping)
     
-    # Нормализация
-    df_sheets['Телефон_нормализованный'] = df_sheets['Телефон_Sheets'].apply(normalize_phone)
-    df_sheets['Статус_связи'] = df_sheets['Статус_связи'].apply(rename_statuses)
-    df_sheets['Инцидент_Sheets_norm'] = df_sheets['Инцидент_Sheets'].astype(str).str.strip()
-    df_sheets['Есть_жалоба'] = df_sheets['Жалоба'].notna() & (df_sheets['Жалоба'].astype(str).str.strip() != '')
+    # Нормализация (функции вызываются по уникальным значениям)
+    df_sheets['Телефон_нормализованный'] = map_unique(df_sheets['Телефон_Sheets'], normalize_phone, as_category=False)
+    df_sheets['Статус_связи'] = map_unique(
+        df_sheets['Статус_связи'],
+        lambda v: 'nan' if pd.isna(v) else str(rename_statuses(v))
+    )
+    df_sheets['Инцидент_Sheets_norm'] = df_sheets['Инцидент_Sheets']
+    df_sheets['Есть_жалоба'] = map_unique(
+        df_sheets['Жалоба'],
+        lambda v: not pd.isna(v) and str(v).strip() != '',
+        as_category=False
+    ).astype(bool)
 
-    # Фильтрация по датам 04–31.01.2026
+    # Фильтрация по датам 04–31.01.2026 (Дата_открытия разобрана при чтении)
     print("\n✓ Фильтрация по диапазону дат 04–31.01.2026...")
-    date_series = pd.to_datetime(df_sheets['Дата_открытия'], errors='coerce', dayfirst=True)
+    date_series = df_sheets['Дата_открытия']
     start_date = pd.Timestamp('2026-01-04')
     end_date = pd.Timestamp('2026-01-31 23:59:59')
     before_count = len(df_sheets)
@@ -197,22 +241,21 @@ def load_sheets_data():
         parts = [p.strip() for p in parts if p.strip()]
         return list(dict.fromkeys(parts))
 
-    df_sheets['Службы_list'] = df_sheets['Служба_Sheets'].apply(extract_services)
-    df_sheets['Службы_list'] = df_sheets['Службы_list'].apply(lambda x: x if x else [None])
-    df_sheets = df_sheets.explode('Службы_list').reset_index(drop=True)
-    df_sheets['Служба_Sheets_norm'] = df_sheets['Службы_list'].astype(str).str.strip()
+    # Строки размножаются по службам без промежуточной колонки списков
+    df_sheets = explode_unique(df_sheets, 'Служба_Sheets', extract_services, 'Службы_list')
+    df_sheets['Служба_Sheets_norm'] = map_unique(
+        df_sheets['Службы_list'], lambda v: 'None' if pd.isna(v) else str(v).strip()
+    )
     
     # Заполнение пустых статусов
     print("\n✓ Заполнение пустых полей...")
     
-    # Преобразуем колонки в строковый тип для заполнения
-    df_sheets['Статус_связи'] = df_sheets['Статус_связи'].astype(str)
-    df_sheets['Положительно'] = df_sheets['Положительно'].astype(str)
+    df_sheets['Положительно'] = map_unique(df_sheets['Положительно'], str)
     
     # Если статус пустой - ставим "Не удалось дозвониться"
     empty_status = (df_sheets['Статус_связи'].isin(['', 'nan', 'None'])) | df_sheets['Статус_связи'].isna()
     if empty_status.sum() > 0:
-        df_sheets.loc[empty_status, 'Статус_связи'] = 'Не удалось дозвониться'
+        df_sheets['Статус_связи'] = set_where(df_sheets['Статус_связи'], empty_status, 'Не удалось дозвониться')
         print(f"  • Заполнено пустых статусов: {empty_status.sum()}")
     
     # Если "Положительно" пустое и нет жалобы - ставим "Нет"
@@ -220,11 +263,14 @@ def load_sheets_data():
     no_complaint = ~df_sheets['Есть_жалоба']
     to_fill = empty_positive & no_complaint
     if to_fill.sum() > 0:
-        df_sheets.loc[to_fill, 'Положительно'] = 'Нет'
+        df_sheets['Положительно'] = set_where(df_sheets['Положительно'], to_fill, 'Нет')
         print(f"  • Заполнено пустых 'Положительно' (без жалоб): {to_fill.sum()}")
+    # match_data проставляет 'Положительно' через .loc
+    df_sheets['Положительно'] = ensure_categories(df_sheets['Положительно'], ['Положительно'])
     
     print(f"\n✓ Уникальных инцидентов: {df_sheets['Инцидент_Sheets_norm'].nunique()}")
     print(f"✓ Записей с жалобами: {df_sheets['Есть_жалоба'].sum()}")
+    memory_report(df_sheets, 'Sheets')
     
     return df_sheets
 
@@ -234,14 +280,14 @@ def load_112_data(files_list):
     print("ЗАГРУЗКА ДАННЫХ 112")
     print("="*80)
     
-    all_data = []
-    for file in files_list:
-        print(f"\n✓ Читаю: {Path(file).name}")
-        df = pd.read_excel(file)
-        print(f"  Строк: {len(df)}")
-        all_data.append(df)
+    # Файлы уже разобраны и типизированы при загрузке (снимки data/snapshots_112),
+    # Excel читается только для файлов, которых еще нет в снимках
+    all_data = load_snapshots(files_list)
+    if not all_data:
+        return pd.DataFrame()
     
-    df_112 = pd.concat(all_data, ignore_index=True)
+    df_112 = concat_frames(all_data)
+    del all_data
     
     print(f"\n✓ Всего строк после объединения: {len(df_112)}")
     
@@ -251,25 +297,12 @@ def load_112_data(files_list):
     duplicates_removed = initial_count - len(df_112)
     print(f"✓ Удалено полных дубликатов: {duplicates_removed}")
     
-    # Переименование колонок (узбекские названия -> русские)
-    df_112 = df_112.rename(columns={
-        'Карточка рақами': 'Карта_112',
-        'Ҳодиса рақами': 'Инцидент_112',
-        'Хизмат': 'Служба_112',
-        'Мурожаатчи телефон рақами': 'Телефон_112',
-        'Ҳолат': 'Статус_112',
-        'Вилоят': 'Регион_112',
-        'Туман': 'Район_112',
-        'Оператор': 'Оператор_112',
-        'Сана': 'Дата_112'
-    })
-    
-    # Нормализация
-    df_112['Телефон_нормализованный'] = df_112['Телефон_112'].apply(normalize_phone)
-    df_112['Статус_112'] = df_112['Статус_112'].apply(rename_statuses)
-    df_112['Карта_112_norm'] = df_112['Карта_112'].astype(str).str.strip()
-    df_112['Инцидент_112_norm'] = df_112['Инцидент_112'].astype(str).str.strip()
-    df_112['Служба_112'] = df_112['Служба_112'].astype(str)
+    # Нормализация (функции вызываются по уникальным значениям)
+    df_112['Телефон_нормализованный'] = map_unique(df_112['Телефон_112'], normalize_phone, as_category=False)
+    df_112['Статус_112'] = map_unique(df_112['Статус_112'], rename_statuses)
+    df_112['Карта_112_norm'] = to_id(df_112['Карта_112'])
+    df_112['Инцидент_112_norm'] = to_id(df_112['Инцидент_112'])
+    df_112['Служба_112'] = map_unique(df_112['Служба_112'], str)
     
     # Удаляем дубликаты по ключевым полям
     df_112 = df_112.drop_duplicates(
@@ -287,8 +320,148 @@ def load_112_data(files_list):
             count = (df_112['Служба_112'] == service).sum()
             print(f"  • {service}: {count}")
     
+    memory_report(df_112, '112')
+    
     return df_112
 
+def filter_by_service(result):
+    """Если в Sheets указана служба — оставляем только строки этой службы"""
+    has_service = ~result['Служба_Sheets_norm'].isin(['', 'None', 'nan']) & result['Служба_Sheets_norm'].notna()
+    same_service = result['Служба_Sheets_norm'].astype(str) == result['Служба_112'].astype(str)
+    # Строки без совпадения по инциденту не отбрасываем - их ищут следующие проходы
+    if '_merge' in result.columns:
+        same_service |= result['_merge'] == 'left_only'
+    return pd.concat([
+        result[~has_service],
+        result[has_service & same_service]
+    ], ignore_index=True)
+
+def match_by_phone(unmatched, df_112, df_112_key, window=PHONE_MATCH_WINDOW):
+    """
+    Второй проход для строк без совпадения по инциденту.
+    
+    Для каждой строки Sheets ищется ближайший по времени звонок 112 с тем же
+    нормализованным телефоном (merge_asof by телефон, окно window). Найденный
+    номер инцидента дальше сопоставляется так же, как в основном проходе.
+    Уверенность = 1 - |Дата_открытия - Дата_112| / window.
+    
+    Возвращает (найденные, оставшиеся).
+    """
+    if unmatched.empty or not pd.api.types.is_datetime64_any_dtype(df_112['Дата_112'].dtype):
+        return unmatched.iloc[0:0], unmatched
+    
+    left = unmatched[['Телефон_нормализованный', 'Дата_открытия']].copy()
+    left['_row'] = unmatched.index
+    left = left[(left['Телефон_нормализованный'].str.len() >= PHONE_MIN_DIGITS) & left['Дата_открытия'].notna()]
+    
+    right = df_112[['Телефон_нормализованный', 'Дата_112', 'Инцидент_112_norm']]
+    right = right[(right['Телефон_нормализованный'].str.len() >= PHONE_MIN_DIGITS)
+                  & right['Дата_112'].notna() & right['Инцидент_112_norm'].notna()]
+    right = right.rename(columns={'Дата_112': '_Дата_звонка'})
+    
+    if left.empty or right.empty:
+        return unmatched.iloc[0:0], unmatched
+    
+    # merge_asof: обе стороны отсортированы по времени, телефон - ключ группы
+    found = pd.merge_asof(
+        left.astype({'Телефон_нормализованный': object}).sort_values('Дата_открытия'),
+        right.astype({'Телефон_нормализованный': object}).sort_values('_Дата_звонка'),
+        left_on='Дата_открытия',
+        right_on='_Дата_звонка',
+        by='Телефон_нормализованный',
+        tolerance=window,
+        direction='nearest'
+    ).dropna(subset=['Инцидент_112_norm'])
+    
+    if found.empty:
+        return unmatched.iloc[0:0], unmatched
+    
+    distance = (found['Дата_открытия'] - found['_Дата_звонка']).abs()
+    # Совпадение по телефону никогда не считается таким же надежным, как по инциденту
+    found['Уверенность_совпадения'] = (1 - distance / window).clip(0, 0.99).round(2)
+    
+    return rematch_found(unmatched, found, df_112_key, 'телефон')
+
+def rematch_found(unmatched, found, df_112_key, method):
+    """
+    Повторить сопоставление строк unmatched по найденным инцидентам.
+    found: _row (индекс в unmatched), Инцидент_112_norm, Уверенность_совпадения.
+    Возвращает (найденные с _Способ = method, оставшиеся).
+    """
+    key_columns = [c for c in df_112_key.columns if c != 'Инцидент_112_norm'] + ['Инцидент_112_norm', '_merge']
+    candidates = unmatched.loc[found['_row']].drop(columns=key_columns, errors='ignore')
+    candidates['Инцидент_112_norm'] = found['Инцидент_112_norm'].astype(df_112_key['Инцидент_112_norm'].dtype).to_numpy()
+    candidates['Уверенность_совпадения'] = found['Уверенность_совпадения'].to_numpy()
+    candidates['_row'] = found['_row'].to_numpy()
+    
+    rematched = candidates.merge(df_112_key, on='Инцидент_112_norm', how='inner')
+    rematched = filter_by_service(rematched)
+    rematched['_merge'] = pd.Categorical(['both'] * len(rematched), categories=['left_only', 'right_only', 'both'])
+    rematched['_Способ'] = method
+    
+    remaining = unmatched.drop(index=rematched['_row'].unique())
+    return rematched.drop(columns=['_row']), remaining
+
+def match_by_similar_incident(unmatched, df_112, df_112_key, window=PHONE_MATCH_WINDOW):
+    """
+    Третий проход: номер инцидента из Sheets с одной опечаткой оператора
+    (расстояние Дамерау-Левенштейна 1).
+    
+    Кандидаты ищутся через IncidentIndex (без сравнения всех пар). Номера 112
+    идут подряд, поэтому кандидатов часто несколько - оставляем только те,
+    где есть служба из Sheets (если указана) и звонок 112 в пределах window
+    от Дата_открытия, и принимаем совпадение, только если такой кандидат один.
+    
+    Возвращает (найденные, оставшиеся).
+    """
+    if unmatched.empty:
+        return unmatched.iloc[0:0], unmatched
+    
+    index = IncidentIndex(df_112['Инцидент_112_norm'])
+    pairs = index.candidates(unmatched['Инцидент_Sheets_norm'])
+    if pairs.empty:
+        return unmatched.iloc[0:0], unmatched
+    
+    rows = pd.DataFrame({
+        '_row': unmatched.index,
+        'Номер': unmatched['Инцидент_Sheets_norm'].astype(object).to_numpy(),
+        'Дата_открытия': unmatched['Дата_открытия'].to_numpy(),
+        '_Служба': unmatched['Служба_Sheets_norm'].astype(object).to_numpy()
+    })
+    found = rows.merge(pairs, on='Номер', how='inner')
+    
+    # Звонки 112 по кандидатам: служба и время
+    calls = pd.DataFrame({
+        'Кандидат': df_112['Инцидент_112_norm'].astype(object).to_numpy(),
+        '_Служба_112': df_112['Служба_112'].astype(object).to_numpy(),
+        '_Дата_звонка': df_112['Дата_112'].to_numpy()
+    }).drop_duplicates()
+    found = found.merge(calls, on='Кандидат', how='inner')
+    
+    # Если в Sheets указана служба - она должна быть в инциденте-кандидате
+    has_service = found['_Служба'].notna() & ~found['_Служба'].isin(['', 'None', 'nan'])
+    found = found[~has_service | (found['_Служба'].astype(str) == found['_Служба_112'].astype(str))]
+    
+    # Звонок 112 должен быть в пределах window от Дата_открытия
+    # (без даты в Sheets кандидата не отбрасываем - но он должен быть единственным)
+    if (pd.api.types.is_datetime64_any_dtype(found['_Дата_звонка'].dtype)
+            and pd.api.types.is_datetime64_any_dtype(found['Дата_открытия'].dtype)):
+        distance = (found['Дата_открытия'] - found['_Дата_звонка']).abs()
+        found = found[found['Дата_открытия'].isna() | (distance <= window)]
+    found = found.drop_duplicates(['_row', 'Кандидат'])
+    
+    # Неоднозначные номера не сопоставляем
+    found = found[~found['_row'].duplicated(keep=False)]
+    if found.empty:
+        return unmatched.iloc[0:0], unmatched
+    
+    found = pd.DataFrame({
+        '_row': found['_row'].to_numpy(),
+        'Инцидент_112_norm': found['Кандидат'].to_numpy(),
+        'Уверенность_совпадения': SIMILAR_INCIDENT_CONFIDENCE
+    })
+    return rematch_found(unmatched, found, df_112_key, 'номер')
+
 def match_data(df_sheets, df_112, period_name):
     """Сопоставление данных"""
     print("\n" + "="*80)
@@ -309,6 +482,13 @@ def match_data(df_sheets, df_112, period_name):
         if missing_mask.any():
             print(f"✓ Найдены строки без службы: {missing_mask.sum()} — сопоставление будет по инциденту")
 
+    # Номера с одной стороны могут быть Int64, с другой - строками
+    df_sheets = df_sheets.copy(deep=False)
+    df_112 = df_112.copy(deep=False)
+    df_sheets['Инцидент_Sheets_norm'], df_112['Инцидент_112_norm'] = align_keys(
+        df_sheets['Инцидент_Sheets_norm'], df_112['Инцидент_112_norm']
+    )
+
     # Считаем количество служб в каждом инциденте
     incident_counts = df_112.groupby('Инцидент_112_norm').agg({
         'Служба_112': 'count'
@@ -334,20 +514,34 @@ def match_data(df_sheets, df_112, period_name):
     
     # Если в Sheets указана служба — оставляем только эту службу
     if 'Служба_Sheets_norm' in result.columns:
-        has_service = ~result['Служба_Sheets_norm'].isin(['', 'None', 'nan']) & result['Служба_Sheets_norm'].notna()
         before_filter = len(result)
-        result = pd.concat([
-            result[~has_service],
-            result[has_service & (result['Служба_Sheets_norm'].astype(str) == result['Служба_112'].astype(str))]
-        ], ignore_index=True)
+        result = filter_by_service(result)
         print(f"✓ Фильтр по службе (если указана): {before_filter} -> {len(result)}")
     
     matched = result[result['_merge'] == 'both'].copy()
     unmatched = result[result['_merge'] == 'left_only'].copy()
+    matched['Уверенность_совпадения'] = 1.0
+    matched['_Способ'] = 'инцидент'
     
     print(f"  ✓ Найдено совпадений: {len(matched)}")
     print(f"  ⚠ Не найдено: {len(unmatched)}")
     
+    # ВТОРОЙ ПРОХОД: ТЕЛЕФОН + ВРЕМЯ для строк без совпадения по инциденту
+    print(f"\n✓ Сопоставление по телефону (окно ±{PHONE_MATCH_WINDOW})...")
+    phone_matched, unmatched = match_by_phone(unmatched, df_112, df_112_key)
+    if len(phone_matched) > 0:
+        matched = concat_frames([matched, phone_matched])
+    print(f"  ✓ Найдено по телефону: {len(phone_matched)}")
+    print(f"  ⚠ Не найдено: {len(unmatched)}")
+    
+    # ТРЕТИЙ ПРОХОД: НОМЕР ИНЦИДЕНТА С ОДНОЙ ОПЕЧАТКОЙ
+    print("\n✓ Сопоставление по похожему номеру инцидента (одна опечатка)...")
+    similar_matched, unmatched = match_by_similar_incident(unmatched, df_112, df_112_key)
+    if len(similar_matched) > 0:
+        matched = concat_frames([matched, similar_matched])
+    print(f"  ✓ Найдено по похожему номеру: {len(similar_matched)}")
+    print(f"  ⚠ Не найдено: {len(unmatched)}")
+    
     if len(matched) > 0:
         # Добавляем количество служб в инциденте
         matched['Количество_служб_в_инциденте'] = matched['Инцидент_112_norm'].map(incident_counts)
@@ -364,38 +558,61 @@ def match_data(df_sheets, df_112, period_name):
         matched.loc[mask_no_complaint, 'Положительно'] = 'Положительно'
         matched.loc[mask_no_complaint & (matched['Количество_служб_в_инциденте'] > 1), 'Тип_совпадения'] = 'Положительно - несколько служб'
         matched.loc[mask_no_complaint & (matched['Количество_служб_в_инциденте'] == 1), 'Тип_совпадения'] = 'Положительно - одна служба'
+        
+        # Совпадения второго и третьего прохода помечаются отдельно
+        mask_phone = matched['_Способ'] == 'телефон'
+        matched.loc[mask_phone & mask_complaint, 'Тип_совпадения'] = 'Жалоба - телефон+время'
+        matched.loc[mask_phone & mask_no_complaint, 'Тип_совпадения'] = 'Положительно - телефон+время'
+        mask_similar = matched['_Способ'] == 'номер'
+        matched.loc[mask_similar & mask_complaint, 'Тип_совпадения'] = 'Жалоба - похожий номер'
+        matched.loc[mask_similar & mask_no_complaint, 'Тип_совпадения'] = 'Положительно - похожий номер'
 
         # Если в Sheets указана конкретная служба — добавляем положительно для остальных служб в этом инциденте
         if 'Служба_Sheets_norm' in matched.columns:
             specified_mask = ~matched['Служба_Sheets_norm'].isin(['', 'None', 'nan']) & matched['Служба_Sheets_norm'].notna()
             specified_incidents = matched.loc[specified_mask, 'Инцидент_112_norm'].dropna().unique().tolist()
             if specified_incidents:
-                extras = []
-                for incident in specified_incidents:
-                    services_in_112 = df_112[df_112['Инцидент_112_norm'] == incident]['Служба_112'].astype(str).unique().tolist()
-                    services_in_matched = matched[matched['Инцидент_112_norm'] == incident]['Служба_112'].astype(str).unique().tolist()
-                    other_services = [s for s in services_in_112 if s not in services_in_matched]
-                    if not other_services:
-                        continue
-                    base_row = matched[matched['Инцидент_112_norm'] == incident].iloc[0].copy()
-                    for service in other_services:
-                        new_row = base_row.copy()
-                        new_row['Служба_112'] = service
-                        new_row['Служба_Sheets_norm'] = service
-                        new_row['Жалоба'] = ''
-                        new_row['Есть_жалоба'] = False
-                        new_row['Положительно'] = 'Положительно'
-                        new_row['Тип_совпадения'] = 'Положительно - другие службы'
-                        extras.append(new_row)
-                if extras:
-                    matched = pd.concat([matched, pd.DataFrame(extras)], ignore_index=True)
+                # Службы инцидента в 112, которых еще нет среди совпадений (anti-join вместо цикла)
+                in_specified = df_112['Инцидент_112_norm'].isin(specified_incidents)
+                services_in_112 = pd.DataFrame({
+                    'Инцидент_112_norm': df_112.loc[in_specified, 'Инцидент_112_norm'],
+                    '_Служба': df_112.loc[in_specified, 'Служба_112'].astype(str)
+                }).drop_duplicates()
+                matched_specified = matched[matched['Инцидент_112_norm'].isin(specified_incidents)]
+                services_in_matched = pd.DataFrame({
+                    'Инцидент_112_norm': matched_specified['Инцидент_112_norm'],
+                    '_Служба': matched_specified['Служба_112'].astype(str)
+                }).drop_duplicates()
+                other_services = services_in_112.merge(
+                    services_in_matched, on=['Инцидент_112_norm', '_Служба'], how='left', indicator=True
+                )
+                other_services = other_services[other_services['_merge'] == 'left_only'].drop(columns='_merge')
+                
+                if not other_services.empty:
+                    # Порядок: как в specified_incidents, внутри инцидента - как в 112
+                    order = pd.Series(range(len(specified_incidents)), index=specified_incidents)
+                    other_services['_Порядок'] = other_services['Инцидент_112_norm'].map(order).to_numpy()
+                    other_services = other_services.sort_values('_Порядок', kind='stable')
+                    
+                    # Первая строка совпадений по инциденту - основа для новых строк
+                    base_rows = matched_specified.drop_duplicates('Инцидент_112_norm', keep='first')
+                    extras = other_services[['Инцидент_112_norm', '_Служба']].merge(
+                        base_rows, on='Инцидент_112_norm', how='left'
+                    )
+                    extras['Служба_112'] = extras['_Служба']
+                    extras['Служба_Sheets_norm'] = extras['_Служба']
+                    extras['Жалоба'] = ''
+                    extras['Есть_жалоба'] = False
+                    extras['Положительно'] = 'Положительно'
+                    extras['Тип_совпадения'] = 'Положительно - другие службы'
+                    matched = concat_frames([matched, extras[matched.columns]])
         
         print("\n  Распределение по типам:")
         for type_name, count in matched['Тип_совпадения'].value_counts().items():
             print(f"    • {type_name}: {count}")
     
     # Объединяем результаты
-    result_final = pd.concat([matched, unmatched], ignore_index=True)
+    result_final = concat_frames([matched, unmatched]).drop(columns=['_Способ'], errors='ignore')
     result_final.loc[result_final['_merge'] == 'left_only', 'Тип_совпадения'] = 'Не найдено в 112'
     result_final['Период'] = period_name
     
@@ -414,7 +631,7 @@ def build_summary_tables(df_result):
     if region_col and 'Есть_жалоба' in df_result.columns:
         complaints_region = (
             df_result[(df_result['Есть_жалоба'] == True) & (df_result['Жалоба'].astype(str).str.strip() != '')]
-            .groupby(region_col)
+            .groupby(region_col, observed=True)
             .size()
             .reset_index(name='Количество_жалоб')
             .sort_values('Количество_жалоб', ascending=False)
@@ -428,7 +645,7 @@ def build_summary_tables(df_result):
     if region_col and 'Жалоба' in df_result.columns:
         complaints_region_type = (
             df_result[(df_result['Жалоба'].astype(str).str.strip() != '')]
-            .groupby([region_col, 'Жалоба'])
+            .groupby([region_col, 'Жалоба'], observed=True)
             .size()
             .reset_index(name='Количество')
             .sort_values(['Количество'], ascending=False)
@@ -457,26 +674,35 @@ def build_summary_tables(df_result):
 
     return complaints_region, complaints_region_type, negative_df
 
-def save_service_files(df_result, period_name, period_dir):
-    """Сохранение отдельных файлов по службам"""
+def report_sheets(df):
+    """Листы книги отчета: сводки, детальные данные, отрицательные и жалобы"""
+    complaints_region, complaints_region_type, negative_df = build_summary_tables(df)
+    return [
+        ('Жалобы_по_регионам', complaints_region),
+        ('Регионы_и_жалобы', complaints_region_type),
+        ('Детальные', df),
+        ('Отрицательные_и_жалобы', negative_df),
+    ]
+
+def service_workbooks(df_result, period_name, period_dir):
+    """Книги по службам: список (путь, листы)"""
     if 'Служба_112' not in df_result.columns:
         return []
 
     safe_period = period_name.replace(':', '-').replace('/', '-')
-    created_files = []
+    service_column = df_result['Служба_112'].astype(str)
+    workbooks = []
     for service_code in ['101', '102', '103', '104']:
-        df_service = df_result[df_result['Служба_112'].astype(str) == service_code]
+        df_service = df_result[service_column == service_code]
         if df_service.empty:
             continue
         file_path = period_dir / f'ОТЧЁТ_{safe_period}_СЛУЖБА_{service_code}.xlsx'
-        with pd.ExcelWriter(file_path, engine='xlsxwriter', engine_kwargs={'options': {'strings_to_urls': False}}) as writer:
-            complaints_region, complaints_region_type, negative_df = build_summary_tables(df_service)
-            complaints_region.to_excel(writer, index=False, sheet_name='Жалобы_по_регионам')
-            complaints_region_type.to_excel(writer, index=False, sheet_name='Регионы_и_жалобы')
-            df_service.to_excel(writer, index=False, sheet_name='Детальные')
-            negative_df.to_excel(writer, index=False, sheet_name='Отрицательные_и_жалобы')
-        created_files.append(file_path)
-    return created_files
+        workbooks.append((file_path, report_sheets(df_service)))
+    return workbooks
+
+def save_service_files(df_result, period_name, period_dir):
+    """Сохранение отдельных файлов по службам"""
+    return write_workbooks(service_workbooks(df_result, period_name, period_dir))
 
 def save_results(df_result, period_name):
     """Сохранение результатов"""
@@ -504,18 +730,34 @@ def save_results(df_result, period_name):
     excel_file = period_dir / f'ОТЧЁТ_{safe_period}_{timestamp}.xlsx'
     print(f"\n  Сохранение Excel (это может занять время для больших файлов)...")
     
+    # Общая книга и книги по службам собираются одновременно:
+    # XML листов всех книг генерируется в пуле процессов. Ошибки
+    # собираются по книгам - неудачная книга не мешает остальным
+    errors = {}
+    books = []
     try:
-        complaints_region, complaints_region_type, negative_df = build_summary_tables(df_result)
-        # Для больших файлов используем xlsxwriter
-        with pd.ExcelWriter(excel_file, engine='xlsxwriter', engine_kwargs={'options': {'strings_to_urls': False}}) as writer:
-            complaints_region.to_excel(writer, index=False, sheet_name='Жалобы_по_регионам')
-            complaints_region_type.to_excel(writer, index=False, sheet_name='Регионы_и_жалобы')
-            df_result.to_excel(writer, index=False, sheet_name='Детальные')
-            negative_df.to_excel(writer, index=False, sheet_name='Отрицательные_и_жалобы')
-        print(f"  ✓ Excel сохранён: {excel_file}")
+        books.append((excel_file, report_sheets(df_result)))
     except Exception as e:
-        print(f"  ⚠️  Ошибка при сохранении Excel: {e}")
+        errors[excel_file] = e
+    try:
+        books += service_workbooks(df_result, period_name, period_dir)
+    except Exception as e:
+        print(f"  ⚠️  Ошибка при подготовке файлов по службам: {e}")
+    try:
+        created = write_workbooks(books, errors=errors)
+    except Exception as e:
+        created = []
+        errors.update({path: e for path, _ in books})
+    
+    if excel_file in errors:
+        print(f"  ⚠️  Ошибка при сохранении Excel: {errors[excel_file]}")
         print(f"  💡 Используйте CSV файл вместо Excel")
+    else:
+        print(f"  ✓ Excel сохранён: {excel_file}")
+    service_files = [path for path in created if path != excel_file]
+    for path, error in errors.items():
+        if path != excel_file:
+            print(f"  ⚠️  Ошибка при сохранении {path.name}: {error}")
     
     print(f"\n{'='*80}")
     print("✓ РЕЗУЛЬТАТЫ СОХРАНЕНЫ")
@@ -543,10 +785,10 @@ def save_results(df_result, period_name):
             
             print("\n  По службам:")
             services = df_result[df_result['Служба_112'].notna()]['Служба_112'].value_counts()
+            services = services[services > 0]
             for service, count in list(services.items())[:10]:  # Топ 10
                 print(f"    • {service}: {count}")
     
-    service_files = save_service_files(df_result, period_name, period_dir)
     if service_files:
         print("\n  📌 Отдельные файлы по службам:")
         for path in service_files:
@@ -596,9 +838,21 @@ def main():
             print("\n❌ Нет результатов!")
             return
         
+        memory_report(df_result, 'результата')
+        
         # 6. Сохраняем результаты
         csv_file, excel_file = save_results(df_result, period_name)
         
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            mark(conn, '112', files_list, STATUS_PROCESSED)
+        finally:
+            conn.close()
+        
+        peak = peak_rss_mb()
+        if peak is not None:
+            print(f"\n🧠 Пиковое RSS за весь прогон: {peak:.0f} МБ")
+        
         print(f"\n{'='*80}")
         print("✅ ГОТОВО!")
         print(f"{'='*80}")
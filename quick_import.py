@@ -4,6 +4,7 @@
 Быстрый импорт данных из ALL_DATA_COLLECTED.csv
 """
 
+import sys
 import sqlite3
 import pandas as pd
 from datetime import datetime
@@ -13,19 +14,8 @@ BASE_DIR = Path(__file__).parent
 DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
 CSV_FILE = BASE_DIR / 'data' / 'ALL_DATA_COLLECTED.csv'
 
-EXCLUDE_PATTERNS = ['Тренды', 'Текущий месяц - Сводка', 'Предыдущий месяц - Сводка',
-                     'СВОДКА СОТРУДНИКИ', 'Ноябрь 2025', 'Декабрь 2025', 'сводка', 'итого']
-
-def should_exclude(operator_name):
-    if not operator_name or pd.isna(operator_name):
-        return True
-    op_str = str(operator_name).strip().lower()
-    if op_str in ['', '-', 'nan', 'none', 'null']:
-        return True
-    for pattern in EXCLUDE_PATTERNS:
-        if pattern.lower() in op_str:
-            return True
-    return False
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from database.exclusions import excluded_mask
 
 print('\n' + '='*80)
 print('ИМПОРТ ДАННЫХ')
@@ -45,13 +35,19 @@ print('\n[2/4] Импорт в fiksa_records...')
 imported = 0
 skipped = 0
 
+# Правила исключения проверяются один раз на каждое имя оператора
+if df.shape[1] > 7:
+    excluded = excluded_mask(df.iloc[:, 7])
+else:
+    excluded = pd.Series(True, index=df.index)
+
 for idx, row in df.iterrows():
     try:
         # Колонки: 3=Дата, 4=Статус, 7=Оператор, 1=Карта, 8=ФИО, 2=Телефон, 9=Адрес, 6=Примечания
         operator_name = row.iloc[7] if len(row) > 7 else None
         
         # Проверка исключений
-        if should_exclude(operator_name):
+        if excluded[idx]:
             skipped += 1
             continue
         
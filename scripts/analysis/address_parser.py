@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Разбор адресов на область и район с приведением написаний к единому виду
+
+Адрес 112 имеет вид "Область, Район, ..." - первая часть считается
+областью, вторая районом. Одна и та же область пишется по-разному
+("Тошкент ш.", "г. Ташкент", "Toshkent shahri"), поэтому названия
+сводятся к каноническим через словарь синонимов. Словарь дополняется
+названиями из таблицы regions: записи с одинаковым region_code
+считаются одной областью.
+
+Адреса сильно повторяются, поэтому разбирается только каждый
+уникальный адрес, а результат кэшируется между вызовами.
+"""
+
+import re
+import sqlite3
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).parent.parent.parent
+DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
+
+NOT_SPECIFIED = 'Не указано'
+
+# Канонические названия областей: (название, вид, основы написаний)
+# Вид 'city' - город, 'region' - область/республика
+CANONICAL_REGIONS = [
+    ('г. Ташкент', 'city', ['ташкент', 'тошкент', 'toshkent', 'tashkent']),
+    ('Ташкентская область', 'region', ['ташкент', 'тошкент', 'toshkent', 'tashkent']),
+    ('Андижанская область', 'region', ['андижан', 'андижон', 'andijon', 'andijan']),
+    ('Бухарская область', 'region', ['бухар', 'бухоро', 'buxoro', 'bukhara']),
+    ('Джизакская область', 'region', ['джизак', 'жиззах', 'jizzax', 'jizzakh']),
+    ('Кашкадарьинская область', 'region', ['кашкадар', 'қашқадар', 'qashqadar']),
+    ('Навоийская область', 'region', ['навои', 'navoi']),
+    ('Наманганская область', 'region', ['наманган', 'namangan']),
+    ('Самаркандская область', 'region', ['самарканд', 'самарқанд', 'samarqand', 'samarkand']),
+    ('Сурхандарьинская область', 'region', ['сурхандар', 'сурхондар', 'surxondar', 'surkhandar']),
+    ('Сырдарьинская область', 'region', ['сырдар', 'сирдар', 'sirdar', 'syrdar']),
+    ('Ферганская область', 'region', ['ферган', 'фарғон', 'фаргон', "farg'on", 'fargon', 'fergan']),
+    ('Хорезмская область', 'region', ['хорезм', 'хоразм', 'xorazm', 'khorezm']),
+    ('Республика Каракалпакстан', 'region', ['каракалпак', 'қорақалпо', 'коракалпо', "qoraqalpo", 'karakalpak']),
+]
+
+# Пометки вида населенного пункта (после удаления точек)
+CITY_MARKERS = {'г', 'ш', 'город', 'шахри', 'шаҳри', 'шахар', 'шаҳар', 'sh', 'shahri', 'shahar'}
+REGION_MARKERS = {'обл', 'область', 'вил', 'вилояти', 'вилоят', 'viloyati', 'viloyat', 'vil',
+                  'респ', 'республика', 'республикаси', 'respublikasi'}
+DISTRICT_MARKERS = {'р-н', 'район', 'р', 'тумани', 'туман', 'т', 'tumani', 'tuman'}
+
+_TOKEN_RE = re.compile(r"[^\w\-ʻʼ'’]+")
+
+# Кэш разбора: адрес -> (область, район)
+_address_cache = {}
+
+# Словарь синонимов областей: нормализованный ключ -> каноническое название
+_region_aliases = None
+
+def _tokens(text):
+    text = str(text).lower().replace('ё', 'е').replace('’', "'").replace('ʻ', "'").replace('ʼ', "'")
+    return [t for t in _TOKEN_RE.split(text) if t]
+
+def region_key(name):
+    """Нормализованный ключ названия области: (основа, вид)"""
+    tokens = _tokens(name)
+    kind = None
+    words = []
+    for token in tokens:
+        if token in CITY_MARKERS:
+            kind = 'city'
+        elif token in REGION_MARKERS:
+            kind = 'region'
+        else:
+            words.append(token)
+    return ' '.join(words), kind
+
+def district_key(name):
+    """Нормализованный ключ названия района (без пометок 'р-н', 'тумани')"""
+    return ' '.join(t for t in _tokens(name) if t not in DISTRICT_MARKERS)
+
+def _match_builtin(stem, kind):
+    """Найти каноническое название по встроенному словарю"""
+    if not stem:
+        return None
+
+    candidates = [
+        (canonical, canonical_kind)
+        for canonical, canonical_kind, stems in CANONICAL_REGIONS
+        if any(stem.startswith(s) for s in stems)
+    ]
+    if not candidates:
+        return None
+
+    # Ташкент без пометки - город, с пометкой - соответствующий вид
+    for canonical, canonical_kind in candidates:
+        if canonical_kind == (kind or 'city'):
+            return canonical
+    return candidates[0][0]
+
+def canonical_region(name, aliases=None):
+    """Каноническое название области или исходное название, если не найдено"""
+    if name is None or pd.isna(name) or not str(name).strip():
+        return NOT_SPECIFIED
+
+    stem, kind = region_key(name)
+    aliases = _region_aliases if aliases is None else aliases
+
+    if aliases and (stem, kind) in aliases:
+        return aliases[(stem, kind)]
+
+    return _match_builtin(stem, kind) or str(name).strip()
+
+def load_region_aliases(conn=None):
+    """
+    Построить словарь синонимов областей.
+    Встроенный словарь дополняется таблицей regions: названия
+    с одинаковым region_code сводятся к одному каноническому.
+    """
+    own_conn = conn is None
+    if own_conn:
+        if not DB_PATH.exists():
+            return {}
+        conn = sqlite3.connect(DB_PATH)
+
+    try:
+        rows = conn.execute('SELECT region_name, region_code FROM regions').fetchall()
+    except sqlite3.Error:
+        rows = []
+    finally:
+        if own_conn:
+            conn.close()
+
+    aliases = {}
+    by_code = {}
+
+    for region_name, region_code in rows:
+        if not region_name:
+            continue
+        key = region_key(region_name)
+        canonical = _match_builtin(*key)
+
+        if canonical is None and region_code:
+            canonical = by_code.setdefault(region_code, str(region_name).strip())
+        elif region_code:
+            by_code.setdefault(region_code, canonical)
+            canonical = by_code[region_code]
+
+        aliases[key] = canonical or str(region_name).strip()
+
+    return aliases
+
+def get_region_aliases(conn=None, reload=False):
+    """Словарь синонимов (загружается один раз)"""
+    global _region_aliases
+    if _region_aliases is None or reload:
+        _region_aliases = load_region_aliases(conn)
+        _address_cache.clear()
+    return _region_aliases
+
+def _parse_unique(addresses):
+    """Разобрать массив уникальных адресов векторно"""
+    aliases = get_region_aliases()
+
+    parts = pd.Series(addresses, dtype=object).astype(str).str.split(',', n=2, expand=True)
+    parts = parts.reindex(columns=[0, 1]).astype(object)
+
+    raw_region = parts[0].str.strip()
+    raw_district = parts[1].astype(str).str.strip().where(parts[1].notna())
+
+    # Каждое уникальное написание области сопоставляется один раз
+    region_names = pd.unique(raw_region.dropna())
+    region_map = {name: canonical_region(name, aliases) for name in region_names}
+
+    region = raw_region.map(region_map)
+    region = region.where(raw_region.fillna('') != '', NOT_SPECIFIED)
+    district = raw_district.where(raw_district.fillna('') != '', NOT_SPECIFIED)
+
+    return region.tolist(), district.tolist()
+
+def _unify_districts(regions, districts, weights):
+    """Свести написания одного района ('Юнусобод тумани', 'юнусобод туман')
+    к самому частому варианту внутри области (weights - число строк
+    каждого уникального адреса)"""
+    frame = pd.DataFrame({'region': regions, 'district': districts, 'n': weights})
+    frame['key'] = frame['district'].map(district_key)
+
+    counts = frame.groupby(['region', 'key', 'district'])['n'].sum().reset_index()
+    counts = counts.sort_values('n', ascending=False).drop_duplicates(['region', 'key'])
+    canonical = counts.set_index(['region', 'key'])['district']
+
+    index = pd.MultiIndex.from_arrays([frame['region'], frame['key']])
+    return canonical.reindex(index).to_numpy()
+
+def parse_addresses(addresses):
+    """
+    Векторный разбор серии адресов.
+    Возвращает DataFrame с колонками 'Область' и 'Район' с тем же индексом.
+    """
+    addresses = pd.Series(addresses)
+    codes, uniques = pd.factorize(addresses, sort=False)
+
+    # Разбираем только то, чего еще нет в кэше
+    missing = [a for a in uniques if a not in _address_cache]
+    if missing:
+        regions, districts = _parse_unique(missing)
+        _address_cache.update(zip(missing, zip(regions, districts)))
+
+    unique_regions = [_address_cache[a][0] for a in uniques] + [NOT_SPECIFIED]
+    unique_districts = [_address_cache[a][1] for a in uniques] + [NOT_SPECIFIED]
+
+    # Районы приводим к единому написанию внутри каждой области;
+    # частота варианта - по строкам, а не по уникальным адресам
+    if len(uniques):
+        weights = np.bincount(codes + 1, minlength=len(uniques) + 1)
+        weights = np.append(weights[1:], weights[0])
+        unique_districts = list(_unify_districts(unique_regions, unique_districts, weights))
+
+    # Код -1 (пустой адрес) указывает на последний элемент 'Не указано'
+    region_values = pd.Series(unique_regions, dtype=object).to_numpy()[codes]
+    district_values = pd.Series(unique_districts, dtype=object).to_numpy()[codes]
+
+    return pd.DataFrame(
+        {'Область': region_values, 'Район': district_values},
+        index=addresses.index
+    )
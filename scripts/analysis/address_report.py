@@ -14,28 +14,11 @@ BASE_DIR = Path(__file__).parent.parent.parent
 DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
 OUTPUT_DIR = BASE_DIR / 'output' / 'reports'
 
+from address_parser import parse_addresses, NOT_SPECIFIED
+
 def get_db_connection():
     return sqlite3.connect(DB_PATH)
 
-def parse_address(address):
-    """Разбить адрес на область и район"""
-    if not address or pd.isna(address):
-        return 'Не указано', 'Не указано'
-    
-    parts = [p.strip() for p in str(address).split(',')]
-    
-    if len(parts) >= 2:
-        region = parts[0]
-        district = parts[1]
-    elif len(parts) == 1:
-        region = parts[0]
-        district = 'Не указано'
-    else:
-        region = 'Не указано'
-        district = 'Не указано'
-    
-    return region, district
-
 def get_available_regions():
     """Получить список доступных регионов"""
     conn = get_db_connection()
@@ -43,13 +26,10 @@ def get_available_regions():
     addresses = pd.read_sql_query(query, conn)
     conn.close()
     
-    regions = set()
-    for addr in addresses['address']:
-        region, _ = parse_address(addr)
-        if region != 'Не указано':
-            regions.add(region)
+    regions = set(parse_addresses(addresses['address'])['Область'])
+    regions.discard(NOT_SPECIFIED)
     
-    return sorted(list(regions))
+    return sorted(regions)
 
 def generate_address_report(start_date=None, end_date=None, selected_regions=None):
     """Создать отчет по адресам"""
@@ -101,9 +81,7 @@ def generate_address_report(start_date=None, end_date=None, selected_regions=Non
     print(f'📊 Всего записей: {len(df)}')
     
     # Разобрать адреса
-    df[['Область', 'Район']] = df['address'].apply(
-        lambda x: pd.Series(parse_address(x))
-    )
+    df[['Область', 'Район']] = parse_addresses(df['address'])
     
     # Фильтр по регионам
     if selected_regions:
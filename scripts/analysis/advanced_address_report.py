@@ -4,6 +4,7 @@
 Расширенный отчет по адресам с агрегацией и отправкой в Telegram
 """
 
+import sys
 import sqlite3
 from pathlib import Path
 import pandas as pd
@@ -15,28 +16,13 @@ DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
 OUTPUT_DIR = BASE_DIR / 'output' / 'reports'
 CONFIG_FILE = BASE_DIR / 'telegram_config.txt'
 
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from database.report_cache import get_or_build
+from address_parser import parse_addresses, NOT_SPECIFIED
+
 def get_db_connection():
     return sqlite3.connect(DB_PATH)
 
-def parse_address(address):
-    """Разбить адрес на область и район"""
-    if not address or pd.isna(address):
-        return 'Не указано', 'Не указано'
-    
-    parts = [p.strip() for p in str(address).split(',')]
-    
-    if len(parts) >= 2:
-        region = parts[0]
-        district = parts[1]
-    elif len(parts) == 1:
-        region = parts[0]
-        district = 'Не указано'
-    else:
-        region = 'Не указано'
-        district = 'Не указано'
-    
-    return region, district
-
 def aggregate_data_to_db():
     """Агрегировать данные для быстрого доступа"""
     conn = get_db_connection()
@@ -77,9 +63,7 @@ def aggregate_data_to_db():
     df = pd.read_sql_query(query, conn)
     
     # Разобрать адреса
-    df[['region', 'district']] = df['address'].apply(
-        lambda x: pd.Series(parse_address(x))
-    )
+    df[['region', 'district']] = parse_addresses(df['address'])
     
     # Упростить жалобы (первые 50 символов как тип)
     df['complaint_type'] = df['complaint'].fillna('Не указано').str[:50]
@@ -103,13 +87,10 @@ def get_available_regions():
     addresses = pd.read_sql_query(query, conn)
     conn.close()
     
-    regions = set()
-    for addr in addresses['address']:
-        region, _ = parse_address(addr)
-        if region != 'Не указано':
-            regions.add(region)
+    regions = set(parse_addresses(addresses['address'])['Область'])
+    regions.discard(NOT_SPECIFIED)
     
-    return sorted(list(regions))
+    return sorted(regions)
 
 def generate_advanced_report(start_date=None, end_date=None, selected_regions=None):
     """Создать расширенный отчет по адресам"""
@@ -161,9 +142,7 @@ def generate_advanced_report(start_date=None, end_date=None, selected_regions=No
     print(f'📊 Всего записей: {len(df)}')
     
     # Разобрать адреса
-    df[['Область', 'Район']] = df['address'].apply(
-        lambda x: pd.Series(parse_address(x))
-    )
+    df[['Область', 'Район']] = parse_addresses(df['address'])
     
     # Фильтр по регионам
     if selected_regions:
@@ -271,6 +250,18 @@ def generate_advanced_report(start_date=None, end_date=None, selected_regions=No
     
     return output_file
 
+def generate_advanced_report_cached(start_date=None, end_date=None, selected_regions=None):
+    """Расширенный отчет через кэш: пересобирается только при изменении данных"""
+    params = {
+        'start_date': start_date,
+        'end_date': end_date,
+        'regions': sorted(selected_regions) if selected_regions else None,
+    }
+    return get_or_build(
+        'address_advanced', params,
+        lambda: generate_advanced_report(start_date, end_date, selected_regions)
+    )
+
 def send_to_telegram(file_path, message=None):
     """Отправить файл в Telegram"""
     try:
@@ -383,7 +374,7 @@ def interactive_menu():
                 print('⚠️ Некорректный ввод, выбраны все регионы')
     
     # Генерация отчета
-    output_file = generate_advanced_report(start_date, end_date, selected_regions)
+    output_file = generate_advanced_report_cached(start_date, end_date, selected_regions)
     
     if output_file:
         # Отправка в Telegram
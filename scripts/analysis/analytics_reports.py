@@ -16,6 +16,7 @@ import sqlite3
 from pathlib import Path
 import pandas as pd
 from datetime import datetime
+import sys
 import asyncio
 from telegram import Bot
 
@@ -24,17 +25,17 @@ DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
 OUTPUT_DIR = BASE_DIR / 'output' / 'reports'
 CONFIG_FILE = BASE_DIR / 'telegram_config.txt'
 
-# Паттерны для исключения из отчетов (имена операторов, которые нужно пропускать)
-EXCLUDE_PATTERNS = [
-    'Тренды',
-    'Текущий месяц - Сводка',
-    'Предыдущий месяц - Сводка',
-    'СВОДКА СОТРУДНИКИ',
-    'Ноябрь 2025',
-    'Декабрь 2025',
-    'сводка',  # любые сводки
-    'итого',   # любые итоги
-]
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from database.exclusions import refresh_excluded
+
+# Операторы-сводки/итоги помечены при импорте (operators.excluded, scripts/database/exclusions.py)
+NOT_EXCLUDED = 'operator_name NOT IN (SELECT operator_name FROM operators WHERE excluded = 1)'
+
+def connect():
+    """Подключение к БД; флаги исключения проставляются только новым операторам"""
+    conn = sqlite3.connect(DB_PATH)
+    refresh_excluded(conn)
+    return conn
 
 # =============================================================================
 # СТАТИСТИКА ОПЕРАТОРОВ
@@ -42,9 +43,9 @@ EXCLUDE_PATTERNS = [
 
 def operator_performance_report():
     """Детальный отчет по работе операторов"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     
-    query = '''
+    query = f'''
         SELECT 
             operator_name as "Оператор",
             COUNT(*) as "Всего звонков",
@@ -56,6 +57,7 @@ def operator_performance_report():
             ROUND(COUNT(CASE WHEN fixation_status LIKE '%Отрицательн%' THEN 1 END) * 100.0 / COUNT(*), 1) as "% Отрицательных"
         FROM v_fixations_full
         WHERE call_date = date('now') AND fixation_status IS NOT NULL AND fixation_status != ''
+          AND {NOT_EXCLUDED}
         GROUP BY operator_name
         ORDER BY COUNT(*) DESC
     '''
@@ -63,11 +65,6 @@ def operator_performance_report():
     df = pd.read_sql_query(query, conn)
     conn.close()
     
-    # Фильтруем исключаемые строки
-    if not df.empty and 'Оператор' in df.columns:
-        for pattern in EXCLUDE_PATTERNS:
-            df = df[~df['Оператор'].str.contains(pattern, case=False, na=False)]
-    
     # Сохранить в Excel
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     output_file = OUTPUT_DIR / f'СТАТИСТИКА_ОПЕРАТОРОВ_{timestamp}.xlsx'
@@ -188,10 +185,10 @@ def service_feedback_report():
 
 def citizen_response_analysis():
     """Анализ ответов граждан на обращения"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     
     # Статистика по типам ответов из представления
-    query = '''
+    query = f'''
         SELECT 
             operator_name as "Оператор",
             fixation_status as "Статус",
@@ -199,6 +196,7 @@ def citizen_response_analysis():
             ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (PARTITION BY operator_name), 1) as "% от оператора"
         FROM v_fixations_full
         WHERE call_date = date('now') AND fixation_status IS NOT NULL AND fixation_status != ''
+          AND {NOT_EXCLUDED}
         GROUP BY operator_name, fixation_status
         ORDER BY operator_name, COUNT(*) DESC
     '''
@@ -206,11 +204,6 @@ def citizen_response_analysis():
     df = pd.read_sql_query(query, conn)
     conn.close()
     
-    # Фильтруем исключаемые строки
-    if not df.empty and 'Оператор' in df.columns:
-        for pattern in EXCLUDE_PATTERNS:
-            df = df[~df['Оператор'].str.contains(pattern, case=False, na=False)]
-    
     # Сохранить
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     output_file = OUTPUT_DIR / f'ОТВЕТЫ_ГРАЖДАН_{timestamp}.xlsx'
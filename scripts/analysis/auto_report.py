@@ -15,28 +15,11 @@ DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
 OUTPUT_DIR = BASE_DIR / 'output' / 'reports'
 CONFIG_FILE = BASE_DIR / 'telegram_config.txt'
 
+from address_parser import parse_addresses
+
 def get_db_connection():
     return sqlite3.connect(DB_PATH)
 
-def parse_address(address):
-    """Разбить адрес на область и район"""
-    if not address or pd.isna(address):
-        return 'Не указано', 'Не указано'
-    
-    parts = [p.strip() for p in str(address).split(',')]
-    
-    if len(parts) >= 2:
-        region = parts[0]
-        district = parts[1]
-    elif len(parts) == 1:
-        region = parts[0]
-        district = 'Не указано'
-    else:
-        region = 'Не указано'
-        district = 'Не указано'
-    
-    return region, district
-
 def parse_complaint(complaint_text):
     """Разобрать описание жалобы на категорию и описание"""
     if not complaint_text or pd.isna(complaint_text):
@@ -115,9 +98,7 @@ def generate_auto_report():
     print(f'📊 Всего записей: {len(df)}')
     
     # Разобрать адреса
-    df[['Область', 'Район']] = df['address'].apply(
-        lambda x: pd.Series(parse_address(x))
-    )
+    df[['Область', 'Район']] = parse_addresses(df['address'])
     
     # Разобрать жалобы
     df[['Категория жалобы', 'Описание', 'Дополнительная информация']] = df['complaint'].apply(
@@ -6,11 +6,16 @@
 =============================================================================
 """
 
+import sys
 import sqlite3
 import json
+from pathlib import Path
 from datetime import datetime, timedelta
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from database.search_index import search
+
 DB_PATH = 'data/fiksa_database.db'
 
 # =============================================================================
@@ -86,19 +91,13 @@ def get_records_by_status(status, start_date=None, end_date=None):
     return df
 
 def search_by_card_or_name(search_text):
-    """Поиск по номеру карты или имени"""
+    """Поиск по номеру карты, имени, телефону, адресу или жалобе (индекс FTS5)"""
     conn = sqlite3.connect(DB_PATH)
     
-    query = '''
-        SELECT * FROM fiksa_records 
-        WHERE card_number LIKE ? OR full_name LIKE ?
-        ORDER BY collection_date DESC
-    '''
-    
-    search_pattern = f'%{search_text}%'
-    df = pd.read_sql_query(query, conn, params=(search_pattern, search_pattern))
-    
-    conn.close()
+    try:
+        df = search(search_text, limit=None, conn=conn)
+    finally:
+        conn.close()
     return df
 
 # =============================================================================
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=================================================================
+АНАЛИТИКА СМЕН И РАБОЧЕГО ВРЕМЕНИ ОПЕРАТОРОВ
+=================================================================
+Python-версия расчетов из apps_script/google_sheets_complete.js
+(analyzeDataOptimized, calculateDayWorkTime, createDailySummarySheet).
+
+Считает по таблице fixations в PostgreSQL для каждого оператора и дня:
+- первую и последнюю фиксацию, смену
+- рабочее время и перерывы (интервалы между фиксациями)
+- количество длинных пауз (больше MAX_BREAK + ERROR_MARGIN)
+- всего фиксаций, уникальных карт, закрытых/открытых/повторных
+  (как в analyzeDataOptimized: открытая - карта дня, не закрытая ни разу
+  за период; повторная - закрытая в этот день карта, первая фиксация
+  которой (у любого оператора) была в другой день)
+- уникальные карты по каждому закрывающему статусу
+
+Расчет выполняется векторно по отсортированным меткам времени,
+результат записывается в Google Sheets одним пакетным запросом.
+Таблицы только отображают готовую сводку.
+
+Использование:
+    python scripts/analysis/operator_shift_analytics.py            # текущий период
+    python scripts/analysis/operator_shift_analytics.py --previous # предыдущий период
+
+Конфигурация: config/postgresql.env
+=================================================================
+"""
+
+import os
+import sys
+import psycopg2
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from dotenv import load_dotenv
+from datetime import datetime
+
+BASE_DIR = Path(__file__).parent.parent.parent
+CONFIG_DIR = BASE_DIR / 'config'
+load_dotenv(CONFIG_DIR / 'postgresql.env')
+
+# Параметры подключения к БД
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': os.getenv('DB_PORT', '5432'),
+    'database': os.getenv('DB_NAME', 'qayta_data'),
+    'user': os.getenv('DB_USER', 'qayta_user'),
+    'password': os.getenv('DB_PASSWORD', 'qayta_password_2026')
+}
+
+# Google Sheets
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+TOKEN_FILE = CONFIG_DIR / 'token_write.json'
+CREDENTIALS_FILE = CONFIG_DIR / 'credentials.json'
+STATISTICS_SPREADSHEET_ID = "1wlqqSCV3HW5ZgfYUT6IS2Ne466jJQeEKH1Nl4Tx2jdc"
+SUMMARY_SHEET_NAME = "Сводка по дням"
+
+# Параметры расчета рабочего времени (как в calculateDayWorkTime), минуты
+MAX_BREAK = 90
+ERROR_MARGIN = 15
+WORK_INTERVAL = 5
+
+# Статусы, при которых карта считается закрытой
+CLOSED_STATUS_LIST = [
+    "отрицательный",
+    "положительный",
+    "заявка закрыта (не удалось дозвониться)",
+    "открыть карту",
+    "тиббиёт ходими аризаси"
+]
+
+SUMMARY_COLUMNS = [
+    "Дата", "ФИО", "Смена", "Первая фиксация", "Последняя фиксация",
+    "Рабочее время", "Перерывы", "Пауз > лимита",
+    "Всего фиксаций", "Уникальных карт", "Закрытых", "Открытых", "Повторных"
+] + [f"Карт: {status}" for status in CLOSED_STATUS_LIST]
+
+
+def get_db_connection():
+    """Создать подключение к БД"""
+    return psycopg2.connect(**DB_CONFIG)
+
+
+def get_period_bounds(reference_date=None, offset=0):
+    """Отчетный период с 20 числа по 19 число следующего месяца (как getPeriodBounds)"""
+    reference_date = reference_date or datetime.now()
+    year, month = reference_date.year, reference_date.month
+    if reference_date.day < 20:
+        month -= 1
+
+    month += offset
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+
+    start = datetime(year, month, 20)
+    end_year = year + month // 12
+    end_month = month % 12 + 1
+    end = datetime(end_year, end_month, 19, 23, 59, 59)
+    return start, end
+
+
+def load_fixations(conn, start_date, end_date):
+    """Загрузить фиксации за период"""
+    query = """
+        SELECT
+            o.operator_name AS operator,
+            TRIM(f.card_number) AS card_number,
+            f.call_date,
+            LOWER(TRIM(COALESCE(f.status, ''))) AS status
+        FROM fixations f
+        JOIN operators o ON o.operator_id = f.operator_id
+        WHERE f.call_date BETWEEN %s AND %s
+          AND f.card_number IS NOT NULL
+          AND TRIM(f.card_number) <> ''
+    """
+    return pd.read_sql_query(query, conn, params=(start_date, end_date))
+
+
+def format_minutes(minutes):
+    """Минуты в формате 'Хч Мм' (как formatMinutes)"""
+    minutes = max(int(minutes), 0)
+    return f"{minutes // 60}ч {minutes % 60}м"
+
+
+def compute_daily_summary(df):
+    """
+    Посчитать метрики по оператору и дню.
+    df - колонки operator, card_number, call_date, status.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    df = df.dropna(subset=['call_date']).sort_values(['operator', 'call_date'], kind='mergesort')
+    df = df.reset_index(drop=True)
+    df['day'] = df['call_date'].dt.normalize()
+
+    # Интервалы между соседними фиксациями одного оператора в один день
+    same_group = (
+        (df['operator'].to_numpy()[1:] == df['operator'].to_numpy()[:-1]) &
+        (df['day'].to_numpy()[1:] == df['day'].to_numpy()[:-1])
+    )
+    gaps = np.diff(df['call_date'].to_numpy()).astype('timedelta64[s]').astype(float) / 60
+    gaps = np.concatenate([[np.nan], np.where(same_group, gaps, np.nan)])
+
+    limit = MAX_BREAK + ERROR_MARGIN
+    df['work_min'] = np.where(gaps <= WORK_INTERVAL, gaps, 0.0)
+    df['break_min'] = np.where((gaps > WORK_INTERVAL) & (gaps <= limit), gaps, 0.0)
+    df['long_gap'] = gaps > limit
+
+    df['closed'] = df['status'].isin(CLOSED_STATUS_LIST)
+
+    # Открытая - карта, не закрытая ни разу за весь период (stats.total.closedB)
+    closed_in_period = df['card_number'].isin(df.loc[df['closed'], 'card_number'].unique())
+    df['open_card'] = df['card_number'].where(~closed_in_period)
+
+    # Повторная - закрытая карта, первая фиксация которой (у любого
+    # оператора) была в другой день (oldClosedCount)
+    first_day = df.groupby('card_number')['day'].transform('min')
+    df['repeat_card'] = df['card_number'].where(df['closed'] & (df['day'] != first_day))
+
+    keys = ['operator', 'day']
+    grouped = df.groupby(keys, sort=False)
+
+    summary = grouped.agg(
+        first_fix=('call_date', 'min'),
+        last_fix=('call_date', 'max'),
+        work_min=('work_min', 'sum'),
+        break_min=('break_min', 'sum'),
+        long_gaps=('long_gap', 'sum'),
+        total_fixes=('card_number', 'size'),
+        unique_cards=('card_number', 'nunique'),
+        open_cards=('open_card', 'nunique'),
+        repeat_cards=('repeat_card', 'nunique'),
+    )
+
+    closed = df[df['closed']]
+    summary['closed_cards'] = closed.groupby(keys)['card_number'].nunique()
+    summary['closed_cards'] = summary['closed_cards'].fillna(0).astype(int)
+
+    by_status = (
+        closed.groupby(keys + ['status'])['card_number'].nunique()
+        .unstack('status')
+        .reindex(columns=CLOSED_STATUS_LIST)
+    )
+    summary = summary.join(by_status).fillna({status: 0 for status in CLOSED_STATUS_LIST})
+
+    # Смена определяется по часу первой фиксации
+    first_hour = summary['first_fix'].dt.hour
+    late_shift = ((first_hour >= 10) & (first_hour < 14)) | ((first_hour >= 18) & (first_hour < 21))
+    summary['shift'] = np.where(late_shift, "11:00-20:00", "09:00-18:00")
+
+    summary = summary.reset_index().sort_values(['day', 'operator'], ascending=[False, True])
+
+    result = pd.DataFrame({
+        "Дата": summary['day'].dt.strftime('%d.%m.%Y'),
+        "ФИО": summary['operator'],
+        "Смена": summary['shift'],
+        "Первая фиксация": summary['first_fix'].dt.strftime('%H:%M:%S'),
+        "Последняя фиксация": summary['last_fix'].dt.strftime('%H:%M:%S'),
+        "Рабочее время": summary['work_min'].round().map(format_minutes),
+        "Перерывы": summary['break_min'].round().map(format_minutes),
+        "Пауз > лимита": summary['long_gaps'].astype(int),
+        "Всего фиксаций": summary['total_fixes'].astype(int),
+        "Уникальных карт": summary['unique_cards'].astype(int),
+        "Закрытых": summary['closed_cards'].astype(int),
+        "Открытых": summary['open_cards'].astype(int),
+        "Повторных": summary['repeat_cards'].astype(int),
+    })
+    for status in CLOSED_STATUS_LIST:
+        result[f"Карт: {status}"] = summary[status].astype(int)
+
+    return result.reset_index(drop=True)
+
+
+# =============================================================================
+# ЗАПИСЬ В GOOGLE SHEETS
+# =============================================================================
+
+def get_sheets_service():
+    """Авторизация в Google Sheets API (с правом записи)"""
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+    from googleapiclient.discovery import build
+
+    creds = None
+    if TOKEN_FILE.exists():
+        creds = Credentials.from_authorized_user_file(str(TOKEN_FILE), SCOPES)
+
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            flow = InstalledAppFlow.from_client_secrets_file(str(CREDENTIALS_FILE), SCOPES)
+            creds = flow.run_local_server(port=0)
+        TOKEN_FILE.write_text(creds.to_json(), encoding='utf-8')
+
+    return build('sheets', 'v4', credentials=creds)
+
+
+def write_summary_to_sheets(summary, service=None,
+                            spreadsheet_id=STATISTICS_SPREADSHEET_ID,
+                            sheet_name=SUMMARY_SHEET_NAME):
+    """Записать сводку на лист: очистка и запись одним пакетом"""
+    service = service or get_sheets_service()
+
+    spreadsheet = service.spreadsheets().get(
+        spreadsheetId=spreadsheet_id, fields='sheets.properties.title'
+    ).execute()
+    titles = {s['properties']['title'] for s in spreadsheet.get('sheets', [])}
+
+    if sheet_name not in titles:
+        service.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={'requests': [{'addSheet': {'properties': {'title': sheet_name}}}]}
+        ).execute()
+
+    rows = [list(summary.columns)] + summary.astype(object).where(summary.notna(), '').values.tolist()
+
+    service.spreadsheets().values().clear(
+        spreadsheetId=spreadsheet_id, range=f"'{sheet_name}'"
+    ).execute()
+    service.spreadsheets().values().batchUpdate(
+        spreadsheetId=spreadsheet_id,
+        body={
+            'valueInputOption': 'USER_ENTERED',
+            'data': [{'range': f"'{sheet_name}'!A1", 'values': rows}]
+        }
+    ).execute()
+
+    return len(rows) - 1
+
+
+def main():
+    offset = -1 if '--previous' in sys.argv else 0
+    start_date, end_date = get_period_bounds(offset=offset)
+
+    print("=" * 70)
+    print("АНАЛИТИКА СМЕН ОПЕРАТОРОВ")
+    print("=" * 70)
+    print(f"Период: {start_date:%d.%m.%Y} - {end_date:%d.%m.%Y}")
+
+    conn = get_db_connection()
+    try:
+        df = load_fixations(conn, start_date, end_date)
+    finally:
+        conn.close()
+
+    print(f"Фиксаций: {len(df):,}")
+
+    summary = compute_daily_summary(df)
+    print(f"Строк сводки (оператор × день): {len(summary):,}")
+
+    if '--no-sheets' in sys.argv:
+        return summary
+
+    written = write_summary_to_sheets(summary)
+    print(f"✅ Записано на лист '{SUMMARY_SHEET_NAME}': {written} строк")
+    return summary
+
+
+if __name__ == '__main__':
+    main()
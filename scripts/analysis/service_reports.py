@@ -4,23 +4,41 @@
 Расширенный отчет с данными по службам из истории звонков 112
 """
 
+import os
+import sys
 import sqlite3
+import tempfile
 from pathlib import Path
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import asyncio
 from telegram import Bot
 
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:
+    pa = None
+
 BASE_DIR = Path(__file__).parent.parent.parent
 DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
 OUTPUT_DIR = BASE_DIR / 'output' / 'reports'
 CONFIG_FILE = BASE_DIR / 'telegram_config.txt'
 
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from database.report_cache import get_or_build
+
 def get_db_connection():
     return sqlite3.connect(DB_PATH)
 
-def generate_service_reports():
-    """Генерация отчетов по службам"""
+def generate_service_reports(parallel=False, max_workers=None):
+    """Генерация отчетов по службам
+
+    parallel=True - режим fan-out: файлы пишутся в пуле процессов
+    (см. generate_reports_parallel).
+    """
     conn = get_db_connection()
     
     print('\n' + '=' * 80)
@@ -31,6 +49,7 @@ def generate_service_reports():
     query = '''
         SELECT 
             call_date,
+            service_code,
             service_name,
             incident_number,
             card_number,
@@ -93,11 +112,15 @@ def generate_service_reports():
     df['fiksa_status_norm'] = df['fiksa_status'].apply(normalize_status)
     df['region'] = df['region'].fillna('Не указано')
     df['service_name'] = df['service_name'].fillna('Неизвестно')
+    df['service_code'] = df['service_code'].fillna('Неизвестно')
     
     # Дата для имени файла
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     date_str = datetime.now().strftime('%Y-%m-%d')
     
+    if parallel:
+        return generate_reports_parallel(df, date_str, timestamp, max_workers)
+    
     report_files = []
     
     # 1. ОБЩИЙ ОТЧЕТ ПО ВСЕМ СЛУЖБАМ
@@ -143,6 +166,139 @@ def generate_service_reports():
     
     return report_files
 
+def generate_service_reports_cached():
+    """Все отчеты по службам через кэш (для кнопок бота)"""
+    return get_or_build(
+        'service_reports', {},
+        lambda: generate_service_reports(parallel=True)
+    )
+
+# =============================================================================
+# FAN-OUT: ПАРАЛЛЕЛЬНАЯ ГЕНЕРАЦИЯ ФАЙЛОВ
+# =============================================================================
+
+# Кадр данных, загруженный в процесс-воркер один раз (см. _init_fanout_worker)
+_WORKER_DF = None
+
+def _dump_frame(df, folder):
+    """Сохранить кадр во временный файл для воркеров.
+
+    При наличии pyarrow - Arrow IPC (воркеры читают его через memory map),
+    иначе - pickle. Pickle используется и тогда, когда Arrow не может
+    записать кадр (колонки object со смешанными типами из Excel).
+    В обоих случаях кадр сериализуется один раз, а не для каждой задачи.
+    """
+    if pa is not None:
+        path = Path(folder) / 'frame.arrow'
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            with pa.OSFile(str(path), 'wb') as sink:
+                with pa_ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            return path
+        except pa.ArrowException as e:
+            print(f"⚠️  Arrow не записал кадр ({type(e).__name__}: {e}), используется pickle")
+            path.unlink(missing_ok=True)
+    
+    path = Path(folder) / 'frame.pkl'
+    df.reset_index(drop=True).to_pickle(path)
+    return path
+
+def _init_fanout_worker(frame_path):
+    """Инициализатор воркера: загрузить общий кадр один раз на процесс"""
+    global _WORKER_DF
+    frame_path = Path(frame_path)
+    if frame_path.suffix == '.arrow':
+        with pa.memory_map(str(frame_path), 'r') as source:
+            _WORKER_DF = pa_ipc.open_file(source).read_all().to_pandas()
+    else:
+        _WORKER_DF = pd.read_pickle(frame_path)
+
+def _run_fanout_task(kind, key, positions, date_str, timestamp):
+    """Выполнить одну задачу fan-out в воркере.
+
+    В задачу передаются только позиции строк партиции, сами данные
+    берутся из _WORKER_DF.
+    """
+    part = _WORKER_DF if positions is None else _WORKER_DF.iloc[positions]
+    
+    if kind == 'general':
+        return create_general_report(part, date_str, timestamp)
+    if kind == 'service':
+        return create_service_report(part, key, date_str, timestamp)
+    service, region = key
+    return create_region_service_report(part, region, service, date_str, timestamp)
+
+def partition_by_service_region(df):
+    """Разбить кадр на партиции (служба, регион) за один проход.
+
+    Возвращает словарь {(служба, регион): массив позиций строк}.
+    """
+    return {
+        key: positions
+        for key, positions in df.groupby(['service_code', 'region'], sort=True).indices.items()
+    }
+
+def build_fanout_tasks(df):
+    """Список задач (вид, ключ, позиции) в том же порядке, что и в последовательном режиме"""
+    partitions = partition_by_service_region(df)
+    
+    tasks = [('general', None, None)]
+    
+    by_service = {}
+    for (service, region), positions in partitions.items():
+        by_service.setdefault(service, []).append((region, positions))
+    
+    services = [s for s in sorted(by_service) if s != 'Неизвестно']
+    
+    for service in services:
+        positions = np.sort(np.concatenate([part for _, part in by_service[service]]))
+        tasks.append(('service', service, positions))
+    
+    for service in services:
+        for region, positions in by_service[service]:
+            if region == 'Не указано' or len(positions) == 0:
+                continue
+            tasks.append(('region', (service, region), positions))
+    
+    return tasks
+
+def generate_reports_parallel(df, date_str, timestamp, max_workers=None):
+    """Fan-out: все файлы отчетов пишутся параллельно в пуле процессов.
+
+    Кадр партиционируется один раз, сохраняется во временный файл
+    (Arrow IPC / pickle) и загружается каждым воркером один раз.
+    Одновременно в памяти не больше max_workers файлов Excel.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    tasks = build_fanout_tasks(df.reset_index(drop=True))
+    
+    print(f'\n[FAN-OUT] Задач: {len(tasks)}, процессов: {max_workers}')
+    
+    results = [None] * len(tasks)
+    
+    with tempfile.TemporaryDirectory(prefix='service_reports_') as tmp_dir:
+        frame_path = _dump_frame(df, tmp_dir)
+        
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_fanout_worker,
+            initargs=(str(frame_path),)
+        ) as executor:
+            futures = {
+                executor.submit(_run_fanout_task, kind, key, positions, date_str, timestamp): i
+                for i, (kind, key, positions) in enumerate(tasks)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    kind, key, _ = tasks[i]
+                    print(f'   [ОШИБКА] {kind} {key}: {e}')
+    
+    return [f for f in results if f]
+
 def create_general_report(df, date_str, timestamp):
     """Создать общий отчет по всем службам"""
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
@@ -344,7 +500,8 @@ def send_to_telegram(file_path):
         return False
 
 if __name__ == '__main__':
-    report_files = generate_service_reports()
+    # По умолчанию файлы пишутся параллельно на всех ядрах, --serial - по одному
+    report_files = generate_service_reports(parallel='--serial' not in sys.argv)
     
     if report_files:
         print(f'\n[OK] СОЗДАНО {len(report_files)} ФАЙЛОВ')
@@ -32,6 +32,9 @@ COLLECTOR_SCRIPT = BASE_DIR / "scripts" / "data_collection" / "sheets_to_db_coll
 ANALYTICS_SCRIPT = BASE_DIR / "scripts" / "automation" / "auto_analytics.py"
 APPLICATIONS_SCRIPT = BASE_DIR / "scripts" / "automation" / "process_applications.py"
 
+sys.path.insert(0, str(BASE_DIR / "scripts"))
+from automation.folder_watcher import FolderWatcher
+
 def run_data_collection():
     """Запуск сбора данных"""
     logger.info("=" * 80)
@@ -113,10 +116,6 @@ def daily_job():
     # 2. Генерация отчетов
     run_analytics()
 
-def hourly_job():
-    """Ежечасная задача: обработка новых заявок"""
-    process_applications()
-
 def main():
     """Главная функция фонового сервиса"""
     logger.info("\n" + "=" * 80)
@@ -126,14 +125,16 @@ def main():
     logger.info("")
     logger.info("📋 РАСПИСАНИЕ:")
     logger.info("  • Сбор данных и отчеты: Ежедневно в 09:00")
-    logger.info("  • Обработка заявок: Каждый час")
+    logger.info("  • Обработка заявок: сразу после загрузки файла (слежение за папками)")
     logger.info("")
     logger.info("❌ Для остановки нажмите Ctrl+C")
     logger.info("=" * 80 + "\n")
     
     # Настройка расписания
     schedule.every().day.at("09:00").do(daily_job)  # Ежедневно в 9:00
-    schedule.every().hour.do(hourly_job)  # Каждый час
+    
+    # Новые файлы заявок и 112 обрабатываются по событию, а не раз в час
+    watcher = FolderWatcher().start()
     
     # Запустить сразу при старте
     logger.info("🚀 Запуск первоначального сбора данных...")
@@ -143,12 +144,14 @@ def main():
     try:
         while True:
             schedule.run_pending()
-            time.sleep(60)  # Проверка каждую минуту
+            # Спим до следующей задачи по расписанию, а не просыпаемся каждую минуту
+            time.sleep(max(schedule.idle_seconds() or 0, 1))
             
     except KeyboardInterrupt:
         logger.info("\n" + "=" * 80)
         logger.info("⛔ ФОНОВЫЙ СЕРВИС ОСТАНОВЛЕН ПОЛЬЗОВАТЕЛЕМ")
         logger.info("=" * 80)
+        watcher.stop()
         sys.exit(0)
 
 if __name__ == "__main__":
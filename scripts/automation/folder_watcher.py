@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+СЛЕЖЕНИЕ ЗА ПАПКАМИ ЗАГРУЗКИ (incoming_data/applications, 123/)
+=============================================================================
+Вместо проверки папок по расписанию (раз в час) файл обрабатывается
+через несколько секунд после того, как его положили в папку:
+
+- Linux: inotify (события ядра, без опроса - в простое процесс спит)
+- другие ОС / inotify недоступен: опрос папок раз в WATCH_POLL_SECONDS
+
+Пока файл дописывается, события по нему приходят снова и снова -
+задание ставится в очередь только после WATCH_DEBOUNCE_SECONDS тишины.
+Задания выполняет один рабочий поток, одно задание на папку в очереди.
+
+Задания:
+    incoming_data/applications -> process_applications.scan_and_process()
+    123/                       -> каталог файлов 112 (разбор и снимок),
+                                  История*.xlsx -> db_import
+
+Все задания идут через каталог файлов (file_catalog) - уже обработанные
+файлы не перечитываются.
+
+Использование:
+    python scripts/automation/folder_watcher.py     # отдельный сервис
+
+    from automation.folder_watcher import FolderWatcher
+    watcher = FolderWatcher()
+    watcher.start()                                 # в фоновом потоке
+=============================================================================
+"""
+
+import os
+import sys
+import time
+import queue
+import select
+import struct
+import ctypes
+import ctypes.util
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent.parent
+DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
+APPLICATIONS_DIR = BASE_DIR / 'incoming_data' / 'applications'
+UPLOADS_DIR = BASE_DIR / '123'
+
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+
+DEBOUNCE_SECONDS = float(os.environ.get('WATCH_DEBOUNCE_SECONDS', '3'))
+POLL_SECONDS = float(os.environ.get('WATCH_POLL_SECONDS', '10'))
+
+WATCH_SUFFIXES = {'.xlsx', '.xls', '.csv'}
+
+# inotify: файл закрыт после записи или перемещен в папку
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT_HEADER = struct.Struct('iIII')
+
+logger = logging.getLogger(__name__)
+
+
+def is_data_file(path):
+    """Файлы данных, без временных файлов Excel и недокачанных загрузок"""
+    name = path.name
+    return (path.suffix.lower() in WATCH_SUFFIXES
+            and not name.startswith(('~$', '.')))
+
+
+# =============================================================================
+# ИСТОЧНИКИ СОБЫТИЙ
+# =============================================================================
+
+class InotifyEvents:
+    """События файловой системы через inotify (ctypes, без зависимостей)"""
+
+    def __init__(self, folders):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+        self.folders = {}
+        for folder in folders:
+            wd = libc.inotify_add_watch(self.fd, str(folder).encode(), WATCH_MASK)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f'inotify_add_watch {folder}')
+            self.folders[wd] = Path(folder)
+        self._wake_read, self._wake_write = os.pipe()
+
+    def wait(self, timeout):
+        """Пути файлов с событиями (timeout=None - ждать без ограничения)"""
+        ready, _, _ = select.select([self.fd, self._wake_read], [], [], timeout)
+        if self._wake_read in ready:
+            os.read(self._wake_read, 1024)
+        if self.fd not in ready:
+            return []
+
+        data = os.read(self.fd, 64 * 1024)
+        paths = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace')
+            offset += length
+            if name and wd in self.folders:
+                paths.append(self.folders[wd] / name)
+        return paths
+
+    def wake(self):
+        os.write(self._wake_write, b'x')
+
+    def close(self):
+        for fd in (self.fd, self._wake_read, self._wake_write):
+            os.close(fd)
+
+
+class PollingEvents:
+    """Запасной вариант: сравнение (размер, mtime) файлов раз в POLL_SECONDS"""
+
+    def __init__(self, folders, interval=POLL_SECONDS):
+        self.folders = [Path(folder) for folder in folders]
+        self.interval = interval
+        self._stop = threading.Event()
+        self.state = self._snapshot()
+
+    def _snapshot(self):
+        state = {}
+        for folder in self.folders:
+            for path in folder.iterdir():
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                state[path] = (stat.st_size, stat.st_mtime)
+        return state
+
+    def wait(self, timeout):
+        delay = self.interval if timeout is None else min(timeout, self.interval)
+        if self._stop.wait(delay):
+            return []
+        state = self._snapshot()
+        changed = [path for path, stamp in state.items() if self.state.get(path) != stamp]
+        self.state = state
+        return changed
+
+    def wake(self):
+        self._stop.set()
+
+    def close(self):
+        pass
+
+
+# =============================================================================
+# ЗАДАНИЯ
+# =============================================================================
+
+def ingest_applications():
+    from automation.process_applications import scan_and_process
+    scan_and_process()
+
+
+def ingest_uploads():
+    """Папка 123: файлы 112 - в каталог и снимки, История*.xlsx - в БД"""
+    from database.file_catalog import scan, pending
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        counts = scan(conn, '112')
+        logger.info(f"📑 Файлы 112: новых {counts['new']}, измененных {counts['changed']}")
+        has_history = bool(pending(conn, 'history'))
+    finally:
+        conn.close()
+
+    if has_history:
+        from database.db_import import import_applications_from_excel, LOG_DIR
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+        import_applications_from_excel()
+
+
+# Папка -> задание
+JOBS = {
+    APPLICATIONS_DIR: ingest_applications,
+    UPLOADS_DIR: ingest_uploads,
+}
+
+
+# =============================================================================
+# НАБЛЮДАТЕЛЬ
+# =============================================================================
+
+class FolderWatcher:
+    """Ставит задание папки в очередь, когда в ней появился (и дописан) файл"""
+
+    def __init__(self, jobs=None, debounce=DEBOUNCE_SECONDS, use_inotify=True):
+        self.jobs = dict(jobs or JOBS)
+        self.debounce = debounce
+        for folder in self.jobs:
+            Path(folder).mkdir(parents=True, exist_ok=True)
+
+        self.events = None
+        if use_inotify and sys.platform.startswith('linux'):
+            try:
+                self.events = InotifyEvents(self.jobs)
+                self.mode = 'inotify'
+            except (OSError, AttributeError) as e:
+                logger.warning(f"⚠️  inotify недоступен ({e}) - опрос папок каждые {POLL_SECONDS:.0f} сек")
+        if self.events is None:
+            self.events = PollingEvents(self.jobs)
+            self.mode = 'polling'
+
+        self.queue = queue.Queue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def enqueue(self, folder):
+        """Поставить задание папки в очередь (если оно еще не ждет в очереди)"""
+        with self._lock:
+            if folder in self._queued:
+                return
+            self._queued.add(folder)
+        self.queue.put(folder)
+
+    def _watch(self):
+        changed = {}  # путь -> время последнего события
+        while not self._stop.is_set():
+            timeout = None
+            if changed:
+                timeout = max(0.0, min(changed.values()) + self.debounce - time.monotonic())
+            for path in self.events.wait(timeout):
+                if is_data_file(path):
+                    changed[path] = time.monotonic()
+
+            now = time.monotonic()
+            for path, seen in list(changed.items()):
+                if now - seen >= self.debounce:
+                    del changed[path]
+                    if path.exists():
+                        logger.info(f"📥 Новый файл: {path.parent.name}/{path.name}")
+                        self.enqueue(path.parent)
+
+    def _work(self):
+        while True:
+            folder = self.queue.get()
+            if folder is None:
+                break
+            with self._lock:
+                self._queued.discard(folder)
+            started = time.monotonic()
+            try:
+                self.jobs[folder]()
+                logger.info(f"✅ {folder.name}: обработано за {time.monotonic() - started:.1f} сек")
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработки {folder.name}: {e}", exc_info=True)
+
+    def start(self, initial_scan=True):
+        """Запустить наблюдение и рабочий поток (фоновые потоки)"""
+        for target in (self._watch, self._work):
+            thread = threading.Thread(target=target, name=f'folder_watcher{target.__name__}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if initial_scan:
+            # Файлы, которые появились, пока сервис не работал
+            for folder in self.jobs:
+                self.enqueue(folder)
+        logger.info(f"👀 Слежение за папками ({self.mode}): "
+                    + ', '.join(Path(folder).name for folder in self.jobs))
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.events.wake()
+        self.queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self.events.close()
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    watcher = FolderWatcher().start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        logger.info("⛔ Слежение за папками остановлено")
+    finally:
+        watcher.stop()
+
+
+if __name__ == '__main__':
+    main()
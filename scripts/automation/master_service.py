@@ -18,11 +18,15 @@ import schedule
 import time
 import subprocess
 import sys
+import logging
 from datetime import datetime
 from pathlib import Path
 
 BASE_DIR = Path(__file__).parent.parent.parent
 
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from automation.folder_watcher import FolderWatcher
+
 # =============================================================================
 # ЗАДАЧИ
 # =============================================================================
@@ -81,22 +85,17 @@ def daily_tasks():
             'description': '2. Импорт истории звонков 112'
         },
         
-        # 3. Обработка заявок
-        {
-            'script': BASE_DIR / 'scripts' / 'automation' / 'process_applications.py',
-            'description': '3. Обработка заявок граждан'
-        },
-        
-        # 4. Генерация отчетов по службам
+        # 3. Генерация отчетов по службам
+        # (заявки граждан обрабатывает наблюдатель за папками сразу при появлении)
         {
             'script': BASE_DIR / 'scripts' / 'analysis' / 'service_reports.py',
-            'description': '4. Генерация отчетов по службам (61 файл)'
+            'description': '3. Генерация отчетов по службам (61 файл)'
         },
         
-        # 5. Генерация отчетов по регионам
+        # 4. Генерация отчетов по регионам
         {
             'script': BASE_DIR / 'scripts' / 'analysis' / 'auto_report.py',
-            'description': '5. Генерация отчетов по регионам (15 файлов)'
+            'description': '4. Генерация отчетов по регионам (15 файлов)'
         },
     ]
     
@@ -196,6 +195,7 @@ def setup_schedule():
     # Статистика каждые 30 минут
     schedule.every(30).minutes.do(show_current_stats)
     print('[OK] Показ статистики: каждые 30 минут')
+    print('[OK] Заявки и файлы 112: сразу после появления в папке')
     
     print('\n' + '=' * 80)
     print('СЕРВИС ЗАПУЩЕН И РАБОТАЕТ В ФОНОВОМ РЕЖИМЕ')
@@ -215,17 +215,23 @@ def main():
     """Главная функция"""
     setup_schedule()
     
+    # Сообщения наблюдателя за папками - в консоль вместе с print
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s', datefmt='%H:%M:%S')
+    watcher = FolderWatcher().start()
+    
     # Бесконечный цикл
     try:
         while True:
             schedule.run_pending()
-            time.sleep(60)  # Проверка каждую минуту
+            # Спим до следующей задачи по расписанию
+            time.sleep(max(schedule.idle_seconds() or 0, 1))
             
     except KeyboardInterrupt:
         print('\n\n' + '=' * 80)
         print('СЕРВИС ОСТАНОВЛЕН ПОЛЬЗОВАТЕЛЕМ')
         print('=' * 80)
         print(f'Время остановки: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
+        watcher.stop()
 
 if __name__ == '__main__':
     main()
@@ -8,6 +8,7 @@ from pathlib import Path
 import pandas as pd
 from datetime import datetime
 import shutil
+import sys
 
 # Пути
 BASE_DIR = Path(__file__).parent.parent.parent
@@ -15,6 +16,12 @@ INCOMING_DIR = BASE_DIR / "incoming_data" / "applications"
 PROCESSED_DIR = BASE_DIR / "incoming_data" / "processed"
 DB_PATH = BASE_DIR / "data" / "fiksa_database.db"
 
+sys.path.insert(0, str(BASE_DIR / "scripts"))
+from database.report_cache import bump_data_version
+from database.file_catalog import (
+    scan, catalog_files, mark, move_entry, STATUS_NEW, STATUS_DUPLICATE, STATUS_PROCESSED, STATUS_ERROR
+)
+
 # Создание папок
 INCOMING_DIR.mkdir(parents=True, exist_ok=True)
 PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
@@ -173,6 +180,8 @@ def process_excel_file(file_path):
             
             imported_count += 1
         
+        if imported_count:
+            bump_data_version(conn, 'applications')
         conn.commit()
         conn.close()
         
@@ -213,11 +222,20 @@ def scan_and_process():
     # Создание таблицы
     create_applications_table()
     
-    # Поиск файлов
-    excel_files = list(INCOMING_DIR.glob("*.xlsx")) + list(INCOMING_DIR.glob("*.xls"))
-    csv_files = list(INCOMING_DIR.glob("*.csv"))
+    # Поиск файлов через каталог: файлы, которые уже не удалось обработать,
+    # повторно не читаются, пока не изменятся
+    conn = get_db_connection()
+    try:
+        scan(conn, 'applications')
+        catalog = catalog_files(conn, 'applications', [STATUS_NEW, STATUS_DUPLICATE])
+    finally:
+        conn.close()
     
-    all_files = excel_files + csv_files
+    duplicates = catalog[catalog['status'] == STATUS_DUPLICATE]
+    for entry in duplicates.itertuples():
+        print(f"  ♻️  {Path(entry.path).name}: уже импортирован ({entry.error}) - пропущен")
+    
+    all_files = [BASE_DIR / p for p in catalog.loc[catalog['status'] == STATUS_NEW, 'path']]
     
     if not all_files:
         print("  ℹ️  Нет новых файлов для обработки")
@@ -237,14 +255,23 @@ def scan_and_process():
         
         total_imported += imported
         
-        # Перемещение обработанного файла
-        if imported > 0:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            new_name = f"{file_path.stem}_{timestamp}{file_path.suffix}"
-            destination = PROCESSED_DIR / new_name
-            
-            shutil.move(str(file_path), str(destination))
-            print(f"  📦 Файл перемещен в: processed/{new_name}")
+        conn = get_db_connection()
+        try:
+            if imported > 0:
+                mark(conn, 'applications', [file_path], STATUS_PROCESSED, rows=imported)
+                
+                # Перемещение обработанного файла
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                new_name = f"{file_path.stem}_{timestamp}{file_path.suffix}"
+                destination = PROCESSED_DIR / new_name
+                
+                shutil.move(str(file_path), str(destination))
+                move_entry(conn, 'applications', file_path, destination)
+                print(f"  📦 Файл перемещен в: processed/{new_name}")
+            else:
+                mark(conn, 'applications', [file_path], STATUS_ERROR, error='0 записей импортировано')
+        finally:
+            conn.close()
     
     print("\n" + "=" * 80)
     print(f"✅ ОБРАБОТКА ЗАВЕРШЕНА. Всего импортировано: {total_imported}")
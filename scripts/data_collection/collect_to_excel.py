@@ -22,6 +22,8 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 import socket
 
+from sheets_metadata import SheetsMetadataCache, build_drive_service, token_has_drive_access, DRIVE_METADATA_SCOPE
+
 try:
     import pandas as pd
     HAS_PANDAS = True
@@ -40,7 +42,7 @@ except ImportError:
 # НАСТРОЙКИ
 # =============================================================================
 
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly', DRIVE_METADATA_SCOPE]
 
 # ID таблицы со списком операторов
 MASTER_SPREADSHEET_ID = "1s0nbLCo6q_KoM0jCP2v2vMxLbIHuScjigNTMSvUn0GA"
@@ -68,7 +70,7 @@ def authenticate():
     """Аутентификация в Google API"""
     creds = None
     
-    if os.path.exists(TOKEN_FILE):
+    if os.path.exists(TOKEN_FILE) and token_has_drive_access(TOKEN_FILE):
         creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
     
     if not creds or not creds.valid:
@@ -103,16 +105,12 @@ def authenticate():
 # ЧТЕНИЕ ДАННЫХ
 # =============================================================================
 
-def get_operator_list(service) -> List[Dict[str, str]]:
+def get_operator_list(metadata) -> List[Dict[str, str]]:
     """Получить список ВСЕХ операторов (включая уволенных, с пустыми ФИО)"""
     print(f"\n📋 Чтение списка операторов...")
     
-    result = service.spreadsheets().values().get(
-        spreadsheetId=MASTER_SPREADSHEET_ID,
-        range=f"{SETTINGS_SHEET_NAME}!A2:C100"  # Читаем до 100 строки
-    ).execute()
-    
-    values = result.get('values', [])
+    # Лист Настройки читается заново, только если мастер-таблица менялась
+    values = metadata.values(MASTER_SPREADSHEET_ID, f"{SETTINGS_SHEET_NAME}!A2:C100")  # Читаем до 100 строки
     operators = []
     
     for idx, row in enumerate(values, start=2):
@@ -137,16 +135,15 @@ def get_operator_list(service) -> List[Dict[str, str]]:
     print(f"✅ Найдено операторов: {len(operators)} (все строки с ID таблицы)")
     return operators
 
-def get_sheet_list(service, spreadsheet_id) -> List[str]:
+def get_sheet_list(metadata, spreadsheet_id) -> List[str]:
     """Получить список архивных листов (только с ФИО или датами)"""
     try:
-        metadata = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-        sheets = metadata.get('sheets', [])
+        sheets = metadata.sheets(spreadsheet_id)
         
         # Фильтруем: оставляем только листы с ФИО или датами
         sheet_names = []
         for sheet in sheets:
-            title = sheet['properties']['title']
+            title = sheet['title']
             title_lower = title.lower()
             
             # Пропускаем служебные листы
@@ -186,7 +183,7 @@ def read_sheet_data(service, spreadsheet_id, sheet_name) -> List[List]:
 # ОБРАБОТКА
 # =============================================================================
 
-def collect_all_data(service, operators):
+def collect_all_data(service, metadata, operators):
     """Собрать все данные от всех операторов"""
     all_rows = []
     
@@ -202,7 +199,7 @@ def collect_all_data(service, operators):
             print(f"▶ {operator_name}")
         
         # Получаем список листов
-        sheets = get_sheet_list(service, spreadsheet_id)
+        sheets = get_sheet_list(metadata, spreadsheet_id)
         
         if not HAS_TQDM:
             print(f"  Найдено архивных листов: {len(sheets)}")
@@ -300,18 +297,23 @@ def main():
         print(f"❌ Ошибка: {e}")
         return
     
+    # Кэш метаданных (листы, список операторов) с проверкой по Drive modifiedTime
+    metadata = SheetsMetadataCache(service, build_drive_service(creds))
+    
     # Получаем список операторов
-    operators = get_operator_list(service)
+    operators = get_operator_list(metadata)
     if not operators:
         print("⚠️ Нет операторов для обработки")
         return
     
     # Собираем данные
     start_time = time.time()
-    all_data = collect_all_data(service, operators)
+    all_data = collect_all_data(service, metadata, operators)
     elapsed = time.time() - start_time
+    metadata.save()
     
     print(f"\n⏱️ Время сбора: {elapsed/60:.1f} минут")
+    print(f"📑 {metadata.report()}")
     
     if not all_data:
         print("⚠️ Нет данных для сохранения")
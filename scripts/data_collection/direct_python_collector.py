@@ -47,6 +47,8 @@ import requests
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 
+from sheets_metadata import SheetsMetadataCache, build_drive_service, token_has_drive_access, DRIVE_METADATA_SCOPE
+
 # Опциональные библиотеки
 try:
     from tqdm import tqdm
@@ -67,7 +69,7 @@ except ImportError:
 # =============================================================================
 
 # Области доступа
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets', DRIVE_METADATA_SCOPE]
 
 # ID таблицы с настройками (список операторов)
 MASTER_SPREADSHEET_ID = "1s0nbLCo6q_KoM0jCP2v2vMxLbIHuScjigNTMSvUn0GA"
@@ -110,7 +112,7 @@ def authenticate():
         'https': 'http://10.145.62.76:3128',
     }
     
-    if os.path.exists(TOKEN_FILE):
+    if os.path.exists(TOKEN_FILE) and token_has_drive_access(TOKEN_FILE):
         creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
     
     if not creds or not creds.valid:
@@ -148,9 +150,10 @@ def authenticate():
 # ЧТЕНИЕ СПИСКА ОПЕРАТОРОВ
 # =============================================================================
 
-def get_operator_list(service) -> List[Dict[str, str]]:
+def get_operator_list(metadata) -> List[Dict[str, str]]:
     """
     Читает список операторов из листа Настройки
+    (заново - только если мастер-таблица менялась)
     
     Returns:
         List[Dict]: [{"name": "ФИО", "spreadsheet_id": "ID", "status": "активен"}]
@@ -158,12 +161,7 @@ def get_operator_list(service) -> List[Dict[str, str]]:
     print(f"\n📋 Чтение списка операторов из {MASTER_SPREADSHEET_ID}...")
     
     try:
-        result = service.spreadsheets().values().get(
-            spreadsheetId=MASTER_SPREADSHEET_ID,
-            range=f"{SETTINGS_SHEET_NAME}!A2:C1000"
-        ).execute()
-        
-        values = result.get('values', [])
+        values = metadata.values(MASTER_SPREADSHEET_ID, f"{SETTINGS_SHEET_NAME}!A2:C1000")
         operators = []
         
         for row in values:
@@ -192,23 +190,23 @@ def get_operator_list(service) -> List[Dict[str, str]]:
 # ЧТЕНИЕ ДАННЫХ ИЗ ТАБЛИЦЫ ОПЕРАТОРА
 # =============================================================================
 
-def get_sheet_list(service, spreadsheet_id: str) -> List[str]:
-    """Получает список листов в таблице"""
+def get_sheet_list(metadata, spreadsheet_id: str) -> List[str]:
+    """Получает список листов в таблице (из кэша метаданных, если таблица не менялась)"""
     max_retries = 3
     
     for attempt in range(max_retries):
         try:
-            spreadsheet = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-            sheets = spreadsheet.get('sheets', [])
+            sheets = metadata.sheets(spreadsheet_id)
             
             sheet_names = []
             for sheet in sheets:
-                title = sheet.get('properties', {}).get('title', '')
+                title = sheet['title']
                 if title not in SKIP_SHEETS:
                     sheet_names.append(title)
             
-            # Задержка после успешного запроса
-            time.sleep(1.5)
+            # Задержка после успешного запроса (ответ из кэша - без задержки)
+            if spreadsheet_id in metadata.fetched:
+                time.sleep(1.5)
             
             return sheet_names
             
@@ -269,12 +267,13 @@ def read_sheet_data(service, spreadsheet_id: str, sheet_name: str,
     print(f"    ❌ Не удалось прочитать {sheet_name} после {max_retries} попыток")
     return []
 
-def process_operator(service, operator: Dict[str, str], progress_callback=None) -> Dict[str, Any]:
+def process_operator(service, metadata, operator: Dict[str, str], progress_callback=None) -> Dict[str, Any]:
     """
     Обрабатывает данные одного оператора
     
     Args:
         service: Google Sheets API service
+        metadata: Кэш метаданных таблиц (SheetsMetadataCache)
         operator: Данные оператора
         progress_callback: Функция для обновления прогресса
         
@@ -287,7 +286,7 @@ def process_operator(service, operator: Dict[str, str], progress_callback=None)
     print(f"\n▶ Обработка: {operator_name}")
     
     # Получаем список листов
-    sheets = get_sheet_list(service, spreadsheet_id)
+    sheets = get_sheet_list(metadata, spreadsheet_id)
     if not sheets:
         print(f"  ⚠️  Нет листов для обработки")
         return None
@@ -555,12 +554,13 @@ def main():
     # Создаем сервис (прокси уже настроен через переменные окружения)
     try:
         service = build('sheets', 'v4', credentials=creds, cache_discovery=False)
+        metadata = SheetsMetadataCache(service, build_drive_service(creds))
         print("✅ Google Sheets API подключен")
         
         # Тестируем подключение
         print("🔍 Проверка доступа к таблице...")
-        test = service.spreadsheets().get(spreadsheetId=MASTER_SPREADSHEET_ID).execute()
-        print(f"✅ Доступ получен: {test.get('properties', {}).get('title', 'Без имени')}")
+        title = metadata.title(MASTER_SPREADSHEET_ID)
+        print(f"✅ Доступ получен: {title or 'Без имени'}")
         
     except Exception as e:
         print(f"❌ Ошибка подключения: {e}")
@@ -591,7 +591,7 @@ def main():
         processed_operators = set()
     
     # Получаем список операторов
-    operators = get_operator_list(service)
+    operators = get_operator_list(metadata)
     if not operators:
         print("\n⚠️  Нет операторов для обработки")
         return
@@ -612,7 +612,7 @@ def main():
         
         for operator in iterator:
             try:
-                stats = process_operator(service, operator)
+                stats = process_operator(service, metadata, operator)
                 if stats:
                     all_stats.append(stats)
                     processed_operators.add(operator['name'])
@@ -624,6 +624,7 @@ def main():
             except KeyboardInterrupt:
                 print("\n\n⚠️  Прерывание пользователем")
                 save_cache(all_stats, list(processed_operators))
+                metadata.save()
                 print("💾 Прогресс сохранен. Запустите снова для продолжения.")
                 return
             
@@ -635,6 +636,9 @@ def main():
         
         print(f"\n⏱️  Время обработки: {int(duration)} сек ({int(duration/60)} мин)")
     
+    metadata.save()
+    print(f"📑 {metadata.report()}")
+    
     # Сохраняем результаты
     if all_stats:
         save_results_to_sheets(service, all_stats)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+ПОТОКОВОЕ ЧТЕНИЕ JSON LINES ИЗ GOOGLE DOCS (с отметкой прочитанного)
+=============================================================================
+docs_collector.gs дописывает записи в конец документа - по одному
+абзацу JSON на запись: заголовок пишется один раз, новые строки листов
+добавляются после уже собранных, итогов в документе нет. Раньше каждый
+импорт разбирал весь документ и собирал все записи в один список.
+
+Теперь для каждого документа хранится отметка (data/docs_watermarks.json):
+    {document_id: {
+        'revisionId': ревизия, прочитанная до конца,
+        'index':      endIndex последнего обработанного абзаца,
+        'start':      startIndex этого абзаца,
+        'digest':     SHA-1 его текста (проверка, что документ не очищен),
+        'records':    записей прочитано всего,
+        'updated':    время
+    }}
+
+- ревизия не изменилась - тело документа не запрашивается вовсе
+- документ запрашивается только с текстом абзацев (без стилей)
+- абзацы до отметки пропускаются без разбора текста
+- записи отдаются пачками, отметка сохраняется после каждой пачки,
+  записанной в БД - прерванный импорт продолжается с места остановки
+- документ пересобран (Пересобрать документ с нуля, Очистить, сбор
+  статистики) - абзаца отметки нет на месте, чтение с начала; повторные
+  записи обновляются в БД через ON CONFLICT
+- JSON разбирается через orjson, если он установлен
+
+Использование:
+    from docs_stream import read_new_records, save_watermark
+    for records, mark in read_new_records(docs_service, DOCS_ID, batch_size=5000):
+        ...                                   # записать пачку в БД
+        save_watermark(DOCS_ID, mark)
+=============================================================================
+"""
+
+import os
+import json
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BASE_DIR = Path(__file__).parent.parent.parent
+WATERMARK_FILE = BASE_DIR / 'data' / 'docs_watermarks.json'
+
+# Только текст абзацев и их позиции - без стилей и настроек документа
+DOC_FIELDS = 'revisionId,body.content(startIndex,endIndex,paragraph.elements.textRun.content)'
+
+BATCH_SIZE = 5000
+
+
+def loads(text):
+    """json.loads или более быстрый orjson.loads"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+# =============================================================================
+# ОТМЕТКИ
+# =============================================================================
+
+def load_watermarks():
+    if WATERMARK_FILE.exists():
+        try:
+            with open(WATERMARK_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+
+def save_watermark(document_id, mark):
+    """Сохранить отметку документа (атомарно)"""
+    watermarks = load_watermarks()
+    watermarks[document_id] = dict(mark, updated=datetime.now().isoformat(timespec='seconds'))
+    WATERMARK_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = WATERMARK_FILE.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(watermarks, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, WATERMARK_FILE)
+
+
+# =============================================================================
+# РАЗБОР ДОКУМЕНТА
+# =============================================================================
+
+def fetch_document(docs_service, document_id, fields=DOC_FIELDS):
+    return docs_service.documents().get(documentId=document_id, fields=fields).execute()
+
+
+def paragraph_text(element):
+    """Текст абзаца (все textRun подряд)"""
+    elements = element.get('paragraph', {}).get('elements', [])
+    return ''.join(elem.get('textRun', {}).get('content', '') for elem in elements).strip()
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def element_position(element, text=None):
+    """Отметка абзаца: позиции в документе и хэш текста"""
+    if text is None:
+        text = paragraph_text(element)
+    return {
+        'index': element.get('endIndex', 0),
+        'start': element.get('startIndex', 0),
+        'digest': _digest(text),
+    }
+
+
+def resume_position(content, mark):
+    """
+    Номер элемента content, с которого начинаются новые абзацы.
+    Абзац отметки должен быть на месте и с тем же текстом - иначе
+    документ пересобран, и чтение идет с начала (0).
+    """
+    if not mark or not mark.get('index'):
+        return 0
+    for position, element in enumerate(content):
+        start = element.get('startIndex', 0)
+        if start < mark['start']:
+            continue
+        if start == mark['start'] and _digest(paragraph_text(element)) == mark['digest']:
+            return position + 1
+        break
+    print("⚠️  Документ пересобран или отредактирован выше отметки - чтение с начала")
+    return 0
+
+
+def iter_records(content, start=0, errors=None):
+    """
+    Записи JSON из абзацев content[start:].
+    Возвращает пары (запись, позиция абзаца). Ошибки разбора
+    считаются в errors['count'] (первые 5 печатаются).
+    """
+    for element in content[start:]:
+        if 'paragraph' not in element:
+            continue
+        text = paragraph_text(element)
+
+        # Пропускаем пустые строки и не-JSON (заголовки, итоги)
+        if not text or not text.startswith('{'):
+            continue
+
+        try:
+            record = loads(text)
+        except ValueError as e:
+            if errors is not None:
+                errors['count'] = errors.get('count', 0) + 1
+                if errors['count'] <= 5:
+                    print(f'Ошибка парсинга JSON: {str(e)[:100]}')
+            continue
+
+        yield record, element_position(element, text)
+
+
+def read_new_records(docs_service, document_id, batch_size=BATCH_SIZE, full=False):
+    """
+    Новые записи документа пачками: (список записей, отметка).
+    Отметку пачки нужно сохранить (save_watermark) после записи пачки в БД.
+    Когда все пачки обработаны, отметка сохраняется вместе с revisionId -
+    следующий запуск без изменений в документе не скачивает его тело.
+    full=True - прочитать документ с начала.
+    """
+    mark = None if full else load_watermarks().get(document_id)
+
+    if mark and mark.get('revisionId'):
+        revision = fetch_document(docs_service, document_id, fields='revisionId').get('revisionId')
+        if revision == mark['revisionId']:
+            print(f"✓ Документ не изменился с последнего импорта ({mark.get('records', 0):,} записей)")
+            return
+
+    document = fetch_document(docs_service, document_id)
+    content = document.get('body', {}).get('content', [])
+    start = resume_position(content, mark)
+    total = mark.get('records', 0) if start else 0
+    if start:
+        print(f"✓ Пропущено уже импортированных абзацев: {start:,} (записей: {total:,})")
+
+    errors = {'count': 0}
+    batch = []
+    last = mark if start else {}
+    for record, position in iter_records(content, start, errors):
+        batch.append(record)
+        last = position
+        if len(batch) >= batch_size:
+            total += len(batch)
+            yield batch, dict(last, records=total)
+            batch = []
+
+    if batch:
+        total += len(batch)
+        yield batch, dict(last, records=total)
+
+    if errors['count']:
+        print(f"⚠️  Ошибок парсинга: {errors['count']}")
+
+    # Все пачки обработаны - документ прочитан до этой ревизии. Отметка -
+    # на последнем абзаце, чтобы итоги и ошибочные строки после последней
+    # записи не разбирались снова
+    if content[start:]:
+        last = element_position(content[-1])
+    final = {key: last[key] for key in ('index', 'start', 'digest') if key in last}
+    save_watermark(document_id, dict(final, records=total, revisionId=document.get('revisionId')))
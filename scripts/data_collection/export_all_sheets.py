@@ -9,18 +9,25 @@
 
 import os
 import io
+import json
 import time
+import threading
 from datetime import datetime
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
 from googleapiclient.errors import HttpError
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+from google.auth.transport.requests import Request, AuthorizedSession
 import pandas as pd
 from tqdm import tqdm
 
+from sheets_metadata import SheetsMetadataCache, build_drive_service
+
 # Настройка прокси
 os.environ['HTTP_PROXY'] = 'http://10.145.62.76:3128'
 os.environ['HTTPS_PROXY'] = 'http://10.145.62.76:3128'
@@ -41,6 +48,20 @@ TOKEN_FILE = 'token.json'
 CREDENTIALS_FILE = 'credentials.json'
 EXPORT_FOLDER = 'exported_sheets'
 
+# Экспорт CSV
+EXPORT_BASE_URL = 'https://docs.google.com'
+PROXIES = {
+    'http': 'http://10.145.62.76:3128',
+    'https': 'http://10.145.62.76:3128',
+}
+MAX_CONCURRENT_EXPORTS = 4       # Одновременных скачиваний
+CHUNK_SIZE = 64 * 1024           # Размер блока записи на диск
+MANIFEST_FILE = '_export_manifest.json'
+MAX_RETRIES = 4                  # Повторов при 429/5xx и обрыве связи
+RETRY_BASE_DELAY = 1.0           # Пауза перед первым повтором, дальше x2
+RETRY_MAX_DELAY = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
 # =============================================================================
 # АУТЕНТИФИКАЦИЯ
 # =============================================================================
@@ -75,17 +96,12 @@ def authenticate():
 # ПОЛУЧЕНИЕ СПИСКА ОПЕРАТОРОВ
 # =============================================================================
 
-def get_operator_list(sheets_service):
-    """Читает список операторов"""
+def get_operator_list(metadata):
+    """Читает список операторов (заново - только если мастер-таблица менялась)"""
     print(f"\n📋 Чтение списка операторов...")
     
     try:
-        result = sheets_service.spreadsheets().values().get(
-            spreadsheetId=MASTER_SPREADSHEET_ID,
-            range=f"{SETTINGS_SHEET_NAME}!A2:C100"  # Увеличил до 100 строк
-        ).execute()
-        
-        values = result.get('values', [])
+        values = metadata.values(MASTER_SPREADSHEET_ID, f"{SETTINGS_SHEET_NAME}!A2:C100")  # Увеличил до 100 строк
         operators = []
         
         for row in values:
@@ -112,26 +128,20 @@ def get_operator_list(sheets_service):
 # ПОЛУЧЕНИЕ СПИСКА ЛИСТОВ
 # =============================================================================
 
-def get_sheet_gids(sheets_service, spreadsheet_id):
-    """Получает список листов с их GID"""
+def get_sheet_gids(metadata, spreadsheet_id):
+    """Получает список листов с их GID (из кэша метаданных, если таблица не менялась)"""
     try:
-        spreadsheet = sheets_service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-        sheets = spreadsheet.get('sheets', [])
-        
         sheet_list = []
-        for sheet in sheets:
-            props = sheet.get('properties', {})
-            title = props.get('title', '')
-            gid = props.get('sheetId', 0)
-            
+        for sheet in metadata.sheets(spreadsheet_id):
             # Пропускаем служебные листы
-            if title not in SKIP_SHEETS:
+            if sheet['title'] not in SKIP_SHEETS:
                 sheet_list.append({
-                    'title': title,
-                    'gid': gid
+                    'title': sheet['title'],
+                    'gid': sheet['gid']
                 })
         
-        time.sleep(1)  # Задержка
+        if spreadsheet_id in metadata.fetched:
+            time.sleep(1)  # Задержка только после запроса к API
         return sheet_list
         
     except HttpError as error:
@@ -142,42 +152,199 @@ def get_sheet_gids(sheets_service, spreadsheet_id):
 # ЭКСПОРТ ЛИСТА В CSV
 # =============================================================================
 
-def export_sheet_to_csv(spreadsheet_id, gid, output_path):
+class CsvExportEngine:
     """
-    Экспортирует лист в CSV через прямую ссылку
-    Это НЕ требует Drive API и работает быстрее
+    Скачивание листов в CSV через одну авторизованную сессию.
+
+    - одна сессия requests с пулом keep-alive соединений через прокси;
+      при AuthorizedSession токен обновляется автоматически
+    - не больше max_workers одновременных скачиваний
+    - ответ пишется на диск блоками, а не целиком из памяти
+    - неизмененные листы пропускаются по 304 или совпавшему ETag
+      (ETag прошлых скачиваний хранится в манифесте); без ETag лист
+      скачивается заново - одинаковый размер не значит те же данные
+    - на 429/5xx и обрыв связи - до MAX_RETRIES повторов с
+      экспоненциальной паузой (Retry-After, если сервер его прислал)
+
+    Для проверки без Google можно передать обычную requests.Session
+    и base_url локального HTTP-сервера.
     """
-    try:
-        import requests
+    
+    def __init__(self, creds=None, session=None, base_url=EXPORT_BASE_URL,
+                 proxies=PROXIES, max_workers=MAX_CONCURRENT_EXPORTS,
+                 manifest_path=None):
+        if session is None:
+            session = AuthorizedSession(creds) if creds is not None else requests.Session()
+            if proxies:
+                session.proxies.update(proxies)
         
-        # Получаем токен доступа
-        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
         
-        # URL для экспорта конкретного листа в CSV
-        export_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/export?format=csv&gid={gid}"
+        self.session = session
+        self.base_url = base_url.rstrip('/')
+        self.max_workers = max_workers
+        self.manifest_path = manifest_path or os.path.join(EXPORT_FOLDER, MANIFEST_FILE)
+        self._manifest_lock = threading.Lock()
+        self.manifest = self._load_manifest()
+    
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return {}
+    
+    def save_manifest(self):
+        os.makedirs(os.path.dirname(self.manifest_path) or '.', exist_ok=True)
+        with self._manifest_lock:
+            tmp_path = self.manifest_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.manifest_path)
+    
+    def export_url(self, spreadsheet_id, gid):
+        return f"{self.base_url}/spreadsheets/d/{spreadsheet_id}/export?format=csv&gid={gid}"
+    
+    def _is_unchanged(self, entry, response, output_path):
+        """Лист не менялся с прошлого скачивания"""
+        if response.status_code == 304:
+            return True
+        if not entry or not os.path.exists(output_path):
+            return False
+        
+        etag = response.headers.get('ETag')
+        return bool(etag) and etag == entry.get('etag')
+    
+    @staticmethod
+    def _retry_delay(attempt, response=None):
+        """Пауза перед повтором: Retry-After или RETRY_BASE_DELAY * 2^attempt"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), RETRY_MAX_DELAY)
+        return min(RETRY_BASE_DELAY * 2 ** attempt, RETRY_MAX_DELAY)
+    
+    def export(self, spreadsheet_id, gid, output_path):
+        """
+        Скачать один лист в CSV.
+        Возвращает 'downloaded', 'skipped' или 'error'.
+        """
+        key = f"{spreadsheet_id}:{gid}"
+        for attempt in range(MAX_RETRIES + 1):
+            result = self._export_once(key, spreadsheet_id, gid, output_path)
+            if not isinstance(result, tuple):
+                return result
+            
+            reason, response = result
+            if attempt == MAX_RETRIES:
+                print(f"    ⚠️  Ошибка экспорта {key}: {reason} (повторов: {MAX_RETRIES})")
+                return 'error'
+            time.sleep(self._retry_delay(attempt, response))
+        return 'error'
+    
+    def _export_once(self, key, spreadsheet_id, gid, output_path):
+        """
+        Одна попытка скачивания. Возвращает результат export() или
+        (причина, ответ) - если попытку стоит повторить.
+        """
+        entry = self.manifest.get(key)
         
-        headers = {
-            'Authorization': f'Bearer {creds.token}'
-        }
+        headers = {}
+        if entry and entry.get('etag') and os.path.exists(output_path):
+            headers['If-None-Match'] = entry['etag']
         
-        proxies = {
-            'http': 'http://10.145.62.76:3128',
-            'https': 'http://10.145.62.76:3128',
-        }
+        # Пишем во временный файл, чтобы не оставить обрезанный CSV
+        part_path = output_path + '.part'
+        try:
+            with self.session.get(self.export_url(spreadsheet_id, gid), headers=headers,
+                                  stream=True, timeout=60) as response:
+                if self._is_unchanged(entry, response, output_path):
+                    return 'skipped'
+                
+                if response.status_code in RETRY_STATUSES:
+                    return f"HTTP {response.status_code}", response
+                
+                if response.status_code != 200:
+                    print(f"    ⚠️  Ошибка экспорта {key}: HTTP {response.status_code}")
+                    return 'error'
+                
+                size = 0
+                with open(part_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+                            size += len(chunk)
+                os.replace(part_path, output_path)
+                
+                with self._manifest_lock:
+                    self.manifest[key] = {
+                        'etag': response.headers.get('ETag'),
+                        'size': size,
+                        'path': output_path,
+                        'updated': datetime.now().isoformat(timespec='seconds'),
+                    }
+                return 'downloaded'
         
-        response = requests.get(export_url, headers=headers, proxies=proxies, timeout=60)
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            self._remove_part(part_path)
+            return str(e), None
+        except Exception as e:
+            self._remove_part(part_path)
+            print(f"    ⚠️  Ошибка {key}: {e}")
+            return 'error'
+    
+    @staticmethod
+    def _remove_part(part_path):
+        try:
+            os.remove(part_path)
+        except FileNotFoundError:
+            pass
+    
+    def export_many(self, jobs, progress=True):
+        """
+        Скачать несколько листов параллельно.
+        jobs - список словарей с ключами spreadsheet_id, gid, path.
+        Возвращает список (job, результат).
+        """
+        results = []
         
-        if response.status_code == 200:
-            with open(output_path, 'wb') as f:
-                f.write(response.content)
-            return True
-        else:
-            print(f"    ⚠️  Ошибка экспорта: HTTP {response.status_code}")
-            return False
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.export, job['spreadsheet_id'], job['gid'], job['path']): job
+                for job in jobs
+            }
+            iterator = as_completed(futures)
+            if progress:
+                iterator = tqdm(iterator, total=len(futures), desc="Экспорт листов")
             
-    except Exception as e:
-        print(f"    ⚠️  Ошибка: {e}")
-        return False
+            for future in iterator:
+                results.append((futures[future], future.result()))
+        
+        self.save_manifest()
+        return results
+
+_default_engine = None
+
+def export_sheet_to_csv(spreadsheet_id, gid, output_path):
+    """
+    Экспортирует лист в CSV через прямую ссылку
+    Это НЕ требует Drive API и работает быстрее
+    """
+    global _default_engine
+    
+    if _default_engine is None:
+        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+        _default_engine = CsvExportEngine(creds)
+    
+    result = _default_engine.export(spreadsheet_id, gid, output_path)
+    if result == 'downloaded':
+        _default_engine.save_manifest()
+    return result != 'error'
 
 # =============================================================================
 # ОСНОВНОЙ ПРОЦЕСС
@@ -197,16 +364,18 @@ def main():
         return
     
     sheets_service = build('sheets', 'v4', credentials=creds)
+    metadata = SheetsMetadataCache(sheets_service, build_drive_service(creds))
     
     # Получаем список операторов
-    operators = get_operator_list(sheets_service)
+    operators = get_operator_list(metadata)
     if not operators:
         print("❌ Не найдено операторов")
         return
     
     print(f"\n🚀 Начало экспорта: {len(operators)} операторов")
     
-    exported_files = []
+    engine = CsvExportEngine(creds)
+    jobs = []
     
     # Обрабатываем каждого оператора
     for idx, operator in enumerate(operators, 1):
@@ -220,30 +389,35 @@ def main():
         os.makedirs(operator_folder, exist_ok=True)
         
         # Получаем список листов
-        sheets = get_sheet_gids(sheets_service, spreadsheet_id)
+        sheets = get_sheet_gids(metadata, spreadsheet_id)
         print(f"  Листов для экспорта: {len(sheets)}")
         
-        # Экспортируем каждый лист
         for sheet in sheets:
-            title = sheet['title']
-            gid = sheet['gid']
-            
             # Безопасное имя файла
-            safe_title = title.replace('/', '_').replace('\\', '_').replace(':', '_')
-            csv_path = os.path.join(operator_folder, f"{safe_title}.csv")
-            
-            print(f"    📄 {title}...", end=" ", flush=True)
-            
-            if export_sheet_to_csv(spreadsheet_id, gid, csv_path):
-                print(f"✅ ({os.path.getsize(csv_path) / 1024:.1f} KB)")
-                exported_files.append({
-                    'operator': operator_name,
-                    'sheet': title,
-                    'path': csv_path
-                })
-                time.sleep(1.5)  # Задержка между запросами
-            else:
-                print("❌")
+            safe_title = sheet['title'].replace('/', '_').replace('\\', '_').replace(':', '_')
+            jobs.append({
+                'operator': operator_name,
+                'sheet': sheet['title'],
+                'spreadsheet_id': spreadsheet_id,
+                'gid': sheet['gid'],
+                'path': os.path.join(operator_folder, f"{safe_title}.csv")
+            })
+    
+    metadata.save()
+    print(f"\n📑 {metadata.report()}")
+    
+    # Экспортируем все листы параллельно
+    results = engine.export_many(jobs)
+    
+    exported_files = [
+        {'operator': job['operator'], 'sheet': job['sheet'], 'path': job['path']}
+        for job, result in results if result != 'error'
+    ]
+    downloaded = sum(1 for _, result in results if result == 'downloaded')
+    skipped = sum(1 for _, result in results if result == 'skipped')
+    errors = sum(1 for _, result in results if result == 'error')
+    
+    print(f"  Скачано: {downloaded}, без изменений: {skipped}, ошибок: {errors}")
     
     print(f"\n✅ Экспорт завершен!")
     print(f"📁 Экспортировано файлов: {len(exported_files)}")
@@ -30,7 +30,6 @@ python python_processor.py
 =============================================================================
 """
 
-import json
 import os
 from datetime import datetime
 from collections import defaultdict
@@ -42,6 +41,8 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from docs_stream import fetch_document, iter_records
+
 # =============================================================================
 # НАСТРОЙКИ
 # =============================================================================
@@ -125,35 +126,13 @@ def read_docs_data(docs_service, document_id: str) -> List[Dict[str, Any]]:
     print(f"\n📄 Чтение документа {document_id}...")
     
     try:
-        # Читаем документ
-        document = docs_service.documents().get(documentId=document_id).execute()
+        # Читаем документ (только текст абзацев, без стилей)
+        document = fetch_document(docs_service, document_id)
         
         content = document.get('body').get('content')
         
-        records = []
-        line_count = 0
-        
-        # Проходим по всем параграфам
-        for element in content:
-            if 'paragraph' in element:
-                paragraph = element.get('paragraph')
-                elements = paragraph.get('elements')
-                
-                for elem in elements:
-                    if 'textRun' in elem:
-                        text = elem.get('textRun').get('content').strip()
-                        
-                        # Пропускаем пустые строки и заголовки
-                        if not text or not text.startswith('{'):
-                            continue
-                        
-                        # Парсим JSON
-                        try:
-                            record = json.loads(text)
-                            records.append(record)
-                            line_count += 1
-                        except json.JSONDecodeError:
-                            continue
+        # Абзацы JSON -> записи (пустые строки и заголовки пропускаются)
+        records = [record for record, _ in iter_records(content)]
         
         print(f"✅ Прочитано записей: {len(records)}")
         return records
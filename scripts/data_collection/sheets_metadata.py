@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+КЭШ МЕТАДАННЫХ GOOGLE SHEETS (листы, gid, rowCount, список операторов)
+=============================================================================
+Сборщики перед чтением данных вызывают spreadsheets().get для списка
+листов и заново читают лист Настройки - десятки запросов за запуск, даже
+если ни одна таблица не менялась.
+
+Кэш хранится в data/sheets_metadata_cache.json:
+    {spreadsheet_id: {
+        'modifiedTime': '2026-01-08T10:15:00.000Z',
+        'title': 'Название документа',
+        'sheets': [{'title': ..., 'gid': ..., 'rowCount': ...}],
+        'values': {'Настройки!A2:C100': [[...], ...]}
+    }}
+
+Проверка актуальности - один запрос Drive files.list (id + modifiedTime
+всех таблиц). Метаданные запрашиваются заново только для таблиц, у
+которых modifiedTime изменился.
+
+Для проверки токену нужен доступ к Drive (DRIVE_METADATA_SCOPE или
+drive.readonly). Все сборщики добавляют DRIVE_METADATA_SCOPE в SCOPES;
+сохраненный токен без него (выданный до появления кэша) не загружается
+(token_has_drive_access) - один раз открывается повторная авторизация.
+Без доступа к Drive кэш работает в пределах одного запуска, а
+метаданные каждый запуск читаются заново, как раньше.
+
+Использование:
+    from data_collection.sheets_metadata import SheetsMetadataCache, build_drive_service
+    metadata = SheetsMetadataCache(service, build_drive_service(creds))
+    for sheet in metadata.sheets(spreadsheet_id):
+        print(sheet['title'], sheet['gid'], sheet['rowCount'])
+    rows = metadata.values(MASTER_SPREADSHEET_ID, 'Настройки!A2:C100')
+    metadata.save()
+
+    # Запросы из нескольких потоков: у каждого потока свой объект API
+    # (httplib2 не потокобезопасен)
+    metadata = SheetsMetadataCache(service, drive, service_factory=make_service)
+=============================================================================
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+BASE_DIR = Path(__file__).parent.parent.parent
+CACHE_FILE = BASE_DIR / 'data' / 'sheets_metadata_cache.json'
+
+DRIVE_METADATA_SCOPE = 'https://www.googleapis.com/auth/drive.metadata.readonly'
+DRIVE_SCOPES = {DRIVE_METADATA_SCOPE, 'https://www.googleapis.com/auth/drive.readonly'}
+
+SPREADSHEET_QUERY = "mimeType = 'application/vnd.google-apps.spreadsheet' and trashed = false"
+
+# Только нужные поля - ответ spreadsheets().get без данных ячеек и форматов
+METADATA_FIELDS = 'properties.title,sheets.properties(sheetId,title,gridProperties.rowCount)'
+
+
+def token_has_drive_access(token_file):
+    """
+    Сохраненный токен выдан с доступом к Drive metadata. Если нет -
+    токен не используется, и сборщик один раз запрашивает авторизацию
+    заново (уже с DRIVE_METADATA_SCOPE).
+    """
+    try:
+        with open(token_file, 'r', encoding='utf-8') as f:
+            scopes = json.load(f).get('scopes') or []
+    except (OSError, ValueError):
+        return False
+    if isinstance(scopes, str):
+        scopes = scopes.split()
+    if DRIVE_SCOPES.isdisjoint(scopes):
+        print("🔐 Токен без доступа к Drive metadata (нужен для кэша метаданных) - "
+              "потребуется повторная авторизация (один раз)")
+        return False
+    return True
+
+
+def build_drive_service(creds):
+    """Drive API для проверки modifiedTime (None - без проверки)"""
+    if creds is None:
+        return None
+    return build('drive', 'v3', credentials=creds, cache_discovery=False)
+
+
+class SheetsMetadataCache:
+    """Метаданные таблиц на диске, проверка по Drive modifiedTime"""
+
+    def __init__(self, service, drive_service=None, path=CACHE_FILE, service_factory=None):
+        self.service = service
+        self.service_factory = service_factory
+        self._local = threading.local()
+        self.drive = drive_service
+        self.path = Path(path)
+        self.entries = self._load()
+        self.modified = None   # {spreadsheet_id: modifiedTime} - один раз за запуск
+        self.checked = set()   # таблицы, уже проверенные/прочитанные в этом запуске
+        self.fetched = set()   # таблицы, для которых был запрос к Sheets API
+        self.requests = 0
+        self.hits = 0
+        self.dirty = False
+        self._lock = threading.RLock()
+
+    def _load(self):
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return {}
+
+    def _api(self):
+        """Sheets API текущего потока (service_factory) или общий service"""
+        if self.service_factory is None:
+            return self.service
+        if not hasattr(self._local, 'service'):
+            self._local.service = self.service_factory()
+        return self._local.service
+
+    def save(self):
+        """Записать кэш на диск (атомарно, только если были изменения)"""
+        with self._lock:
+            if not self.dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+    # -------------------------------------------------------------------------
+    # Проверка актуальности
+    # -------------------------------------------------------------------------
+
+    def modified_times(self):
+        """modifiedTime всех таблиц - один files.list (с постраничной выдачей)"""
+        with self._lock:
+            if self.modified is not None:
+                return self.modified
+            self.modified = {}
+            if self.drive is None:
+                return self.modified
+            try:
+                page_token = None
+                while True:
+                    response = self.drive.files().list(
+                        q=SPREADSHEET_QUERY,
+                        fields='nextPageToken, files(id, modifiedTime)',
+                        pageSize=1000,
+                        pageToken=page_token,
+                        supportsAllDrives=True,
+                        includeItemsFromAllDrives=True
+                    ).execute()
+                    for item in response.get('files', []):
+                        self.modified[item['id']] = item['modifiedTime']
+                    page_token = response.get('nextPageToken')
+                    if not page_token:
+                        break
+            except HttpError as error:
+                print(f"⚠️  Drive modifiedTime недоступен (HTTP {error.resp.status}) - метаданные будут прочитаны заново")
+                print(f"   Для кэша между запусками нужен доступ: {DRIVE_METADATA_SCOPE}")
+                self.modified = {}
+            return self.modified
+
+    def _validated(self, spreadsheet_id):
+        """
+        Запись кэша таблицы. Проверяется один раз за запуск: если
+        modifiedTime изменился (или неизвестен), старые метаданные и
+        значения сбрасываются.
+        """
+        with self._lock:
+            if spreadsheet_id not in self.checked:
+                entry = self.entries.get(spreadsheet_id)
+                remote = self.modified_times().get(spreadsheet_id)
+                if entry is None or remote is None or entry.get('modifiedTime') != remote:
+                    self.entries[spreadsheet_id] = {'modifiedTime': remote}
+                    self.dirty = True
+                self.checked.add(spreadsheet_id)
+            return self.entries[spreadsheet_id]
+
+    # -------------------------------------------------------------------------
+    # Метаданные
+    # -------------------------------------------------------------------------
+
+    def _entry(self, spreadsheet_id):
+        """Запись таблицы с листами (запрос к API, если их нет в кэше)"""
+        with self._lock:
+            entry = self._validated(spreadsheet_id)
+            if 'sheets' in entry:
+                self.hits += 1
+                return entry
+
+        spreadsheet = self._api().spreadsheets().get(
+            spreadsheetId=spreadsheet_id,
+            fields=METADATA_FIELDS
+        ).execute()
+
+        with self._lock:
+            self.requests += 1
+            self.fetched.add(spreadsheet_id)
+            entry['title'] = spreadsheet.get('properties', {}).get('title', '')
+            entry['sheets'] = [
+                {
+                    'title': sheet['properties'].get('title', ''),
+                    'gid': sheet['properties'].get('sheetId', 0),
+                    'rowCount': sheet['properties'].get('gridProperties', {}).get('rowCount', 0),
+                }
+                for sheet in spreadsheet.get('sheets', [])
+            ]
+            self.dirty = True
+            return entry
+
+    def sheets(self, spreadsheet_id):
+        """Листы таблицы: [{'title', 'gid', 'rowCount'}] в порядке документа"""
+        return self._entry(spreadsheet_id)['sheets']
+
+    def title(self, spreadsheet_id):
+        """Название документа"""
+        return self._entry(spreadsheet_id)['title']
+
+    def values(self, spreadsheet_id, range_name):
+        """
+        Значения небольшого служебного диапазона (например, списка
+        операторов на листе Настройки) - читаются, только если таблица
+        изменилась.
+        """
+        with self._lock:
+            entry = self._validated(spreadsheet_id)
+            if range_name in entry.get('values', {}):
+                self.hits += 1
+                return entry['values'][range_name]
+
+        result = self._api().spreadsheets().values().get(
+            spreadsheetId=spreadsheet_id,
+            range=range_name
+        ).execute()
+
+        with self._lock:
+            self.requests += 1
+            values = result.get('values', [])
+            entry.setdefault('values', {})[range_name] = values
+            self.dirty = True
+            return values
+
+    def report(self):
+        """Строка статистики для вывода в конце сбора"""
+        return f"Метаданные: из кэша {self.hits}, запросов к API {self.requests}"
@@ -41,14 +41,20 @@ DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
 TOKEN_FILE = BASE_DIR / 'config' / 'token.json'
 CREDENTIALS_FILE = BASE_DIR / 'config' / 'credentials.json'
 
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from database.report_cache import bump_data_version
+from database.dimensions import DimensionResolver
+from database.exclusions import EXCLUDE_PATTERNS, ExclusionRules, load_red_rows, ensure_excluded_column
+from data_collection.sheets_metadata import (
+    SheetsMetadataCache, build_drive_service, token_has_drive_access, DRIVE_METADATA_SCOPE
+)
+from data_processing.completeness_audit import record_source
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly', DRIVE_METADATA_SCOPE]
 MASTER_SPREADSHEET_ID = "1s0nbLCo6q_KoM0jCP2v2vMxLbIHuScjigNTMSvUn0GA"
 
-# Паттерны для исключения служебных листов
-EXCLUDE_PATTERNS = [
-    'Настройки', 'Статистика', 'Сводка', 'Тренды', 
-    'Текущий месяц', 'Предыдущий месяц', 'СВОДКА', 'Итого'
-]
+# Общие правила исключения + служебные листы таблицы операторов
+EXCLUSION_RULES = ExclusionRules(EXCLUDE_PATTERNS + ['Настройки', 'Статистика'], load_red_rows())
 
 # =============================================================================
 # GOOGLE API
@@ -58,7 +64,7 @@ def authenticate():
     """Аутентификация в Google API"""
     creds = None
     
-    if TOKEN_FILE.exists():
+    if TOKEN_FILE.exists() and token_has_drive_access(TOKEN_FILE):
         creds = Credentials.from_authorized_user_file(str(TOKEN_FILE), SCOPES)
     
     if not creds or not creds.valid:
@@ -81,24 +87,19 @@ def authenticate():
     
     return creds
 
-def get_operator_sheets(service):
-    """Получить список всех листов операторов"""
-    spreadsheet = service.spreadsheets().get(spreadsheetId=MASTER_SPREADSHEET_ID).execute()
-    sheets = spreadsheet.get('sheets', [])
-    
+def get_operator_sheets(metadata):
+    """Получить список всех листов операторов (из кэша метаданных, если таблица не менялась)"""
     operator_sheets = []
-    for sheet in sheets:
-        title = sheet['properties']['title']
+    for sheet in metadata.sheets(MASTER_SPREADSHEET_ID):
+        title = sheet['title']
         
         # Пропускаем служебные листы
-        is_excluded = any(pattern.lower() in title.lower() for pattern in EXCLUDE_PATTERNS)
-        
-        if not is_excluded:
+        if not EXCLUSION_RULES.is_excluded(title):
             operator_sheets.append(title)
     
     return operator_sheets
 
-def collect_fiksa_data(operator_name, service):
+def collect_fiksa_data(operator_name, service, first_row=2, last_row=10000):
     """Собрать данные с листа оператора
     
     Структура Google Sheets (колонки):
@@ -109,102 +110,69 @@ def collect_fiksa_data(operator_name, service):
     E - Статус связи (ОБЯЗАТЕЛЬНО должен быть заполнен!)
     F - Дата звонка
     G - Примечания
+    
+    first_row/last_row - диапазон строк (по умолчанию весь лист)
     """
     try:
         # Читаем данные со всего листа
-        range_name = f"'{operator_name}'!A2:Z10000"
+        range_name = f"'{operator_name}'!A{first_row}:Z{last_row}"
         result = service.spreadsheets().values().get(
             spreadsheetId=MASTER_SPREADSHEET_ID,
             range=range_name
         ).execute()
         
-        values = result.get('values', [])
-        if not values:
-            return []
-        
-        records = []
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        for row in values:
-            # Проверяем что строка не пустая
-            if not row or len(row) < 5:
-                continue
-            
-            # ⭐ КРИТИЧНО: Проверяем колонку E (индекс 4) - статус должен быть заполнен
-            # Это основное условие фильтрации - без статуса запись неполная
-            status = row[4] if len(row) > 4 else ''
-            if not status or status.strip() == '':
-                continue  # Пропускаем строки без статуса
-            
-            # Проверяем номер карты (колонка A)
-            card_number = row[0] if len(row) > 0 else ''
-            if not card_number or card_number.strip() == '':
-                continue  # Пропускаем строки без номера карты
-            
-            # Формируем запись
-            record = {
-                'collection_date': today,
-                'operator_name': operator_name,
-                'card_number': row[0].strip() if len(row) > 0 else None,
-                'full_name': row[1].strip() if len(row) > 1 else None,
-                'phone': row[2].strip() if len(row) > 2 else None,
-                'address': row[3].strip() if len(row) > 3 else None,
-                'status': status.strip(),
-                'call_date': row[5].strip() if len(row) > 5 else None,
-                'notes': row[6].strip() if len(row) > 6 else None,
-            }
-            
-            records.append(record)
-        
-        return records
+        return parse_fiksa_rows(operator_name, result.get('values', []), first_row)
         
     except Exception as e:
         print(f'   ⚠️  [{operator_name}] Ошибка: {e}')
         return []
 
+def parse_fiksa_rows(operator_name, values, first_row=2):
+    """Строки листа -> записи (row_number - номер строки в листе)"""
+    records = []
+    today = datetime.now().strftime('%Y-%m-%d')
+    
+    for row_number, row in enumerate(values, first_row):
+        # Проверяем что строка не пустая
+        if not row or len(row) < 5:
+            continue
+        
+        # ⭐ КРИТИЧНО: Проверяем колонку E (индекс 4) - статус должен быть заполнен
+        # Это основное условие фильтрации - без статуса запись неполная
+        status = row[4] if len(row) > 4 else ''
+        if not status or status.strip() == '':
+            continue  # Пропускаем строки без статуса
+        
+        # Проверяем номер карты (колонка A)
+        card_number = row[0] if len(row) > 0 else ''
+        if not card_number or card_number.strip() == '':
+            continue  # Пропускаем строки без номера карты
+        
+        # Формируем запись
+        record = {
+            'collection_date': today,
+            'operator_name': operator_name,
+            'card_number': row[0].strip() if len(row) > 0 else None,
+            'full_name': row[1].strip() if len(row) > 1 else None,
+            'phone': row[2].strip() if len(row) > 2 else None,
+            'address': row[3].strip() if len(row) > 3 else None,
+            'status': status.strip(),
+            'call_date': row[5].strip() if len(row) > 5 else None,
+            'notes': row[6].strip() if len(row) > 6 else None,
+            'row_number': row_number,
+        }
+        
+        records.append(record)
+    
+    return records
+
 # =============================================================================
 # БАЗА ДАННЫХ (НОВАЯ СТРУКТУРА)
 # =============================================================================
 
 def should_exclude_operator(operator_name):
     """Проверка, нужно ли исключить оператора из обработки"""
-    if not operator_name:
-        return True
-    
-    operator_str = str(operator_name).strip().lower()
-    
-    # Пустые значения
-    if operator_str in ['', '-', 'nan', 'none', 'null']:
-        return True
-    
-    # Служебные листы
-    for pattern in EXCLUDE_PATTERNS:
-        if pattern.lower() in operator_str:
-            return True
-    
-    return False
-
-def get_or_create_operator(cursor, operator_name):
-    """Получить или создать оператора в БД"""
-    if should_exclude_operator(operator_name):
-        return None
-    
-    operator_name = str(operator_name).strip()
-    
-    # Проверяем существование
-    cursor.execute('SELECT operator_id FROM operators WHERE operator_name = ?', (operator_name,))
-    result = cursor.fetchone()
-    
-    if result:
-        return result[0]
-    
-    # Создаем нового оператора
-    cursor.execute('''
-        INSERT INTO operators (operator_name, position, is_active)
-        VALUES (?, ?, ?)
-    ''', (operator_name, 'Оператор 112', 1))
-    
-    return cursor.lastrowid
+    return EXCLUSION_RULES.is_excluded(operator_name)
 
 def extract_service_code(status_text):
     """Извлечь код службы из статуса
@@ -228,36 +196,12 @@ def extract_service_code(status_text):
     
     return None
 
-def get_or_create_service(cursor, service_code):
-    """Получить или создать службу в БД"""
-    if not service_code:
-        return None
-    
-    service_code = str(service_code).strip()
-    
-    # Проверяем существование
-    cursor.execute('SELECT service_id FROM services WHERE service_code = ?', (service_code,))
-    result = cursor.fetchone()
-    
-    if result:
-        return result[0]
-    
-    # Определяем название службы
-    service_names = {
-        '102': 'Милиция',
-        '103': 'Скорая помощь',
-        '104': 'Пожарная служба'
-    }
-    
-    service_name = service_names.get(service_code, f'Служба {service_code}')
-    
-    # Создаем новую службу
-    cursor.execute('''
-        INSERT INTO services (service_code, service_name)
-        VALUES (?, ?)
-    ''', (service_code, service_name))
-    
-    return cursor.lastrowid
+# Названия служб для новых записей справочника
+SERVICE_NAMES = {
+    '102': 'Милиция',
+    '103': 'Скорая помощь',
+    '104': 'Пожарная служба'
+}
 
 def save_to_database(records):
     """Сохранить записи в БД (новая структура fixations)"""
@@ -284,15 +228,25 @@ def save_to_database(records):
     updated = 0
     today = datetime.now().strftime('%Y-%m-%d')
     
+    # Справочники в памяти; новые операторы и службы - одним INSERT на справочник
+    ensure_excluded_column(conn)
+    operators = DimensionResolver(conn, 'operators', defaults={
+        'position': 'Оператор 112', 'is_active': 1, 'excluded': lambda name: int(should_exclude_operator(name))
+    })
+    services = DimensionResolver(
+        conn, 'services', defaults={'service_name': lambda code: SERVICE_NAMES.get(code, f'Служба {code}')}
+    )
+    operators.resolve([r['operator_name'] for r in records if not should_exclude_operator(r['operator_name'])])
+    services.resolve([extract_service_code(r['status']) for r in records])
+    
     for record in records:
-        # Получаем или создаем оператора
-        operator_id = get_or_create_operator(cursor, record['operator_name'])
-        if not operator_id:
-            continue  # Пропускаем служебные записи
+        # Служебные записи (сводки, итоги) пропускаем
+        if should_exclude_operator(record['operator_name']):
+            continue
+        operator_id = operators.get(record['operator_name'])
         
         # Извлекаем код службы из статуса
-        service_code = extract_service_code(record['status'])
-        service_id = get_or_create_service(cursor, service_code) if service_code else None
+        service_id = services.get(extract_service_code(record['status']))
         
         # Проверяем существует ли запись (по номеру карты и оператору)
         cursor.execute('''
@@ -347,11 +301,23 @@ def save_to_database(records):
             ))
             inserted += 1
     
+    if inserted or updated:
+        bump_data_version(conn, 'fixations')
     conn.commit()
     conn.close()
     
     return inserted, updated
 
+def save_source_checksums(collected, modified_time):
+    """Агрегаты прочитанных листов (completeness_audit сравнивает их с fixations)"""
+    conn = sqlite3.connect(DB_PATH)
+    for operator, records in collected.items():
+        # Пустой результат - ошибка чтения или пустой лист: прежние агрегаты остаются
+        if records and not should_exclude_operator(operator):
+            record_source(conn, operator, records, MASTER_SPREADSHEET_ID, modified_time)
+    conn.commit()
+    conn.close()
+
 # =============================================================================
 # ОСНОВНОЙ ПРОЦЕСС
 # =============================================================================
@@ -368,22 +334,27 @@ def main():
         print('\n[1/4] 🔗 Подключение к Google Sheets API...')
         creds = authenticate()
         service = build('sheets', 'v4', credentials=creds)
+        metadata = SheetsMetadataCache(service, build_drive_service(creds))
         print('      ✅ Подключено')
         
         # 2. Получение списка операторов
         print('\n[2/4] 📋 Получение списка операторов...')
-        operators = get_operator_sheets(service)
+        operators = get_operator_sheets(metadata)
+        metadata.save()
         print(f'      ✅ Найдено листов: {len(operators)}')
+        print(f'      {metadata.report()}')
         
         # 3. Сбор данных
         print(f'\n[3/4] 📥 Сбор данных от операторов...')
         all_records = []
+        collected = {}
         
         for idx, operator in enumerate(operators, 1):
             print(f'      [{idx:2}/{len(operators)}] {operator[:60]:60}', end='', flush=True)
             
             records = collect_fiksa_data(operator, service)
             all_records.extend(records)
+            collected[operator] = records
             
             print(f' → {len(records):,} записей')
         
@@ -393,6 +364,10 @@ def main():
         print(f'\n[4/4] 💾 Сохранение в базу данных...')
         inserted, updated = save_to_database(all_records)
         
+        # Счетчики и контрольные суммы листов по месяцам - для аудита полноты
+        if inserted or updated:
+            save_source_checksums(collected, metadata.modified_times().get(MASTER_SPREADSHEET_ID))
+        
         # Итоговая статистика
         print('\n' + '='*80)
         print('✅ ОБНОВЛЕНИЕ ЗАВЕРШЕНО УСПЕШНО')
@@ -1,6 +1,9 @@
 """
 Проверка полноты собранных данных
 Сравниваем что в CSV с тем что в исходных таблицах
+
+Для БД (fixations) - completeness_audit.py: сравнение счетчиков и
+контрольных сумм по (лист, месяц) без повторного скачивания листов
 """
 import pandas as pd
 import os
@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+АУДИТ ПОЛНОТЫ: ЛИСТЫ ОПЕРАТОРОВ <-> fixations (счетчики и контрольные суммы)
+=============================================================================
+check_completeness.py для проверки заново скачивает все листы и считает
+строки в Python. Здесь сравниваются агрегаты по (оператор, лист, месяц):
+
+- источник: sheets_to_db_collector при сборе сохраняет для каждого
+  листа и месяца число записей, контрольную сумму и диапазон строк
+  листа (таблица source_checksums) - это уже прочитанные данные, лишних
+  запросов нет
+- БД: один GROUP BY по fixations; месяц и контрольная сумма строки
+  считаются в SQL (audit_month, audit_checksum - те же функции, что и
+  на стороне источника)
+
+Контрольная сумма - сумма 32-битных хэшей строк: не зависит от порядка
+строк, меняется при пропуске, лишней или измененной строке.
+
+Только для несовпавших (лист, месяц) читается диапазон строк этого
+месяца в листе и сравнивается с БД по номерам карт - отчет показывает,
+каких строк листа нет в БД.
+
+Если таблица изменилась после сбора (Drive modifiedTime), расхождения
+могут быть просто новыми строками - лист читается целиком.
+
+Использование:
+    python scripts/data_processing/completeness_audit.py            # аудит + разбор расхождений
+    python scripts/data_processing/completeness_audit.py --no-drill # только агрегаты (без API)
+=============================================================================
+"""
+
+import re
+import sys
+import time
+import sqlite3
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent.parent
+DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
+
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+
+# Поля записи, входящие в контрольную сумму, и те же поля в fixations
+CHECKSUM_FIELDS = ['card_number', 'full_name', 'phone', 'address', 'status', 'call_date', 'notes']
+CHECKSUM_COLUMNS = ['f.card_number', 'f.full_name', 'f.phone_called', 'f.address_declared',
+                    'f.fixation_status', 'f.fixation_date', 'f.notes']
+
+# Сколько номеров карт/строк показывать в разборе расхождения
+SHOW_EXAMPLES = 10
+
+_DAY_FIRST = re.compile(r'^(\d{1,2})[./-](\d{1,2})[./-](\d{4})')
+_YEAR_FIRST = re.compile(r'^(\d{4})[./-](\d{1,2})[./-](\d{1,2})')
+
+
+# =============================================================================
+# ФУНКЦИИ АГРЕГАТОВ (одинаковые для источника и SQL)
+# =============================================================================
+
+def month_of(value):
+    """Месяц 'YYYY-MM' из даты звонка в виде как в листе ('' - не распознан)"""
+    text = str(value or '').strip()
+    match = _DAY_FIRST.match(text)
+    if match:
+        return f'{match.group(3)}-{int(match.group(2)):02d}'
+    match = _YEAR_FIRST.match(text)
+    if match:
+        return f'{match.group(1)}-{int(match.group(2)):02d}'
+    return ''
+
+
+def row_checksum(*values):
+    """32-битный хэш строки (None и '' - одно и то же)"""
+    text = '\x1f'.join('' if value is None else str(value) for value in values)
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=4).digest(), 'big')
+
+
+def record_checksum(record):
+    return row_checksum(*(record.get(field) for field in CHECKSUM_FIELDS))
+
+
+def register_functions(conn):
+    """audit_month() и audit_checksum() для запросов SQLite"""
+    conn.create_function('audit_month', 1, month_of, deterministic=True)
+    conn.create_function('audit_checksum', len(CHECKSUM_COLUMNS), row_checksum, deterministic=True)
+
+
+def expected_records(records):
+    """
+    Записи, которые должны оказаться в БД: сборщик обновляет запись по
+    (номер карты, оператор), поэтому из повторов карты остается последний.
+    """
+    expected = {}
+    for record in records:
+        expected[record['card_number']] = record
+    return expected
+
+
+# =============================================================================
+# ИСТОЧНИК: агрегаты сохраняются при сборе
+# =============================================================================
+
+def ensure_source_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS source_checksums (
+            operator_name TEXT NOT NULL,
+            sheet TEXT NOT NULL,
+            month TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            checksum INTEGER NOT NULL,
+            first_row INTEGER,
+            last_row INTEGER,
+            spreadsheet_id TEXT,
+            modified_time TEXT,
+            collected_at TEXT,
+            PRIMARY KEY (sheet, month)
+        )
+    ''')
+
+
+def source_aggregates(records):
+    """{месяц: {'rows', 'checksum', 'first_row', 'last_row'}} для записей одного листа"""
+    months = {}
+    for record in records:
+        # Диапазон строк - по всем строкам месяца, включая повторы карт
+        entry = months.setdefault(month_of(record.get('call_date')),
+                                  {'rows': 0, 'checksum': 0, 'first_row': None, 'last_row': None})
+        row_number = record.get('row_number')
+        if row_number is not None:
+            entry['first_row'] = min(entry['first_row'] or row_number, row_number)
+            entry['last_row'] = max(entry['last_row'] or row_number, row_number)
+
+    for record in expected_records(records).values():
+        entry = months[month_of(record.get('call_date'))]
+        entry['rows'] += 1
+        entry['checksum'] += record_checksum(record)
+    return months
+
+
+def record_source(conn, sheet, records, spreadsheet_id=None, modified_time=None):
+    """Сохранить агрегаты листа (заменяют предыдущие; commit - у вызывающего)"""
+    ensure_source_table(conn)
+    operator_name = records[0]['operator_name'] if records else sheet
+    collected_at = datetime.now().isoformat(timespec='seconds')
+    conn.execute('DELETE FROM source_checksums WHERE sheet = ?', (sheet,))
+    conn.executemany('''
+        INSERT INTO source_checksums (operator_name, sheet, month, rows, checksum, first_row,
+                                      last_row, spreadsheet_id, modified_time, collected_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (operator_name, sheet, month, entry['rows'], entry['checksum'], entry['first_row'],
+         entry['last_row'], spreadsheet_id, modified_time, collected_at)
+        for month, entry in source_aggregates(records).items()
+    ])
+
+
+# =============================================================================
+# СРАВНЕНИЕ АГРЕГАТОВ
+# =============================================================================
+
+def load_source(conn):
+    """{(оператор, месяц): строка source_checksums}"""
+    conn.row_factory = sqlite3.Row
+    try:
+        return {
+            (row['operator_name'], row['month']): dict(row)
+            for row in conn.execute('SELECT * FROM source_checksums')
+        }
+    finally:
+        conn.row_factory = None
+
+
+def db_aggregates(conn):
+    """{(оператор, месяц): (строк, контрольная сумма)} - одним запросом"""
+    query = f'''
+        SELECT o.operator_name, audit_month(f.fixation_date) AS month,
+               COUNT(*), SUM(audit_checksum({', '.join(CHECKSUM_COLUMNS)}))
+        FROM fixations f
+        JOIN operators o ON o.operator_id = f.operator_id
+        WHERE f.card_number IS NOT NULL AND f.card_number != ''
+        GROUP BY o.operator_name, month
+    '''
+    return {(operator, month): (rows, checksum) for operator, month, rows, checksum in conn.execute(query)}
+
+
+def compare(source, database):
+    """
+    Расхождения по (оператор, месяц). kind:
+        missing - в БД нет строк месяца, rows - не совпало число строк,
+        content - число совпало, содержимое нет, extra - в БД есть месяц,
+        которого нет в листе. Операторы без листа в source_checksums
+        (другие импортеры) не сравниваются.
+    """
+    operators = {operator for operator, _ in source}
+    discrepancies = []
+    for key in sorted(set(source) | {key for key in database if key[0] in operators}):
+        src = source.get(key)
+        db_rows, db_checksum = database.get(key, (0, 0))
+        src_rows, src_checksum = (src['rows'], src['checksum']) if src else (0, 0)
+        if src_rows == db_rows and src_checksum == db_checksum:
+            continue
+
+        if src is None:
+            kind = 'extra'
+        elif db_rows == 0:
+            kind = 'missing'
+        elif src_rows != db_rows:
+            kind = 'rows'
+        else:
+            kind = 'content'
+        discrepancies.append({
+            'operator': key[0],
+            'month': key[1],
+            'sheet': src['sheet'] if src else key[0],
+            'kind': kind,
+            'source_rows': src_rows,
+            'db_rows': db_rows,
+            'first_row': src['first_row'] if src else None,
+            'last_row': src['last_row'] if src else None,
+        })
+    return discrepancies
+
+
+# =============================================================================
+# РАЗБОР РАСХОЖДЕНИЯ
+# =============================================================================
+
+def db_month_rows(conn, operator, month):
+    """{номер карты: контрольная сумма} строк оператора за месяц"""
+    query = f'''
+        SELECT f.card_number, audit_checksum({', '.join(CHECKSUM_COLUMNS)})
+        FROM fixations f
+        JOIN operators o ON o.operator_id = f.operator_id
+        WHERE o.operator_name = ? AND audit_month(f.fixation_date) = ?
+          AND f.card_number IS NOT NULL AND f.card_number != ''
+    '''
+    return dict(conn.execute(query, (operator, month)).fetchall())
+
+
+def db_card_months(conn, operator, cards):
+    """Месяцы, в которых карты оператора лежат в БД (карта перенесена в другой месяц)"""
+    found = {}
+    cards = list(cards)
+    for offset in range(0, len(cards), 500):
+        chunk = cards[offset:offset + 500]
+        query = f'''
+            SELECT f.card_number, audit_month(f.fixation_date)
+            FROM fixations f
+            JOIN operators o ON o.operator_id = f.operator_id
+            WHERE o.operator_name = ? AND f.card_number IN ({', '.join('?' * len(chunk))})
+        '''
+        found.update(conn.execute(query, [operator] + chunk).fetchall())
+    return found
+
+
+def drill_down(conn, service, item, whole_sheet=False):
+    """
+    Прочитать строки месяца из листа (только диапазон first_row..last_row,
+    если лист не менялся) и сравнить с БД по номерам карт.
+    """
+    from data_collection.sheets_to_db_collector import collect_fiksa_data
+
+    if whole_sheet or not item['first_row']:
+        records = collect_fiksa_data(item['sheet'], service)
+    else:
+        records = collect_fiksa_data(item['sheet'], service, item['first_row'], item['last_row'])
+
+    expected = {
+        card: record for card, record in expected_records(records).items()
+        if month_of(record.get('call_date')) == item['month']
+    }
+    in_db = db_month_rows(conn, item['operator'], item['month'])
+
+    missing = [card for card in expected if card not in in_db]
+    moved = db_card_months(conn, item['operator'], missing) if missing else {}
+    return {
+        'missing': [expected[card] for card in missing if card not in moved],
+        'moved': {card: moved[card] for card in missing if card in moved},
+        'extra': [card for card in in_db if card not in expected],
+        'changed': [expected[card] for card in expected
+                    if card in in_db and in_db[card] != record_checksum(expected[card])],
+    }
+
+
+def print_drill(result):
+    def rows_of(records):
+        numbers = [str(record['row_number']) for record in records[:SHOW_EXAMPLES]]
+        more = f' и еще {len(records) - SHOW_EXAMPLES}' if len(records) > SHOW_EXAMPLES else ''
+        return ', '.join(numbers) + more
+
+    if result['missing']:
+        print(f"      ❌ Нет в БД: {len(result['missing'])} (строки листа: {rows_of(result['missing'])})")
+    if result['changed']:
+        print(f"      ✏️  Отличаются от листа: {len(result['changed'])} (строки листа: {rows_of(result['changed'])})")
+    if result['moved']:
+        examples = ', '.join(f'{card} → {month or "без даты"}' for card, month in list(result['moved'].items())[:SHOW_EXAMPLES])
+        print(f"      ↪️  В БД с другим месяцем: {len(result['moved'])} ({examples})")
+    if result['extra']:
+        examples = ', '.join(result['extra'][:SHOW_EXAMPLES])
+        print(f"      ➕ Есть в БД, нет в листе: {len(result['extra'])} (карты: {examples})")
+    if not any(result.values()):
+        print('      ✓ По строкам листа расхождений нет (лист изменился после сбора)')
+
+
+# =============================================================================
+# ОСНОВНОЙ ПРОЦЕСС
+# =============================================================================
+
+KIND_LABELS = {
+    'missing': 'нет в БД',
+    'rows': 'число строк',
+    'content': 'содержимое',
+    'extra': 'лишний месяц в БД',
+}
+
+
+def main():
+    drill = '--no-drill' not in sys.argv
+
+    print('=' * 80)
+    print('АУДИТ ПОЛНОТЫ ДАННЫХ: ЛИСТЫ ОПЕРАТОРОВ ↔ БАЗА ДАННЫХ')
+    print('=' * 80)
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if 'fixations' not in tables:
+            print('❌ Таблица fixations не найдена: python scripts/database/db_schema.py')
+            return 1
+        ensure_source_table(conn)
+        register_functions(conn)
+
+        started = time.monotonic()
+        source = load_source(conn)
+        if not source:
+            print('⚠️  Нет агрегатов источника - сначала запустите сбор:')
+            print('   python scripts/data_collection/sheets_to_db_collector.py')
+            return 1
+        database = db_aggregates(conn)
+        discrepancies = compare(source, database)
+        elapsed = time.monotonic() - started
+
+        source_rows = sum(entry['rows'] for entry in source.values())
+        operators = {operator for operator, _ in source}
+        db_rows = sum(rows for (operator, _), (rows, _) in database.items() if operator in operators)
+        print(f"\n📊 Проверено (лист, месяц): {len(source):,}, листов: {len(operators)}")
+        print(f"   Строк в листах (на момент сбора): {source_rows:,}")
+        print(f"   Строк в БД:                       {db_rows:,}")
+        print(f"   Время сравнения: {elapsed:.2f} сек")
+
+        if not discrepancies:
+            print('\n✅ ДАННЫЕ СОВПАДАЮТ ПОЛНОСТЬЮ!')
+            return 0
+
+        print(f'\n⚠️ НАЙДЕНЫ РАСХОЖДЕНИЯ: {len(discrepancies)}')
+        for item in discrepancies:
+            rows = f" (строки {item['first_row']}-{item['last_row']})" if item['first_row'] else ''
+            print(f"  • {item['sheet']} / {item['month'] or 'без даты'}{rows}: "
+                  f"лист {item['source_rows']:,} | БД {item['db_rows']:,} | "
+                  f"разница {item['source_rows'] - item['db_rows']:,} [{KIND_LABELS[item['kind']]}]")
+
+        if not drill:
+            return 2
+
+        # Разбор - только несовпавшие листы и месяцы
+        from googleapiclient.discovery import build
+        from data_collection.sheets_to_db_collector import authenticate, MASTER_SPREADSHEET_ID
+        from data_collection.sheets_metadata import SheetsMetadataCache, build_drive_service
+
+        creds = authenticate()
+        service = build('sheets', 'v4', credentials=creds)
+        metadata = SheetsMetadataCache(service, build_drive_service(creds))
+        remote = metadata.modified_times().get(MASTER_SPREADSHEET_ID)
+        collected = {entry['modified_time'] for entry in source.values()}
+        stale = remote is not None and collected != {remote}
+        if stale:
+            print('\n⚠️  Таблица изменилась после последнего сбора - листы читаются целиком')
+
+        print('\n🔍 Разбор расхождений:')
+        for item in discrepancies:
+            print(f"\n  ▶ {item['sheet']} / {item['month'] or 'без даты'}")
+            print_drill(drill_down(conn, service, item, whole_sheet=stale))
+        return 2
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
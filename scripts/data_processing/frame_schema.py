@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+ТИПИЗИРОВАННАЯ ЗАГРУЗКА ТАБЛИЦ SHEETS И 112
+=============================================================================
+Схема типов, которая применяется сразу при чтении
+КОНСОЛИДИРОВАННЫЕ_ДАННЫЕ_*.csv и файлов 112 из папки 123:
+
+- category   - операторы, регионы, районы, службы, статусы, жалобы,
+               имена документов/листов (десятки-сотни разных значений
+               на сотни тысяч строк)
+- id         - номера карт и инцидентов: Int64, если все значения -
+               целые числа без ведущих нулей, иначе строки
+- datetime   - даты разбираются один раз при загрузке; нераспознанные
+               значения становятся NaT (с предупреждением)
+
+Колонки, которых нет в схеме, становятся category, если разных
+значений не больше половины строк.
+
+Функции нормализации (статусы, службы, телефоны) вызываются по
+уникальным значениям через map_unique() - без .apply по строкам
+и без промежуточных копий через astype(str).
+=============================================================================
+"""
+
+import re
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CATEGORY = 'category'
+ID = 'id'
+DATETIME = 'datetime'
+TEXT = 'text'
+
+# Исходные колонки КОНСОЛИДИРОВАННЫЕ_ДАННЫЕ_*.csv
+SHEETS_SCHEMA = {
+    'Колонка_2': ID,          # номер инцидента
+    'Колонка_3': TEXT,        # телефон
+    'Колонка_4': DATETIME,    # дата открытия карты
+    'Колонка_5': CATEGORY,    # статус связи
+    'Колонка_6': CATEGORY,    # служба (может быть несколько)
+    'Колонка_7': CATEGORY,    # жалоба
+    'Колонка_8': CATEGORY,    # положительно
+    'Колонка_9': CATEGORY,
+    'Колонка_10': CATEGORY,
+    'Колонка_11': CATEGORY,
+    'Колонка_12': CATEGORY,
+    'Импортирован': CATEGORY,
+    'Документ': CATEGORY,
+    'Лист': CATEGORY,
+    'ID_Документа': CATEGORY,
+}
+
+# Колонки файлов 112 (после переименования в load_112_data)
+SCHEMA_112 = {
+    'Карта_112': ID,
+    'Инцидент_112': ID,
+    'Служба_112': CATEGORY,
+    'Телефон_112': TEXT,
+    'Статус_112': CATEGORY,
+    'Регион_112': CATEGORY,
+    'Район_112': CATEGORY,
+    'Оператор_112': CATEGORY,
+    'Дата_112': DATETIME,
+}
+
+# Доля уникальных значений, при которой колонка вне схемы становится category
+AUTO_CATEGORY_RATIO = 0.5
+
+_INTEGER_ID = re.compile(r'^(0|[1-9]\d{0,17})$')
+
+
+# =============================================================================
+# ПРЕОБРАЗОВАНИЯ КОЛОНОК
+# =============================================================================
+
+def read_dtypes(schema):
+    """dtype для pd.read_csv: category сразу при чтении, остальное - строки"""
+    return {
+        column: 'category' if kind == CATEGORY else str
+        for column, kind in schema.items()
+    }
+
+
+def to_id(series):
+    """
+    Номер карты/инцидента: Int64, если все значения - целые числа
+    (123, 123.0, '123'), иначе строки без пробелов по краям.
+    """
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return series.astype('Int64')
+
+    if pd.api.types.is_float_dtype(series.dtype):
+        values = series.dropna()
+        if (values == values.round()).all() and (values.abs() < 1e18).all():
+            return series.astype('Int64')
+        return series
+
+    text = series.astype(object).where(series.notna())
+    text = text.map(lambda v: str(v).strip(), na_action='ignore')
+    text = text.where(text != '')
+    values = text.dropna()
+    if len(values) and values.str.match(_INTEGER_ID).all():
+        return pd.to_numeric(text, errors='coerce').astype('Int64')
+    return text
+
+
+def to_datetime(series, dayfirst=True, strict=False):
+    """
+    Разобрать даты, неразбираемые значения - NaT (как errors='coerce').
+    strict=True - оставить колонку как есть, если хотя бы одно непустое
+    значение не разбирается.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series
+
+    parsed = pd.to_datetime(series, errors='coerce', dayfirst=dayfirst)
+    if strict and parsed.notna().sum() < series.notna().sum():
+        return series
+    return parsed
+
+
+def report_bad_dates(column, series, parsed, examples=3):
+    """Напечатать, сколько непустых значений не разобралось в дату"""
+    bad = series[series.notna() & parsed.isna()]
+    if len(bad):
+        sample = ', '.join(repr(v) for v in bad.astype(object).unique()[:examples])
+        print(f"⚠️  {column}: {len(bad):,} значений не распознаны как дата -> NaT (например: {sample})")
+
+
+def text_key(series):
+    """Ключ сопоставления в виде строк (Int64 -> '123', пропуски - NaN)"""
+    if not pd.api.types.is_integer_dtype(series.dtype):
+        return series
+    text = series.astype(object).map(str, na_action='ignore')
+    return text.where(series.notna(), np.nan)
+
+
+def align_keys(left, right):
+    """Привести ключи двух таблиц к одному типу перед merge"""
+    if left.dtype == right.dtype:
+        return left, right
+    return text_key(left), text_key(right)
+
+
+def map_unique(series, func, as_category=True):
+    """
+    Применить func к каждому уникальному значению (включая пропуск)
+    и раздать результат по строкам через коды.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    results = [func(value) for value in uniques]
+
+    if as_category:
+        result_codes, categories = pd.factorize(pd.Series(results, dtype=object))
+        values = pd.Categorical.from_codes(result_codes[codes], categories=categories)
+    else:
+        values = np.asarray(results + [None], dtype=object)[:-1][codes]
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def set_where(series, mask, value):
+    """Записать значение по маске (для category - с добавлением категории)"""
+    if isinstance(series.dtype, pd.CategoricalDtype) and value not in series.cat.categories:
+        series = series.cat.add_categories([value])
+    series = series.copy()
+    series[mask] = value
+    return series
+
+
+def ensure_categories(series, values):
+    """Добавить категории заранее, чтобы дальше можно было присваивать через .loc"""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    missing = [v for v in values if v not in series.cat.categories]
+    return series.cat.add_categories(missing) if missing else series
+
+
+def explode_unique(df, column, split, target):
+    """
+    Аналог df[column].apply(split) + explode(), но split вызывается
+    по уникальным значениям, а строки размножаются через index.repeat.
+    Пустой список дает одну строку с None. Результат в колонке target
+    (category), порядок строк как у explode().reset_index(drop=True).
+    """
+    codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+    lists = [split(value) or [None] for value in uniques]
+
+    counts = np.array([len(items) for items in lists], dtype=np.int64)
+    vocabulary, table = [], np.full((len(lists), counts.max() if len(lists) else 1), -1, dtype=np.int64)
+    positions = {}
+    for row, items in enumerate(lists):
+        for k, item in enumerate(items):
+            if item is None:
+                continue
+            if item not in positions:
+                positions[item] = len(vocabulary)
+                vocabulary.append(item)
+            table[row, k] = positions[item]
+
+    row_counts = counts[codes]
+    repeated = np.repeat(codes, row_counts)
+    starts = np.cumsum(row_counts) - row_counts
+    offsets = np.arange(len(repeated)) - np.repeat(starts, row_counts)
+
+    exploded = df.loc[df.index.repeat(row_counts)].reset_index(drop=True)
+    exploded[target] = pd.Categorical.from_codes(table[repeated, offsets], categories=vocabulary)
+    return exploded
+
+
+# =============================================================================
+# СХЕМА ТАБЛИЦЫ
+# =============================================================================
+
+def apply_schema(df, schema, dayfirst=True):
+    """Привести колонки к типам схемы (на месте), вернуть df"""
+    for column in df.columns:
+        kind = schema.get(column)
+        series = df[column]
+
+        if kind == ID:
+            df[column] = to_id(series)
+        elif kind == DATETIME:
+            # Даты идут в фильтры и merge_asof - колонка всегда datetime,
+            # нераспознанные значения становятся NaT и попадают в отчет
+            parsed = to_datetime(series, dayfirst=dayfirst)
+            report_bad_dates(column, series, parsed)
+            df[column] = parsed
+        elif kind == CATEGORY:
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                df[column] = series.astype('category')
+        elif kind is None and (pd.api.types.is_object_dtype(series.dtype)
+                               or pd.api.types.is_string_dtype(series.dtype)):
+            if len(series) and series.nunique() <= len(series) * AUTO_CATEGORY_RATIO:
+                df[column] = series.astype('category')
+    return df
+
+
+def concat_frames(frames):
+    """
+    pd.concat, сохраняющий типы схемы: у category выравниваются
+    категории (с учетом значений из нетипизированных частей), остальные
+    колонки приводятся к типу первой типизированной части - иначе
+    concat превращает их обратно в object.
+    """
+    frames = [frame.copy(deep=False) for frame in frames if frame is not None]
+    if len(frames) < 2:
+        return pd.concat(frames, ignore_index=True)
+
+    columns = list(dict.fromkeys(column for frame in frames for column in frame.columns))
+    for column in columns:
+        parts = [frame[column] for frame in frames if column in frame.columns]
+        categorical = [p for p in parts if isinstance(p.dtype, pd.CategoricalDtype)]
+
+        if categorical:
+            values = [pd.Series(p.cat.categories, dtype=object) for p in categorical]
+            values += [p.dropna().astype(object) for p in parts if not isinstance(p.dtype, pd.CategoricalDtype)]
+            categories = pd.Index(pd.concat(values).unique())
+            for frame in frames:
+                if column in frame.columns:
+                    series = frame[column]
+                    if isinstance(series.dtype, pd.CategoricalDtype):
+                        frame[column] = series.cat.set_categories(categories)
+                    else:
+                        frame[column] = pd.Categorical(series.astype(object), categories=categories)
+            continue
+
+        typed = [p.dtype for p in parts if not pd.api.types.is_object_dtype(p.dtype)]
+        if not typed or not pd.api.types.is_extension_array_dtype(typed[0]):
+            continue
+        for frame in frames:
+            if column in frame.columns and pd.api.types.is_object_dtype(frame[column].dtype):
+                try:
+                    frame[column] = frame[column].astype(typed[0])
+                except (TypeError, ValueError):
+                    pass
+
+    return pd.concat(frames, ignore_index=True)
+
+
+# =============================================================================
+# ОТЧЕТ О ПАМЯТИ
+# =============================================================================
+
+def frame_memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 / 1024
+
+
+def peak_rss_mb():
+    """Пиковое RSS процесса (None, если недоступно на этой ОС)"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def memory_report(df, name, top=5):
+    """Напечатать память таблицы: всего и самые тяжелые колонки"""
+    usage = df.memory_usage(deep=True, index=False).sort_values(ascending=False)
+    print(f"\n🧠 Память {name}: {len(df):,} × {len(df.columns)}, {usage.sum() / 1024 / 1024:.1f} МБ")
+    for column, size in usage.head(top).items():
+        print(f"   • {column} ({df[column].dtype}): {size / 1024 / 1024:.1f} МБ")
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"   Пиковое RSS процесса: {peak:.0f} МБ")
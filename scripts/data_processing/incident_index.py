@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+ПОИСК НОМЕРОВ ИНЦИДЕНТОВ С ОДНОЙ ОПЕЧАТКОЙ
+=============================================================================
+Операторы вводят номера карт/инцидентов вручную: одна переставленная,
+пропущенная, лишняя или неверная цифра - и строка уходит в
+"Не найдено в 112".
+
+IncidentIndex индексирует все номера 112 за период по "окрестности
+удалений": сам номер и все варианты без одного символа. Два номера на
+расстоянии Дамерау-Левенштейна 1 (замена, вставка, удаление,
+перестановка соседних символов) всегда имеют общий вариант, поэтому
+поиск - это несколько бинарных поисков, без сравнения всех пар.
+
+Варианты хранятся как 64-битные хэши в отсортированном numpy-массиве
+(~16 байт на вариант), кандидаты проверяются точно.
+
+Использование:
+    index = IncidentIndex(df_112['Инцидент_112_norm'])
+    index.lookup('01.AAD4248/26')          # ['01.AAD4284/26', ...]
+    index.candidates(series)               # DataFrame: Номер, Кандидат
+=============================================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+# Короткие номера не сопоставляем: слишком много случайных совпадений
+MIN_LENGTH = 6
+
+
+def normalize_number(value):
+    """Номер для сравнения: строка без пробелов по краям, в верхнем регистре"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    return str(value).strip().upper()
+
+
+def deletion_variants(text):
+    """Сам номер и все варианты без одного символа"""
+    return [text] + [text[:i] + text[i + 1:] for i in range(len(text))]
+
+
+def within_one_edit(a, b):
+    """Расстояние Дамерау-Левенштейна (OSA) между a и b не больше 1"""
+    if a == b:
+        return True
+    len_a, len_b = len(a), len(b)
+    if abs(len_a - len_b) > 1:
+        return False
+
+    # Общий префикс
+    i = 0
+    while i < len_a and i < len_b and a[i] == b[i]:
+        i += 1
+
+    if len_a == len_b:
+        # Замена одного символа или перестановка соседних
+        if a[i + 1:] == b[i + 1:]:
+            return True
+        return (i + 1 < len_a and a[i] == b[i + 1] and a[i + 1] == b[i]
+                and a[i + 2:] == b[i + 2:])
+
+    # Вставка / удаление одного символа
+    if len_a > len_b:
+        return a[i + 1:] == b[i:]
+    return a[i:] == b[i + 1:]
+
+
+class IncidentIndex:
+    """Индекс номеров 112 для поиска с одной опечаткой"""
+
+    def __init__(self, numbers, min_length=MIN_LENGTH):
+        self.min_length = min_length
+
+        # Исходное значение (Int64 или строка) для каждого нормализованного номера
+        originals = {}
+        for value in pd.Series(numbers).dropna().unique():
+            text = normalize_number(value)
+            if len(text) >= min_length:
+                originals.setdefault(text, value)
+        self.numbers = list(originals)
+        self.originals = [originals[text] for text in self.numbers]
+
+        variants, owners = [], []
+        for number_id, text in enumerate(self.numbers):
+            items = deletion_variants(text)
+            variants.extend(items)
+            owners.extend([number_id] * len(items))
+
+        hashes = np.fromiter((hash(v) for v in variants), dtype=np.int64, count=len(variants))
+        order = np.argsort(hashes, kind='stable')
+        self.hashes = hashes[order]
+        self.owners = np.asarray(owners, dtype=np.int64)[order]
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def _candidates(self, text):
+        """Номера индекса, имеющие общий вариант с text"""
+        keys = np.fromiter((hash(v) for v in deletion_variants(text)), dtype=np.int64)
+        left = np.searchsorted(self.hashes, keys, side='left')
+        right = np.searchsorted(self.hashes, keys, side='right')
+        found = set()
+        for start, stop in zip(left.tolist(), right.tolist()):
+            found.update(self.owners[start:stop].tolist())
+        return found
+
+    def lookup(self, number):
+        """Все номера 112 на расстоянии не больше 1 (исходные значения)"""
+        text = normalize_number(number)
+        if len(text) < self.min_length:
+            return []
+        return [
+            self.originals[number_id]
+            for number_id in sorted(self._candidates(text))
+            if within_one_edit(text, self.numbers[number_id])
+        ]
+
+    def candidates(self, numbers):
+        """
+        Пары (номер, похожий номер 112) для всех номеров серии.
+        Каждый разный номер ищется один раз. Номера 112 идут подряд,
+        поэтому у одного номера часто несколько кандидатов - выбор
+        остается вызывающему коду (например, по времени звонка).
+        """
+        queries, found = [], []
+        for value in pd.Series(numbers).dropna().unique():
+            for candidate in self.lookup(value):
+                queries.append(value)
+                found.append(candidate)
+        return pd.DataFrame({'Номер': queries, 'Кандидат': found}, dtype=object)
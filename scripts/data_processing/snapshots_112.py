@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+СНИМКИ ФАЙЛОВ 112 (разбор при загрузке)
+=============================================================================
+Файл 112 разбирается один раз - когда он приходит в бот (или при первой
+обработке, если его положили в папку 123 вручную):
+
+- проверка колонок выгрузки 112
+- переименование колонок и типизация по SCHEMA_112
+- определение периода по датам звонков (Сана)
+- снимок в колоночном формате: data/snapshots_112/<sha256>.arrow
+  (Arrow IPC при наличии pyarrow, иначе pickle)
+
+manifest.json:
+    'snapshots': {sha256: {'file', 'snapshot', 'rows', 'period_start',
+                           'period_end', 'period', 'created'}}
+    'files':     {имя файла: {'size', 'mtime', 'sha256'}}
+
+Повторная загрузка того же содержимого (под любым именем) определяется
+по SHA-256. process_period_data.py читает готовые снимки вместо Excel.
+
+Файл из 123/ может одновременно разбирать бот и наблюдатель за папками
+(разные процессы). Разбор и запись манифеста идут под блокировкой файла
+manifest.lock: второй процесс дожидается первого, находит готовый снимок
+и файл не перечитывает, записи манифеста не теряются.
+
+Использование:
+    from data_processing.snapshots_112 import ingest_file, load_snapshots
+    info = ingest_file('123/ЧақирувТарихи_112_....xlsx')
+    frames = load_snapshots(['123/a.xlsx', '123/b.xlsx'])
+=============================================================================
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:
+    pa = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+from data_processing.frame_schema import SCHEMA_112, apply_schema
+
+BASE_DIR = Path(__file__).parent.parent.parent
+SNAPSHOT_DIR = BASE_DIR / 'data' / 'snapshots_112'
+MANIFEST_FILE = SNAPSHOT_DIR / 'manifest.json'
+LOCK_FILE = SNAPSHOT_DIR / 'manifest.lock'
+
+# Колонки выгрузки 112 -> колонки обработки
+COLUMNS_112 = {
+    'Карточка рақами': 'Карта_112',
+    'Ҳодиса рақами': 'Инцидент_112',
+    'Хизмат': 'Служба_112',
+    'Мурожаатчи телефон рақами': 'Телефон_112',
+    'Ҳолат': 'Статус_112',
+    'Вилоят': 'Регион_112',
+    'Туман': 'Район_112',
+    'Оператор': 'Оператор_112',
+    'Сана': 'Дата_112'
+}
+
+# Без этих колонок файл не является выгрузкой 112
+REQUIRED_COLUMNS = ['Ҳодиса рақами', 'Сана']
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Формат имени: ЧақирувТарихи_112_2026_01_04_00_00_00_2026_01_11_23_59_59.xlsx
+_PERIOD_IN_NAME = re.compile(r'(\d{4})_(\d{2})_(\d{2}).*?(\d{4})_(\d{2})_(\d{2})')
+
+_manifest_lock = threading.Lock()
+
+
+class InvalidFile112(ValueError):
+    """Файл не похож на выгрузку 112"""
+
+
+# =============================================================================
+# МАНИФЕСТ
+# =============================================================================
+
+@contextmanager
+def manifest_lock():
+    """Блокировка манифеста для потоков этого процесса и для других процессов"""
+    with _manifest_lock:
+        SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        with open(LOCK_FILE, 'a+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK ждет около 10 секунд - разбор большого файла дольше
+                        continue
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def load_manifest():
+    if MANIFEST_FILE.exists():
+        try:
+            with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            manifest.setdefault('snapshots', {})
+            manifest.setdefault('files', {})
+            return manifest
+        except (OSError, ValueError):
+            pass
+    return {'snapshots': {}, 'files': {}}
+
+
+def save_manifest(manifest):
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = MANIFEST_FILE.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+
+def file_hash(path):
+    """SHA-256 содержимого файла (чтение блоками)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_stamp(path):
+    stat = Path(path).stat()
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def cached_hash(path, manifest):
+    """Хэш из манифеста, если размер и время изменения файла не поменялись"""
+    known = manifest['files'].get(Path(path).name)
+    stamp = _file_stamp(path)
+    if known and known['size'] == stamp['size'] and known['mtime'] == stamp['mtime']:
+        return known['sha256']
+    return None
+
+
+# =============================================================================
+# РАЗБОР ФАЙЛА
+# =============================================================================
+
+def read_112_file(path):
+    """Прочитать выгрузку 112, проверить колонки и привести к SCHEMA_112"""
+    path = Path(path)
+    if path.suffix.lower() == '.csv':
+        df = pd.read_csv(path, encoding='utf-8-sig')
+    else:
+        df = pd.read_excel(path)
+
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise InvalidFile112(f"нет колонок: {', '.join(missing)}")
+
+    return apply_schema(df.rename(columns=COLUMNS_112), SCHEMA_112)
+
+
+def detect_period(df, file_name=''):
+    """Период файла: по датам звонков, иначе по имени файла"""
+    dates = df['Дата_112'] if 'Дата_112' in df.columns else None
+    if dates is not None and pd.api.types.is_datetime64_any_dtype(dates.dtype) and dates.notna().any():
+        return dates.min().date().isoformat(), dates.max().date().isoformat()
+
+    match = _PERIOD_IN_NAME.search(file_name)
+    if match:
+        start = '-'.join(match.group(1, 2, 3))
+        end = '-'.join(match.group(4, 5, 6))
+        return start, end
+    return None, None
+
+
+def write_snapshot(df, sha256):
+    """Колонный снимок: Arrow IPC (типы и категории сохраняются), иначе pickle"""
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    df = df.reset_index(drop=True)
+    if pa is not None:
+        path = SNAPSHOT_DIR / f'{sha256}.arrow'
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            with pa.OSFile(str(path), 'wb') as sink:
+                with pa_ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            return path
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            # Смешанные типы в колонке вне схемы - снимок в pickle
+            path.unlink(missing_ok=True)
+
+    path = SNAPSHOT_DIR / f'{sha256}.pkl'
+    df.to_pickle(path)
+    return path
+
+
+def read_snapshot(path):
+    path = Path(path)
+    if path.suffix == '.arrow':
+        with pa.memory_map(str(path), 'r') as source:
+            return pa_ipc.open_file(source).read_all().to_pandas()
+    return pd.read_pickle(path)
+
+
+def _snapshot_path(entry):
+    return SNAPSHOT_DIR / entry['snapshot']
+
+
+# =============================================================================
+# ЗАГРУЗКА
+# =============================================================================
+
+def ingest_file(path, sha256=None):
+    """
+    Разобрать файл 112 и сохранить снимок (sha256 - уже посчитанный хэш).
+    Возвращает словарь: sha256, rows, period_start, period_end, period,
+    duplicate (True - такое содержимое уже загружено), duplicate_of
+    (имя файла, под которым оно было загружено впервые).
+    Файл не выгрузка 112 - InvalidFile112.
+    """
+    path = Path(path)
+    sha256 = sha256 or file_hash(path)
+
+    # Разбор под блокировкой: тот же файл, пришедший одновременно в бот
+    # и наблюдателю за папками, разбирается один раз
+    with manifest_lock():
+        manifest = load_manifest()
+        entry = manifest['snapshots'].get(sha256)
+        if entry and _snapshot_path(entry).exists():
+            manifest['files'][path.name] = dict(_file_stamp(path), sha256=sha256)
+            save_manifest(manifest)
+            return dict(entry, sha256=sha256, duplicate=True, duplicate_of=entry['file'])
+
+        df = read_112_file(path)
+        period_start, period_end = detect_period(df, path.name)
+        snapshot = write_snapshot(df, sha256)
+
+        entry = {
+            'file': path.name,
+            'snapshot': snapshot.name,
+            'rows': len(df),
+            'period_start': period_start,
+            'period_end': period_end,
+            'period': period_start[:7] if period_start else None,
+            'created': datetime.now().isoformat(timespec='seconds'),
+        }
+        manifest['snapshots'][sha256] = entry
+        manifest['files'][path.name] = dict(_file_stamp(path), sha256=sha256)
+        save_manifest(manifest)
+
+    return dict(entry, sha256=sha256, duplicate=False, duplicate_of=None)
+
+
+def load_snapshots(files_list):
+    """
+    Таблицы 112 для списка файлов: готовые снимки, неразобранные файлы
+    разбираются и сохраняются. Файлы с одинаковым содержимым читаются
+    один раз. Возвращает список DataFrame в порядке files_list.
+    """
+    manifest = load_manifest()
+    frames = []
+    seen = set()
+    for file in files_list:
+        sha256 = cached_hash(file, manifest) or file_hash(file)
+        if sha256 in seen:
+            print(f"\n✓ {Path(file).name}: то же содержимое, что у уже загруженного файла - пропущен")
+            continue
+        seen.add(sha256)
+
+        entry = manifest['snapshots'].get(sha256)
+        if entry and _snapshot_path(entry).exists():
+            print(f"\n✓ Снимок: {Path(file).name} ({entry['rows']:,} строк)")
+        else:
+            print(f"\n✓ Читаю: {Path(file).name}")
+            try:
+                entry = ingest_file(file)
+            except InvalidFile112 as e:
+                print(f"  ⚠️  Не выгрузка 112 ({e}) - пропущен")
+                continue
+            print(f"  Строк: {entry['rows']:,} (снимок сохранен)")
+            manifest = load_manifest()
+        frames.append(read_snapshot(_snapshot_path(entry)))
+    return frames
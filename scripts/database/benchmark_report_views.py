@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+БЕНЧМАРК: ПЕРЕСБОРКА ТАБЛИЦ ОТЧЕТОВ VS МАТЕРИАЛИЗОВАННЫЕ ПРЕДСТАВЛЕНИЯ
+=============================================================================
+Создает временную схему bench_report_views с синтетическими фиксациями
+(по умолчанию 1 000 000) и сравнивает:
+1. Старый способ - DROP TABLE + CREATE TABLE AS с LIKE по тексту статуса
+2. Первое заполнение материализованных представлений (REFRESH)
+3. REFRESH MATERIALIZED VIEW CONCURRENTLY после догрузки 1% строк
+
+Основные таблицы не затрагиваются, схема удаляется после замера.
+
+Использование:
+    python scripts/database/benchmark_report_views.py
+    python scripts/database/benchmark_report_views.py --rows 200000 --keep
+
+Конфигурация: config/postgresql.env
+=============================================================================
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from database.report_views import get_db_connection, create_report_views, refresh_report_views
+
+SCHEMA = 'bench_report_views'
+
+# Запросы старой версии process_data.py / create_reports_in_sql.py
+LEGACY_QUERIES = [
+    """
+    DROP TABLE IF EXISTS legacy_detailed_reports;
+    CREATE TABLE legacy_detailed_reports AS
+    SELECT
+        f.fixation_id, f.card_number, f.call_date AS "call_datetime",
+        r.region_name AS "region", s.service_name AS "service", f.phone AS "phone",
+        f.incident_number AS "incident", f.complaint AS "complaint",
+        f.status AS "status_text", f.reason, f.description AS "comment",
+        o.operator_name, f.source_file, f.collection_date AS "closed_date"
+    FROM fixations f
+    LEFT JOIN operators o ON f.operator_id = o.operator_id
+    LEFT JOIN regions r ON f.region_id = r.region_id
+    LEFT JOIN services s ON f.service_id = s.service_id
+    ORDER BY f.call_date;
+    """,
+    """
+    DROP TABLE IF EXISTS legacy_negative_complaints;
+    CREATE TABLE legacy_negative_complaints AS
+    SELECT * FROM legacy_detailed_reports
+    WHERE LOWER(status_text) LIKE '%жалоб%'
+        OR LOWER(status_text) LIKE '%отриц%'
+        OR LOWER(status_text) LIKE '%негатив%';
+    """,
+    """
+    DROP TABLE IF EXISTS legacy_complaints_by_region;
+    CREATE TABLE legacy_complaints_by_region AS
+    SELECT
+        COALESCE(region, '(регион не указан)') as region,
+        COUNT(*) as total_calls,
+        COUNT(*) FILTER (WHERE LOWER(status_text) LIKE '%жалоб%') as complaints_count,
+        COUNT(*) FILTER (WHERE LOWER(status_text) LIKE '%отриц%') as negative_count,
+        COUNT(*) FILTER (WHERE LOWER(status_text) LIKE '%Положительно%') as positive_count
+    FROM legacy_detailed_reports
+    GROUP BY region
+    ORDER BY total_calls DESC;
+    """,
+    """
+    DROP TABLE IF EXISTS legacy_summary_statistics;
+    CREATE TABLE legacy_summary_statistics AS
+    SELECT
+        COUNT(*) as total_calls,
+        COUNT(*) FILTER (WHERE LOWER(status_text) LIKE '%жалоб%') as total_complaints,
+        COUNT(*) FILTER (WHERE LOWER(status_text) LIKE '%отриц%') as negative_feedback,
+        COUNT(*) FILTER (WHERE LOWER(status_text) LIKE '%Положительно%') as positive_feedback,
+        COUNT(DISTINCT COALESCE(region, '')) as regions_count,
+        COUNT(DISTINCT operator_name) as operators_count,
+        MIN(call_datetime) as first_call,
+        MAX(call_datetime) as last_call
+    FROM legacy_detailed_reports;
+    """,
+]
+
+STATUSES = ['положительный', 'отрицательный', 'НЕТ ОТВЕТА (ЗАНЯТО)', 'открыть карту',
+            'заявка закрыта (не удалось дозвониться)', 'жалоба']
+
+SETUP_SQL = """
+    CREATE TABLE operators (operator_id SERIAL PRIMARY KEY, operator_name VARCHAR(255));
+    CREATE TABLE regions (region_id SERIAL PRIMARY KEY, region_name VARCHAR(255));
+    CREATE TABLE services (service_id SERIAL PRIMARY KEY, service_name VARCHAR(255));
+    CREATE TABLE fixations (
+        fixation_id BIGSERIAL PRIMARY KEY,
+        card_number VARCHAR(50), operator_id INTEGER, service_id INTEGER, region_id INTEGER,
+        call_date TIMESTAMP, incident_number VARCHAR(100), phone VARCHAR(50),
+        status VARCHAR(255), status_category VARCHAR(50),
+        reason TEXT, complaint TEXT, description TEXT,
+        source_file VARCHAR(500), collection_date TIMESTAMP
+    );
+    INSERT INTO operators (operator_name) SELECT 'Оператор ' || g FROM generate_series(1, 40) g;
+    INSERT INTO regions (region_name) SELECT 'Регион ' || g FROM generate_series(1, 14) g;
+    INSERT INTO services (service_name) SELECT (100 + g)::text FROM generate_series(1, 4) g;
+"""
+
+INSERT_SQL = """
+    INSERT INTO fixations (
+        card_number, operator_id, service_id, region_id, call_date, incident_number,
+        phone, status, status_category, complaint, description, source_file
+    )
+    SELECT
+        'C' || (g %% 400000),
+        1 + g %% 40,
+        1 + g %% 4,
+        CASE WHEN g %% 50 = 0 THEN NULL ELSE 1 + g %% 14 END,
+        TIMESTAMP '2025-01-01' + (g %% 31536000) * INTERVAL '1 second',
+        'INC' || g,
+        '99890' || (1000000 + g %% 9000000),
+        (%(statuses)s)[1 + g %% %(status_count)s],
+        NULL,
+        CASE WHEN g %% 7 = 0 THEN 'долго ехали' END,
+        'описание ' || g,
+        'bench'
+    FROM generate_series(%(start)s, %(stop)s) g
+"""
+
+# Категория заполняется тем же выражением, что и триггер в основной схеме
+CATEGORIZE_SQL = """
+    UPDATE fixations SET status_category = CASE
+        WHEN LOWER(status) LIKE '%положительн%' THEN 'Положительно'
+        WHEN LOWER(status) LIKE '%отрицательн%' OR LOWER(status) LIKE '%нет ответа%'
+             OR LOWER(status) LIKE '%жалоб%' THEN 'Отрицательно'
+        WHEN LOWER(status) LIKE '%занято%' OR LOWER(status) LIKE '%не дозвон%' THEN 'Не дозвонились'
+        ELSE 'Прочее'
+    END
+    WHERE status_category IS NULL
+"""
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<55} {elapsed:8.2f} сек")
+    return elapsed, result
+
+
+def insert_fixations(conn, start, stop):
+    with conn.cursor() as cursor:
+        cursor.execute(INSERT_SQL, {
+            'statuses': STATUSES, 'status_count': len(STATUSES),
+            'start': start, 'stop': stop
+        })
+        cursor.execute(CATEGORIZE_SQL)
+    conn.commit()
+
+
+def run_legacy(conn):
+    with conn.cursor() as cursor:
+        for query in LEGACY_QUERIES:
+            cursor.execute(query)
+            conn.commit()
+
+
+def main():
+    rows = 1_000_000
+    if '--rows' in sys.argv:
+        rows = int(sys.argv[sys.argv.index('--rows') + 1])
+    keep = '--keep' in sys.argv
+
+    print("=" * 70)
+    print(f"БЕНЧМАРК ОТЧЕТОВ: {rows:,} ФИКСАЦИЙ")
+    print("=" * 70)
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+            cursor.execute(f'CREATE SCHEMA {SCHEMA}')
+            cursor.execute(f'SET search_path TO {SCHEMA}')
+            cursor.execute(SETUP_SQL)
+        conn.commit()
+
+        print("\n📥 Подготовка данных...")
+        timed("Генерация фиксаций", lambda: insert_fixations(conn, 1, rows))
+        with conn.cursor() as cursor:
+            cursor.execute('ANALYZE fixations')
+        conn.commit()
+
+        print("\n⏱️  Замеры:")
+        legacy, _ = timed("DROP + CREATE TABLE AS (LIKE по статусу)", lambda: run_legacy(conn))
+
+        create_report_views(conn)
+        initial, _ = timed("Первое заполнение представлений (REFRESH)", lambda: refresh_report_views(conn))
+
+        delta = max(rows // 100, 1)
+        timed(f"Догрузка {delta:,} фиксаций", lambda: insert_fixations(conn, rows + 1, rows + delta))
+        legacy_again, _ = timed("DROP + CREATE TABLE AS после догрузки", lambda: run_legacy(conn))
+        concurrent, stats = timed("REFRESH CONCURRENTLY после догрузки", lambda: refresh_report_views(conn))
+
+        print("\n📊 Итог:")
+        for name, (count, seconds) in stats.items():
+            print(f"  {name:<25} {count:>10,} строк {seconds:8.2f} сек")
+        print(f"\n  Старый способ: {legacy:.2f} / {legacy_again:.2f} сек (таблицы недоступны на время пересборки)")
+        print(f"  Представления: {initial:.2f} сек первое заполнение, "
+              f"{concurrent:.2f} сек обновление (чтение не блокируется)")
+    finally:
+        if not keep:
+            conn.rollback()
+            with conn.cursor() as cursor:
+                cursor.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+            conn.commit()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@
 Очистка базы данных от лишних строк
 Удаляет операторов и связанные данные по паттернам исключения
 """
+import sys
 import sqlite3
 from pathlib import Path
 from datetime import datetime
@@ -10,19 +11,8 @@ BASE_DIR = Path(__file__).parent.parent.parent
 DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
 LOG_DIR = BASE_DIR / 'logs' / 'database'
 
-# Паттерны для удаления
-EXCLUDE_PATTERNS = [
-    'Тренды',
-    'Текущий месяц - Сводка',
-    'Предыдущий месяц - Сводка',
-    'СВОДКА СОТРУДНИКИ',
-    'Ноябрь 2025',
-    'Декабрь 2025',
-    'сводка',
-    'итого',
-    'total',
-    'summary',
-]
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from database.exclusions import refresh_excluded
 
 def log_message(message):
     """Логирование"""
@@ -55,24 +45,15 @@ def clean_database():
         # Находим операторов для удаления
         log_message('Поиск операторов для удаления...')
         
-        operators_to_delete = []
-        for pattern in EXCLUDE_PATTERNS:
-            cursor.execute('''
-                SELECT operator_id, operator_name 
-                FROM operators 
-                WHERE LOWER(operator_name) LIKE ?
-            ''', (f'%{pattern.lower()}%',))
-            
-            found = cursor.fetchall()
-            operators_to_delete.extend(found)
+        # Правила исключения проверяются заново для всех операторов (могли измениться)
+        refresh_excluded(conn, recheck=True)
+        cursor.execute('SELECT operator_id, operator_name FROM operators WHERE excluded = 1')
+        operators_to_delete = cursor.fetchall()
         
         if not operators_to_delete:
             log_message('✅ Не найдено операторов для удаления')
             return
         
-        # Удаляем дубликаты
-        operators_to_delete = list(set(operators_to_delete))
-        
         log_message(f'\nНайдено операторов для удаления: {len(operators_to_delete)}')
         for op_id, op_name in operators_to_delete:
             log_message(f'  • ID {op_id}: {op_name}')
@@ -83,22 +64,15 @@ def clean_database():
             log_message('❌ Отменено пользователем')
             return
         
-        # Удаляем данные
-        deleted_fixations = 0
-        deleted_stats = 0
+        # Удаляем данные - по флагу, одним запросом на таблицу
+        cursor.execute('DELETE FROM fixations WHERE operator_id IN (SELECT operator_id FROM operators WHERE excluded = 1)')
+        deleted_fixations = cursor.rowcount
+        
+        cursor.execute('DELETE FROM daily_statistics WHERE operator_id IN (SELECT operator_id FROM operators WHERE excluded = 1)')
+        deleted_stats = cursor.rowcount
         
+        cursor.execute('DELETE FROM operators WHERE excluded = 1')
         for op_id, op_name in operators_to_delete:
-            # Удаляем фиксации
-            cursor.execute('DELETE FROM fixations WHERE operator_id = ?', (op_id,))
-            deleted_fixations += cursor.rowcount
-            
-            # Удаляем статистику
-            cursor.execute('DELETE FROM daily_statistics WHERE operator_id = ?', (op_id,))
-            deleted_stats += cursor.rowcount
-            
-            # Удаляем самого оператора
-            cursor.execute('DELETE FROM operators WHERE operator_id = ?', (op_id,))
-            
             log_message(f'✓ Удален: {op_name}')
         
         conn.commit()
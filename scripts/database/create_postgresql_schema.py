@@ -8,6 +8,7 @@
 =============================================================================
 """
 
+import sys
 import psycopg2
 from psycopg2 import sql
 from pathlib import Path
@@ -16,6 +17,9 @@ import os
 from dotenv import load_dotenv
 
 BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR))
+from database.partitions import TABLE_DDL, PARTITIONED_TABLES, is_partitioned, ensure_partitions
+from database.search_index import ensure_postgres_index
 CONFIG_DIR = BASE_DIR / 'config'
 
 # Загрузка конфигурации
@@ -139,84 +143,62 @@ def create_schema():
         """)
         print('  ✅ Таблица regions создана')
         
-        print('\n[4/7] Создание таблицы фиксаций...')
+        print('\n[4/7] Создание таблиц fixations и incidents_112 (секции по месяцам)...')
+        # Функция нужна до таблицы: status_category вычисляется через нее
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS fixations (
-                fixation_id BIGSERIAL PRIMARY KEY,
-                card_number VARCHAR(50),
-                operator_id INTEGER REFERENCES operators(operator_id),
-                service_id INTEGER REFERENCES services(service_id),
-                region_id INTEGER REFERENCES regions(region_id),
-                
-                -- Данные обращения
-                call_date TIMESTAMP,
-                incident_number VARCHAR(100),
-                phone VARCHAR(50),
-                caller_name VARCHAR(255),
-                address TEXT,
-                district VARCHAR(255),
-                
-                -- Статус и результат
-                status VARCHAR(255),
-                status_category VARCHAR(50),
-                reason TEXT,
-                complaint TEXT,
-                description TEXT,
+            -- Функция: Категоризация статуса
+            CREATE OR REPLACE FUNCTION categorize_status(status_text TEXT)
+            RETURNS VARCHAR(50) AS $$
+            BEGIN
+                IF status_text IS NULL THEN
+                    RETURN 'Прочее';
+                END IF;
                 
-                -- Метаданные
-                source_file VARCHAR(500),
-                import_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                collection_date TIMESTAMP,
+                status_text := LOWER(status_text);
                 
-                -- Индексы для быстрого поиска
-                CONSTRAINT fixations_card_number_idx UNIQUE (card_number, call_date)
-            );
-            
-            CREATE INDEX IF NOT EXISTS idx_fixations_card ON fixations(card_number);
-            CREATE INDEX IF NOT EXISTS idx_fixations_operator ON fixations(operator_id);
-            CREATE INDEX IF NOT EXISTS idx_fixations_service ON fixations(service_id);
-            CREATE INDEX IF NOT EXISTS idx_fixations_region ON fixations(region_id);
-            CREATE INDEX IF NOT EXISTS idx_fixations_date ON fixations(call_date);
-            CREATE INDEX IF NOT EXISTS idx_fixations_status ON fixations(status_category);
-            CREATE INDEX IF NOT EXISTS idx_fixations_import ON fixations(import_date);
+                IF status_text LIKE '%положительн%' OR 
+                   status_text LIKE '%qanoatlantir%' OR
+                   status_text LIKE '%қаноатлантир%' THEN
+                    RETURN 'Положительно';
+                ELSIF status_text LIKE '%отрицательн%' OR
+                      status_text LIKE '%qanoatlantirilmadi%' OR
+                      status_text LIKE '%нет ответа%' OR
+                      status_text LIKE '%жалоб%' THEN
+                    RETURN 'Отрицательно';
+                ELSIF status_text LIKE '%занято%' OR
+                      status_text LIKE '%не дозвон%' THEN
+                    RETURN 'Не дозвонились';
+                ELSE
+                    RETURN 'Прочее';
+                END IF;
+            END;
+            $$ LANGUAGE plpgsql IMMUTABLE;
         """)
-        print('  ✅ Таблица fixations создана')
         
-        print('\n[5/7] Создание таблицы инцидентов 112...')
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS incidents_112 (
-                incident_id BIGSERIAL PRIMARY KEY,
-                incident_number VARCHAR(100) UNIQUE,
-                card_number VARCHAR(50),
-                service_id INTEGER REFERENCES services(service_id),
-                region_id INTEGER REFERENCES regions(region_id),
-                
-                -- Данные инцидента
-                call_time TIMESTAMP,
-                caller_phone VARCHAR(50),
-                caller_name VARCHAR(255),
-                address TEXT,
-                district VARCHAR(255),
-                reason TEXT,
-                status VARCHAR(255),
-                
-                -- Данные обработки
-                operator_112 VARCHAR(255),
-                close_time TIMESTAMP,
-                duration INTERVAL,
-                
-                -- Метаданные
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-            
-            CREATE INDEX IF NOT EXISTS idx_incidents_number ON incidents_112(incident_number);
-            CREATE INDEX IF NOT EXISTS idx_incidents_card ON incidents_112(card_number);
-            CREATE INDEX IF NOT EXISTS idx_incidents_service ON incidents_112(service_id);
-            CREATE INDEX IF NOT EXISTS idx_incidents_region ON incidents_112(region_id);
-            CREATE INDEX IF NOT EXISTS idx_incidents_time ON incidents_112(call_time);
-        """)
-        print('  ✅ Таблица incidents_112 создана')
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(cursor, table):
+                cursor.execute(
+                    "SELECT to_regclass(%s) IS NOT NULL", (table,)
+                )
+                if cursor.fetchone()[0]:
+                    print(f'  ⚠️  {table} - обычная таблица, для перевода на секции:')
+                    print('     python scripts/database/partitions.py --migrate')
+                    continue
+            cursor.execute(TABLE_DDL[table])
+            cursor.execute(f'CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT')
+            print(f'  ✅ Таблица {table} создана')
+        
+        print('\n[5/7] Создание секций текущего месяца...')
+        conn.commit()
+        
+        # Остальные секции создает импортер перед вставкой
+        for table in PARTITIONED_TABLES:
+            ensure_partitions(conn, table, [datetime.now()])
+        print('  ✅ Секции созданы')
+        
+        # Триграммные индексы для поиска по карте/телефону/адресу/жалобе
+        ensure_postgres_index(conn)
+        print('  ✅ Индексы поиска pg_trgm созданы')
         
         print('\n[6/7] Создание аналитических представлений...')
         cursor.execute("""
@@ -293,52 +275,14 @@ def create_schema():
         print('  ✅ Аналитические представления созданы')
         
         print('\n[7/7] Создание функций для анализа...')
-        cursor.execute("""
-            -- Функция: Категоризация статуса
-            CREATE OR REPLACE FUNCTION categorize_status(status_text TEXT)
-            RETURNS VARCHAR(50) AS $$
-            BEGIN
-                IF status_text IS NULL THEN
-                    RETURN 'Прочее';
-                END IF;
-                
-                status_text := LOWER(status_text);
-                
-                IF status_text LIKE '%положительн%' OR 
-                   status_text LIKE '%qanoatlantir%' OR
-                   status_text LIKE '%қаноатлантир%' THEN
-                    RETURN 'Положительно';
-                ELSIF status_text LIKE '%отрицательн%' OR
-                      status_text LIKE '%qanoatlantirilmadi%' OR
-                      status_text LIKE '%нет ответа%' OR
-                      status_text LIKE '%жалоб%' THEN
-                    RETURN 'Отрицательно';
-                ELSIF status_text LIKE '%занято%' OR
-                      status_text LIKE '%не дозвон%' THEN
-                    RETURN 'Не дозвонились';
-                ELSE
-                    RETURN 'Прочее';
-                END IF;
-            END;
-            $$ LANGUAGE plpgsql IMMUTABLE;
-            
-            -- Триггер: Автоматическая категоризация при вставке
-            CREATE OR REPLACE FUNCTION trigger_categorize_status()
-            RETURNS TRIGGER AS $$
-            BEGIN
-                NEW.status_category := categorize_status(NEW.status);
-                NEW.updated_at := CURRENT_TIMESTAMP;
-                RETURN NEW;
-            END;
-            $$ LANGUAGE plpgsql;
-            
-            DROP TRIGGER IF EXISTS before_insert_fixation ON fixations;
-            CREATE TRIGGER before_insert_fixation
-                BEFORE INSERT OR UPDATE ON fixations
-                FOR EACH ROW
-                EXECUTE FUNCTION trigger_categorize_status();
-        """)
-        print('  ✅ Функции и триггеры созданы')
+        # В секционированной fixations категория - вычисляемая колонка,
+        # построчный триггер остается только у старой таблицы до миграции
+        if is_partitioned(cursor, 'fixations'):
+            cursor.execute("""
+                DROP TRIGGER IF EXISTS before_insert_fixation ON fixations;
+                DROP FUNCTION IF EXISTS trigger_categorize_status();
+            """)
+        print('  ✅ Функции созданы')
         
         conn.commit()
         cursor.close()
@@ -352,8 +296,8 @@ def create_schema():
         print('     • operators (операторы)')
         print('     • services (службы: 101, 102, 103, 104)')
         print('     • regions (регионы)')
-        print('     • fixations (фиксации)')
-        print('     • incidents_112 (инциденты 112)')
+        print('     • fixations (фиксации, секции по месяцам)')
+        print('     • incidents_112 (инциденты 112, секции по месяцам)')
         print('\n   Представления:')
         print('     • v_fixations_full (полная информация)')
         print('     • v_operator_statistics (статистика операторов)')
@@ -361,7 +305,6 @@ def create_schema():
         print('     • v_region_statistics (статистика регионов)')
         print('\n   Функции:')
         print('     • categorize_status() (категоризация статусов)')
-        print('     • trigger_categorize_status() (авто-категоризация)')
         print('\n' + '='*80)
         
     except psycopg2.Error as e:
@@ -18,40 +18,13 @@ import sys
 BASE_DIR = Path(__file__).parent.parent.parent
 DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
 DATA_DIR = BASE_DIR / 'data'
-IMPORT_DIR = BASE_DIR / '123'
 LOG_DIR = BASE_DIR / 'logs' / 'database'
 
-# Паттерны для исключения из импорта (имена операторов, которые нужно пропускать)
-EXCLUDE_PATTERNS = [
-    'Тренды',
-    'Текущий месяц - Сводка',
-    'Предыдущий месяц - Сводка',
-    'СВОДКА СОТРУДНИКИ',
-    'Ноябрь 2025',
-    'Декабрь 2025',
-    'сводка',  # любые сводки
-    'итого',   # любые итоги
-    'total',
-    'summary',
-]
-
-def should_exclude_operator(operator_name):
-    """Проверка, нужно ли исключить оператора"""
-    if not operator_name:
-        return True
-    
-    operator_str = str(operator_name).strip().lower()
-    
-    # Пустые значения
-    if operator_str in ['', '-', 'nan', 'none', 'null']:
-        return True
-    
-    # Проверка паттернов
-    for pattern in EXCLUDE_PATTERNS:
-        if pattern.lower() in operator_str:
-            return True
-    
-    return False
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from database.report_cache import bump_data_version
+from database.dimensions import DimensionResolver
+from database.exclusions import is_excluded, excluded_mask, ensure_excluded_column
+from database.file_catalog import pending, mark, STATUS_PROCESSED, STATUS_ERROR
 
 def log_import(message, level='INFO'):
     """Логирование импорта"""
@@ -63,93 +36,132 @@ def log_import(message, level='INFO'):
     
     print(f'[{level}] {message}')
 
-def get_or_create_operator(cursor, operator_name):
-    """Получить или создать оператора"""
-    # Проверяем, нужно ли исключить
-    if should_exclude_operator(operator_name):
-        return None
-    
-    operator_name = str(operator_name).strip()
-    
-    # Проверяем существование
-    cursor.execute('SELECT operator_id FROM operators WHERE operator_name = ?', (operator_name,))
-    result = cursor.fetchone()
-    
-    if result:
-        return result[0]
-    
-    # Создаем нового
-    cursor.execute('''
-        INSERT INTO operators (operator_name, position)
-        VALUES (?, ?)
-    ''', (operator_name, 'Оператор'))
-    
-    return cursor.lastrowid
+# Колонки Excel истории звонков -> текстовые колонки applications
+APPLICATION_TEXT_COLUMNS = {
+    'Номер карты': 'card_number',
+    'Номер инцидента': 'incident_number',
+    'ФИО заявителя': 'caller_name',
+    'Телефон': 'caller_phone',
+    'Дата звонка': 'call_date',
+    'Время звонка': 'call_time',
+    'Адрес': 'address',
+    'Район': 'district',
+    'Повод': 'reason',
+    'Описание': 'description',
+    'Примечание': 'notes',
+}
 
-def get_or_create_service(cursor, service_code, service_name=None):
-    """Получить или создать службу"""
-    if not service_code or str(service_code).strip() == '':
-        return None
-    
-    service_code = str(service_code).strip()
-    
-    # Проверяем существование
-    cursor.execute('SELECT service_id FROM services WHERE service_code = ?', (service_code,))
-    result = cursor.fetchone()
-    
-    if result:
-        return result[0]
-    
-    # Создаем новую
-    if not service_name:
-        service_name = f'Служба {service_code}'
-    
-    cursor.execute('''
-        INSERT INTO services (service_code, service_name)
-        VALUES (?, ?)
-    ''', (service_code, service_name))
-    
-    return cursor.lastrowid
+APPLICATION_COLUMNS = [
+    'application_number', 'card_number', 'incident_number',
+    'service_id', 'region_id',
+    'caller_name', 'caller_phone',
+    'call_date', 'call_time', 'address', 'district', 'reason', 'description',
+    'status', 'notes'
+]
+
+REJECT_NO_KEY = 'Нет даты звонка и номера инцидента'
+
+def _column(df, name):
+    """Колонка Excel или пустая колонка, если ее нет в файле"""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(None, index=df.index, dtype=object)
 
-def get_or_create_region(cursor, region_name):
-    """Получить или создать регион"""
-    if not region_name or str(region_name).strip() == '' or str(region_name).lower() == 'не указано':
+def _clean_text(series):
+    """str(значение).strip() для непустых значений, пропуски - NaN"""
+    text = series.astype(str).str.strip()
+    return text.where(series.notna())
+
+def load_dimensions(conn):
+    """Справочники операторов, служб и регионов в памяти"""
+    # Флаг исключения оператора вычисляется один раз - при добавлении в справочник
+    ensure_excluded_column(conn)
+    return {
+        'operators': DimensionResolver(
+            conn, 'operators', defaults={'position': 'Оператор', 'excluded': lambda name: int(is_excluded(name))}
+        ),
+        'services': DimensionResolver(conn, 'services', defaults={'service_name': lambda code: f'Служба {code}'}),
+        'regions': DimensionResolver(conn, 'regions'),
+    }
+
+def prepare_applications(df, dimensions):
+    """
+    Подготовить строки applications из таблицы истории звонков.
+    Новые службы и регионы добавляются в справочники пачкой.
+    Возвращает (DataFrame с колонками APPLICATION_COLUMNS, отклоненные строки).
+    """
+    # Без даты звонка и номера инцидента строку не с чем связать
+    valid = _column(df, 'Дата звонка').notna() | _column(df, 'Номер инцидента').notna()
+    rejects = df[~valid].assign(Причина=REJECT_NO_KEY)
+    df = df[valid]
+    
+    records = pd.DataFrame(index=df.index)
+    for source, target in APPLICATION_TEXT_COLUMNS.items():
+        records[target] = _clean_text(_column(df, source))
+    
+    # Номер заявки: номер инцидента, иначе уникальный технический номер
+    number = records['incident_number']
+    no_number = number.isna() | number.isin(['', 'nan'])
+    stamp = datetime.now().timestamp()
+    records['application_number'] = number.where(
+        ~no_number, pd.Series([f'APP_{stamp}_{idx}' for idx in df.index], index=df.index)
+    )
+    
+    status = _clean_text(_column(df, 'Статус'))
+    records['status'] = status.where(status.notna(), 'Новая')
+    
+    # Службы: код -> service_id (название берется из первой строки с этим кодом)
+    records['service_id'] = dimensions['services'].resolve(
+        _column(df, 'Код службы'), service_name=_clean_text(_column(df, 'Название службы'))
+    )
+    
+    # Регионы: 'не указано' - без региона
+    region_names = _clean_text(_column(df, 'Область'))
+    region_names = region_names.where(region_names.str.lower() != 'не указано')
+    records['region_id'] = dimensions['regions'].resolve(region_names)
+    
+    return records[APPLICATION_COLUMNS], rejects
+
+def save_rejects(rejects, name):
+    """Сохранить отклоненные строки в logs/database/ (CSV)"""
+    if rejects.empty:
         return None
-    
-    region_name = str(region_name).strip()
-    
-    # Проверяем существование
-    cursor.execute('SELECT region_id FROM regions WHERE region_name = ?', (region_name,))
-    result = cursor.fetchone()
-    
-    if result:
-        return result[0]
-    
-    # Создаем новый
-    cursor.execute('''
-        INSERT INTO regions (region_name)
-        VALUES (?)
-    ''', (region_name,))
-    
-    return cursor.lastrowid
+    reject_file = LOG_DIR / f'import_rejects_{name}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    rejects.to_csv(reject_file, index=False, encoding='utf-8-sig')
+    return reject_file
 
 def import_applications_from_excel():
-    """Импорт заявок из Excel файлов"""
+    """
+    Импорт заявок из Excel файлов.
+    Файлы берутся из каталога (file_catalog): уже импортированные и
+    неизмененные файлы не открываются.
+    Каждый файл: колонки чистятся целиком, справочники берутся из памяти,
+    строки загружаются одним executemany в одной транзакции.
+    Возвращает (импортировано, пропущено, DataFrame отклоненных строк).
+    """
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
     log_import('Начало импорта заявок из Excel')
     
-    # Ищем файлы с историей звонков
-    excel_files = list(IMPORT_DIR.glob('История*.xlsx'))
+    # Новые и измененные файлы с историей звонков
+    excel_files = pending(conn, 'history')
     
     if not excel_files:
-        log_import('Нет файлов для импорта в папке 123/', 'WARNING')
+        log_import('Нет новых файлов для импорта в папке 123/', 'WARNING')
         conn.close()
-        return
+        return 0, 0, pd.DataFrame()
     
     total_imported = 0
     total_skipped = 0
+    all_rejects = []
+    
+    dimensions = load_dimensions(conn)
+    
+    insert_sql = f'''
+        INSERT OR REPLACE INTO applications ({', '.join(APPLICATION_COLUMNS)})
+        VALUES ({', '.join('?' * len(APPLICATION_COLUMNS))})
+    '''
     
     for file_path in excel_files:
         log_import(f'Импорт файла: {file_path.name}')
@@ -158,73 +170,37 @@ def import_applications_from_excel():
             df = pd.read_excel(file_path)
             log_import(f'  Найдено записей: {len(df)}')
             
-            for idx, row in df.iterrows():
-                try:
-                    # Пропускаем записи без ключевых данных
-                    if pd.isna(row.get('Дата звонка')) and pd.isna(row.get('Номер инцидента')):
-                        total_skipped += 1
-                        continue
-                    
-                    # Получаем или создаем связанные записи
-                    service_id = None
-                    if 'Код службы' in row and not pd.isna(row['Код службы']):
-                        service_name = row.get('Название службы', None)
-                        service_id = get_or_create_service(cursor, row['Код службы'], service_name)
-                    
-                    region_id = None
-                    if 'Область' in row and not pd.isna(row['Область']):
-                        region_id = get_or_create_region(cursor, row['Область'])
-                    
-                    # Формируем уникальный номер заявки
-                    application_number = str(row.get('Номер инцидента', f'APP_{datetime.now().timestamp()}')).strip()
-                    if not application_number or application_number == 'nan':
-                        application_number = f'APP_{datetime.now().timestamp()}_{idx}'
-                    
-                    # Вставляем заявку
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO applications (
-                            application_number, card_number, incident_number,
-                            service_id, region_id,
-                            caller_name, caller_phone,
-                            call_date, call_time, address, district, reason, description,
-                            status, notes
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        application_number,
-                        str(row.get('Номер карты', '')).strip() if not pd.isna(row.get('Номер карты')) else None,
-                        str(row.get('Номер инцидента', '')).strip() if not pd.isna(row.get('Номер инцидента')) else None,
-                        service_id,
-                        region_id,
-                        str(row.get('ФИО заявителя', '')).strip() if not pd.isna(row.get('ФИО заявителя')) else None,
-                        str(row.get('Телефон', '')).strip() if not pd.isna(row.get('Телефон')) else None,
-                        row.get('Дата звонка'),
-                        str(row.get('Время звонка', '')).strip() if not pd.isna(row.get('Время звонка')) else None,
-                        str(row.get('Адрес', '')).strip() if not pd.isna(row.get('Адрес')) else None,
-                        str(row.get('Район', '')).strip() if not pd.isna(row.get('Район')) else None,
-                        str(row.get('Повод', '')).strip() if not pd.isna(row.get('Повод')) else None,
-                        str(row.get('Описание', '')).strip() if not pd.isna(row.get('Описание')) else None,
-                        str(row.get('Статус', 'Новая')).strip() if not pd.isna(row.get('Статус')) else 'Новая',
-                        str(row.get('Примечание', '')).strip() if not pd.isna(row.get('Примечание')) else None
-                    ))
-                    
-                    total_imported += 1
-                    
-                except Exception as e:
-                    log_import(f'  Ошибка в строке {idx}: {str(e)}', 'ERROR')
-                    total_skipped += 1
-                    continue
+            records, rejects = prepare_applications(df, dimensions)
+            rows = records.astype(object).where(records.notna(), None)
+            cursor.executemany(insert_sql, rows.itertuples(index=False, name=None))
             
+            bump_data_version(conn, 'applications')
             conn.commit()
-            log_import(f'  ✅ Импортировано: {total_imported}')
+            mark(conn, 'history', [file_path], STATUS_PROCESSED, rows=len(records))
+            
+            total_imported += len(records)
+            total_skipped += len(rejects)
+            if not rejects.empty:
+                all_rejects.append(rejects.assign(Файл=file_path.name))
+            log_import(f'  ✅ Импортировано: {len(records)}, отклонено: {len(rejects)}')
             
         except Exception as e:
             log_import(f'  Ошибка при обработке файла: {str(e)}', 'ERROR')
             conn.rollback()
+            mark(conn, 'history', [file_path], STATUS_ERROR, error=str(e))
+            # Новые службы/регионы этого файла откатились вместе с транзакцией
+            for resolver in dimensions.values():
+                resolver.reload()
     
     conn.close()
     
+    rejects = pd.concat(all_rejects, ignore_index=True) if all_rejects else pd.DataFrame()
+    reject_file = save_rejects(rejects, 'applications')
+    if reject_file:
+        log_import(f'Отклоненные строки: {reject_file}', 'WARNING')
+    
     log_import(f'Импорт завершен. Импортировано: {total_imported}, Пропущено: {total_skipped}', 'SUCCESS')
-    return total_imported, total_skipped
+    return total_imported, total_skipped, rejects
 
 def import_fixations_from_csv():
     """Импорт фиксаций из CSV файлов"""
@@ -244,6 +220,8 @@ def import_fixations_from_csv():
     total_imported = 0
     total_skipped = 0
     
+    dimensions = load_dimensions(conn)
+    
     for file_path in csv_files:
         log_import(f'Импорт файла: {file_path.name}')
         
@@ -251,6 +229,12 @@ def import_fixations_from_csv():
             df = pd.read_csv(file_path, encoding='utf-8-sig')
             log_import(f'  Найдено записей: {len(df)}')
             
+            # Операторы всего файла - одним обращением к справочнику
+            operators = _column(df, 'Оператор фиксировавший')
+            operator_ids = dimensions['operators'].resolve(
+                operators.where(~excluded_mask(operators))
+            )
+            
             for idx, row in df.iterrows():
                 try:
                     # Пропускаем записи без оператора
@@ -258,11 +242,12 @@ def import_fixations_from_csv():
                         total_skipped += 1
                         continue
                     
-                    # Получаем или создаем оператора
-                    operator_id = get_or_create_operator(cursor, row['Оператор фиксировавший'])
-                    if not operator_id:
+                    # Исключенные операторы (сводки, итоги) пропускаем
+                    operator_id = operator_ids[idx]
+                    if pd.isna(operator_id):
                         total_skipped += 1
                         continue
+                    operator_id = int(operator_id)
                     
                     # Ищем заявку по номеру карты
                     application_id = None
@@ -305,12 +290,14 @@ def import_fixations_from_csv():
                     total_skipped += 1
                     continue
             
+            bump_data_version(conn, 'fixations')
             conn.commit()
             log_import(f'  ✅ Импортировано: {total_imported}')
             
         except Exception as e:
             log_import(f'  Ошибка при обработке файла: {str(e)}', 'ERROR')
             conn.rollback()
+            dimensions['operators'].reload()
     
     conn.close()
     
@@ -327,7 +314,7 @@ def main():
     
     # Импорт заявок
     print('\n1️⃣  Импорт заявок из Excel...')
-    app_imported, app_skipped = import_applications_from_excel()
+    app_imported, app_skipped, _ = import_applications_from_excel()
     print(f'   ✅ Импортировано заявок: {app_imported}')
     print(f'   ⚠️  Пропущено: {app_skipped}')
     
@@ -90,7 +90,7 @@ def full_initialization():
     print('\n2️⃣  ИМПОРТ ЗАЯВОК ИЗ EXCEL')
     print('-' * 80)
     try:
-        app_imported, app_skipped = import_applications_from_excel()
+        app_imported, app_skipped, _ = import_applications_from_excel()
         print(f'✅ Импортировано: {app_imported}, Пропущено: {app_skipped}')
     except Exception as e:
         print(f'❌ Ошибка импорта заявок: {e}')
@@ -137,7 +137,7 @@ def main():
             
             elif choice == '2':
                 print('\n' + '=' * 80)
-                app_imported, app_skipped = import_applications_from_excel()
+                app_imported, app_skipped, _ = import_applications_from_excel()
                 print(f'\n✅ Импортировано: {app_imported}')
                 print(f'⚠️  Пропущено: {app_skipped}')
                 print('=' * 80)
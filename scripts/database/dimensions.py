@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+СПРАВОЧНИКИ (operators, services, regions) В ПАМЯТИ
+=============================================================================
+Общая замена get_or_create_operator / get_or_create_service /
+get_or_create_region из импортеров: вместо SELECT + INSERT на каждую
+запись справочник загружается в словарь {ключ: id} один раз.
+
+- resolve(series)  - id для всей колонки через .map, новые ключи
+                     добавляются одним INSERT на пачку
+- get(value)       - id для одного значения (тот же кэш)
+
+Новые ключи вставляются через
+    INSERT ... ON CONFLICT (ключ) DO NOTHING RETURNING ключ, id
+Ключи, которые в это же время добавил другой импортер (конфликт, строка
+не возвращена), дочитываются одним SELECT - кэш всегда совпадает с БД.
+
+Работает с sqlite3 (SQLite >= 3.35) и psycopg2.
+
+Использование:
+    from database.dimensions import DimensionResolver
+    services = DimensionResolver(conn, 'services', defaults={'service_name': lambda code: f'Служба {code}'})
+    df['service_id'] = services.resolve(df['Код службы'], service_name=df['Название службы'])
+=============================================================================
+"""
+
+import sqlite3
+import pandas as pd
+
+# Таблица -> (колонка ключа, колонка id)
+DIMENSIONS = {
+    'operators': ('operator_name', 'operator_id'),
+    'services': ('service_code', 'service_id'),
+    'regions': ('region_name', 'region_id'),
+}
+
+# Строк в одном INSERT (лимит параметров SQLite - 999 в старых версиях)
+BATCH_SIZE = 200
+
+EMPTY_VALUES = ['', 'nan', 'none', 'null']
+
+
+def is_postgres(conn):
+    return not isinstance(conn, sqlite3.Connection)
+
+
+def clean_keys(values):
+    """Ключи справочника: str().strip(), пустые значения - NaN"""
+    values = pd.Series(values)
+    text = values.astype(str).str.strip()
+    return text.where(values.notna() & ~text.str.lower().isin(EMPTY_VALUES))
+
+
+class DimensionResolver:
+    """Справочник БД в памяти: {ключ: id}"""
+
+    def __init__(self, conn, table, defaults=None):
+        """
+        defaults: значения остальных колонок для новых строк -
+        {колонка: значение или функция(ключ)}.
+        """
+        self.conn = conn
+        self.table = table
+        self.key_column, self.id_column = DIMENSIONS[table]
+        self.defaults = defaults or {}
+        self.placeholder = '%s' if is_postgres(conn) else '?'
+        self.ids = {}
+        self.reload()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def reload(self):
+        """Перечитать справочник (например, после отката транзакции)"""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f'SELECT {self.key_column}, {self.id_column} FROM {self.table}')
+            self.ids = dict(cursor.fetchall())
+        finally:
+            cursor.close()
+        return self
+
+    def _value(self, column, key, extra):
+        value = extra.get(column, {}).get(key)
+        if value is not None and not pd.isna(value) and str(value).strip() != '':
+            return value
+        default = self.defaults.get(column)
+        return default(key) if callable(default) else default
+
+    def _fetch(self, cursor, keys):
+        """Дочитать id ключей, вставленных другим импортером"""
+        marks = ', '.join([self.placeholder] * len(keys))
+        cursor.execute(
+            f'SELECT {self.key_column}, {self.id_column} FROM {self.table} '
+            f'WHERE {self.key_column} IN ({marks})',
+            keys
+        )
+        self.ids.update(cursor.fetchall())
+
+    def ensure(self, keys, extra=None):
+        """
+        Добавить в справочник ключи, которых еще нет в кэше.
+        extra: {колонка: {ключ: значение}} для новых строк.
+        Возвращает число добавленных строк.
+        """
+        extra = extra or {}
+        missing = [key for key in dict.fromkeys(keys) if key not in self.ids]
+        if not missing:
+            return 0
+
+        columns = [self.key_column] + list(dict.fromkeys(list(self.defaults) + list(extra)))
+        row_marks = '(' + ', '.join([self.placeholder] * len(columns)) + ')'
+        inserted = 0
+
+        cursor = self.conn.cursor()
+        try:
+            for start in range(0, len(missing), BATCH_SIZE):
+                batch = missing[start:start + BATCH_SIZE]
+                params = []
+                for key in batch:
+                    params.append(key)
+                    params.extend(self._value(column, key, extra) for column in columns[1:])
+
+                cursor.execute(
+                    f'INSERT INTO {self.table} ({", ".join(columns)}) '
+                    f'VALUES {", ".join([row_marks] * len(batch))} '
+                    f'ON CONFLICT ({self.key_column}) DO NOTHING '
+                    f'RETURNING {self.key_column}, {self.id_column}',
+                    params
+                )
+                returned = cursor.fetchall()
+                inserted += len(returned)
+                self.ids.update(returned)
+
+                conflicts = [key for key in batch if key not in self.ids]
+                if conflicts:
+                    self._fetch(cursor, conflicts)
+        finally:
+            cursor.close()
+        return inserted
+
+    def resolve(self, values, **extra):
+        """
+        id для каждого значения серии (Int64, пустые ключи - <NA>).
+        extra: колонка=Series (выровненная с values) - значения для новых
+        строк справочника, берется первое непустое для каждого ключа.
+        """
+        keys = clean_keys(values)
+        present = keys.dropna()
+        extra_maps = {}
+        for column, series in extra.items():
+            series = pd.Series(series, index=keys.index)
+            pairs = pd.DataFrame({'key': keys, 'value': series}).dropna()
+            extra_maps[column] = pairs.drop_duplicates('key').set_index('key')['value'].to_dict()
+        self.ensure(present.unique().tolist(), extra_maps)
+        return keys.map(self.ids).astype('Int64')
+
+    def get(self, value, **extra):
+        """id одного значения (None для пустого ключа)"""
+        key = clean_keys([value]).iloc[0]
+        if pd.isna(key):
+            return None
+        if key not in self.ids:
+            self.ensure([key], {column: {key: v} for column, v in extra.items()})
+        return self.ids.get(key)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+ПРАВИЛА ИСКЛЮЧЕНИЯ СТРОК (сводки, итоги, отмеченные красным)
+=============================================================================
+Один набор правил вместо EXCLUDE_PATTERNS в каждом модуле:
+
+- EXCLUDE_PATTERNS        - подстроки (без учета регистра), собираются
+                            в одно регулярное выражение
+- СТРОКИ_ДЛЯ_УДАЛЕНИЯ.txt - точные значения из красных строк отчетов
+                            (extract_red_items.py), хранятся в множестве
+- пустые значения ('', '-', 'nan', 'none', 'null')
+
+Правила проверяются один раз - при импорте оператора. Результат хранится
+в operators.excluded (с индексом), отчеты фильтруют по флагу:
+    WHERE o.excluded = 0
+
+Использование:
+    from database.exclusions import is_excluded, excluded_mask, refresh_excluded
+    is_excluded('Текущий месяц - Сводка')    # True
+    df = df[~excluded_mask(df['Оператор'])]
+    refresh_excluded(conn)                    # флаги для новых операторов
+
+    python scripts/database/exclusions.py    # пересчитать флаги всех операторов
+=============================================================================
+"""
+
+import re
+import sqlite3
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent.parent
+DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
+RED_ROWS_FILE = BASE_DIR / 'СТРОКИ_ДЛЯ_УДАЛЕНИЯ.txt'
+
+# Подстроки: служебные листы и строки сводок
+EXCLUDE_PATTERNS = [
+    'Тренды',
+    'Текущий месяц - Сводка',
+    'Предыдущий месяц - Сводка',
+    'СВОДКА СОТРУДНИКИ',
+    'Ноябрь 2025',
+    'Декабрь 2025',
+    'Текущий месяц',
+    'Предыдущий месяц',
+    'сводка',  # любые сводки
+    'итого',   # любые итоги
+    'total',
+    'summary',
+]
+
+EMPTY_VALUES = ['', '-', 'nan', 'none', 'null']
+
+
+def load_red_rows(path=RED_ROWS_FILE):
+    """Точные значения из красных строк (файл extract_red_items.py)"""
+    if not Path(path).exists():
+        return []
+    with open(path, encoding='utf-8') as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+class ExclusionRules:
+    """Скомпилированные правила: одно регулярное выражение + множество точных значений"""
+
+    def __init__(self, patterns=EXCLUDE_PATTERNS, exact=()):
+        ordered = sorted({p.lower() for p in patterns}, key=len, reverse=True)
+        self.regex = re.compile('|'.join(re.escape(p) for p in ordered)) if ordered else None
+        self.exact = {value.strip().lower() for value in exact} | set(EMPTY_VALUES)
+
+    def is_excluded(self, value):
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return True
+        text = str(value).strip().lower()
+        if text in self.exact:
+            return True
+        return bool(self.regex and self.regex.search(text))
+
+    def mask(self, series):
+        """Булева маска исключаемых значений (проверка по уникальным значениям)"""
+        series = pd.Series(series)
+        codes, uniques = pd.factorize(series, use_na_sentinel=False)
+        flags = np.array([self.is_excluded(value) for value in uniques], dtype=bool)
+        return pd.Series(flags[codes], index=series.index)
+
+
+_rules = None
+
+
+def get_rules(reload=False):
+    """Правила загружаются и компилируются один раз на процесс"""
+    global _rules
+    if _rules is None or reload:
+        _rules = ExclusionRules(EXCLUDE_PATTERNS, load_red_rows())
+    return _rules
+
+
+def is_excluded(value):
+    return get_rules().is_excluded(value)
+
+
+def excluded_mask(series):
+    return get_rules().mask(series)
+
+
+# =============================================================================
+# ФЛАГ operators.excluded
+# =============================================================================
+
+def _placeholder(conn):
+    return '?' if isinstance(conn, sqlite3.Connection) else '%s'
+
+
+def ensure_excluded_column(conn):
+    """Колонка operators.excluded (NULL - еще не проверен) и индекс по ней"""
+    cursor = conn.cursor()
+    try:
+        if isinstance(conn, sqlite3.Connection):
+            cursor.execute('PRAGMA table_info(operators)')
+            if 'excluded' not in [row[1] for row in cursor.fetchall()]:
+                cursor.execute('ALTER TABLE operators ADD COLUMN excluded INTEGER')
+        else:
+            cursor.execute('ALTER TABLE operators ADD COLUMN IF NOT EXISTS excluded INTEGER')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_operator_excluded ON operators(excluded)')
+    finally:
+        cursor.close()
+
+
+def refresh_excluded(conn, recheck=False):
+    """
+    Проставить operators.excluded.
+    По умолчанию проверяются только новые операторы (excluded IS NULL);
+    recheck=True - все (после изменения правил или красных строк).
+    Возвращает число исключенных среди проверенных.
+    """
+    ensure_excluded_column(conn)
+    rules = get_rules(reload=recheck)
+
+    cursor = conn.cursor()
+    try:
+        where = '' if recheck else ' WHERE excluded IS NULL'
+        cursor.execute(f'SELECT operator_id, operator_name FROM operators{where}')
+        rows = cursor.fetchall()
+        if rows:
+            flags = rules.mask([name for _, name in rows])
+            mark = _placeholder(conn)
+            cursor.executemany(
+                f'UPDATE operators SET excluded = {mark} WHERE operator_id = {mark}',
+                [(int(flag), operator_id) for flag, (operator_id, _) in zip(flags, rows)]
+            )
+        conn.commit()
+        return int(sum(flags)) if rows else 0
+    finally:
+        cursor.close()
+
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        excluded = refresh_excluded(conn, recheck=True)
+    finally:
+        conn.close()
+    rules = get_rules()
+    print(f"✓ Правила: {len(EXCLUDE_PATTERNS)} подстрок, {len(rules.exact) - len(EMPTY_VALUES)} точных значений")
+    print(f"✓ Исключено операторов: {excluded}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+КАТАЛОГ ВХОДЯЩИХ ФАЙЛОВ (123/, incoming_data/applications)
+=============================================================================
+Таблица file_catalog в основной БД - что лежит в папках загрузки и что
+с этим уже сделано:
+
+    source, path       - источник ('112', 'history', 'applications') и путь
+                         относительно корня проекта
+    size, mtime        - по ним сканер понимает, что файл не менялся,
+                         не открывая его
+    sha256             - содержимое (повторная загрузка того же файла
+                         под другим именем -> status 'duplicate'; такой
+                         файл не разбирается, а если оригинал удален или
+                         больше не 'processed' - снова становится 'new')
+    date_start/date_end, period, rows
+                       - диапазон дат и число строк (для 112 - сразу при
+                         сканировании, из снимка data/snapshots_112)
+    status             - new / processed / error / invalid / duplicate
+
+Изменился размер или время файла - пересчитывается хэш; новое содержимое
+снова получает status 'new'. Файлы, которые исчезли из папки (например,
+перемещены в processed/), остаются в каталоге как история.
+
+Использование:
+    from database.file_catalog import scan, pending, mark, catalog_files
+    conn = sqlite3.connect(DB_PATH)
+    for path in pending(conn, 'history'):       # новые и измененные файлы
+        ...
+        mark(conn, 'history', [path], 'processed', rows=n)
+
+    python scripts/database/file_catalog.py     # просканировать все папки
+=============================================================================
+"""
+
+import sys
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+
+BASE_DIR = Path(__file__).parent.parent.parent
+DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
+
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from data_processing.snapshots_112 import ingest_file, file_hash, InvalidFile112
+
+HISTORY_PATTERN = 'История*.xlsx'
+
+# Источник -> (папка, шаблоны имен, исключенные шаблоны)
+SOURCES = {
+    # История звонков лежит в той же папке, но это отдельный источник
+    '112': (BASE_DIR / '123', ['*.xlsx'], [HISTORY_PATTERN]),
+    'history': (BASE_DIR / '123', [HISTORY_PATTERN], []),
+    'applications': (BASE_DIR / 'incoming_data' / 'applications', ['*.xlsx', '*.xls', '*.csv'], []),
+}
+
+STATUS_NEW = 'new'
+STATUS_PROCESSED = 'processed'
+STATUS_ERROR = 'error'
+STATUS_INVALID = 'invalid'
+STATUS_DUPLICATE = 'duplicate'
+
+
+def ensure_catalog(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS file_catalog (
+            source TEXT NOT NULL,
+            path TEXT NOT NULL,
+            size INTEGER,
+            mtime REAL,
+            sha256 TEXT,
+            date_start TEXT,
+            date_end TEXT,
+            period TEXT,
+            rows INTEGER,
+            status TEXT NOT NULL DEFAULT 'new',
+            error TEXT,
+            scanned_at TEXT,
+            processed_at TEXT,
+            PRIMARY KEY (source, path)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_file_catalog_status ON file_catalog(source, status)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_file_catalog_sha256 ON file_catalog(sha256)')
+
+
+def relative_path(path):
+    """Путь в каталоге: относительно корня проекта, через /"""
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(BASE_DIR.resolve()).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def absolute_path(path):
+    path = Path(path)
+    return path if path.is_absolute() else BASE_DIR / path
+
+
+def _inspect_112(path, sha256):
+    """Число строк и диапазон дат файла 112 (заодно сохраняется снимок)"""
+    try:
+        info = ingest_file(path, sha256)
+    except InvalidFile112 as e:
+        return {'status': STATUS_INVALID, 'error': str(e)}
+    return {
+        'rows': info['rows'],
+        'date_start': info['period_start'],
+        'date_end': info['period_end'],
+        'period': info['period'],
+    }
+
+
+# Источники, файлы которых разбираются уже при сканировании
+INSPECTORS = {
+    '112': _inspect_112,
+}
+
+
+def source_files(source):
+    """Файлы источника в его папке (с учетом исключенных шаблонов)"""
+    folder, patterns, excluded = SOURCES[source]
+    return sorted({
+        path for pattern in patterns for path in folder.glob(pattern)
+        if not any(path.match(skip) for skip in excluded)
+    })
+
+
+def processed_original(conn, source, sha256, path):
+    """Обработанный файл с тем же содержимым, который еще лежит на месте"""
+    for (original,) in conn.execute(
+        'SELECT path FROM file_catalog WHERE source = ? AND sha256 = ? AND path != ? AND status = ?',
+        (source, sha256, path, STATUS_PROCESSED)
+    ).fetchall():
+        if absolute_path(original).exists():
+            return original
+    return None
+
+
+def recheck_duplicates(conn, source, inspect=True):
+    """
+    Дубликаты, у которых больше нет обработанного оригинала (удален или
+    перемаркирован), снова становятся 'new' и разбираются, если у источника
+    есть разбор при сканировании. Возвращает число таких файлов.
+    """
+    inspector = INSPECTORS.get(source) if inspect else None
+    released = 0
+    for path, sha256 in conn.execute(
+        'SELECT path, sha256 FROM file_catalog WHERE source = ? AND status = ?',
+        (source, STATUS_DUPLICATE)
+    ).fetchall():
+        file = absolute_path(path)
+        if not file.exists() or processed_original(conn, source, sha256, path):
+            continue
+
+        row = {'status': STATUS_NEW, 'error': None, 'rows': None,
+               'date_start': None, 'date_end': None, 'period': None}
+        if inspector:
+            row.update(inspector(file, sha256))
+        conn.execute('''
+            UPDATE file_catalog
+            SET status = ?, error = ?, rows = ?, date_start = ?, date_end = ?, period = ?
+            WHERE source = ? AND path = ?
+        ''', (row['status'], row['error'], row['rows'], row['date_start'], row['date_end'],
+              row['period'], source, path))
+        released += 1
+    return released
+
+
+def scan(conn, source, inspect=True):
+    """
+    Обновить каталог по папке источника.
+    Неизмененные файлы (тот же размер и mtime) не открываются.
+    Дубликаты без оригинала проверяются заново (recheck_duplicates).
+    Возвращает {'new': n, 'changed': n, 'unchanged': n, 'released': n}.
+    """
+    ensure_catalog(conn)
+    files = source_files(source)
+
+    # Записи, попавшие в источник до исключения шаблона (история в '112')
+    excluded = SOURCES[source][2]
+    conn.executemany(
+        'DELETE FROM file_catalog WHERE source = ? AND path = ?',
+        [(source, path) for (path,) in conn.execute(
+            'SELECT path FROM file_catalog WHERE source = ?', (source,)
+        ).fetchall() if any(Path(path).match(skip) for skip in excluded)]
+    )
+
+    known = {
+        path: (size, mtime, sha256)
+        for path, size, mtime, sha256 in conn.execute(
+            'SELECT path, size, mtime, sha256 FROM file_catalog WHERE source = ?', (source,)
+        )
+    }
+    inspector = INSPECTORS.get(source) if inspect else None
+    now = datetime.now().isoformat(timespec='seconds')
+    counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+
+    for file in files:
+        path = relative_path(file)
+        stat = file.stat()
+        previous = known.get(path)
+        if previous and previous[0] == stat.st_size and previous[1] == stat.st_mtime:
+            counts['unchanged'] += 1
+            continue
+
+        sha256 = file_hash(file)
+        if previous and previous[2] == sha256:
+            # Файл перезаписан тем же содержимым - статус не меняется
+            conn.execute(
+                'UPDATE file_catalog SET size = ?, mtime = ?, scanned_at = ? WHERE source = ? AND path = ?',
+                (stat.st_size, stat.st_mtime, now, source, path)
+            )
+            counts['unchanged'] += 1
+            continue
+
+        counts['changed' if previous else 'new'] += 1
+        row = {'status': STATUS_NEW, 'error': None, 'rows': None,
+               'date_start': None, 'date_end': None, 'period': None}
+
+        # То же содержимое уже обработано под другим именем - файл
+        # не разбирается (снимок у оригинала уже есть)
+        original = processed_original(conn, source, sha256, path)
+        if original:
+            row.update(status=STATUS_DUPLICATE, error=f'как {original}')
+        elif inspector:
+            row.update(inspector(file, sha256))
+
+        conn.execute('''
+            INSERT INTO file_catalog (source, path, size, mtime, sha256, date_start, date_end,
+                                      period, rows, status, error, scanned_at, processed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, NULL)
+            ON CONFLICT (source, path) DO UPDATE SET
+                size = excluded.size, mtime = excluded.mtime, sha256 = excluded.sha256,
+                date_start = excluded.date_start, date_end = excluded.date_end,
+                period = excluded.period, rows = excluded.rows, status = excluded.status,
+                error = excluded.error, scanned_at = excluded.scanned_at, processed_at = NULL
+        ''', (source, path, stat.st_size, stat.st_mtime, sha256, row['date_start'], row['date_end'],
+              row['period'], row['rows'], row['status'], row['error'], now))
+
+    counts['released'] = recheck_duplicates(conn, source, inspect)
+    conn.commit()
+    return counts
+
+
+def catalog_files(conn, source, statuses=None, present=True):
+    """
+    Файлы источника из каталога (DataFrame). statuses - список статусов,
+    present=True - только файлы, которые сейчас лежат в папке.
+    """
+    ensure_catalog(conn)
+    query = 'SELECT * FROM file_catalog WHERE source = ?'
+    params = [source]
+    if statuses:
+        query += f" AND status IN ({', '.join('?' * len(statuses))})"
+        params.extend(statuses)
+    df = pd.read_sql_query(query + ' ORDER BY path', conn, params=params)
+    if present and not df.empty:
+        df = df[df['path'].map(lambda p: absolute_path(p).exists())].reset_index(drop=True)
+    return df
+
+
+def pending(conn, source):
+    """
+    Просканировать папку и вернуть пути файлов, которые еще не обработаны
+    (включая дубликаты, оригинал которых удален или перемаркирован)
+    """
+    scan(conn, source)
+    df = catalog_files(conn, source, [STATUS_NEW])
+    return [absolute_path(path) for path in df['path']]
+
+
+def mark(conn, source, paths, status, rows=None, error=None):
+    """Записать результат обработки файлов"""
+    ensure_catalog(conn)
+    now = datetime.now().isoformat(timespec='seconds')
+    conn.executemany('''
+        UPDATE file_catalog
+        SET status = ?, rows = COALESCE(?, rows), error = ?, processed_at = ?
+        WHERE source = ? AND path = ?
+    ''', [(status, rows, error, now, source, relative_path(path)) for path in paths])
+    conn.commit()
+
+
+def move_entry(conn, source, old_path, new_path):
+    """Файл перемещен (например, в processed/) - путь в каталоге меняется вместе с ним"""
+    conn.execute(
+        'UPDATE file_catalog SET path = ? WHERE source = ? AND path = ?',
+        (relative_path(new_path), source, relative_path(old_path))
+    )
+    conn.commit()
+
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        for source in SOURCES:
+            counts = scan(conn, source)
+            print(f"📂 {source}: новых {counts['new']}, измененных {counts['changed']}, "
+                  f"без изменений {counts['unchanged']}")
+            df = catalog_files(conn, source)
+            for row in df.itertuples():
+                rows = f"{int(row.rows):,}" if pd.notna(row.rows) else '-'
+                dates = f"{row.date_start} — {row.date_end}" if row.date_start else ''
+                print(f"   • {row.path} [{row.status}] строк: {rows} {dates}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
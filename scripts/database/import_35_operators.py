@@ -34,6 +34,11 @@ import time
 BASE_DIR = Path(__file__).parent.parent.parent
 CONFIG_DIR = BASE_DIR / 'config'
 
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from data_collection.sheets_metadata import (
+    SheetsMetadataCache, build_drive_service, token_has_drive_access, DRIVE_METADATA_SCOPE
+)
+
 load_dotenv(CONFIG_DIR / 'postgresql.env')
 
 DB_CONFIG = {
@@ -46,7 +51,7 @@ DB_CONFIG = {
 
 CREDENTIALS_FILE = CONFIG_DIR / 'credentials.json'
 TOKEN_FILE = CONFIG_DIR / 'token.json'
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly', DRIVE_METADATA_SCOPE]
 MASTER_SPREADSHEET_ID = "1s0nbLCo6q_KoM0jCP2v2vMxLbIHuScjigNTMSvUn0GA"
 
 print('\n' + '='*80)
@@ -54,9 +59,9 @@ print('ИМПОРТ ДАННЫХ ВСЕХ ОПЕРАТОРОВ ИЗ 35 GOOGLE SH
 print('='*80 + '\n')
 
 def get_sheets_service():
-    """Подключение к Google Sheets API"""
+    """Подключение к Google Sheets API + кэш метаданных таблиц"""
     creds = None
-    if TOKEN_FILE.exists():
+    if TOKEN_FILE.exists() and token_has_drive_access(TOKEN_FILE):
         creds = Credentials.from_authorized_user_file(str(TOKEN_FILE), SCOPES)
     
     if not creds or not creds.valid:
@@ -69,16 +74,12 @@ def get_sheets_service():
         with open(TOKEN_FILE, 'w', encoding='utf-8') as token:
             token.write(creds.to_json())
     
-    return build('sheets', 'v4', credentials=creds)
+    service = build('sheets', 'v4', credentials=creds)
+    return service, SheetsMetadataCache(service, build_drive_service(creds))
 
-def get_operators_list(service):
-    """Читает список операторов из мастер-таблицы"""
-    result = service.spreadsheets().values().get(
-        spreadsheetId=MASTER_SPREADSHEET_ID,
-        range="Настройки!A2:C100"
-    ).execute()
-    
-    values = result.get('values', [])
+def get_operators_list(metadata):
+    """Читает список операторов из мастер-таблицы (заново - только если она менялась)"""
+    values = metadata.values(MASTER_SPREADSHEET_ID, "Настройки!A2:C100")
     operators = []
     
     for row in values:
@@ -92,15 +93,14 @@ def get_operators_list(service):
     
     return operators
 
-def read_operator_data(service, operator):
+def read_operator_data(service, metadata, operator):
     """Читает данные из таблицы оператора"""
     name = operator['name']
     spreadsheet_id = operator['spreadsheet_id']
     
     try:
-        # Получаем список листов
-        spreadsheet = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-        sheets = spreadsheet.get('sheets', [])
+        # Получаем список листов (из кэша, если таблица не менялась)
+        sheets = metadata.sheets(spreadsheet_id)
         
         # Находим лист с данными (максимальное количество строк)
         data_sheet = None
@@ -109,15 +109,15 @@ def read_operator_data(service, operator):
         skip_sheets = {'настройки', 'статистика', 'сводка', 'тренды', 'итого', 'summary'}
         
         for sheet in sheets:
-            title = sheet['properties']['title']
-            rows = sheet['properties']['gridProperties'].get('rowCount', 0)
+            title = sheet['title']
+            rows = sheet['rowCount']
             
             if title.lower() not in skip_sheets and rows > max_rows:
                 max_rows = rows
                 data_sheet = title
         
         if not data_sheet:
-            data_sheet = sheets[0]['properties']['title']
+            data_sheet = sheets[0]['title']
         
         # Читаем данные
         result = service.spreadsheets().values().get(
@@ -166,7 +166,7 @@ def read_operator_data(service, operator):
         elif e.resp.status == 429:
             print(f'    ⚠️  Rate limit, пауза 60 сек...')
             time.sleep(60)
-            return read_operator_data(service, operator)
+            return read_operator_data(service, metadata, operator)
         else:
             print(f'    ⚠️  HTTP {e.resp.status}: {e.reason}')
         return []
@@ -291,11 +291,11 @@ def show_stats():
 
 def main():
     print('[1/4] Подключение к Google Sheets API...')
-    service = get_sheets_service()
+    service, metadata = get_sheets_service()
     print('✅ Подключено\n')
     
     print('[2/4] Получение списка операторов...')
-    operators = get_operators_list(service)
+    operators = get_operators_list(metadata)
     print(f'✅ Найдено операторов: {len(operators)}\n')
     
     print('[3/4] Сбор данных из таблиц...')
@@ -303,11 +303,13 @@ def main():
     
     for i, op in enumerate(operators, 1):
         print(f'  [{i}/{len(operators)}] {op["name"]}...', end=' ')
-        records = read_operator_data(service, op)
+        records = read_operator_data(service, metadata, op)
         all_records.extend(records)
         print(f'{len(records):,} записей')
         time.sleep(1)
     
+    metadata.save()
+    print(f'\n📑 {metadata.report()}')
     print(f'\n✅ Собрано: {len(all_records):,} записей\n')
     
     print('[4/4] Импорт в PostgreSQL...')
@@ -21,10 +21,10 @@ EXPORTED_SHEETS_DIR = BASE_DIR / 'exported_sheets'
 INCOMING_DATA_DIR = BASE_DIR / 'incoming_data'
 LOG_DIR = BASE_DIR / 'logs' / 'database'
 
-# Паттерны для исключения
-EXCLUDE_PATTERNS = [
-    'тренды', 'сводка', 'итого', 'total', 'summary', 'текущий месяц', 'предыдущий месяц'
-]
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from database.report_cache import bump_data_version
+from database.dimensions import DimensionResolver
+from database.exclusions import is_excluded, excluded_mask, ensure_excluded_column
 
 def log_import(message, level='INFO'):
     """Логирование импорта"""
@@ -45,72 +45,18 @@ def log_import(message, level='INFO'):
     except Exception as e:
         pass  # Игнорируем ошибки логирования
 
-def should_exclude(text):
-    """Проверка, нужно ли исключить"""
-    if not text or pd.isna(text):
-        return True
-    
-    text_str = str(text).strip().lower()
-    
-    if text_str in ['', '-', 'nan', 'none', 'null']:
-        return True
-    
-    for pattern in EXCLUDE_PATTERNS:
-        if pattern in text_str:
-            return True
-    
-    return False
-
-def get_or_create_operator(cursor, operator_name):
-    """Получить или создать оператора"""
-    if should_exclude(operator_name):
-        return None
-    
-    operator_name = str(operator_name).strip()
-    
-    cursor.execute('SELECT operator_id FROM operators WHERE operator_name = ?', (operator_name,))
-    result = cursor.fetchone()
-    
-    if result:
-        return result[0]
-    
-    cursor.execute('INSERT INTO operators (operator_name) VALUES (?)', (operator_name,))
-    return cursor.lastrowid
-
-def get_or_create_service(cursor, service_code):
-    """Получить или создать службу"""
-    if should_exclude(service_code):
-        return None
-    
-    service_code = str(service_code).strip()
-    
-    cursor.execute('SELECT service_id FROM services WHERE service_code = ?', (service_code,))
-    result = cursor.fetchone()
-    
-    if result:
-        return result[0]
-    
-    cursor.execute(
-        'INSERT INTO services (service_code, service_name) VALUES (?, ?)', 
-        (service_code, f'Служба {service_code}')
-    )
-    return cursor.lastrowid
+def load_dimensions(conn):
+    """Справочники операторов и служб в памяти"""
+    # Флаг исключения оператора вычисляется один раз - при добавлении в справочник
+    ensure_excluded_column(conn)
+    return {
+        'operators': DimensionResolver(conn, 'operators', defaults={'excluded': lambda name: int(is_excluded(name))}),
+        'services': DimensionResolver(conn, 'services', defaults={'service_name': lambda code: f'Служба {code}'}),
+    }
 
-def get_or_create_region(cursor, region_name):
-    """Получить или создать регион"""
-    if should_exclude(region_name):
-        return None
-    
-    region_name = str(region_name).strip()
-    
-    cursor.execute('SELECT region_id FROM regions WHERE region_name = ?', (region_name,))
-    result = cursor.fetchone()
-    
-    if result:
-        return result[0]
-    
-    cursor.execute('INSERT INTO regions (region_name) VALUES (?)', (region_name,))
-    return cursor.lastrowid
+def exclude_values(series):
+    """Пропуски вместо исключенных значений (сводки, итоги, пустые)"""
+    return series.where(~excluded_mask(series))
 
 def normalize_date(date_val):
     """Нормализация даты"""
@@ -135,7 +81,7 @@ def normalize_date(date_val):
     except:
         return None
 
-def import_csv_file(cursor, file_path, operator_name):
+def import_csv_file(cursor, file_path, operator_name, dimensions):
     """Импорт одного CSV файла"""
     try:
         df = pd.read_csv(file_path, encoding='utf-8')
@@ -147,11 +93,15 @@ def import_csv_file(cursor, file_path, operator_name):
         imported = 0
         skipped = 0
         
-        operator_id = get_or_create_operator(cursor, operator_name)
+        operator_id = None if is_excluded(operator_name) else dimensions['operators'].get(operator_name)
         if not operator_id:
             log_import(f'  Пропуск файла (исключенный оператор): {file_path.name}', 'WARNING')
             return 0, len(df)
         
+        # Службы всего файла - одним обращением к справочнику
+        services = df['Выбор службы'] if 'Выбор службы' in df.columns else pd.Series(None, index=df.index, dtype=object)
+        service_ids = dimensions['services'].resolve(exclude_values(services))
+        
         for idx, row in df.iterrows():
             try:
                 # Пропускаем строки без ключевых данных (номер карты - основной идентификатор)
@@ -163,10 +113,7 @@ def import_csv_file(cursor, file_path, operator_name):
                 card_num_str = str(card_number).strip()
                 
                 # Получаем или создаем связи
-                service_id = None
-                service_field = row.get('Выбор службы')
-                if not pd.isna(service_field) and str(service_field).strip():
-                    service_id = get_or_create_service(cursor, str(service_field).strip())
+                service_id = None if pd.isna(service_ids[idx]) else int(service_ids[idx])
                 
                 # Формируем номер заявки из номера карты
                 app_number = card_num_str
@@ -244,6 +191,8 @@ def import_all_csv_from_exported_sheets():
     total_skipped = 0
     total_files = 0
     
+    dimensions = load_dimensions(conn)
+    
     # Проходим по всем папкам операторов
     operator_dirs = [d for d in EXPORTED_SHEETS_DIR.iterdir() if d.is_dir()]
     total_operators = len(operator_dirs)
@@ -270,7 +219,7 @@ def import_all_csv_from_exported_sheets():
         
         for csv_file in csv_files:
             log_import(f'  Файл: {csv_file.name}')
-            imported, skipped = import_csv_file(cursor, csv_file, operator_name)
+            imported, skipped = import_csv_file(cursor, csv_file, operator_name, dimensions)
             total_imported += imported
             total_skipped += skipped
             total_files += 1
@@ -279,6 +228,8 @@ def import_all_csv_from_exported_sheets():
                 log_import(f'    OK: Импортировано: {imported}, Пропущено: {skipped}')
             
             # Коммитим после каждого файла
+            if imported > 0:
+                bump_data_version(conn, 'fixations')
             conn.commit()
     
     conn.close()
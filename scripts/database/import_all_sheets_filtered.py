@@ -37,6 +37,9 @@ import time
 BASE_DIR = Path(__file__).parent.parent.parent
 CONFIG_DIR = BASE_DIR / 'config'
 
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from database.partitions import ensure_partitions
+
 load_dotenv(CONFIG_DIR / 'postgresql.env')
 
 DB_CONFIG = {
@@ -253,6 +256,8 @@ def import_records(records):
             
             if len(batch) >= 2000:
                 try:
+                    # Месячные секции для дат пачки
+                    ensure_partitions(conn, 'fixations', [row[2] for row in batch])
                     execute_batch(cur, '''
                         INSERT INTO fixations (card_number, operator_id, call_date, phone, status, description)
                         VALUES (%s, %s, %s, %s, %s, %s)
@@ -272,6 +277,7 @@ def import_records(records):
     
     if batch:
         try:
+            ensure_partitions(conn, 'fixations', [row[2] for row in batch])
             execute_batch(cur, '''
                 INSERT INTO fixations (card_number, operator_id, call_date, phone, status, description)
                 VALUES (%s, %s, %s, %s, %s, %s)
@@ -3,6 +3,10 @@
 """
 Импорт данных из Google Docs в PostgreSQL
 Читает JSON Lines из Google Docs и записывает в БД
+
+По умолчанию импортируются только записи, добавленные после прошлого
+импорта (отметка в data/docs_watermarks.json), пачками по BATCH_SIZE.
+    python import_from_docs_to_postgresql.py [ID документа] [--full]
 """
 
 import sys
@@ -12,7 +16,6 @@ if sys.platform == 'win32':
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
 import os
-import json
 import psycopg2
 from psycopg2.extras import execute_batch
 from pathlib import Path
@@ -28,6 +31,23 @@ from tqdm import tqdm
 BASE_DIR = Path(__file__).parent.parent.parent
 CONFIG_DIR = BASE_DIR / 'config'
 
+sys.path.insert(0, str(BASE_DIR / 'scripts' / 'data_collection'))
+from docs_stream import fetch_document, iter_records, read_new_records, save_watermark
+
+# Записей в одной транзакции
+BATCH_SIZE = 5000
+
+INSERT_FIXATIONS = '''
+    INSERT INTO fixations (card_number, phone_number, call_date, call_status, service_name, comments, operator_id)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (card_number, call_date) DO UPDATE SET
+        phone_number = EXCLUDED.phone_number,
+        call_status = EXCLUDED.call_status,
+        service_name = EXCLUDED.service_name,
+        comments = EXCLUDED.comments,
+        operator_id = EXCLUDED.operator_id
+'''
+
 # Загрузка конфигурации
 load_dotenv(CONFIG_DIR / 'postgresql.env')
 
@@ -93,36 +113,13 @@ def read_docs_data(docs_service, document_id):
     print(f'\n📄 Чтение документа {document_id}...')
     
     try:
-        document = docs_service.documents().get(documentId=document_id).execute()
+        document = fetch_document(docs_service, document_id)
         content = document.get('body').get('content')
         
-        records = []
-        line_count = 0
-        error_count = 0
-        
-        # Проходим по всем параграфам
-        for element in content:
-            if 'paragraph' in element:
-                paragraph = element.get('paragraph')
-                elements = paragraph.get('elements', [])
-                
-                for elem in elements:
-                    if 'textRun' in elem:
-                        text = elem.get('textRun').get('content').strip()
-                        
-                        # Пропускаем пустые строки и не-JSON
-                        if not text or not text.startswith('{'):
-                            continue
-                        
-                        # Парсим JSON
-                        try:
-                            record = json.loads(text)
-                            records.append(record)
-                            line_count += 1
-                        except json.JSONDecodeError as e:
-                            error_count += 1
-                            if error_count <= 5:  # Показываем первые 5 ошибок
-                                print(f'Ошибка парсинга JSON: {str(e)[:100]}')
+        errors = {'count': 0}
+        records = [record for record, _ in iter_records(content, errors=errors)]
+        line_count = len(records)
+        error_count = errors['count']
         
         print(f'✅ Прочитано {line_count:,} записей из документа')
         if error_count > 0:
@@ -142,8 +139,75 @@ def read_docs_data(docs_service, document_id):
         traceback.print_exc()
         return []
 
+def parse_call_date(call_date):
+    """Дата звонка из строки (несколько форматов), None - не распознана"""
+    if not call_date:
+        return None
+    for date_format in ['%d.%m.%Y %H:%M', '%d.%m.%Y', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d']:
+        try:
+            return datetime.strptime(call_date, date_format)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def load_operators(cur):
+    """Кэш операторов: имя -> id"""
+    cur.execute('SELECT name, id FROM operators')
+    return dict(cur.fetchall())
+
+def import_batch(cur, records, operators_cache, counts):
+    """
+    Записать пачку записей (без commit). counts - словарь счетчиков
+    imported / skipped / errors.
+    """
+    batch_data = []
+    
+    for record in records:
+        try:
+            operator_name = record.get('operator')
+            card_number = record.get('card_number')
+            
+            # Пропускаем записи без ключевых полей
+            if not operator_name or not card_number:
+                counts['skipped'] += 1
+                continue
+            
+            # Получаем или создаем оператора
+            if operator_name not in operators_cache:
+                cur.execute(
+                    'INSERT INTO operators (name) VALUES (%s) ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name RETURNING id',
+                    (operator_name,)
+                )
+                operators_cache[operator_name] = cur.fetchone()[0]
+            
+            batch_data.append((
+                card_number,
+                record.get('phone_number'),
+                parse_call_date(record.get('call_date')),
+                record.get('status'),
+                record.get('service'),
+                record.get('comments', ''),
+                operators_cache[operator_name]
+            ))
+        
+        except Exception as e:
+            counts['errors'] += 1
+            if counts['errors'] <= 5:  # Показываем первые 5 ошибок
+                print(f'\n⚠️  Ошибка обработки записи: {e}')
+    
+    if batch_data:
+        execute_batch(cur, INSERT_FIXATIONS, batch_data)
+        counts['imported'] += len(batch_data)
+
+def print_import_summary(counts):
+    print(f'\n✅ Импорт завершен!')
+    print(f'   Импортировано: {counts["imported"]:,}')
+    print(f'   Пропущено: {counts["skipped"]:,}')
+    if counts['errors'] > 0:
+        print(f'   Ошибок: {counts["errors"]:,}')
+
 def import_to_postgresql(records):
-    """Импорт записей в PostgreSQL"""
+    """Импорт записей в PostgreSQL (весь список, пачками по BATCH_SIZE)"""
     if not records:
         print('Нет данных для импорта')
         return 0
@@ -153,121 +217,56 @@ def import_to_postgresql(records):
     try:
         conn = psycopg2.connect(**DB_CONFIG)
         cur = conn.cursor()
+        operators_cache = load_operators(cur)
+        counts = {'imported': 0, 'skipped': 0, 'errors': 0}
         
-        # Получаем или создаем операторов
-        operators_cache = {}
-        
-        # Загружаем существующих операторов
-        cur.execute('SELECT name, id FROM operators')
-        for name, op_id in cur.fetchall():
-            operators_cache[name] = op_id
+        for offset in tqdm(range(0, len(records), BATCH_SIZE), desc='Обработка записей'):
+            import_batch(cur, records[offset:offset + BATCH_SIZE], operators_cache, counts)
+            conn.commit()
         
-        imported_count = 0
-        skipped_count = 0
-        error_count = 0
-        batch_data = []
+        conn.close()
+        print_import_summary(counts)
+        return counts['imported']
         
-        for record in tqdm(records, desc='Обработка записей'):
-            try:
-                operator_name = record.get('operator')
-                card_number = record.get('card_number')
-                call_date = record.get('call_date')
-                phone_number = record.get('phone_number')
-                status = record.get('status')
-                service_name = record.get('service')
-                comments = record.get('comments', '')
-                
-                # Пропускаем записи без ключевых полей
-                if not operator_name or not card_number:
-                    skipped_count += 1
-                    continue
-                
-                # Получаем или создаем оператора
-                if operator_name not in operators_cache:
-                    cur.execute(
-                        'INSERT INTO operators (name) VALUES (%s) ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name RETURNING id',
-                        (operator_name,)
-                    )
-                    operators_cache[operator_name] = cur.fetchone()[0]
-                
-                operator_id = operators_cache[operator_name]
-                
-                # Парсим дату
-                parsed_date = None
-                if call_date:
-                    try:
-                        # Пробуем разные форматы дат
-                        for date_format in ['%d.%m.%Y %H:%M', '%d.%m.%Y', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d']:
-                            try:
-                                parsed_date = datetime.strptime(call_date, date_format)
-                                break
-                            except:
-                                continue
-                    except:
-                        pass
-                
-                batch_data.append((
-                    card_number,
-                    phone_number,
-                    parsed_date,
-                    status,
-                    service_name,
-                    comments,
-                    operator_id
-                ))
-                
-                # Коммитим батчами по 5000 записей
-                if len(batch_data) >= 5000:
-                    execute_batch(cur, '''
-                        INSERT INTO fixations (card_number, phone_number, call_date, call_status, service_name, comments, operator_id)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (card_number, call_date) DO UPDATE SET
-                            phone_number = EXCLUDED.phone_number,
-                            call_status = EXCLUDED.call_status,
-                            service_name = EXCLUDED.service_name,
-                            comments = EXCLUDED.comments,
-                            operator_id = EXCLUDED.operator_id
-                    ''', batch_data)
-                    imported_count += len(batch_data)
-                    batch_data = []
-                    conn.commit()
-            
-            except Exception as e:
-                error_count += 1
-                if error_count <= 5:  # Показываем первые 5 ошибок
-                    print(f'\n⚠️  Ошибка обработки записи: {e}')
-                continue
+    except Exception as e:
+        print(f'\n❌ Ошибка импорта: {e}')
+        import traceback
+        traceback.print_exc()
+        return 0
+
+def import_new_records(docs_service, document_id, full=False):
+    """
+    Импорт только новых записей документа: пачка разбирается, пишется в
+    БД и коммитится, затем сохраняется отметка. Прерванный импорт
+    продолжится со следующей пачки.
+    Возвращает число импортированных записей (None - ошибка).
+    """
+    print(f'\n📄 Чтение новых записей документа {document_id}...')
+    
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        cur = conn.cursor()
+        operators_cache = load_operators(cur)
+        counts = {'imported': 0, 'skipped': 0, 'errors': 0}
         
-        # Импортируем оставшиеся записи
-        if batch_data:
-            execute_batch(cur, '''
-                INSERT INTO fixations (card_number, phone_number, call_date, call_status, service_name, comments, operator_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (card_number, call_date) DO UPDATE SET
-                    phone_number = EXCLUDED.phone_number,
-                    call_status = EXCLUDED.call_status,
-                    service_name = EXCLUDED.service_name,
-                    comments = EXCLUDED.comments,
-                    operator_id = EXCLUDED.operator_id
-            ''', batch_data)
-            imported_count += len(batch_data)
+        for records, mark in read_new_records(docs_service, document_id, BATCH_SIZE, full=full):
+            import_batch(cur, records, operators_cache, counts)
             conn.commit()
+            save_watermark(document_id, mark)
+            print(f'   💾 Пачка: {len(records):,} записей (всего в документе прочитано: {mark["records"]:,})')
         
         conn.close()
+        print_import_summary(counts)
+        return counts['imported']
         
-        print(f'\n✅ Импорт завершен!')
-        print(f'   Импортировано: {imported_count:,}')
-        print(f'   Пропущено: {skipped_count:,}')
-        if error_count > 0:
-            print(f'   Ошибок: {error_count:,}')
-        
-        return imported_count
-        
+    except HttpError as e:
+        print(f'❌ Ошибка доступа к документу: {e}')
+        return None
     except Exception as e:
         print(f'\n❌ Ошибка импорта: {e}')
         import traceback
         traceback.print_exc()
-        return 0
+        return None
 
 def show_statistics(conn):
     """Показать статистику по импортированным данным"""
@@ -316,19 +315,25 @@ def show_statistics(conn):
 def main():
     """Главная функция"""
     
-    # Запрашиваем ID документа
-    print('\n📝 Введите ID документа Google Docs')
-    print('(ID находится в URL: https://docs.google.com/document/d/[THIS_IS_ID]/edit)')
-    print('\nОставьте пустым если хотите использовать тестовый документ:')
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    full = '--full' in sys.argv
     
-    docs_id = input('ID документа: ').strip()
+    # Запрашиваем ID документа
+    if args:
+        docs_id = args[0]
+    else:
+        print('\n📝 Введите ID документа Google Docs')
+        print('(ID находится в URL: https://docs.google.com/document/d/[THIS_IS_ID]/edit)')
+        print('\nОставьте пустым если хотите использовать тестовый документ:')
+        
+        docs_id = input('ID документа: ').strip()
     
     if not docs_id:
         print('❌ ID документа обязателен')
         return
     
     # Подключение к Google Docs API
-    print('\n[1/3] Подключение к Google Docs API...')
+    print('\n[1/2] Подключение к Google Docs API...')
     docs_service = get_google_service('docs', 'v1')
     
     if not docs_service:
@@ -337,19 +342,13 @@ def main():
     
     print('✅ Подключено к Google Docs API')
     
-    # Чтение данных из документа
-    print('\n[2/3] Чтение данных из Google Docs...')
-    records = read_docs_data(docs_service, docs_id)
+    # Чтение новых записей и импорт пачками
+    print('\n[2/2] Импорт из Google Docs в PostgreSQL' + (' (с начала документа)...' if full else ' (только новые записи)...'))
+    imported = import_new_records(docs_service, docs_id, full=full)
     
-    if not records:
-        print('❌ Не удалось прочитать данные из документа')
-        return
-    
-    # Импорт в PostgreSQL
-    print('\n[3/3] Импорт в PostgreSQL...')
-    imported = import_to_postgresql(records)
-    
-    if imported > 0:
+    if imported is None:
+        print('\n❌ Импорт не выполнен')
+    elif imported > 0:
         # Показываем статистику
         conn = psycopg2.connect(**DB_CONFIG)
         show_statistics(conn)
@@ -358,7 +357,7 @@ def main():
         print('✅ ИМПОРТ ЗАВЕРШЕН УСПЕШНО!')
         print('='*80)
     else:
-        print('\n❌ Импорт не выполнен')
+        print('\n✓ Новых записей нет')
 
 if __name__ == '__main__':
     main()
@@ -15,10 +15,14 @@ import sqlite3
 from pathlib import Path
 from datetime import datetime
 import os
+import sys
 from dotenv import load_dotenv
 from tqdm import tqdm
 
 BASE_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from database.dimensions import DimensionResolver
+
 CONFIG_DIR = BASE_DIR / 'config'
 SQLITE_DB = BASE_DIR / 'data' / 'fiksa_database.db'
 EXPORT_DIR = BASE_DIR / 'exported_sheets'
@@ -38,73 +42,6 @@ print('\n' + '='*80)
 print('📥 ИМПОРТ ДАННЫХ В POSTGRESQL')
 print('='*80)
 
-def get_or_create_operator(cursor, operator_name):
-    """Получить или создать оператора"""
-    if not operator_name or pd.isna(operator_name):
-        return None
-    
-    operator_name = str(operator_name).strip()
-    
-    cursor.execute(
-        "SELECT operator_id FROM operators WHERE operator_name = %s",
-        (operator_name,)
-    )
-    result = cursor.fetchone()
-    
-    if result:
-        return result[0]
-    
-    cursor.execute(
-        "INSERT INTO operators (operator_name) VALUES (%s) RETURNING operator_id",
-        (operator_name,)
-    )
-    return cursor.fetchone()[0]
-
-def get_or_create_service(cursor, service_code):
-    """Получить или создать службу"""
-    if not service_code or pd.isna(service_code):
-        return None
-    
-    service_code = str(service_code).strip()
-    
-    cursor.execute(
-        "SELECT service_id FROM services WHERE service_code = %s",
-        (service_code,)
-    )
-    result = cursor.fetchone()
-    
-    if result:
-        return result[0]
-    
-    cursor.execute(
-        """INSERT INTO services (service_code, service_name) 
-           VALUES (%s, %s) RETURNING service_id""",
-        (service_code, f'Служба {service_code}')
-    )
-    return cursor.fetchone()[0]
-
-def get_or_create_region(cursor, region_name):
-    """Получить или создать регион"""
-    if not region_name or pd.isna(region_name):
-        return None
-    
-    region_name = str(region_name).strip()
-    
-    cursor.execute(
-        "SELECT region_id FROM regions WHERE region_name = %s",
-        (region_name,)
-    )
-    result = cursor.fetchone()
-    
-    if result:
-        return result[0]
-    
-    cursor.execute(
-        "INSERT INTO regions (region_name) VALUES (%s) RETURNING region_id",
-        (region_name,)
-    )
-    return cursor.fetchone()[0]
-
 def import_from_sqlite():
     """Импорт данных из SQLite"""
     print('\n[1/2] Импорт из SQLite БД...')
@@ -128,14 +65,16 @@ def import_from_sqlite():
         imported = 0
         batch_size = 1000
         
+        # ID операторов для всех записей - одним обращением к справочнику
+        operator_ids = DimensionResolver(pg_conn, 'operators').resolve(df['operator_name'])
+        
         print('  🔄 Импорт данных...')
         for i in tqdm(range(0, len(df), batch_size), desc='  Прогресс'):
             batch = df.iloc[i:i+batch_size]
             
-            for _, row in batch.iterrows():
+            for idx, row in batch.iterrows():
                 try:
-                    # Получаем ID оператора
-                    operator_id = get_or_create_operator(cursor, row.get('operator_name'))
+                    operator_id = None if pd.isna(operator_ids[idx]) else int(operator_ids[idx])
                     
                     # Вставляем фиксацию
                     cursor.execute("""
@@ -190,6 +129,7 @@ def import_from_csv():
         
         imported = 0
         errors = 0
+        operators = DimensionResolver(pg_conn, 'operators')
         
         for csv_file in tqdm(csv_files, desc='  Обработка файлов'):
             try:
@@ -204,7 +144,7 @@ def import_from_csv():
                     operator_name = csv_file.stem
                 
                 # Получаем ID оператора
-                operator_id = get_or_create_operator(cursor, operator_name)
+                operator_id = operators.get(operator_name)
                 
                 # Определяем колонки
                 card_col = next((col for col in ['Номер карты', 'Код карты', 'card_number'] if col in df.columns), None)
@@ -0,0 +1,416 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+ПОМЕСЯЧНОЕ СЕКЦИОНИРОВАНИЕ fixations И incidents_112 (PostgreSQL)
+=============================================================================
+Таблицы разбиты по месяцам (PARTITION BY RANGE по дате звонка):
+- fixations      -> fixations_y2025m01, fixations_y2025m02, ...
+- incidents_112  -> incidents_112_y2025m01, ...
+Строки без даты попадают в секцию *_default.
+
+Отчет за месяц читает одну секцию (partition pruning), а старый месяц
+можно отсоединить или перенести в архивную схему без DELETE.
+По времени звонка - BRIN индексы (маленькие, данные идут по порядку).
+Категория статуса - вычисляемая колонка (GENERATED ... STORED) вместо
+построчного триггера.
+
+Секции создаются импортером автоматически (ensure_partitions) перед
+вставкой пачки. Если строки месяца уже лежат в default-секции, они
+переносятся в новую секцию.
+
+Использование:
+    python scripts/database/partitions.py --migrate          # перевести существующие таблицы
+    python scripts/database/partitions.py --ensure           # разложить строки из default-секций
+    python scripts/database/partitions.py --list
+    python scripts/database/partitions.py --detach 2024-01 [--archive]
+
+Конфигурация: config/postgresql.env
+=============================================================================
+"""
+
+import os
+import sys
+import psycopg2
+from pathlib import Path
+from dotenv import load_dotenv
+from datetime import datetime, date
+
+BASE_DIR = Path(__file__).parent.parent.parent
+load_dotenv(BASE_DIR / 'config' / 'postgresql.env')
+
+# Параметры подключения к БД
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': os.getenv('DB_PORT', '5432'),
+    'database': os.getenv('DB_NAME', 'qayta_data'),
+    'user': os.getenv('DB_USER', 'qayta_user'),
+    'password': os.getenv('DB_PASSWORD', 'qayta_password_2026')
+}
+
+# Схема для отсоединенных секций
+ARCHIVE_SCHEMA = 'archive'
+
+# Таблица -> колонка секционирования
+PARTITIONED_TABLES = {
+    'fixations': 'call_date',
+    'incidents_112': 'call_time',
+}
+
+# Уникальность на секционированной таблице должна включать ключ секции,
+# поэтому fixation_id / incident_id - просто индексы (значения из sequence)
+TABLE_DDL = {
+    'fixations': """
+        CREATE TABLE IF NOT EXISTS fixations (
+            fixation_id BIGSERIAL,
+            card_number VARCHAR(50),
+            operator_id INTEGER REFERENCES operators(operator_id),
+            service_id INTEGER REFERENCES services(service_id),
+            region_id INTEGER REFERENCES regions(region_id),
+
+            -- Данные обращения
+            call_date TIMESTAMP,
+            incident_number VARCHAR(100),
+            phone VARCHAR(50),
+            caller_name VARCHAR(255),
+            address TEXT,
+            district VARCHAR(255),
+
+            -- Статус и результат
+            status VARCHAR(255),
+            status_category VARCHAR(50) GENERATED ALWAYS AS (categorize_status(status)) STORED,
+            reason TEXT,
+            complaint TEXT,
+            description TEXT,
+
+            -- Метаданные
+            source_file VARCHAR(500),
+            import_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            collection_date TIMESTAMP,
+
+            CONSTRAINT fixations_card_number_idx UNIQUE (card_number, call_date)
+        ) PARTITION BY RANGE (call_date);
+
+        CREATE INDEX IF NOT EXISTS idx_fixations_id ON fixations(fixation_id);
+        CREATE INDEX IF NOT EXISTS idx_fixations_card ON fixations(card_number);
+        CREATE INDEX IF NOT EXISTS idx_fixations_operator ON fixations(operator_id);
+        CREATE INDEX IF NOT EXISTS brin_fixations_date ON fixations USING BRIN (call_date);
+        CREATE INDEX IF NOT EXISTS brin_fixations_import ON fixations USING BRIN (import_date);
+    """,
+    'incidents_112': """
+        CREATE TABLE IF NOT EXISTS incidents_112 (
+            incident_id BIGSERIAL,
+            incident_number VARCHAR(100),
+            card_number VARCHAR(50),
+            service_id INTEGER REFERENCES services(service_id),
+            region_id INTEGER REFERENCES regions(region_id),
+
+            -- Данные инцидента
+            call_time TIMESTAMP,
+            caller_phone VARCHAR(50),
+            caller_name VARCHAR(255),
+            address TEXT,
+            district VARCHAR(255),
+            reason TEXT,
+            status VARCHAR(255),
+
+            -- Данные обработки
+            operator_112 VARCHAR(255),
+            close_time TIMESTAMP,
+            duration INTERVAL,
+
+            -- Метаданные
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+            CONSTRAINT incidents_112_number_key UNIQUE (incident_number, call_time)
+        ) PARTITION BY RANGE (call_time);
+
+        CREATE INDEX IF NOT EXISTS idx_incidents_id ON incidents_112(incident_id);
+        CREATE INDEX IF NOT EXISTS idx_incidents_number ON incidents_112(incident_number);
+        CREATE INDEX IF NOT EXISTS idx_incidents_card ON incidents_112(card_number);
+        CREATE INDEX IF NOT EXISTS brin_incidents_time ON incidents_112 USING BRIN (call_time);
+    """,
+}
+
+# Уже созданные секции (чтобы не спрашивать каталог на каждую пачку)
+_known_partitions = set()
+
+
+def get_db_connection():
+    """Создать подключение к БД"""
+    return psycopg2.connect(**DB_CONFIG)
+
+
+def month_start(value):
+    """Первое число месяца для даты/времени"""
+    return date(value.year, value.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    """Имя секции месяца: fixations_y2025m01"""
+    return f'{table}_y{month.year:04d}m{month.month:02d}'
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("""
+        SELECT c.relkind = 'p'
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relname = %s AND n.nspname = current_schema()
+    """, (table,))
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def list_partitions(cursor, table):
+    """Секции таблицы: [(имя, границы)]"""
+    cursor.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+    """, (table,))
+    return cursor.fetchall()
+
+
+def _insertable_columns(cursor, table):
+    """Колонки, в которые можно вставлять (без вычисляемых)"""
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND is_generated = 'NEVER'
+        ORDER BY ordinal_position
+    """, (table,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _create_month_partition(cursor, table, month):
+    """Создать секцию месяца, перенеся строки этого месяца из default-секции"""
+    name = partition_name(table, month)
+    column = PARTITIONED_TABLES[table]
+    default = f'{table}_default'
+    bounds = (month, next_month(month))
+
+    cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {default} WHERE {column} >= %s AND {column} < %s)', bounds)
+    has_rows = cursor.fetchone()[0]
+
+    if has_rows:
+        # Секцию нельзя создать, пока такие строки лежат в default
+        columns = ', '.join(_insertable_columns(cursor, table))
+        cursor.execute(f"""
+            CREATE TEMP TABLE _partition_move ON COMMIT DROP AS
+            SELECT {columns} FROM {default} WHERE {column} >= %s AND {column} < %s
+        """, bounds)
+        cursor.execute(f'DELETE FROM {default} WHERE {column} >= %s AND {column} < %s', bounds)
+
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)',
+        bounds
+    )
+
+    if has_rows:
+        cursor.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM _partition_move')
+        cursor.execute('DROP TABLE _partition_move')
+
+    return name
+
+
+def ensure_partitions(conn, table, dates):
+    """
+    Создать недостающие месячные секции для дат пачки.
+    Вызывается импортером перед вставкой. Возвращает имена новых секций.
+    """
+    # d == d отсекает NaN/NaT
+    months = {month_start(d) for d in dates if d is not None and d == d}
+    missing = [m for m in sorted(months) if (table, m) not in _known_partitions]
+    if not missing:
+        return []
+
+    created = []
+    cursor = conn.cursor()
+    try:
+        if not is_partitioned(cursor, table):
+            return []
+
+        existing = {name for name, _ in list_partitions(cursor, table)}
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT')
+
+        for month in missing:
+            if partition_name(table, month) not in existing:
+                created.append(_create_month_partition(cursor, table, month))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    _known_partitions.update((table, m) for m in missing)
+    return created
+
+
+def split_default_partition(conn, table):
+    """Разложить строки с датой из default-секции по месячным секциям"""
+    column = PARTITIONED_TABLES[table]
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT DISTINCT date_trunc('month', {column})
+            FROM {table}_default WHERE {column} IS NOT NULL
+        """)
+        months = [row[0] for row in cursor.fetchall()]
+    _known_partitions.difference_update((table, month_start(m)) for m in months)
+    return ensure_partitions(conn, table, months)
+
+
+def detach_month(conn, table, month, archive=False):
+    """
+    Отсоединить секцию месяца от таблицы (данные остаются в отдельной таблице).
+    archive=True - перенести ее в схему archive.
+    """
+    name = partition_name(table, month)
+    with conn.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {name}')
+        if archive:
+            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}')
+            cursor.execute(f'ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}')
+    conn.commit()
+    _known_partitions.discard((table, month))
+    return f'{ARCHIVE_SCHEMA}.{name}' if archive else name
+
+
+# =============================================================================
+# МИГРАЦИЯ СУЩЕСТВУЮЩИХ ТАБЛИЦ
+# =============================================================================
+
+def _dependent_views(cursor, table):
+    """Представления, зависящие от таблицы: [(имя, relkind, определение, [индексы])]"""
+    cursor.execute("""
+        SELECT DISTINCT c.oid, c.relname, c.relkind
+        FROM pg_depend d
+        JOIN pg_rewrite rw ON rw.oid = d.objid
+        JOIN pg_class c ON c.oid = rw.ev_class
+        WHERE d.refobjid = %s::regclass AND c.oid <> %s::regclass
+    """, (table, table))
+    views = []
+    for oid, name, kind in cursor.fetchall():
+        cursor.execute('SELECT pg_get_viewdef(%s)', (oid,))
+        definition = cursor.fetchone()[0]
+        cursor.execute('SELECT indexdef FROM pg_indexes WHERE tablename = %s AND schemaname = current_schema()', (name,))
+        views.append((name, kind, definition, [row[0] for row in cursor.fetchall()]))
+    return views
+
+
+def migrate_table(conn, table):
+    """
+    Перевести обычную таблицу в секционированную в одной транзакции:
+    переименовать старую, создать новую с секциями по месяцам данных,
+    скопировать строки, продолжить sequence, пересоздать зависящие
+    представления и удалить старую таблицу.
+    """
+    column = PARTITIONED_TABLES[table]
+    legacy = f'{table}_legacy'
+    id_column = 'fixation_id' if table == 'fixations' else 'incident_id'
+
+    cursor = conn.cursor()
+    try:
+        if is_partitioned(cursor, table):
+            print(f"ℹ️  {table} уже секционирована")
+            return 0
+
+        # Определения представлений нужно снять до переименования
+        views = _dependent_views(cursor, table)
+
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {legacy}')
+        cursor.execute('SELECT indexname FROM pg_indexes WHERE tablename = %s AND schemaname = current_schema()', (legacy,))
+        for (index_name,) in cursor.fetchall():
+            cursor.execute(f'ALTER INDEX {index_name} RENAME TO {index_name}_legacy')
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', (legacy, id_column))
+        old_sequence = cursor.fetchone()[0]
+        if old_sequence:
+            cursor.execute(f'ALTER SEQUENCE {old_sequence} RENAME TO {legacy}_{id_column}_seq')
+
+        cursor.execute(TABLE_DDL[table])
+        cursor.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+        cursor.execute(f"""
+            SELECT DISTINCT date_trunc('month', {column})
+            FROM {legacy} WHERE {column} IS NOT NULL
+        """)
+        for (month,) in sorted(cursor.fetchall()):
+            month = month_start(month)
+            cursor.execute(
+                f'CREATE TABLE {partition_name(table, month)} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)',
+                (month, next_month(month))
+            )
+
+        # Копируем только общие колонки (вычисляемые заполнятся сами)
+        new_columns = _insertable_columns(cursor, table)
+        old_columns = set(_insertable_columns(cursor, legacy))
+        columns = ', '.join(c for c in new_columns if c in old_columns)
+        cursor.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {legacy}')
+        copied = cursor.rowcount
+
+        cursor.execute(f"""
+            SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE((SELECT MAX({id_column}) FROM {table}), 0) + 1, false)
+        """, (table, id_column))
+
+        cursor.execute(f'DROP TABLE {legacy} CASCADE')
+
+        for name, kind, definition, indexes in views:
+            if kind == 'm':
+                cursor.execute(f'CREATE MATERIALIZED VIEW {name} AS {definition}')
+                for index_def in indexes:
+                    cursor.execute(index_def)
+            else:
+                cursor.execute(f'CREATE OR REPLACE VIEW {name} AS {definition}')
+
+        cursor.execute(f'ANALYZE {table}')
+        conn.commit()
+        return copied
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def main():
+    conn = get_db_connection()
+    try:
+        if '--migrate' in sys.argv:
+            print("="*70)
+            print("МИГРАЦИЯ НА ПОМЕСЯЧНЫЕ СЕКЦИИ")
+            print("="*70)
+            for table in PARTITIONED_TABLES:
+                start = datetime.now()
+                copied = migrate_table(conn, table)
+                print(f"✓ {table}: перенесено {copied:,} строк за {datetime.now() - start}")
+
+        elif '--ensure' in sys.argv:
+            for table in PARTITIONED_TABLES:
+                created = split_default_partition(conn, table)
+                print(f"✓ {table}: новых секций {len(created)}")
+
+        elif '--detach' in sys.argv:
+            month = datetime.strptime(sys.argv[sys.argv.index('--detach') + 1], '%Y-%m').date()
+            for table in PARTITIONED_TABLES:
+                name = detach_month(conn, table, month, archive='--archive' in sys.argv)
+                print(f"✓ {table}: секция отсоединена -> {name}")
+
+        else:
+            with conn.cursor() as cursor:
+                for table in PARTITIONED_TABLES:
+                    print(f"\n{table}:")
+                    for name, bounds in list_partitions(cursor, table):
+                        print(f"  • {name}: {bounds}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
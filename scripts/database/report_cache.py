@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+КЭШ ГОТОВЫХ ОТЧЕТОВ
+=============================================================================
+Хранит сгенерированные файлы отчетов по ключу
+(тип отчета, параметры, версия данных).
+
+Версия данных хранится в основной БД (таблица data_versions) и
+увеличивается импортерами через bump_data_version(). Пока данные не
+менялись, повторный запрос отчета с теми же параметрами отдается из
+кэша без пересборки. Одновременные одинаковые запросы ждут одну сборку.
+
+Кэш ограничен по размеру на диске (REPORT_CACHE_MB, по умолчанию 500 МБ),
+при превышении удаляются давно не запрошенные отчеты (LRU).
+=============================================================================
+"""
+
+import os
+import json
+import shutil
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import Future
+
+BASE_DIR = Path(__file__).parent.parent.parent
+DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
+CACHE_DIR = BASE_DIR / 'output' / 'report_cache'
+CACHE_INDEX = CACHE_DIR / 'cache_index.db'
+
+# Бюджет кэша на диске
+CACHE_BUDGET_BYTES = int(os.environ.get('REPORT_CACHE_MB', '500')) * 1024 * 1024
+
+# Сборки, которые выполняются прямо сейчас: {ключ: Future}
+_building = {}
+_building_lock = threading.Lock()
+
+# =============================================================================
+# ВЕРСИЯ ДАННЫХ
+# =============================================================================
+
+def _ensure_versions_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            source TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def bump_data_version(conn=None, source='all'):
+    """Увеличить версию данных после импорта.
+
+    Можно передать открытое соединение импортера - тогда версия
+    изменится в той же транзакции, что и данные.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(DB_PATH)
+
+    try:
+        _ensure_versions_table(conn)
+        conn.execute('''
+            INSERT INTO data_versions (source, version, updated_at)
+            VALUES (?, 1, CURRENT_TIMESTAMP)
+            ON CONFLICT(source) DO UPDATE SET
+                version = version + 1,
+                updated_at = CURRENT_TIMESTAMP
+        ''', (source,))
+        if own_conn:
+            conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+
+def get_data_version():
+    """Текущая версия данных (сумма версий всех источников)"""
+    if not DB_PATH.exists():
+        return 0
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        _ensure_versions_table(conn)
+        row = conn.execute('SELECT COALESCE(SUM(version), 0) FROM data_versions').fetchone()
+        return row[0]
+    finally:
+        conn.close()
+
+# =============================================================================
+# ИНДЕКС КЭША
+# =============================================================================
+
+def _get_index():
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(CACHE_INDEX, timeout=30)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS cached_reports (
+            cache_key TEXT PRIMARY KEY,
+            report_type TEXT NOT NULL,
+            params TEXT,
+            data_version INTEGER,
+            files TEXT NOT NULL,
+            is_list INTEGER DEFAULT 0,
+            size_bytes INTEGER NOT NULL,
+            created_at TIMESTAMP,
+            last_access TIMESTAMP
+        )
+    ''')
+    return conn
+
+def make_cache_key(report_type, params, data_version):
+    """Ключ кэша: хэш от (тип отчета, параметры, версия данных)"""
+    payload = json.dumps([report_type, params, data_version], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+def _lookup(cache_key):
+    """Найти готовый отчет в кэше. Возвращает путь, список путей или None"""
+    conn = _get_index()
+    try:
+        row = conn.execute(
+            'SELECT files, is_list FROM cached_reports WHERE cache_key = ?', (cache_key,)
+        ).fetchone()
+        if not row:
+            return None
+
+        files = [Path(p) for p in json.loads(row[0])]
+        if not all(f.exists() for f in files):
+            # Файлы удалены вручную - запись недействительна
+            conn.execute('DELETE FROM cached_reports WHERE cache_key = ?', (cache_key,))
+            conn.commit()
+            return None
+
+        conn.execute(
+            'UPDATE cached_reports SET last_access = ? WHERE cache_key = ?',
+            (datetime.now().isoformat(), cache_key)
+        )
+        conn.commit()
+        return files if row[1] else files[0]
+    finally:
+        conn.close()
+
+def _store(cache_key, report_type, params, data_version, built_files, is_list):
+    """Скопировать собранные файлы в кэш и записать в индекс"""
+    entry_dir = CACHE_DIR / cache_key
+    if entry_dir.exists():
+        shutil.rmtree(entry_dir, ignore_errors=True)
+    entry_dir.mkdir(parents=True)
+
+    cached_files = []
+    for src in built_files:
+        src = Path(src)
+        dst = entry_dir / src.name
+        shutil.copy2(src, dst)
+        cached_files.append(dst)
+
+    size = sum(f.stat().st_size for f in cached_files)
+    now = datetime.now().isoformat()
+
+    conn = _get_index()
+    try:
+        conn.execute('''
+            INSERT OR REPLACE INTO cached_reports (
+                cache_key, report_type, params, data_version,
+                files, is_list, size_bytes, created_at, last_access
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            cache_key, report_type,
+            json.dumps(params, sort_keys=True, ensure_ascii=False, default=str),
+            data_version,
+            json.dumps([str(f) for f in cached_files], ensure_ascii=False),
+            int(is_list), size, now, now
+        ))
+        conn.commit()
+    finally:
+        conn.close()
+
+    evict(keep=cache_key)
+    return cached_files if is_list else cached_files[0]
+
+def evict(budget_bytes=None, keep=None):
+    """Удалить давно не запрошенные отчеты, пока кэш не влезет в бюджет"""
+    budget_bytes = CACHE_BUDGET_BYTES if budget_bytes is None else budget_bytes
+
+    conn = _get_index()
+    try:
+        rows = conn.execute(
+            'SELECT cache_key, size_bytes FROM cached_reports ORDER BY last_access ASC'
+        ).fetchall()
+        total = sum(size for _, size in rows)
+
+        removed = 0
+        for cache_key, size in rows:
+            if total <= budget_bytes:
+                break
+            if cache_key == keep:
+                continue
+            shutil.rmtree(CACHE_DIR / cache_key, ignore_errors=True)
+            conn.execute('DELETE FROM cached_reports WHERE cache_key = ?', (cache_key,))
+            total -= size
+            removed += 1
+
+        conn.commit()
+        return removed
+    finally:
+        conn.close()
+
+def clear_cache():
+    """Полностью очистить кэш отчетов"""
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+# =============================================================================
+# ПОЛУЧЕНИЕ ОТЧЕТА
+# =============================================================================
+
+def get_or_build(report_type, params, build_fn):
+    """Вернуть отчет из кэша или собрать его.
+
+    build_fn() должна вернуть путь к файлу, список путей или None.
+    Возвращает то же самое, но с путями внутри кэша.
+    Если такой же отчет уже собирается в другом потоке,
+    вызов дожидается той сборки вместо запуска новой.
+    """
+    data_version = get_data_version()
+    cache_key = make_cache_key(report_type, params, data_version)
+
+    cached = _lookup(cache_key)
+    if cached is not None:
+        print(f'[КЭШ] Отчет {report_type} из кэша')
+        return cached
+
+    with _building_lock:
+        future = _building.get(cache_key)
+        owner = future is None
+        if owner:
+            future = Future()
+            _building[cache_key] = future
+
+    if not owner:
+        print(f'[КЭШ] Отчет {report_type} уже собирается, ожидание...')
+        return future.result()
+
+    try:
+        # Сборка могла завершиться между проверкой кэша и захватом ключа
+        cached = _lookup(cache_key)
+        if cached is not None:
+            future.set_result(cached)
+            return cached
+        
+        built = build_fn()
+        if not built:
+            # Пустой результат (нет данных) не кэшируем
+            result = built
+        elif isinstance(built, (list, tuple)):
+            result = _store(cache_key, report_type, params, data_version, built, True)
+        else:
+            result = _store(cache_key, report_type, params, data_version, [built], False)
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _building_lock:
+            _building.pop(cache_key, None)
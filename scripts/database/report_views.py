@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+МАТЕРИАЛИЗОВАННЫЕ ПРЕДСТАВЛЕНИЯ ОТЧЕТОВ (PostgreSQL)
+=============================================================================
+Таблицы отчетов detailed_reports, negative_complaints,
+complaints_by_region и summary_statistics раньше пересоздавались через
+DROP TABLE + CREATE TABLE AS - на время пересборки таблиц не было.
+
+Теперь это материализованные представления с уникальным индексом
+(fixation_id / region / summary_id). Они обновляются через
+REFRESH MATERIALIZED VIEW CONCURRENTLY: читатели видят старые данные,
+пока строятся новые. Классификация берется из fixations.status_category
+(вычисляется через categorize_status), без LIKE по тексту.
+
+Использование:
+    python scripts/database/report_views.py            # создать/обновить
+    python scripts/database/report_views.py --recreate # пересоздать определения
+
+Конфигурация: config/postgresql.env
+=============================================================================
+"""
+
+import os
+import sys
+import psycopg2
+from pathlib import Path
+from dotenv import load_dotenv
+from datetime import datetime
+
+BASE_DIR = Path(__file__).parent.parent.parent
+load_dotenv(BASE_DIR / 'config' / 'postgresql.env')
+
+# Параметры подключения к БД
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': os.getenv('DB_PORT', '5432'),
+    'database': os.getenv('DB_NAME', 'qayta_data'),
+    'user': os.getenv('DB_USER', 'qayta_user'),
+    'password': os.getenv('DB_PASSWORD', 'qayta_password_2026')
+}
+
+# Категории из categorize_status()
+CATEGORY_POSITIVE = 'Положительно'
+CATEGORY_NEGATIVE = 'Отрицательно'
+
+NO_REGION = '(регион не указан)'
+
+DETAILED_SELECT = """
+    SELECT
+        f.fixation_id,
+        f.card_number,
+        f.call_date AS "call_datetime",
+        r.region_name AS "region",
+        s.service_name AS "service",
+        f.phone AS "phone",
+        f.incident_number AS "incident",
+        f.complaint AS "complaint",
+        f.status AS "status_text",
+        f.reason,
+        f.description AS "comment",
+        o.operator_name,
+        f.source_file,
+        f.collection_date AS "closed_date"
+    FROM fixations f
+    LEFT JOIN operators o ON f.operator_id = o.operator_id
+    LEFT JOIN regions r ON f.region_id = r.region_id
+    LEFT JOIN services s ON f.service_id = s.service_id
+"""
+
+HAS_COMPLAINT = "NULLIF(TRIM(f.complaint), '') IS NOT NULL"
+
+# (имя, запрос, колонки уникального индекса, дополнительные индексы)
+REPORT_VIEWS = [
+    (
+        'detailed_reports',
+        DETAILED_SELECT,
+        ['fixation_id'],
+        [['call_datetime']],
+    ),
+    (
+        'negative_complaints',
+        DETAILED_SELECT + f"WHERE f.status_category = '{CATEGORY_NEGATIVE}'",
+        ['fixation_id'],
+        [['call_datetime'], ['service']],
+    ),
+    (
+        'complaints_by_region',
+        f"""
+    SELECT
+        COALESCE(r.region_name, '{NO_REGION}') AS region,
+        COUNT(*) AS total_calls,
+        COUNT(*) FILTER (WHERE {HAS_COMPLAINT}) AS complaints_count,
+        COUNT(*) FILTER (WHERE f.status_category = '{CATEGORY_NEGATIVE}') AS negative_count,
+        COUNT(*) FILTER (WHERE f.status_category = '{CATEGORY_POSITIVE}') AS positive_count
+    FROM fixations f
+    LEFT JOIN regions r ON f.region_id = r.region_id
+    GROUP BY COALESCE(r.region_name, '{NO_REGION}')
+""",
+        ['region'],
+        [],
+    ),
+    (
+        'summary_statistics',
+        f"""
+    SELECT
+        1 AS summary_id,
+        COUNT(*) AS total_calls,
+        COUNT(*) FILTER (WHERE {HAS_COMPLAINT}) AS total_complaints,
+        COUNT(*) FILTER (WHERE f.status_category = '{CATEGORY_NEGATIVE}') AS negative_feedback,
+        COUNT(*) FILTER (WHERE f.status_category = '{CATEGORY_POSITIVE}') AS positive_feedback,
+        COUNT(DISTINCT COALESCE(r.region_name, '')) AS regions_count,
+        COUNT(DISTINCT o.operator_name) AS operators_count,
+        MIN(f.call_date) AS first_call,
+        MAX(f.call_date) AS last_call
+    FROM fixations f
+    LEFT JOIN operators o ON f.operator_id = o.operator_id
+    LEFT JOIN regions r ON f.region_id = r.region_id
+""",
+        ['summary_id'],
+        [],
+    ),
+]
+
+
+def get_db_connection():
+    """Создать подключение к БД"""
+    return psycopg2.connect(**DB_CONFIG)
+
+
+def _relation_kind(cursor, name):
+    """Тип объекта в текущей схеме: 'r' таблица, 'm' мат. представление, 'v' представление"""
+    cursor.execute("""
+        SELECT c.relkind
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relname = %s AND n.nspname = current_schema()
+    """, (name,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _is_populated(cursor, name):
+    cursor.execute("""
+        SELECT ispopulated FROM pg_matviews
+        WHERE matviewname = %s AND schemaname = current_schema()
+    """, (name,))
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def create_report_views(conn, recreate=False):
+    """
+    Создать материализованные представления отчетов.
+    Старые таблицы с теми же именами (от CREATE TABLE AS) удаляются.
+    Представления создаются WITH NO DATA - заполняет refresh_report_views().
+    """
+    cursor = conn.cursor()
+    try:
+        for name, query, unique_columns, extra_indexes in REPORT_VIEWS:
+            kind = _relation_kind(cursor, name)
+            if kind == 'r':
+                cursor.execute(f'DROP TABLE {name}')
+            elif kind == 'v':
+                cursor.execute(f'DROP VIEW {name}')
+            elif kind == 'm' and recreate:
+                cursor.execute(f'DROP MATERIALIZED VIEW {name}')
+
+            cursor.execute(f'CREATE MATERIALIZED VIEW IF NOT EXISTS {name} AS {query} WITH NO DATA')
+
+            # Уникальный индекс обязателен для REFRESH ... CONCURRENTLY
+            cursor.execute(
+                f'CREATE UNIQUE INDEX IF NOT EXISTS ux_{name} ON {name} ({", ".join(unique_columns)})'
+            )
+            for columns in extra_indexes:
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS ix_{name}_{"_".join(columns)} ON {name} ({", ".join(columns)})'
+                )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def refresh_report_views(conn, concurrently=True):
+    """
+    Обновить представления отчетов после импорта.
+    Первое заполнение идет обычным REFRESH (CONCURRENTLY требует
+    заполненного представления), дальше - без блокировки читателей.
+    Возвращает {имя: (строк, секунд)}.
+    """
+    create_report_views(conn)
+
+    # Каждое обновление фиксируется сразу, чтобы не держать
+    # блокировки всех представлений до конца обновления
+    old_autocommit = conn.autocommit
+    conn.autocommit = True
+    cursor = conn.cursor()
+    stats = {}
+    try:
+        for name, _, _, _ in REPORT_VIEWS:
+            start = datetime.now()
+            mode = 'CONCURRENTLY ' if concurrently and _is_populated(cursor, name) else ''
+            cursor.execute(f'REFRESH MATERIALIZED VIEW {mode}{name}')
+            elapsed = (datetime.now() - start).total_seconds()
+            cursor.execute(f'SELECT COUNT(*) FROM {name}')
+            stats[name] = (cursor.fetchone()[0], elapsed)
+    finally:
+        cursor.close()
+        conn.autocommit = old_autocommit
+    return stats
+
+
+def print_refresh_stats(stats):
+    for name, (rows, seconds) in stats.items():
+        print(f"✓ {name}: {rows:,} записей ({seconds:.1f} сек)")
+
+
+def main():
+    print("="*70)
+    print("ОБНОВЛЕНИЕ МАТЕРИАЛИЗОВАННЫХ ПРЕДСТАВЛЕНИЙ ОТЧЕТОВ")
+    print("="*70)
+
+    conn = get_db_connection()
+    try:
+        if '--recreate' in sys.argv:
+            create_report_views(conn, recreate=True)
+        print_refresh_stats(refresh_report_views(conn))
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+ПОЛНОТЕКСТОВЫЙ ПОИСК ПО КАРТАМ И ЖАЛОБАМ
+=============================================================================
+Поиск по номеру карты, ФИО, телефону, адресу и тексту жалобы
+без полного прохода по таблице (LIKE '%текст%').
+
+SQLite (data/fiksa_database.db):
+    виртуальная таблица fiksa_search (FTS5, токенизатор trigram) поверх
+    fiksa_records. Синхронизируется триггерами на INSERT/UPDATE/DELETE,
+    поэтому сборщики ничего дополнительно не делают. Текст жалобы
+    в fiksa_records хранится в колонке notes.
+
+PostgreSQL (fixations):
+    расширение pg_trgm и GIN-индексы gin_trgm_ops - ILIKE '%текст%'
+    по этим колонкам идет через индекс.
+
+Использование:
+    from database.search_index import search
+    df = search('998901234567', limit=20, filters={'operator_name': 'Иванова'})
+
+    python scripts/database/search_index.py --rebuild       # пересобрать индекс SQLite
+    python scripts/database/search_index.py --postgres      # создать индексы pg_trgm
+    python scripts/database/search_index.py "Чиланзар 12"   # поиск из консоли
+=============================================================================
+"""
+
+import os
+import sys
+import sqlite3
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).parent.parent.parent
+DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
+load_dotenv(BASE_DIR / 'config' / 'postgresql.env')
+
+# Параметры подключения к PostgreSQL
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': os.getenv('DB_PORT', '5432'),
+    'database': os.getenv('DB_NAME', 'qayta_data'),
+    'user': os.getenv('DB_USER', 'qayta_user'),
+    'password': os.getenv('DB_PASSWORD', 'qayta_password_2026')
+}
+
+# Колонки fiksa_records, попадающие в индекс
+SQLITE_COLUMNS = ['card_number', 'full_name', 'phone', 'address', 'notes']
+
+# Колонки fixations с индексами pg_trgm
+POSTGRES_COLUMNS = ['card_number', 'caller_name', 'phone', 'address', 'complaint']
+
+# Триграммный индекс не ищет строки короче 3 символов
+MIN_QUERY_LENGTH = 3
+
+DEFAULT_LIMIT = 20
+
+# =============================================================================
+# SQLITE: FTS5
+# =============================================================================
+
+def ensure_sqlite_index(conn):
+    """
+    Создать fiksa_search и триггеры синхронизации, если их еще нет.
+    При первом создании индекс заполняется из существующих записей.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'fiksa_search'")
+    if cursor.fetchone():
+        return False
+
+    columns = ', '.join(SQLITE_COLUMNS)
+    new_values = ', '.join(f'new.{c}' for c in SQLITE_COLUMNS)
+    old_values = ', '.join(f'old.{c}' for c in SQLITE_COLUMNS)
+
+    cursor.executescript(f'''
+        CREATE VIRTUAL TABLE fiksa_search USING fts5(
+            {columns},
+            content='fiksa_records',
+            content_rowid='id',
+            tokenize='trigram'
+        );
+
+        CREATE TRIGGER IF NOT EXISTS fiksa_search_ai AFTER INSERT ON fiksa_records BEGIN
+            INSERT INTO fiksa_search(rowid, {columns}) VALUES (new.id, {new_values});
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS fiksa_search_ad AFTER DELETE ON fiksa_records BEGIN
+            INSERT INTO fiksa_search(fiksa_search, rowid, {columns})
+            VALUES ('delete', old.id, {old_values});
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS fiksa_search_au AFTER UPDATE ON fiksa_records BEGIN
+            INSERT INTO fiksa_search(fiksa_search, rowid, {columns})
+            VALUES ('delete', old.id, {old_values});
+            INSERT INTO fiksa_search(rowid, {columns}) VALUES (new.id, {new_values});
+        END;
+
+        INSERT INTO fiksa_search(fiksa_search) VALUES ('rebuild');
+    ''')
+    conn.commit()
+    return True
+
+def rebuild_sqlite_index(conn):
+    """Перестроить индекс целиком (после ручных правок БД в обход триггеров)"""
+    ensure_sqlite_index(conn)
+    conn.execute("INSERT INTO fiksa_search(fiksa_search) VALUES ('rebuild')")
+    conn.commit()
+
+def _fts_phrase(text):
+    """Строка поиска как одна фраза FTS5 - подстрока в любой из колонок"""
+    return '"' + text.replace('"', '""') + '"'
+
+def _sqlite_filters(filters):
+    """WHERE-условия по фильтрам: operator_name, status, date_from, date_to"""
+    conditions, params = [], []
+    filters = filters or {}
+
+    if filters.get('operator_name'):
+        conditions.append('r.operator_name = ?')
+        params.append(filters['operator_name'])
+    if filters.get('status'):
+        conditions.append('r.status = ?')
+        params.append(filters['status'])
+    if filters.get('date_from'):
+        conditions.append('r.collection_date >= ?')
+        params.append(str(filters['date_from']))
+    if filters.get('date_to'):
+        conditions.append('r.collection_date <= ?')
+        params.append(str(filters['date_to']))
+
+    return conditions, params
+
+def search_sqlite(conn, query, limit=DEFAULT_LIMIT, filters=None):
+    """Поиск по fiksa_records через fiksa_search"""
+    ensure_sqlite_index(conn)
+    conditions, params = _sqlite_filters(filters)
+
+    if len(query) >= MIN_QUERY_LENGTH:
+        source = 'fiksa_search s JOIN fiksa_records r ON r.id = s.rowid'
+        conditions.insert(0, 'fiksa_search MATCH ?')
+        params.insert(0, _fts_phrase(query))
+    else:
+        # 1-2 символа - триграмм нет, ищем только точное совпадение карты/телефона
+        source = 'fiksa_records r'
+        conditions.insert(0, '(r.card_number = ? OR r.phone = ?)')
+        params[0:0] = [query, query]
+
+    sql = f'''
+        SELECT r.* FROM {source}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY r.collection_date DESC, r.id DESC
+        LIMIT ?
+    '''
+    # limit=None - без ограничения (LIMIT -1 в SQLite)
+    return pd.read_sql_query(sql, conn, params=params + [-1 if limit is None else limit])
+
+# =============================================================================
+# POSTGRESQL: PG_TRGM
+# =============================================================================
+
+def ensure_postgres_index(conn):
+    """Расширение pg_trgm и GIN-индексы по колонкам поиска в fixations"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in POSTGRES_COLUMNS:
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS trgm_fixations_{column} '
+                f'ON fixations USING GIN ({column} gin_trgm_ops)'
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def search_postgres(conn, query, limit=DEFAULT_LIMIT, filters=None):
+    """Поиск по fixations через индексы pg_trgm (ILIKE)"""
+    filters = filters or {}
+    pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+    conditions = ['(' + ' OR '.join(f'f.{c} ILIKE %(pattern)s' for c in POSTGRES_COLUMNS) + ')']
+    params = {'pattern': pattern, 'limit': limit}
+
+    if filters.get('operator_name'):
+        conditions.append('o.operator_name = %(operator_name)s')
+        params['operator_name'] = filters['operator_name']
+    if filters.get('status'):
+        conditions.append('f.status = %(status)s')
+        params['status'] = filters['status']
+    if filters.get('date_from'):
+        conditions.append('f.call_date >= %(date_from)s')
+        params['date_from'] = filters['date_from']
+    if filters.get('date_to'):
+        conditions.append('f.call_date < %(date_to)s::date + 1')
+        params['date_to'] = filters['date_to']
+
+    sql = f'''
+        SELECT f.fixation_id, f.card_number, f.call_date, f.phone, f.caller_name,
+               f.address, f.status, f.complaint, o.operator_name
+        FROM fixations f
+        LEFT JOIN operators o ON f.operator_id = o.operator_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY f.call_date DESC
+        LIMIT %(limit)s
+    '''
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        columns = [d[0] for d in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+    finally:
+        cursor.close()
+
+# =============================================================================
+# ОБЩИЙ API
+# =============================================================================
+
+def search(query, limit=DEFAULT_LIMIT, filters=None, conn=None):
+    """
+    Найти записи по номеру карты, ФИО, телефону, адресу или жалобе.
+
+    limit: максимум строк (None - все совпадения)
+    filters: {'operator_name', 'status', 'date_from', 'date_to'}
+    conn: соединение psycopg2 - поиск по PostgreSQL (fixations),
+          sqlite3 или None - по data/fiksa_database.db (fiksa_records).
+    Возвращает DataFrame, новые записи первыми.
+    """
+    query = (query or '').strip()
+    if not query:
+        return pd.DataFrame()
+
+    if conn is not None and not isinstance(conn, sqlite3.Connection):
+        return search_postgres(conn, query, limit, filters)
+
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(DB_PATH)
+    try:
+        return search_sqlite(conn, query, limit, filters)
+    finally:
+        if own_conn:
+            conn.close()
+
+def main():
+    if '--postgres' in sys.argv:
+        import psycopg2
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            ensure_postgres_index(conn)
+        finally:
+            conn.close()
+        print(f"✓ Индексы pg_trgm созданы: {', '.join(POSTGRES_COLUMNS)}")
+        return
+
+    if '--rebuild' in sys.argv:
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            rebuild_sqlite_index(conn)
+        finally:
+            conn.close()
+        print("✓ Индекс fiksa_search перестроен")
+        return
+
+    query = ' '.join(arg for arg in sys.argv[1:] if not arg.startswith('--'))
+    start = datetime.now()
+    df = search(query)
+    elapsed = (datetime.now() - start).total_seconds() * 1000
+    print(f"🔍 Найдено: {len(df)} ({elapsed:.0f} мс)")
+    if len(df) > 0:
+        print(df.to_string())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+=============================================================================
+ПАРАЛЛЕЛЬНАЯ СБОРКА XLSX
+=============================================================================
+XLSX - это zip-архив из XML частей. Самая долгая часть записи - генерация
+XML листов, и при обычной записи через ExcelWriter она идет на одном ядре.
+
+Здесь XML листов генерируется в пуле процессов блоками по ROWS_PER_PART
+строк (строки записываются как inline strings, поэтому общая таблица
+строк не нужна). Готовые блоки склеиваются в XML листа прямо при
+упаковке в архив вместе с общими стилями. Листы всех книг периода
+(общей и по службам) попадают в один пул, упаковка книг тоже идет
+параллельно.
+
+Результат - обычная книга Excel, открывается в Excel и LibreOffice.
+
+Использование:
+    from formatting.parallel_xlsx import write_workbooks
+
+    write_workbooks([
+        (path, [('Лист1', df1), ('Лист2', df2)]),
+        ...
+    ])
+=============================================================================
+"""
+
+import os
+import re
+import math
+import shutil
+import zipfile
+import tempfile
+from pathlib import Path
+from datetime import datetime, date, time
+from xml.sax.saxutils import escape
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Максимальная длина текста в ячейке Excel
+MAX_CELL_LENGTH = 32767
+
+# Стили ячеек (индексы в cellXfs, см. STYLES_XML)
+STYLE_DATETIME = 1
+STYLE_HEADER = 2
+STYLE_DATE = 3
+
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+# Символы, недопустимые в XML
+_ILLEGAL_XML_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+CONTENT_TYPES_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+<Override PartName="/docProps/core.xml" ContentType="application/vnd.openxmlformats-package.core-properties+xml"/>
+<Override PartName="/docProps/app.xml" ContentType="application/vnd.openxmlformats-officedocument.extended-properties+xml"/>
+{sheets}
+</Types>'''
+
+ROOT_RELS_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties" Target="docProps/core.xml"/>
+<Relationship Id="rId3" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/extended-properties" Target="docProps/app.xml"/>
+</Relationships>'''
+
+CORE_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+<dcterms:created xsi:type="dcterms:W3CDTF">{created}</dcterms:created>
+</cp:coreProperties>'''
+
+APP_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties">
+<Application>Microsoft Excel</Application>
+</Properties>'''
+
+WORKBOOK_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<bookViews><workbookView activeTab="0"/></bookViews>
+<sheets>{sheets}</sheets>
+</workbook>'''
+
+WORKBOOK_RELS_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+{sheets}
+<Relationship Id="rIdStyles" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>'''
+
+# Общие стили: обычная ячейка, дата-время, заголовок (как у pandas), дата
+STYLES_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<numFmts count="2">
+<numFmt numFmtId="164" formatCode="yyyy\\-mm\\-dd\\ hh:mm:ss"/>
+<numFmt numFmtId="165" formatCode="yyyy\\-mm\\-dd"/>
+</numFmts>
+<fonts count="2">
+<font><sz val="11"/><name val="Calibri"/><family val="2"/></font>
+<font><b/><sz val="11"/><name val="Calibri"/><family val="2"/></font>
+</fonts>
+<fills count="2">
+<fill><patternFill patternType="none"/></fill>
+<fill><patternFill patternType="gray125"/></fill>
+</fills>
+<borders count="2">
+<border><left/><right/><top/><bottom/><diagonal/></border>
+<border><left style="thin"><color auto="1"/></left><right style="thin"><color auto="1"/></right><top style="thin"><color auto="1"/></top><bottom style="thin"><color auto="1"/></bottom><diagonal/></border>
+</borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="4">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" applyAlignment="1"><alignment horizontal="center" vertical="top"/></xf>
+<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+</cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>'''
+
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheetData>'
+)
+SHEET_TAIL = '</sheetData></worksheet>'
+
+# Сколько строк XML копить перед записью в файл
+ROWS_PER_WRITE = 5000
+
+# Большие листы режутся на блоки строк, каждый блок - отдельная задача пула
+ROWS_PER_PART = 50000
+
+
+# =============================================================================
+# ГЕНЕРАЦИЯ XML ЛИСТА (выполняется в процессах пула)
+# =============================================================================
+
+def column_letter(idx):
+    """Буква колонки по индексу с нуля: 0 -> A, 26 -> AA"""
+    letters = ''
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _text_fragment(value):
+    text = _ILLEGAL_XML_RE.sub('', str(value))[:MAX_CELL_LENGTH]
+    return f' t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _number_fragment(value, style=0):
+    if isinstance(value, float) and not math.isfinite(value):
+        return ''
+    style_attr = f' s="{style}"' if style else ''
+    return f'{style_attr}><v>{value!r}</v></c>' if isinstance(value, float) else f'{style_attr}><v>{value}</v></c>'
+
+
+def _excel_serial(value):
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None)
+    return (value - EXCEL_EPOCH).total_seconds() / 86400
+
+
+def _value_fragment(value):
+    """Часть XML ячейки после ссылки (без '<c r="A1"') для одного значения"""
+    if value is None or value is pd.NaT:
+        return ''
+    if isinstance(value, (bool, np.bool_)):
+        return f' t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, np.integer)):
+        return _number_fragment(int(value))
+    if isinstance(value, (float, np.floating)):
+        return _number_fragment(float(value))
+    if isinstance(value, datetime):
+        return _number_fragment(_excel_serial(value), STYLE_DATETIME)
+    if isinstance(value, date):
+        return _number_fragment(_excel_serial(datetime.combine(value, time())), STYLE_DATE)
+    if isinstance(value, np.datetime64):
+        if np.isnat(value):
+            return ''
+        return _value_fragment(pd.Timestamp(value).to_pydatetime())
+    if isinstance(value, str) and value == '':
+        return ''
+    return _text_fragment(value)
+
+
+def _column_fragments(series):
+    """Фрагменты XML для всей колонки (векторно для типизированных колонок)"""
+    dtype = series.dtype
+
+    if pd.api.types.is_bool_dtype(dtype) and not isinstance(dtype, pd.CategoricalDtype):
+        values = series.to_numpy(dtype=object)
+        return [_value_fragment(v) if not pd.isna(v) else '' for v in values]
+
+    if pd.api.types.is_integer_dtype(dtype) and series.notna().all():
+        return [f'><v>{v}</v></c>' for v in series.to_numpy().tolist()]
+
+    if pd.api.types.is_float_dtype(dtype):
+        return [_number_fragment(v) if v == v else '' for v in series.to_numpy(dtype=float).tolist()]
+
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        if getattr(series.dt, 'tz', None) is not None:
+            series = series.dt.tz_localize(None)
+        serial = (series - EXCEL_EPOCH) / pd.Timedelta(days=1)
+        return [
+            f' s="{STYLE_DATETIME}"><v>{v!r}</v></c>' if v == v else ''
+            for v in serial.to_numpy(dtype=float).tolist()
+        ]
+
+    # object / category / string: уникальные значения сериализуются один раз
+    values = series.astype(object).to_numpy()
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    unique_fragments = [_value_fragment(v) for v in uniques] + ['']
+    return [unique_fragments[c] for c in codes.tolist()]
+
+
+def render_header(columns):
+    """XML первой строки листа (заголовок)"""
+    cells = ''.join(
+        f'<c r="{column_letter(i)}1" s="{STYLE_HEADER}"{_text_fragment(column)}'
+        for i, column in enumerate(columns)
+    )
+    return f'<row r="1">{cells}</row>'
+
+
+def render_rows(df, first_row, part_path):
+    """Записать XML строк df (начиная со строки листа first_row) в файл part_path"""
+    letters = [column_letter(i) for i in range(len(df.columns))]
+    columns = [_column_fragments(df.iloc[:, i]) for i in range(len(df.columns))]
+
+    with open(part_path, 'w', encoding='utf-8') as f:
+        buffer = []
+        for row_idx, fragments in enumerate(zip(*columns), start=first_row):
+            cells = ''.join(
+                f'<c r="{letter}{row_idx}"{fragment}'
+                for letter, fragment in zip(letters, fragments) if fragment
+            )
+            buffer.append(f'<row r="{row_idx}">{cells}</row>')
+            if len(buffer) >= ROWS_PER_WRITE:
+                f.write(''.join(buffer))
+                buffer.clear()
+        f.write(''.join(buffer))
+
+    return part_path
+
+
+# =============================================================================
+# СБОРКА КНИГИ
+# =============================================================================
+
+def assemble_workbook(file_path, sheets):
+    """
+    Упаковать готовые XML части листов в книгу вместе с общими частями.
+    sheets - список (имя_листа, xml_заголовка, [файлы блоков строк]).
+    """
+    file_path = Path(file_path)
+    tmp_path = file_path.with_name(file_path.name + '.part')
+
+    sheets_xml = ''.join(
+        f'<sheet name="{escape(name, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+        for i, (name, _, _) in enumerate(sheets, 1)
+    )
+    rels_xml = ''.join(
+        f'<Relationship Id="rId{i}" '
+        f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        f'Target="worksheets/sheet{i}.xml"/>'
+        for i in range(1, len(sheets) + 1)
+    )
+    types_xml = ''.join(
+        f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+        f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for i in range(1, len(sheets) + 1)
+    )
+    created = datetime.now().strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        zf.writestr('[Content_Types].xml', CONTENT_TYPES_XML.format(sheets=types_xml))
+        zf.writestr('_rels/.rels', ROOT_RELS_XML)
+        zf.writestr('docProps/core.xml', CORE_XML.format(created=created))
+        zf.writestr('docProps/app.xml', APP_XML)
+        zf.writestr('xl/workbook.xml', WORKBOOK_XML.format(sheets=sheets_xml))
+        zf.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS_XML.format(sheets=rels_xml))
+        zf.writestr('xl/styles.xml', STYLES_XML)
+
+        for i, (_, header_xml, part_paths) in enumerate(sheets, 1):
+            with zf.open(f'xl/worksheets/sheet{i}.xml', 'w', force_zip64=True) as dst:
+                dst.write((SHEET_HEAD + header_xml).encode('utf-8'))
+                for part_path in part_paths:
+                    with open(part_path, 'rb') as src:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+                dst.write(SHEET_TAIL.encode('utf-8'))
+
+    os.replace(tmp_path, file_path)
+    return file_path
+
+
+def write_workbooks(workbooks, max_workers=None, errors=None):
+    """
+    Записать несколько книг, генерируя XML всех листов параллельно.
+
+    workbooks - список (путь, [(имя_листа, DataFrame), ...]).
+    max_workers=1 - без пула процессов (в текущем процессе).
+    errors - словарь: ошибка книги записывается в errors[путь], остальные
+    книги дописываются. Без него первая ошибка прерывает запись всех книг.
+    Возвращает список путей созданных книг в том же порядке.
+    """
+    workbooks = [(Path(path), list(sheets)) for path, sheets in workbooks]
+    if not workbooks:
+        return []
+
+    def fail(path, error):
+        if errors is None:
+            raise error
+        errors[path] = error
+
+    work_dir = Path(tempfile.mkdtemp(prefix='xlsx_parts_'))
+    try:
+        # Режем листы на блоки строк: (df блока, первая строка, файл)
+        render_jobs = []
+        layouts = []
+        for book_idx, (path, sheets) in enumerate(workbooks):
+            try:
+                layout = []
+                for sheet_idx, (name, df) in enumerate(sheets, 1):
+                    part_paths = []
+                    for start in range(0, len(df), ROWS_PER_PART):
+                        part_path = work_dir / f'book{book_idx}_sheet{sheet_idx}_{start}.xml'
+                        render_jobs.append((book_idx, (df.iloc[start:start + ROWS_PER_PART], start + 2, part_path)))
+                        part_paths.append(part_path)
+                    layout.append((str(name), render_header(df.columns), part_paths))
+                path.parent.mkdir(parents=True, exist_ok=True)
+            except Exception as e:
+                fail(path, e)
+                layout = None
+            layouts.append((path, layout))
+
+        # Книги, у которых хотя бы один блок не сгенерировался, не собираются
+        failed = {idx for idx, (_, layout) in enumerate(layouts) if layout is None}
+        render_jobs = [(idx, job) for idx, job in render_jobs if idx not in failed]
+
+        if max_workers is None:
+            max_workers = min(max(len(render_jobs), 1), os.cpu_count() or 1)
+
+        def finish(book_idx, error):
+            failed.add(book_idx)
+            fail(layouts[book_idx][0], error)
+
+        if max_workers <= 1:
+            for book_idx, job in render_jobs:
+                if book_idx in failed:
+                    continue
+                try:
+                    render_rows(*job)
+                except Exception as e:
+                    finish(book_idx, e)
+            created = []
+            for book_idx, (path, layout) in enumerate(layouts):
+                if book_idx in failed:
+                    continue
+                try:
+                    created.append(assemble_workbook(path, layout))
+                except Exception as e:
+                    finish(book_idx, e)
+            return created
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [(book_idx, executor.submit(render_rows, *job)) for book_idx, job in render_jobs]
+            for book_idx, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    if book_idx not in failed:
+                        finish(book_idx, e)
+
+            # Упаковка (сжатие) книг тоже идет параллельно - по книге на процесс
+            assembled = [
+                (book_idx, executor.submit(assemble_workbook, path, layout))
+                for book_idx, (path, layout) in enumerate(layouts)
+                if book_idx not in failed
+            ]
+            created = []
+            for book_idx, future in assembled:
+                try:
+                    created.append(future.result())
+                except Exception as e:
+                    finish(book_idx, e)
+            return created
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -138,38 +138,65 @@ def categorize_status(status):
     
     return 'Прочее'
 
-df_filtered['Категория'] = df_filtered['Статус'].apply(categorize_status)
+# Классифицируем каждый уникальный статус один раз
+status_categories = {status: categorize_status(status) for status in df_filtered['Статус'].dropna().unique()}
+df_filtered['Категория'] = df_filtered['Статус'].map(status_categories).fillna('Прочее')
 
 # Создаем сводный отчет
 print("\n📊 Создание отчета...")
 
 services = ['101', '102', '103', '104']
+categories = ['Положительный', 'Отрицательный', 'Прочее']
 
-# Группируем данные
-result = []
+month_names_ru = {
+    '01': 'Январь', '02': 'Февраль', '03': 'Март', '04': 'Апрель',
+    '05': 'Май', '06': 'Июнь', '07': 'Июль', '08': 'Август',
+    '09': 'Сентябрь', '10': 'Октябрь', '11': 'Ноябрь', '12': 'Декабрь'
+}
 
-for (year, month, region), group in df_filtered.groupby(['Год', 'Месяц', 'Регион']):
-    row = {
-        'Yil': year,
-        'Oy': month_names.get(month, month),
-        'Hudud': region
-    }
-    
-    for service in services:
-        service_data = group[group['Служба'] == service]
-        
-        total = len(service_data)
-        positive = len(service_data[service_data['Категория'] == 'Положительный'])
-        negative = len(service_data[service_data['Категория'] == 'Отрицательный'])
-        
-        row[f'{service}_Jami'] = total
-        row[f'{service}_Qanoatlantirildi'] = positive
-        row[f'{service}_Qanoatlantirilmadi'] = negative
-    
-    result.append(row)
+CUBE_KEYS = ['Год', 'Месяц', 'Регион', 'Служба', 'Оператор']
+
+def build_report_cube(data):
+    """
+    Куб отчета: количество заявок по (год, месяц, регион, служба, оператор)
+    в разрезе категорий статуса. Строится за один проход по данным,
+    все листы отчета получаются агрегацией куба.
+    В куб попадают только встречающиеся сочетания ключей; строки без
+    оператора сохраняются (они входят в итоги листов 1 и 2).
+    """
+    cube = (
+        data.groupby(CUBE_KEYS + ['Категория'], observed=True, dropna=False).size()
+        .unstack('Категория', fill_value=0)
+        .reindex(columns=categories, fill_value=0)
+    )
+    cube['Всего'] = cube[categories].sum(axis=1)
+    return cube
+
+def count_unique_cards(data, keys):
+    """Число уникальных карт по ключам (одна дедупликация вместо nunique по группам)"""
+    cards = data.dropna(subset=['Номер карты']).drop_duplicates(keys + ['Номер карты'])
+    return cards.groupby(keys).size()
+
+cube = build_report_cube(df_filtered)
+
+# Лист 1: Год | Месяц | Регион | службы (Jami / Qanoatlantirildi / Qanoatlantirilmadi)
+# Строки без региона не попадают в лист, как в прежнем groupby по региону
+by_region = cube.groupby(['Год', 'Месяц', 'Регион', 'Служба']).sum()
+by_region = by_region.unstack('Служба', fill_value=0)
+
+report_df = by_region.index.to_frame(index=False)
+report_df.columns = ['Yil', 'Oy', 'Hudud']
+report_df['Oy'] = report_df['Oy'].map(lambda month: month_names.get(month, month))
 
-# Создаем DataFrame
-report_df = pd.DataFrame(result)
+for service in services:
+    for column, category in [('Jami', 'Всего'),
+                             ('Qanoatlantirildi', 'Положительный'),
+                             ('Qanoatlantirilmadi', 'Отрицательный')]:
+        if (category, service) in by_region.columns:
+            values = by_region[(category, service)].to_numpy()
+        else:
+            values = 0
+        report_df[f'{service}_{column}'] = values
 
 # Сортируем по году и месяцу
 month_order = {'Yanvar': 1, 'Fevral': 2, 'Mart': 3, 'Aprel': 4, 'May': 5, 'Iyun': 6,
@@ -178,6 +205,46 @@ report_df['Month_Order'] = report_df['Oy'].map(month_order)
 report_df = report_df.sort_values(['Yil', 'Month_Order', 'Hudud'])
 report_df = report_df.drop('Month_Order', axis=1)
 
+# Лист 2: Год | Месяц | Служба
+service_cube = cube[cube.index.get_level_values('Служба').isin(services)]
+
+by_service = service_cube.groupby(['Год', 'Месяц', 'Служба']).sum()
+operators_per_service = (
+    service_cube.index.droplevel('Регион').to_frame(index=False)
+    .dropna(subset=['Оператор'])
+    .drop_duplicates()
+    .groupby(['Год', 'Месяц', 'Служба']).size()
+)
+cards_per_service = count_unique_cards(df_filtered, ['Год', 'Месяц', 'Служба'])
+
+detail_df = pd.DataFrame({
+    'Всего заявок': by_service['Всего'],
+    'Положительных': by_service['Положительный'],
+    'Отрицательных': by_service['Отрицательный'],
+    'Уникальных карт': cards_per_service.reindex(by_service.index, fill_value=0),
+    'Операторов': operators_per_service.reindex(by_service.index, fill_value=0),
+}).reset_index()
+detail_df['Служба'] = pd.Categorical(detail_df['Служба'], categories=services, ordered=True)
+detail_df = detail_df.sort_values(['Год', 'Месяц', 'Служба'])
+detail_df['Служба'] = detail_df['Служба'].astype(str)
+detail_df['Месяц'] = detail_df['Месяц'].map(lambda month: month_names_ru.get(month, month))
+detail_df = detail_df[['Год', 'Месяц', 'Служба', 'Всего заявок', 'Положительных',
+                       'Отрицательных', 'Уникальных карт', 'Операторов']]
+
+# Лист 3: Год | Месяц | Служба | Оператор
+by_operator = cube.groupby(['Год', 'Месяц', 'Служба', 'Оператор']).sum()
+cards_per_operator = count_unique_cards(df_filtered, ['Год', 'Месяц', 'Служба', 'Оператор'])
+
+operator_df = pd.DataFrame({
+    'Всего заявок': by_operator['Всего'],
+    'Положительных': by_operator['Положительный'],
+    'Отрицательных': by_operator['Отрицательный'],
+    'Уникальных карт': cards_per_operator.reindex(by_operator.index, fill_value=0),
+}).reset_index()
+operator_df['Месяц'] = operator_df['Месяц'].map(lambda month: month_names_ru.get(month, month))
+if len(operator_df) > 0:
+    operator_df = operator_df.sort_values(['Год', 'Месяц', 'Служба', 'Всего заявок'], ascending=[True, True, True, False])
+
 # Сохраняем в Excel
 print("\n💾 Сохранение отчета...")
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
@@ -186,54 +253,14 @@ output_file = OUTPUT_DIR / f'QAYTA_ALOQA_REPORT_FINAL_{timestamp}.xlsx'
 
 try:
     with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-    # Основной отчет
-    report_df.to_excel(writer, sheet_name='Отчет по месяцам', index=False)
-    
-    # Детальная статистика по месяцам и службам
-    month_names_ru = {
-        '01': 'Январь', '02': 'Февраль', '03': 'Март', '04': 'Апрель',
-        '05': 'Май', '06': 'Июнь', '07': 'Июль', '08': 'Август',
-        '09': 'Сентябрь', '10': 'Октябрь', '11': 'Ноябрь', '12': 'Декабрь'
-    }
-    
-    detail_stats = []
-    for (year, month), group in df_filtered.groupby(['Год', 'Месяц']):
-        for service in services:
-            service_data = group[group['Служба'] == service]
-            if len(service_data) > 0:
-                detail_stats.append({
-                    'Год': year,
-                    'Месяц': month_names_ru.get(month, month),
-                    'Служба': service,
-                    'Всего заявок': len(service_data),
-                    'Положительных': len(service_data[service_data['Категория'] == 'Положительный']),
-                    'Отрицательных': len(service_data[service_data['Категория'] == 'Отрицательный']),
-                    'Уникальных карт': service_data['Номер карты'].nunique(),
-                    'Операторов': service_data['Оператор'].nunique()
-                })
-    
-    detail_df = pd.DataFrame(detail_stats)
-    detail_df.to_excel(writer, sheet_name='Детальная статистика', index=False)
-    
-    # Статистика по операторам
-    operator_stats = []
-    for (year, month, service, operator), group in df_filtered.groupby(['Год', 'Месяц', 'Служба', 'Оператор']):
-        if len(group) > 0:
-            operator_stats.append({
-                'Год': year,
-                'Месяц': month_names_ru.get(month, month),
-                'Служба': service,
-                'Оператор': operator,
-                'Всего заявок': len(group),
-                'Положительных': len(group[group['Категория'] == 'Положительный']),
-                'Отрицательных': len(group[group['Категория'] == 'Отрицательный']),
-                'Уникальных карт': group['Номер карты'].nunique()
-            })
-    
-    operator_df = pd.DataFrame(operator_stats)
-    if len(operator_df) > 0:
-        operator_df = operator_df.sort_values(['Год', 'Месяц', 'Служба', 'Всего заявок'], ascending=[True, True, True, False])
-    operator_df.to_excel(writer, sheet_name='По операторам', index=False)
+        # Основной отчет
+        report_df.to_excel(writer, sheet_name='Отчет по месяцам', index=False)
+        
+        # Детальная статистика по месяцам и службам
+        detail_df.to_excel(writer, sheet_name='Детальная статистика', index=False)
+        
+        # Статистика по операторам
+        operator_df.to_excel(writer, sheet_name='По операторам', index=False)
 
     print(f"✅ Отчет сохранен: {output_file}")
 except Exception as e:
@@ -272,18 +299,12 @@ for service in services:
         print(f"    Qanoatlantirilmadi (Отрицательных): {negative:,} ({neg_pct:.1f}%)")
 
 # Статистика по месяцам
-month_names_ru = {
-    '01': 'Январь', '02': 'Февраль', '03': 'Март', '04': 'Апрель',
-    '05': 'Май', '06': 'Июнь', '07': 'Июль', '08': 'Август',
-    '09': 'Сентябрь', '10': 'Октябрь', '11': 'Ноябрь', '12': 'Декабрь'
-}
-
 print("\n📅 Статистика по месяцам:")
-for (year, month), group in df_filtered.groupby(['Год', 'Месяц']):
+for (year, month), totals in cube.groupby(['Год', 'Месяц']).sum().iterrows():
     month_name = month_names_ru.get(month, month)
-    total = len(group)
-    positive = len(group[group['Категория'] == 'Положительный'])
-    negative = len(group[group['Категория'] == 'Отрицательный'])
+    total = totals['Всего']
+    positive = totals['Положительный']
+    negative = totals['Отрицательный']
     
     print(f"\n  {month_name} {year}:")
     print(f"    Всего: {total:,}")
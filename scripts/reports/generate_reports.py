@@ -14,7 +14,8 @@
 
 Особенности:
 - Группирует по видам услуг (101, 102, 103, 104...)
-- Форматирует Excel файлы (шапка, цвета)
+- Форматирует Excel файлы (шапка, цвета) за один проход записи
+- Читает БД серверным курсором порциями - память не зависит от размера таблицы
 - Сохраняет в папку reports/{МЕСЯЦ_ГОД}/ТОЛЬКО_ОТРИЦАТЕЛЬНЫЕ/
 
 Использование:
@@ -30,6 +31,9 @@ import pandas as pd
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import datetime
+from psycopg2 import sql
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill, Font, Alignment
 from openpyxl.utils import get_column_letter
 
@@ -46,6 +50,17 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'qayta_password_2026')
 }
 
+# Размер порции при чтении серверным курсором
+FETCH_CHUNK_SIZE = 5000
+
+# Максимальная ширина колонки в Excel
+MAX_COLUMN_WIDTH = 50
+
+# Стиль заголовка (синий фон, белый текст)
+HEADER_FILL = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+HEADER_FONT = Font(color="FFFFFF", bold=True)
+HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='center', wrap_text=True)
+
 
 def get_db_connection():
     """Создать подключение к БД"""
@@ -53,21 +68,17 @@ def get_db_connection():
 
 
 def format_excel(file_path, sheet_name='Sheet1'):
-    """Отформатировать Excel файл"""
+    """Отформатировать уже сохраненный Excel файл"""
     from openpyxl import load_workbook
     
     wb = load_workbook(file_path)
     ws = wb[sheet_name]
     
-    # Стиль заголовка (синий фон, белый текст)
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True)
-    
     # Отформатировать первую строку
     for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        cell.fill = HEADER_FILL
+        cell.font = HEADER_FONT
+        cell.alignment = HEADER_ALIGNMENT
     
     # Установить ширину колонок
     for column in ws.columns:
@@ -79,11 +90,123 @@ def format_excel(file_path, sheet_name='Sheet1'):
                     max_length = max(max_length, len(str(cell.value)))
             except:
                 pass
-        ws.column_dimensions[column_letter].width = min(max_length + 2, 50)
+        ws.column_dimensions[column_letter].width = min(max_length + 2, MAX_COLUMN_WIDTH)
     
     wb.save(file_path)
 
 
+def excel_value(value):
+    """Привести значение из БД к типу, который можно записать в ячейку"""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    if isinstance(value, (dict, list)):
+        return str(value)
+    return value
+
+
+class StreamingExcelWriter:
+    """
+    Запись Excel файла за один проход в режиме write-only.
+    
+    Ширина колонок должна быть известна до первой строки (openpyxl пишет
+    их в начало листа), поэтому она передается заранее - например,
+    посчитанная агрегатом в БД. Строки сразу уходят на диск, в памяти
+    файл не накапливается.
+    """
+    
+    def __init__(self, file_path, sheet_name, columns, max_lengths=None):
+        self.file_path = Path(file_path)
+        self.rows = 0
+        
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet(sheet_name)
+        
+        max_lengths = max_lengths or {}
+        for idx, column in enumerate(columns, 1):
+            length = max(len(str(column)), max_lengths.get(column) or 0)
+            self.ws.column_dimensions[get_column_letter(idx)].width = min(length + 2, MAX_COLUMN_WIDTH)
+        
+        header = []
+        for column in columns:
+            cell = WriteOnlyCell(self.ws, value=str(column))
+            cell.fill = HEADER_FILL
+            cell.font = HEADER_FONT
+            cell.alignment = HEADER_ALIGNMENT
+            header.append(cell)
+        self.ws.append(header)
+    
+    def append(self, row):
+        self.ws.append([excel_value(v) for v in row])
+        self.rows += 1
+    
+    def close(self):
+        self.wb.save(self.file_path)
+
+
+def write_dataframe(df, file_path, sheet_name):
+    """Записать небольшой DataFrame с оформлением за один проход"""
+    max_lengths = {
+        column: df[column].dropna().astype(str).str.len().max() if df[column].notna().any() else 0
+        for column in df.columns
+    }
+    writer = StreamingExcelWriter(file_path, sheet_name, list(df.columns), max_lengths)
+    for row in df.itertuples(index=False, name=None):
+        writer.append(row)
+    writer.close()
+
+
+def get_table_columns(conn, table):
+    """Список колонок таблицы (по пустой выборке)"""
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("SELECT * FROM {} LIMIT 0").format(sql.Identifier(table)))
+        return [desc[0] for desc in cursor.description]
+
+
+def get_service_profile(conn, table, columns, group_column='service'):
+    """
+    Количество строк и максимальная длина значений каждой колонки
+    по группам - одним агрегатным запросом на стороне БД.
+    Возвращает {группа: (количество, {колонка: длина})}.
+    """
+    length_exprs = [
+        sql.SQL("MAX(LENGTH({}::text))").format(sql.Identifier(column))
+        for column in columns
+    ]
+    query = sql.SQL("SELECT {group}, COUNT(*), {lengths} FROM {table} GROUP BY {group}").format(
+        group=sql.Identifier(group_column),
+        lengths=sql.SQL(', ').join(length_exprs),
+        table=sql.Identifier(table)
+    )
+    
+    profile = {}
+    with conn.cursor() as cursor:
+        cursor.execute(query)
+        for row in cursor.fetchall():
+            profile[row[0]] = (row[1], dict(zip(columns, row[2:])))
+    return profile
+
+
+def merge_lengths(*length_maps):
+    """Максимум длин по нескольким группам"""
+    merged = {}
+    for lengths in length_maps:
+        for column, length in lengths.items():
+            merged[column] = max(merged.get(column) or 0, length or 0)
+    return merged
+
+
+def stream_rows(conn, query, chunk_size=FETCH_CHUNK_SIZE):
+    """Читать результат запроса серверным курсором порциями"""
+    with conn.cursor(name='report_stream') as cursor:
+        cursor.itersize = chunk_size
+        cursor.execute(query)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+
+
 def main():
     """Генерировать отчеты"""
     print("="*70)
@@ -101,60 +224,66 @@ def main():
     
     print(f"\n📁 Папка для отчетов: {reports_dir}\n")
     
-    cursor = conn.cursor()
-    
-    # 1. Загрузить все отрицательные отзывы
-    print("1️⃣  Загрузка отрицательных отзывов из БД...")
-    df_all = pd.read_sql(
-        "SELECT * FROM negative_complaints ORDER BY call_datetime DESC",
-        conn
-    )
+    # 1. Профиль данных: количество и ширина колонок по услугам
+    print("1️⃣  Анализ отрицательных отзывов в БД...")
+    columns = get_table_columns(conn, 'negative_complaints')
+    profile = get_service_profile(conn, 'negative_complaints', columns)
     
-    if len(df_all) == 0:
+    total_records = sum(count for count, _ in profile.values())
+    if total_records == 0:
         print("⚠️  Нет отрицательных отзывов в БД")
-        cursor.close()
         conn.close()
         return
     
-    total_records = len(df_all)
-    print(f"✓ Загружено {total_records:,} отрицательных отзывов\n")
+    print(f"✓ Найдено {total_records:,} отрицательных отзывов\n")
     
-    # 2. Генерировать отчеты по услугам
-    print("2️⃣  Генерирование отчетов по видам услуг...")
+    # 2. Один проход по таблице: каждая строка пишется в общий отчет
+    # и в отчет своей услуги
+    print("2️⃣  Генерирование отчетов по видам услуг и общего отчета...")
     
-    services = df_all['service'].dropna().unique()
-    if None in df_all['service'].values:
-        services = list(services) + [None]
+    general_file = reports_dir / "ОБЩИЙ_ОТЧЕТ_ОТРИЦАТЕЛЬНЫЕ.xlsx"
+    general_writer = StreamingExcelWriter(
+        general_file, 'Отрицательные', columns,
+        merge_lengths(*(lengths for _, lengths in profile.values()))
+    )
     
     service_reports = {}
+    service_writers = {}
+    file_writers = {}
     
-    for service in sorted([s for s in services if s]):
-        df_service = df_all[df_all['service'] == service]
+    for service in sorted(s for s in profile if s):
+        # Извлекаем номер услуги (101, 102, 103...)
+        service_num = service[:3] if len(service) >= 3 else service
+        filename = f"СЛУЖБА_{service_num}_ОТРИЦАТЕЛЬНЫЕ.xlsx"
         
-        if len(df_service) > 0:
-            # Извлекаем номер услуги (101, 102, 103...)
-            service_num = service[:3] if len(service) >= 3 else service
-            
-            filename = f"СЛУЖБА_{service_num}_ОТРИЦАТЕЛЬНЫЕ.xlsx"
-            file_path = reports_dir / filename
-            
-            # Сохраняем в Excel
-            df_service.to_excel(file_path, sheet_name='Отрицательные', index=False)
-            format_excel(file_path, 'Отрицательные')
-            
-            service_reports[service] = len(df_service)
-            print(f"   ✓ {filename}: {len(df_service):,} записей")
-    
-    # 3. Общий отчет все отрицательные
-    print("\n3️⃣  Генерирование общего отчета...")
+        # Услуги с одинаковым номером попадают в один файл
+        if filename not in file_writers:
+            same_file = [lengths for name, (_, lengths) in profile.items()
+                         if name and (name[:3] if len(name) >= 3 else name) == service_num]
+            file_writers[filename] = StreamingExcelWriter(
+                reports_dir / filename, 'Отрицательные', columns, merge_lengths(*same_file)
+            )
+        service_writers[service] = file_writers[filename]
+        service_reports[service] = profile[service][0]
     
-    general_file = reports_dir / "ОБЩИЙ_ОТЧЕТ_ОТРИЦАТЕЛЬНЫЕ.xlsx"
-    df_all.to_excel(general_file, sheet_name='Отрицательные', index=False)
-    format_excel(general_file, 'Отрицательные')
-    print(f"   ✓ ОБЩИЙ_ОТЧЕТ_ОТРИЦАТЕЛЬНЫЕ.xlsx: {total_records:,} записей")
+    service_idx = columns.index('service')
+    query = "SELECT * FROM negative_complaints ORDER BY call_datetime DESC"
+    
+    for row in stream_rows(conn, query):
+        general_writer.append(row)
+        writer = service_writers.get(row[service_idx])
+        if writer is not None:
+            writer.append(row)
+    
+    for filename, writer in file_writers.items():
+        writer.close()
+        print(f"   ✓ {filename}: {writer.rows:,} записей")
+    
+    general_writer.close()
+    print(f"   ✓ ОБЩИЙ_ОТЧЕТ_ОТРИЦАТЕЛЬНЫЕ.xlsx: {general_writer.rows:,} записей")
     
-    # 4. Статистика
-    print("\n4️⃣  Генерирование сводной статистики...")
+    # 3. Статистика
+    print("\n3️⃣  Генерирование сводной статистики...")
     
     stats_data = {
         'Вид услуги': list(service_reports.keys()),
@@ -165,11 +294,9 @@ def main():
     df_stats = df_stats.sort_values('Количество отрицательных', ascending=False)
     
     stats_file = reports_dir / "СТАТИСТИКА_ОТРИЦАТЕЛЬНЫЕ.xlsx"
-    df_stats.to_excel(stats_file, sheet_name='Статистика', index=False)
-    format_excel(stats_file, 'Статистика')
+    write_dataframe(df_stats, stats_file, 'Статистика')
     print(f"   ✓ СТАТИСТИКА_ОТРИЦАТЕЛЬНЫЕ.xlsx создана")
     
-    cursor.close()
     conn.close()
     
     # Финальная информация
@@ -19,6 +19,9 @@ from telegram.ext import (
 # Пути
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / 'scripts' / 'analysis'))
+
+from service_reports import generate_service_reports_cached
 
 DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
 REPORTS_DIR = BASE_DIR / 'reports'
@@ -352,18 +355,11 @@ async def generate_service_report(update: Update, context: ContextTypes.DEFAULT_
     await query.edit_message_text(f"⏳ Генерирую отчет по службе {service}...")
     
     try:
-        # Запускаем генерацию отчетов
-        subprocess.run(
-            [sys.executable, str(BASE_DIR / 'scripts' / 'analysis' / 'service_reports.py')],
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='ignore'
-        )
+        # Отчеты берутся из кэша, пересборка - только если данные изменились
+        report_files = await asyncio.to_thread(generate_service_reports_cached) or []
         
         # Ищем файлы службы
-        services_dir = REPORTS_DIR / 'services'
-        service_files = list(services_dir.glob(f'*{service}*.xlsx'))
+        service_files = [f for f in report_files if f'Служба_{service}' in f.name]
         
         if service_files:
             await query.edit_message_text(f"✅ Найдено {len(service_files)} файлов. Отправляю...")
@@ -388,18 +384,14 @@ async def generate_all_reports(update: Update, context: ContextTypes.DEFAULT_TYP
     await query.edit_message_text("⏳ Генерирую ВСЕ отчеты (это может занять время)...")
     
     try:
-        subprocess.run(
-            [sys.executable, str(BASE_DIR / 'scripts' / 'analysis' / 'service_reports.py')],
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='ignore',
+        report_files = await asyncio.wait_for(
+            asyncio.to_thread(generate_service_reports_cached),
             timeout=300  # 5 минут максимум
         )
         
-        await query.edit_message_text("✅ Все отчеты сгенерированы и отправлены!")
+        await query.edit_message_text(f"✅ Все отчеты сгенерированы: {len(report_files or [])} файлов")
         
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         await query.edit_message_text("⚠️ Генерация заняла слишком много времени, но процесс запущен")
     except Exception as e:
         await query.edit_message_text(f"❌ Ошибка: {e}")
@@ -2,10 +2,12 @@
 Рабочий Telegram бот с автоматическим обновлением данных и отчетами
 """
 import asyncio
+import html
 import sqlite3
 import subprocess
 import sys
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta
 import pandas as pd
@@ -18,6 +20,9 @@ from telegram.ext import (
 # Пути
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / 'scripts'))
+from database.search_index import search
+from data_processing.snapshots_112 import ingest_file, InvalidFile112
 
 DB_PATH = BASE_DIR / 'data' / 'fiksa_database.db'
 REPORTS_DIR = BASE_DIR / 'reports'
@@ -25,6 +30,13 @@ ANALYTICS_DIR = REPORTS_DIR / 'analytics'
 SERVICES_DIR = REPORTS_DIR / 'services'
 UPLOADS_DIR = BASE_DIR / '123'  # Папка для загруженных файлов 112
 
+# Разбор загруженных файлов 112 - по одному в фоне, не блокируя бота
+INGEST_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ingest_112')
+
+# Предел длины сообщения Telegram (символов)
+MESSAGE_LIMIT = 4096
+SEARCH_NOTES_LENGTH = 200
+
 # Создаем директории
 for dir_path in [REPORTS_DIR, ANALYTICS_DIR, SERVICES_DIR, UPLOADS_DIR]:
     dir_path.mkdir(exist_ok=True, parents=True)
@@ -327,29 +339,78 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         msg = f"""✅ <b>Файл успешно загружен!</b>
 
-📁 Имя: <code>{file_name}</code>
+📁 Имя: <code>{html.escape(file_name)}</code>
 📊 Размер: {file_size:.2f} MB
 📂 Папка: 123/
 
-💡 Теперь вы можете обработать данные командой /process или через кнопку "Обработать данные"""
-        
-        # Кнопки для действий
-        keyboard = [
-            [InlineKeyboardButton("📊 Обработать данные", callback_data='process_data')],
-            [InlineKeyboardButton("📋 Список файлов", callback_data='list_files')],
-            [InlineKeyboardButton("🔙 Главное меню", callback_data='start')]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+⏳ Проверяю и разбираю файл 112..."""
         
-        await update.message.reply_text(msg, parse_mode='HTML', reply_markup=reply_markup)
+        await update.message.reply_text(msg, parse_mode='HTML')
         
         logger.info(f"Файл загружен: {file_name} ({file_size:.2f} MB)")
         
+        # Разбор в фоне - бот сразу принимает следующие сообщения
+        context.application.create_task(ingest_upload(update, file_path))
+        
     except Exception as e:
         error_msg = f"❌ Ошибка при загрузке файла: {str(e)}"
         await update.message.reply_text(error_msg)
         logger.error(error_msg, exc_info=True)
 
+async def ingest_upload(update: Update, file_path: Path):
+    """Фоновый разбор загруженного файла 112: снимок, число строк, период, дубликаты"""
+    file_name = html.escape(file_path.name)
+    keyboard = [
+        [InlineKeyboardButton("📊 Обработать данные", callback_data='process_data')],
+        [InlineKeyboardButton("📋 Список файлов", callback_data='list_files')],
+        [InlineKeyboardButton("🔙 Главное меню", callback_data='start')]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    try:
+        loop = asyncio.get_running_loop()
+        info = await loop.run_in_executor(INGEST_EXECUTOR, ingest_file, file_path)
+    except InvalidFile112 as e:
+        await update.message.reply_text(
+            f"⚠️ <code>{file_name}</code> не похож на выгрузку 112 ({html.escape(str(e))}).\n"
+            f"Файл сохранен в 123/, но в сопоставление не попадет.",
+            parse_mode='HTML'
+        )
+        return
+    except Exception as e:
+        await update.message.reply_text(f"❌ Ошибка разбора файла: {str(e)}")
+        logger.error(f"Ошибка разбора {file_path.name}: {e}", exc_info=True)
+        return
+    
+    original = info['duplicate_of']
+    if info['duplicate'] and original != file_path.name and (UPLOADS_DIR / original).exists():
+        # То же содержимое под другим именем - копия дала бы двойной счет
+        file_path.unlink(missing_ok=True)
+        await update.message.reply_text(
+            f"♻️ Этот файл уже загружен как <code>{html.escape(original)}</code> - копия удалена.",
+            parse_mode='HTML', reply_markup=reply_markup
+        )
+        logger.info(f"Дубликат {file_path.name} = {original}, удален")
+        return
+    
+    if info['period_start']:
+        period = f"{info['period_start']} — {info['period_end']}"
+    else:
+        period = "не определен"
+    # Тот же файл мог успеть разобрать наблюдатель за папкой 123
+    status = "уже был разобран ранее" if info['duplicate'] and original != file_path.name else "разобран"
+    
+    msg = f"""📑 <b>Файл 112 {status}</b>
+
+📁 <code>{file_name}</code>
+📊 Строк: {info['rows']:,}
+📅 Период звонков: {period}
+
+💡 Теперь вы можете обработать данные командой /process или через кнопку "Обработать данные"""
+    
+    await update.message.reply_text(msg, parse_mode='HTML', reply_markup=reply_markup)
+    logger.info(f"Файл разобран: {file_path.name} ({info['rows']} строк, период {period})")
+
 async def list_files(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показать список файлов в папке 123"""
     try:
@@ -488,6 +549,79 @@ async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=reply_markup
     )
 
+async def find_records(update: Update, context: ContextTypes.DEFAULT_TYPE, query: str = None):
+    """Поиск по карте, ФИО, телефону, адресу или жалобе: /find <текст>"""
+    if query is None:
+        query = ' '.join(context.args or [])
+    query = query.strip()
+    
+    if not query:
+        await update.effective_message.reply_text(
+            "🔍 Использование: /find <номер карты, телефон, ФИО, адрес или текст жалобы>"
+        )
+        return
+    
+    start_time = datetime.now()
+    try:
+        # Запрос к SQLite блокирующий - выполняем вне цикла событий
+        df = await asyncio.to_thread(search, query, 10)
+    except Exception as e:
+        logger.error(f"Ошибка поиска '{query}': {e}")
+        await update.effective_message.reply_text(f"❌ Ошибка поиска: {e}")
+        return
+    elapsed = (datetime.now() - start_time).total_seconds() * 1000
+    
+    if df.empty:
+        await update.effective_message.reply_text(
+            f"🔍 По запросу <code>{html.escape(query)}</code> ничего не найдено ({elapsed:.0f} мс)",
+            parse_mode='HTML'
+        )
+        return
+    
+    header = f"🔍 <b>Результаты по запросу</b> <code>{html.escape(query)}</code> ({elapsed:.0f} мс)"
+    blocks = []
+    for _, row in df.iterrows():
+        fields = [
+            f"📇 <b>{_field(row['card_number'])}</b> | {_field(row['collection_date'])}",
+            f"👤 {_field(row['full_name'])} | 📞 {_field(row['phone'])}",
+        ]
+        if _has_text(row['address']):
+            fields.append(f"📍 {_field(row['address'])}")
+        fields.append(f"👩‍💼 {_field(row['operator_name'])} | {_field(row['status'])}")
+        if _has_text(row['notes']):
+            notes = str(row['notes']).strip()
+            if len(notes) > SEARCH_NOTES_LENGTH:
+                notes = notes[:SEARCH_NOTES_LENGTH] + '…'
+            fields.append(f"💬 {html.escape(notes)}")
+        blocks.append('\n'.join(fields))
+    
+    # Длинные результаты - несколькими сообщениями (предел Telegram 4096 символов)
+    for message in _split_message([header] + blocks):
+        await update.effective_message.reply_text(message, parse_mode='HTML')
+
+def _has_text(value):
+    """Значение из БД не пустое (None, NaN и пробелы - пусто)"""
+    return pd.notna(value) and bool(str(value).strip())
+
+def _field(value):
+    """Значение поля для вывода в HTML ('-' для пустых)"""
+    return html.escape(str(value).strip()) if _has_text(value) else '-'
+
+def _split_message(blocks, limit=MESSAGE_LIMIT):
+    """Собрать блоки в сообщения не длиннее limit (блок не разрывается,
+    слишком длинный блок обрезается)"""
+    messages = []
+    current = ''
+    for block in blocks:
+        block = block[:limit]
+        if current and len(current) + 2 + len(block) > limit:
+            messages.append(current)
+            current = ''
+        current = f"{current}\n\n{block}" if current else block
+    if current:
+        messages.append(current)
+    return messages
+
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Помощь"""
     text = """
@@ -501,6 +635,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /full - Полное обновление
 /operators - Отчет по операторам
 /feedback - Отчет по фидбэкам
+/find - Поиск по карте, телефону, ФИО, адресу, жалобе
 /service102 - Служба 102
 /service103 - Служба 103
 /service104 - Служба 104
@@ -567,7 +702,11 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка текстовых сообщений"""
     text = update.message.text.lower()
     
-    if any(word in text for word in ['стат', 'данные', 'инфо']):
+    words = update.message.text.split(maxsplit=1)
+    if words and words[0].lower() in ('найти', 'поиск'):
+        # Без текста запроса find_records покажет подсказку
+        await find_records(update, context, words[1] if len(words) > 1 else '')
+    elif any(word in text for word in ['стат', 'данные', 'инфо']):
         await show_stats(update, context)
     elif any(word in text for word in ['обнов', 'загруз', 'собр']):
         await full_update(update)
@@ -620,6 +759,7 @@ Chat ID: {CHAT_ID}
         app.add_handler(CommandHandler('full', full_update))
         app.add_handler(CommandHandler('operators', send_operator_stats))
         app.add_handler(CommandHandler('feedback', send_feedback_report))
+        app.add_handler(CommandHandler('find', find_records))
         app.add_handler(CommandHandler('service102', lambda u, c: send_service_report(u, c, 102)))
         app.add_handler(CommandHandler('service103', lambda u, c: send_service_report(u, c, 103)))
         app.add_handler(CommandHandler('service104', lambda u, c: send_service_report(u, c, 104)))
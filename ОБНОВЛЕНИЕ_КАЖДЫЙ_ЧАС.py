@@ -75,7 +75,8 @@ def main():
     try:
         while True:
             schedule.run_pending()
-            time.sleep(60)  # Проверяем каждую минуту
+            # Спим до следующего запуска, а не проверяем каждую минуту
+            time.sleep(max(schedule.idle_seconds() or 0, 1))
             
     except KeyboardInterrupt:
         logger.info("\n" + "=" * 60)